@@ -10,7 +10,7 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['pandas'],  # openpyxl lo importa si está instalado; la app no lo usa
     noarchive=False,
     optimize=0,
 )
@@ -1,10 +1,11 @@
 import sqlite3
 from werkzeug.security import generate_password_hash
 import config  # Importa la configuración para obtener el nombre de la BD
+import seguridad
 
 def migrar_passwords():
     """
-    Este script actualiza las contraseñas en texto plano a formato hasheado (pbkdf2:sha256).
+    Este script actualiza las contraseñas en texto plano a formato hasheado (config.PASSWORD_METODO).
     Es seguro ejecutarlo múltiples veces; solo afectará a las contraseñas que no estén hasheadas.
     """
     print("--- INICIANDO MIGRACIÓN DE CONTRASEÑAS ---")
@@ -26,9 +27,9 @@ def migrar_passwords():
         for usuario in usuarios:
             password_actual = usuario['password']
             
-            # Revisa si la contraseña ya parece estar hasheada
-            # El método por defecto de Werkzeug incluye '$' en el hash.
-            if password_actual and '$' in password_actual and password_actual.startswith('pbkdf2:sha256'):
+            # Revisa si la contraseña ya está hasheada (pbkdf2 o scrypt de Werkzeug, con cualquier costo).
+            # Los hashes con otro método se actualizan solos al iniciar sesión.
+            if seguridad.es_hash(password_actual):
                 print(f"✔️ El usuario '{usuario['username']}' ya tiene una contraseña hasheada. Omitiendo.")
                 continue
 
@@ -36,7 +37,7 @@ def migrar_passwords():
             print(f"⚠️  El usuario '{usuario['username']}' tiene una contraseña en texto plano. Actualizando...")
             
             # Genera el nuevo hash
-            nuevo_hash = generate_password_hash(password_actual, method='pbkdf2:sha256')
+            nuevo_hash = generate_password_hash(password_actual, method=config.PASSWORD_METODO)
             
             # Actualiza la base de datos
             cursor.execute("UPDATE usuarios SET password = ? WHERE id = ?", (nuevo_hash, usuario['id']))
@@ -0,0 +1,226 @@
+import json
+from collections import namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+
+# --- CONFIGURACIÓN (Importada) ---
+import archivo_logs
+import config
+import horarios
+import reportes
+
+# --- ANALÍTICA DE ASISTENCIA (vectorizada con numpy) ---
+# Métricas por docente y día: primera entrada y última salida, horas trabajadas,
+# atrasos contra el horario, ausencias y jornadas sin marca de salida.
+# Leer un año de logs fila por fila (cientos de miles de tuplas de Python) tardaba más
+# que todo el cálculo. Aquí cada parte (`logs` y cada mes archivado) se lee con UNA
+# consulta agrupada por docente que devuelve sus fechas concatenadas: todas tienen el
+# formato fijo 'YYYY-MM-DD HH:MM:SS' (19 caracteres), así que el texto se convierte en
+# una matriz de bytes y se decodifica a columnas (docente, día, segundo del día) sin
+# recorrer filas en Python. Luego se ordena por (docente, día, jornada, hora) y los
+# bordes de cada grupo dan primera/última marca y cantidad.
+# Las jornadas (mañana/tarde) se separan con reportes.CORTE_JORNADA, como el reporte.
+# Este módulo importa numpy: la app lo importa recién al primer uso.
+
+Marcas = namedtuple('Marcas', 'docente dia segundo')  # Arreglos paralelos (índice de docente, índice de día, segundo)
+
+SIN_MARCA = -1
+_ANCHO_FECHA = 19
+_DIGITOS = [0, 1, 2, 3, 5, 6, 8, 9, 11, 12, 14, 15, 17, 18]  # Posiciones de los dígitos en 'YYYY-MM-DD HH:MM:SS'
+_SEPARADORES = {4: '-', 7: '-', 10: ' ', 13: ':', 16: ':'}
+
+def _normalizar_fecha(fecha):
+    """'YYYY-MM-DD HH:MM[:SS]' (o con 'T') -> 'YYYY-MM-DD HH:MM:SS'; None si no tiene ese formato."""
+    if not isinstance(fecha, str) or len(fecha) < 16 or fecha[10] not in ' T':
+        return None
+    return f"{fecha[:10]} {fecha[11:16]}{fecha[16:19] if len(fecha) >= 19 else ':00'}"
+
+# --- Lectura columnar ---
+def _grupos(conn, ids, desde, hasta):
+    """(usuario_id, cantidad, fechas concatenadas) de cada mes archivado del rango y de `logs`."""
+    parametros = {'ids': json.dumps(ids), 'desde': desde, 'hasta': hasta}
+    for _, ruta in archivo_logs.meses_archivados(conn, desde, hasta):
+        with archivo_logs.abrir(ruta) as archivo:
+            yield from archivo.execute(
+                "SELECT usuario_id, COUNT(*), group_concat(datetime(ts, 'unixepoch'), '') FROM eventos "
+                "WHERE usuario_id IN (SELECT value FROM json_each(:ids)) "
+                "AND ts >= CAST(strftime('%s', :desde) AS INTEGER) AND ts < CAST(strftime('%s', :hasta) AS INTEGER) "
+                "GROUP BY usuario_id", parametros).fetchall()
+    for usuario_id, cantidad, fechas in conn.execute(
+            "SELECT usuario_id, COUNT(*), group_concat(fecha, '') FROM logs "
+            "WHERE usuario_id IN (SELECT value FROM json_each(:ids)) AND fecha >= :desde AND fecha < :hasta "
+            "GROUP BY usuario_id", parametros).fetchall():
+        if len(fechas) != cantidad * _ANCHO_FECHA:
+            # Alguna fecha con otro formato (sin segundos, con 'T'...): este docente se lee fila por fila
+            filas = conn.execute("SELECT fecha FROM logs WHERE usuario_id = ? AND fecha >= ? AND fecha < ?",
+                                 (usuario_id, desde, hasta))
+            normalizadas = [f for f in (_normalizar_fecha(fila[0]) for fila in filas) if f]
+            cantidad, fechas = len(normalizadas), ''.join(normalizadas)
+        yield usuario_id, cantidad, fechas
+
+def cargar_marcas(conn, usuarios, inicio, fin):
+    """
+    Marcas de `usuarios` entre inicio y fin (dates, inclusive) como arreglos paralelos:
+    índice del docente en `usuarios`, índice del día desde `inicio` y segundo del día.
+    Las fechas que no se pueden interpretar se descartan.
+    """
+    ids = [str(u['biometric_id']) for u in usuarios]
+    posicion = {b: i for i, b in enumerate(ids)}
+    docentes, cantidades, textos = [], [], []
+    for usuario_id, cantidad, fechas in _grupos(conn, ids, inicio.isoformat(), (fin + timedelta(days=1)).isoformat()):
+        if cantidad and usuario_id in posicion:
+            docentes.append(posicion[usuario_id])
+            cantidades.append(cantidad)
+            textos.append(fechas)
+    if not textos:
+        vacio = np.zeros(0, dtype=np.int32)
+        return Marcas(vacio, vacio, vacio)
+
+    # 'replace' deja un byte por carácter: el ancho fijo se mantiene aunque haya basura
+    crudo = np.frombuffer(''.join(textos).encode('ascii', 'replace'), dtype=np.uint8).reshape(-1, _ANCHO_FECHA)
+    d = crudo[:, _DIGITOS].astype(np.int32) - ord('0')
+    validas = ((d >= 0) & (d <= 9)).all(axis=1)
+    for posicion_sep, separador in _SEPARADORES.items():
+        validas &= crudo[:, posicion_sep] == ord(separador)
+    dia_numero = d[:, :8] @ (10 ** np.arange(7, -1, -1, dtype=np.int32))  # AAAAMMDD
+    segundo = (d[:, 8] * 10 + d[:, 9]) * 3600 + (d[:, 10] * 10 + d[:, 11]) * 60 + d[:, 12] * 10 + d[:, 13]
+    validas &= segundo < 86400
+
+    # Pocos días distintos: se convierten con datetime y se reparten con el índice inverso
+    distintos, inverso = np.unique(np.where(validas, dia_numero, 0), return_inverse=True)
+    desplazamientos = np.array([_dias_desde(inicio, int(n)) for n in distintos], dtype=np.int32)
+    dia = desplazamientos[inverso.ravel()]
+    validas &= (dia >= 0) & (dia <= (fin - inicio).days)
+
+    docente = np.repeat(np.array(docentes, dtype=np.int32), cantidades)
+    return Marcas(docente[validas], dia[validas], segundo[validas].astype(np.int32))
+
+def _dias_desde(inicio, aaaammdd):
+    try:
+        return (date(aaaammdd // 10000, aaaammdd // 100 % 100, aaaammdd % 100) - inicio).days
+    except ValueError:
+        return -1
+
+# --- Cálculo ---
+def agrupar(marcas, n_docentes, n_dias, cortes):
+    """
+    Primera y última marca (segundo del día o SIN_MARCA) y cantidad de marcas por docente,
+    día y jornada: arreglos (n_docentes, n_dias, 2). La jornada de cada marca se decide con
+    el corte de su docente y día en `cortes` (n_docentes, n_dias).
+    """
+    # Orden por (celda, hora) con una sola clave entera; celda = (docente, día, jornada)
+    jornada = (marcas.segundo > cortes[marcas.docente, marcas.dia]).astype(np.int64)
+    celda = (marcas.docente.astype(np.int64) * n_dias + marcas.dia) * 2 + jornada
+    clave = np.sort(celda * 86400 + marcas.segundo)
+    celdas, segundos = np.divmod(clave, 86400)
+    if len(clave):
+        inicios = np.flatnonzero(np.r_[True, celdas[1:] != celdas[:-1]])
+        finales = np.r_[inicios[1:], len(clave)] - 1
+    else:
+        inicios = finales = np.zeros(0, np.int64)
+
+    forma = (n_docentes, n_dias, 2)
+    primera = np.full(forma, SIN_MARCA, dtype=np.int32)
+    ultima = np.full(forma, SIN_MARCA, dtype=np.int32)
+    cantidad = np.zeros(forma, dtype=np.int32)
+    presentes = celdas[inicios]
+    primera.reshape(-1)[presentes] = segundos[inicios]
+    ultima.reshape(-1)[presentes] = segundos[finales]
+    cantidad.reshape(-1)[presentes] = finales - inicios + 1
+    return primera, ultima, cantidad
+
+def _hora(segundo):
+    return None if segundo == SIN_MARCA else f"{segundo // 3600:02d}:{segundo // 60 % 60:02d}:{segundo % 60:02d}"
+
+def como_grupos(primera, ultima, cantidad, biometric_ids, dias):
+    """
+    Los arreglos de agrupar() con el formato de reportes.agrupar_marcas:
+    {biometric_id: {'YYYY-MM-DD': [primera_m, ultima_m, n_m, primera_t, ultima_t, n_t]}}.
+    """
+    grupos = {}
+    for i, j in zip(*np.nonzero(cantidad.sum(axis=2))):
+        marcas = []
+        for k in (0, 1):
+            marcas += [_hora(int(primera[i, j, k])), _hora(int(ultima[i, j, k])), int(cantidad[i, j, k])]
+        grupos.setdefault(str(biometric_ids[i]), {})[dias[j].isoformat()] = marcas
+    return grupos
+
+class Analitica:
+    """
+    Métricas de asistencia de `usuarios` en los días de `dias`. Arreglos por docente y día
+    (las de jornada tienen una tercera dimensión: 0 = mañana, 1 = tarde):
+    primera, ultima (segundo del día o SIN_MARCA), cantidad, horas, atraso_min,
+    tardanza, sin_salida (jornadas con una sola marca), ausente (día programado y
+    cerrado sin ninguna marca) y horas_programadas. `entradas`, `salidas` y `cortes`
+    son los de horarios.IndiceHorarios.matrices.
+    """
+
+    def __init__(self, usuarios, dias, marcas, entradas, salidas, cortes, tolerancia_min, hoy=None):
+        self.usuarios = usuarios
+        self.dias = dias
+        self.entradas, self.salidas = entradas, salidas
+        self.primera, self.ultima, self.cantidad = agrupar(marcas, len(usuarios), len(dias), cortes)
+
+        completas = self.cantidad >= 2
+        self.horas = np.where(completas, self.ultima - self.primera, 0).sum(axis=2) / 3600
+
+        atraso = np.where(self.cantidad > 0, self.primera - entradas, np.nan)
+        tarde = atraso > tolerancia_min * 60  # NaN (sin horario o sin marcas) -> False
+        self.atraso_min = np.where(tarde, atraso / 60, 0).sum(axis=2)
+        self.tardanza = tarde.any(axis=2)
+
+        # Hoy (y después) todavía puede llegar la marca: solo cuentan los días cerrados
+        hoy = hoy or date.today()
+        cerrados = np.array([d < hoy for d in dias], dtype=bool)[None, :]
+        programados = ~np.isnan(entradas).all(axis=2)
+        self.programado = programados & cerrados
+        self.ausente = self.programado & (self.cantidad.sum(axis=2) == 0)
+        self.sin_salida = np.where(cerrados, (self.cantidad == 1).sum(axis=2), 0)
+        duracion = np.where(np.isnan(entradas), 0, salidas - entradas).sum(axis=2)
+        self.horas_programadas = np.where(self.programado, duracion, 0) / 3600
+
+    def resumen(self):
+        """Totales por docente (dicts en el orden de `usuarios`)."""
+        con_marcas = (self.cantidad.sum(axis=2) > 0).sum(axis=1)
+        totales = zip(con_marcas, self.programado.sum(axis=1), self.ausente.sum(axis=1), self.horas.sum(axis=1),
+                      self.horas_programadas.sum(axis=1), self.tardanza.sum(axis=1), self.atraso_min.sum(axis=1),
+                      self.sin_salida.sum(axis=1))
+        return [{'biometric_id': u['biometric_id'], 'nombre': u['nombre'], 'dias_con_marcas': int(dias_marcas),
+                 'dias_programados': int(programados), 'ausencias': int(ausencias), 'horas': round(float(horas), 2),
+                 'horas_programadas': round(float(horas_prog), 2), 'tardanzas': int(tardanzas),
+                 'minutos_atraso': round(float(minutos), 1), 'sin_salida': int(sin_salida)}
+                for u, (dias_marcas, programados, ausencias, horas, horas_prog, tardanzas, minutos, sin_salida)
+                in zip(self.usuarios, totales)]
+
+    def detalle(self, i):
+        """Métricas día por día del docente i (solo los días con marcas, turnos o ausencia)."""
+        primeras = np.where(self.cantidad[i] > 0, self.primera[i], 86400).min(axis=1)
+        ultimas = self.ultima[i].max(axis=1)
+        programados = ~np.isnan(self.entradas[i])
+        dias = []
+        for j in np.flatnonzero((self.cantidad[i].sum(axis=1) > 0) | programados.any(axis=1)):
+            turnos = [f"{_hora(int(self.entradas[i, j, k]))[:5]}-{_hora(int(self.salidas[i, j, k]))[:5]}"
+                      for k in (0, 1) if programados[j, k]]
+            dias.append({'dia': self.dias[j].isoformat(), 'turnos': turnos,
+                         'primera': _hora(int(primeras[j])) if primeras[j] < 86400 else None,
+                         'ultima': _hora(int(ultimas[j])), 'marcas': int(self.cantidad[i, j].sum()),
+                         'horas': round(float(self.horas[i, j]), 2), 'atraso_min': round(float(self.atraso_min[i, j]), 1),
+                         'ausente': bool(self.ausente[i, j]), 'sin_salida': int(self.sin_salida[i, j])})
+        return dias
+
+    def filas_resumen(self):
+        """Filas de la hoja "Resumen" del reporte Excel (ver COLUMNAS_RESUMEN)."""
+        return [[r['biometric_id'], r['nombre'], r['dias_con_marcas'], r['ausencias'], r['horas'], r['horas_programadas'],
+                 r['tardanzas'], r['minutos_atraso'], r['sin_salida']] for r in self.resumen()]
+
+COLUMNAS_RESUMEN = ['ID Biométrico', 'Nombre Completo', 'Días con marcas', 'Ausencias', 'Horas trabajadas',
+                    'Horas programadas', 'Atrasos', 'Minutos de atraso', 'Jornadas sin salida']
+
+def analizar(conn, usuarios, inicio, fin, indice=None, hoy=None):
+    """Lee las marcas del rango (una consulta por parte) y calcula las métricas con el horario de cada docente."""
+    indice = indice or horarios.cargar(conn)
+    dias = reportes.rango_fechas(inicio, fin)
+    marcas = cargar_marcas(conn, usuarios, inicio, fin)
+    entradas, salidas, cortes = indice.matrices([u['biometric_id'] for u in usuarios], dias)
+    return Analitica(usuarios, dias, marcas, entradas, salidas, cortes, config.HORARIO_TOLERANCIA_MIN, hoy)
@@ -1,22 +1,101 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify
+from flask import Blueprint, Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, Response, stream_with_context, g, abort
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.exceptions import RequestEntityTooLarge
+import archivo_logs
 import biometrico_driver as bio
-import threading
-import pandas as pd
-import io
-from datetime import datetime, timedelta, time
-from openpyxl import Workbook
-from openpyxl.styles import PatternFill, Alignment, Border, Side
+import hashlib
+import hmac
+import horarios
+import importacion_docentes
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import eleccion_lider
+import metricas
+import reportes
+import seguridad
+import trabajos_reporte
 
 # --- CONFIGURACIÓN CENTRALIZADA ---
 import config
 
-app = Flask(__name__)
-app.secret_key = config.SECRET_KEY
+# --- ARRANQUE ---
+# Importar este módulo no toca la BD ni arranca hilos: todo eso lo hace crear_app().
+# Las dependencias pesadas (openpyxl, pyarrow, requests) se importan al primer uso.
+# Servidor de producción con varios procesos: python servidor.py (o gunicorn -w 4 'app:crear_app()')
+web = Blueprint('web', __name__)
+eleccion = eleccion_lider.EleccionLider()
+
+def _estado_lider():
+    """Estado de lo que solo existe en el proceso líder (gateway, pipeline, puertas)."""
+    return {'terminales': bio.estado_terminales(), 'puertas': bio.estado_puertas(), 'pipeline': bio.estado_pipeline()}
+
+def _nombre_proceso():
+    """Etiqueta `proceso` de las métricas: 'ingesta', 'web-1'... con servidor.py; si no, el pid."""
+    nombre = multiprocessing.current_process().name
+    return f"pid-{os.getpid()}" if nombre == 'MainProcess' else nombre
+
+def _servicios_de_lider():
+    """Escritor por lotes, escucha de los terminales y archivado de logs: solo en el proceso líder."""
+    bio.iniciar_escritor_logs()
+    bio.iniciar_escucha_en_hilo()
+    archivo_logs.MantenimientoProgramado().iniciar()
+    # Los otros procesos le piden al líder el estado de los dispositivos y sus métricas
+    eleccion.servir({
+        '/estado': lambda: ('application/json', json.dumps(_estado_lider()).encode()),
+        '/metrics': lambda: (metricas.TIPO_CONTENIDO, metricas.exponer(proceso=_nombre_proceso()).encode()),
+    })
+
+def iniciar_ingesta():
+    """Toma el liderazgo (o espera a que se libere) y, como líder, arranca los servicios de dispositivos."""
+    eleccion.esperar_liderazgo(_servicios_de_lider)
+
+def crear_app(iniciar_servicios=True, dispositivos=True):
+    """
+    Crea la app Flask. Con iniciar_servicios=True prepara la BD (migraciones y directorio
+    de usuarios) y sigue los cambios que hagan otros procesos; con dispositivos=True,
+    además, si este proceso resulta líder, arranca los servicios de dispositivos.
+    servidor.py usa dispositivos=False en los procesos web: la ingesta va en un proceso aparte.
+    """
+    app = Flask(__name__)
+    app.secret_key = config.SECRET_KEY
+    app.config['MAX_CONTENT_LENGTH'] = config.IMPORTACION_MAX_BYTES
+    app.register_blueprint(web)
+    login_manager.init_app(app)
+    if iniciar_servicios:
+        bio.init_db()
+        bio.iniciar_sincronizacion()
+        if dispositivos:
+            iniciar_ingesta()
+    return app
+
+# --- MÉTRICAS DE LA APP WEB ---
+HTTP_SEGUNDOS = metricas.histograma(
+    'http_solicitud_segundos', "Tiempo hasta tener la respuesta de cada ruta (sin el envío de respuestas por streaming).",
+    ('ruta', 'metodo', 'codigo'))
+REPORTE_SEGUNDOS = metricas.histograma(
+    'reporte_generacion_segundos', "Tiempo de generación del reporte matricial, por formato.", ('formato',),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+
+@web.before_app_request
+def _inicio_solicitud():
+    g.inicio_solicitud = time.perf_counter()
+
+@web.after_app_request
+def _medir_solicitud(respuesta):
+    inicio = g.pop('inicio_solicitud', None)
+    if inicio is not None:
+        # Por endpoint y no por URL: /editar_docente/1, /editar_docente/2... son una sola serie
+        HTTP_SEGUNDOS.observar(time.perf_counter() - inicio, ruta=request.endpoint or 'sin_ruta',
+                               metodo=request.method, codigo=respuesta.status_code)
+    return respuesta
 
 # --- FILTROS DE PLANTILLA ---
-@app.template_filter('datetimeformat')
+@web.app_template_filter('datetimeformat')
 def datetimeformat(value, format='%d/%m/%Y %H:%M'):
     if value == 'now':
         return datetime.now().strftime(format)
@@ -31,8 +110,7 @@ def datetimeformat(value, format='%d/%m/%Y %H:%M'):
 
 # --- CONFIGURACIÓN DE FLASK-LOGIN ---
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'web.login'
 login_manager.login_message = "Por favor, inicia sesión para acceder a esta página."
 login_manager.login_message_category = "info"
 
@@ -47,35 +125,55 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    conn = bio.get_db_connection()
-    u = conn.execute("SELECT * FROM usuarios WHERE id = ?", (user_id,)).fetchone()
-    conn.close()
+    # Se sirve del directorio en memoria: ninguna consulta a la BD por petición
+    u = bio.directorio.por_id(user_id)
     if u:
-        acceso = u['acceso_puerta'] if 'acceso_puerta' in u.keys() else 0
         return User(id=u['id'], username=u['username'], rol=u['rol'], 
-                    nombre=u['nombre'], bio_id=u['biometric_id'], acceso_puerta=acceso)
+                    nombre=u['nombre'], bio_id=u['biometric_id'], acceso_puerta=u['acceso_puerta'] or 0)
     return None
 
-# --- INICIALIZACIÓN ---
-bio.init_db()
-threading.Thread(target=bio.iniciar_escucha_background, daemon=True).start()
+def _actualizar_hash(user_id, hash_anterior, hash_nuevo):
+    """Guarda el hash regenerado con config.PASSWORD_METODO, salvo que la contraseña haya cambiado mientras tanto."""
+    conn = bio.get_db_connection()
+    conn.execute("UPDATE usuarios SET password = ? WHERE id = ? AND password = ?", (hash_nuevo, user_id, hash_anterior))
+    conn.commit()
+    conn.close()
 
 # --- RUTAS PRINCIPALES ---
-@app.route('/', methods=['GET', 'POST'])
+@web.route('/', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('admin_dashboard') if current_user.rol == 'admin' else url_for('docente_dashboard'))
+        return redirect(url_for('web.admin_dashboard') if current_user.rol == 'admin' else url_for('web.docente_dashboard'))
 
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        
-        conn = bio.get_db_connection()
+        ip = request.remote_addr or ''
+
+        # Los límites se revisan antes de gastar CPU en el hash
+        espera = seguridad.espera_login(username, ip)
+        if espera:
+            seguridad.LOGIN_INTENTOS.inc(resultado='limitado')
+            flash(f'Demasiados intentos fallidos. Intente de nuevo en {math.ceil(espera / 60)} minuto(s).', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(math.ceil(espera))}
+
+        conn = bio.get_db_connection(solo_lectura=True)
         usuario_db = conn.execute("SELECT * FROM usuarios WHERE username = ?", (username,)).fetchone()
         conn.close()
-        
+
         # Ahora se verifica el hash de la contraseña, no el texto plano
-        if usuario_db and check_password_hash(usuario_db['password'], password):
+        try:
+            valida, nuevo_hash = seguridad.verificar(usuario_db['password'], password) if usuario_db else (False, None)
+        except seguridad.Ocupado:
+            seguridad.LOGIN_INTENTOS.inc(resultado='ocupado')
+            flash('El servidor está atendiendo muchos inicios de sesión. Intente de nuevo en unos segundos.', 'warning')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+        seguridad.registrar_login(username, ip, valida)
+        seguridad.LOGIN_INTENTOS.inc(resultado='ok' if valida else 'fallo')
+
+        if valida:
+            if nuevo_hash:
+                _actualizar_hash(usuario_db['id'], usuario_db['password'], nuevo_hash)
             acceso = usuario_db['acceso_puerta'] if 'acceso_puerta' in usuario_db.keys() else 0
             user_obj = User(id=usuario_db['id'], username=usuario_db['username'], rol=usuario_db['rol'], 
                             nombre=usuario_db['nombre'], bio_id=usuario_db['biometric_id'], acceso_puerta=acceso)
@@ -83,29 +181,29 @@ def login():
             
             # Redirige al dashboard correspondiente
             if user_obj.rol == 'admin':
-                return redirect(url_for('admin_dashboard'))
+                return redirect(url_for('web.admin_dashboard'))
             else:
-                return redirect(url_for('docente_dashboard'))
+                return redirect(url_for('web.docente_dashboard'))
         else:
             flash('Usuario o contraseña incorrectos.', 'danger')
 
     return render_template('login.html')
 
-@app.route('/logout')
+@web.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('web.login'))
 
 # --- RUTAS DE ADMINISTRADOR ---
-@app.route('/admin')
+@web.route('/admin')
 @login_required
 def admin_dashboard():
     if current_user.rol != 'admin':
-        return redirect(url_for('docente_dashboard'))
+        return redirect(url_for('web.docente_dashboard'))
         
-    conn = bio.get_db_connection()
+    conn = bio.get_db_connection(solo_lectura=True)
     docentes = [dict(row) for row in conn.execute("SELECT * FROM usuarios WHERE rol='docente' ORDER BY nombre").fetchall()]
     query_logs = '''
         SELECT l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen
@@ -118,7 +216,7 @@ def admin_dashboard():
     
     return render_template('admin.html', docentes=docentes, logs=logs)
 
-@app.route('/toggle_permiso/<int:id>', methods=['POST'])
+@web.route('/toggle_permiso/<int:id>', methods=['POST'])
 @login_required
 def toggle_permiso(id):
     if current_user.rol != 'admin':
@@ -132,15 +230,91 @@ def toggle_permiso(id):
         conn.execute("UPDATE usuarios SET acceso_puerta = ? WHERE id = ?", (nuevo_estado, id))
         conn.commit()
         conn.close()
+        bio.directorio.invalidar()
         return jsonify({'success': True})
     except Exception as e:
         print(f"Error en toggle_permiso: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@app.route('/crear_docente', methods=['POST'])
+@web.route('/api/docentes/acceso', methods=['POST'])
+@login_required
+def acceso_en_lote():
+    """
+    Da o quita el permiso de puerta a varios docentes a la vez. JSON:
+    {"estado": true|false, "ids": [...]} o "biometric_ids": [...], "texto": "...", "todos": true.
+    """
+    if current_user.rol != 'admin':
+        return jsonify({'success': False, 'message': 'No autorizado'}), 403
+
+    data = request.get_json(silent=True) or {}
+    if 'estado' not in data:
+        return jsonify({'success': False, 'message': "Falta 'estado'"}), 400
+    conn = bio.get_db_connection()
+    try:
+        cambiados = importacion_docentes.actualizar_acceso(
+            conn, data['estado'], ids=data.get('ids'), biometric_ids=data.get('biometric_ids'),
+            texto=data.get('texto'), todos=bool(data.get('todos')))
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    finally:
+        conn.close()
+    if cambiados:
+        bio.directorio.invalidar()
+    return jsonify({'success': True, 'actualizados': cambiados})
+
+@web.route('/importar_docentes', methods=['POST'])
+@login_required
+def importar_docentes():
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
+
+    try:
+        archivo = request.files.get('archivo')
+    except RequestEntityTooLarge:
+        flash(f'El archivo supera {config.IMPORTACION_MAX_BYTES // (1024 * 1024)} MB.', 'danger')
+        return redirect(url_for('web.admin_dashboard'))
+    if not archivo or not archivo.filename:
+        flash('Seleccione un archivo CSV o Excel.', 'warning')
+        return redirect(url_for('web.admin_dashboard'))
+
+    modo = 'actualizar' if request.form.get('modo') == 'actualizar' else 'crear'
+    # Los hashes se calculan dentro de la petición: un archivo con muchas contraseñas nuevas
+    # superaría el tiempo de espera del proxy, así que va por la línea de comandos
+    try:
+        resultado = importacion_docentes.importar(archivo.read(), archivo.filename, modo,
+                                                  max_hashes=config.IMPORTACION_MAX_HASHES_WEB)
+    except importacion_docentes.ErrorImportacion as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('web.admin_dashboard'))
+
+    errores = resultado['errores']
+    if errores:
+        detalle = '; '.join(f"fila {fila}: {mensaje}" if fila else mensaje for fila, mensaje in errores[:10])
+        resto = f' (y {len(errores) - 10} más)' if len(errores) > 10 else ''
+        flash(f'No se importó nada. {len(errores)} error(es): {detalle}{resto}.', 'danger')
+    else:
+        bio.directorio.invalidar()
+        flash(f"Importación completa: {resultado['creados']} docentes creados, "
+              f"{resultado['actualizados']} actualizados.", 'success')
+    return redirect(url_for('web.admin_dashboard'))
+
+@web.route('/exportar_docentes')
+@login_required
+def exportar_docentes():
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
+
+    filas = importacion_docentes.iterar_docentes()
+    if request.args.get('formato') == 'xlsx':
+        salida = tempfile.TemporaryFile()
+        importacion_docentes.escribir_excel(filas, salida)
+        salida.seek(0)
+        return send_file(salida, download_name="Docentes.xlsx", as_attachment=True)
+    return Response(stream_with_context(importacion_docentes.generar_csv(filas)), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=Docentes.csv'})
+
+@web.route('/crear_docente', methods=['POST'])
 @login_required
 def crear_docente():
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
     nombre = request.form['nombre']
     bio_id = request.form['bio_id']
@@ -150,11 +324,15 @@ def crear_docente():
 
     if not all([nombre, bio_id, username, password]):
         flash('Todos los campos son obligatorios.', 'warning')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('web.admin_dashboard'))
 
     # Se hashea la contraseña antes de guardarla
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
-    
+    try:
+        hashed_password = seguridad.generar_hash(password)
+    except seguridad.Ocupado:
+        flash('El servidor está ocupado. Intente crear el docente de nuevo en unos segundos.', 'warning')
+        return redirect(url_for('web.admin_dashboard'))
+
     try:
         conn = bio.get_db_connection()
         conn.execute(
@@ -163,44 +341,49 @@ def crear_docente():
         )
         conn.commit()
         conn.close()
+        bio.directorio.invalidar()
         flash(f'Docente "{nombre}" creado exitosamente.', 'success')
     except Exception as e:
         flash(f'Error al crear el docente: {e}', 'danger')
         
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('web.admin_dashboard'))
 
-@app.route('/eliminar_docente/<int:id>')
+@web.route('/eliminar_docente/<int:id>')
 @login_required
 def eliminar_docente(id):
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
     conn = bio.get_db_connection()
     conn.execute("DELETE FROM usuarios WHERE id = ?", (id,))
     conn.commit()
     conn.close()
+    bio.directorio.invalidar()
     
     flash('Docente eliminado correctamente.', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('web.admin_dashboard'))
 
-@app.route('/editar_docente/<int:id>')
+@web.route('/editar_docente/<int:id>')
 @login_required
 def editar_docente(id):
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
-    conn = bio.get_db_connection()
+    conn = bio.get_db_connection(solo_lectura=True)
     docente = conn.execute("SELECT * FROM usuarios WHERE id = ?", (id,)).fetchone()
+    turnos = horarios.listar(conn, id)
     conn.close()
     
     if docente:
-        return render_template('editar_docente.html', docente=dict(docente))
+        return render_template('editar_docente.html', docente=dict(docente), turnos=turnos,
+                               dias_semana=horarios.DIAS_SEMANA, jornadas=horarios.JORNADAS,
+                               hoy=datetime.now().strftime('%Y-%m-%d'))
     
     flash('El docente no fue encontrado.', 'warning')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('web.admin_dashboard'))
 
-@app.route('/actualizar_docente', methods=['POST'])
+@web.route('/actualizar_docente', methods=['POST'])
 @login_required
 def actualizar_docente():
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
     docente_id = request.form['docente_id']
     nombre = request.form['nombre']
@@ -209,10 +392,15 @@ def actualizar_docente():
     password = request.form.get('password') # Es opcional
     acceso = 1 if request.form.get('acceso_puerta') else 0
     
-    conn = bio.get_db_connection()
     # Si se proporcionó una nueva contraseña, se hashea
     if password:
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        try:
+            hashed_password = seguridad.generar_hash(password)
+        except seguridad.Ocupado:
+            flash('El servidor está ocupado. Intente guardar de nuevo en unos segundos.', 'warning')
+            return redirect(url_for('web.editar_docente', id=docente_id))
+    conn = bio.get_db_connection()
+    if password:
         conn.execute(
             "UPDATE usuarios SET biometric_id=?, nombre=?, username=?, password=?, acceso_puerta=? WHERE id=?",
             (bio_id, nombre, username, hashed_password, acceso, docente_id)
@@ -225,159 +413,431 @@ def actualizar_docente():
         )
     conn.commit()
     conn.close()
+    bio.directorio.invalidar()
     
     flash('Docente actualizado correctamente.', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('web.admin_dashboard'))
+
+@web.route('/agregar_turno', methods=['POST'])
+@login_required
+def agregar_turno():
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
+
+    # Solo turnos de un docente: el horario general se edita con `python horarios.py`
+    docente_id = request.form.get('docente_id', type=int)
+    conn = bio.get_db_connection()
+    try:
+        if docente_id is None or not conn.execute("SELECT 1 FROM usuarios WHERE id = ?", (docente_id,)).fetchone():
+            flash('El docente no fue encontrado.', 'warning')
+            return redirect(url_for('web.admin_dashboard'))
+        with conn:
+            n = horarios.agregar(conn, docente_id, request.form.getlist('dias'), request.form.get('jornada'),
+                                 request.form.get('entrada'), request.form.get('salida'),
+                                 request.form.get('desde'), request.form.get('hasta') or None)
+        flash(f'{n} turno(s) agregado(s) al horario.', 'success')
+    except horarios.ErrorHorario as e:
+        flash(f'No se pudo guardar el turno: {e}', 'danger')
+    finally:
+        conn.close()
+    return redirect(url_for('web.editar_docente', id=docente_id))
+
+@web.route('/eliminar_turno/<int:docente_id>/<int:turno_id>')
+@login_required
+def eliminar_turno(docente_id, turno_id):
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
+
+    conn = bio.get_db_connection()
+    with conn:
+        eliminado = horarios.eliminar(conn, turno_id, docente_id)
+    conn.close()
+    flash('Turno eliminado.' if eliminado else 'El turno no existe.', 'success' if eliminado else 'warning')
+    return redirect(url_for('web.editar_docente', id=docente_id))
 
-@app.route('/admin/abrir_puerta')
+@web.route('/admin/abrir_puerta')
 @login_required
 def admin_abrir():
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
     exito, msg = bio.abrir_puerta_remota(f"Admin: {current_user.nombre}")
     flash(msg, 'success' if exito else 'error')
     
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('web.admin_dashboard'))
 
 # --- API & REPORTES ---
-@app.route('/api/logs')
+@web.route('/api/directorio')
+@login_required
+def api_directorio():
+    """Contadores de aciertos/fallos del directorio de usuarios en memoria."""
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(bio.directorio.estadisticas())
+
+@web.route('/api/puerta')
+@login_required
+def api_puerta():
+    """Comandos enviados/colapsados y latencia de apertura del NodeMCU."""
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(bio.obtener_controlador_puerta().estadisticas())
+
+def _estado_dispositivos():
+    """_estado_lider() de este proceso si es el líder; si no, pedido al proceso líder (OSError si no responde)."""
+    if eleccion.es_lider:
+        return _estado_lider()
+    return json.loads(eleccion_lider.consultar_lider('/estado')[1])
+
+@web.route('/api/dispositivos')
+@login_required
+def api_dispositivos():
+    """Estado de conexión de cada terminal del gateway y estadísticas de cada puerta."""
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    try:
+        estado = _estado_dispositivos()
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f"El proceso de ingesta no responde: {e}"}), 503
+    return jsonify({'terminales': estado['terminales'], 'puertas': estado['puertas']})
+
+@web.route('/api/pipeline')
+@login_required
+def api_pipeline():
+    """Eventos por segundo y profundidad de cola de cada etapa del pipeline de eventos."""
+    if current_user.rol != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    try:
+        return jsonify(_estado_dispositivos()['pipeline'])
+    except (OSError, ValueError) as e:
+        return jsonify({'error': f"El proceso de ingesta no responde: {e}"}), 503
+
+@web.route('/metrics')
+def metrics():
+    """
+    Métricas en formato de texto de Prometheus (ver config.METRICAS_TOKEN), con la etiqueta
+    `proceso`: las de este proceso y, si no es el líder, también las del proceso líder, que
+    atiende los dispositivos. Cada proceso web solo suma sus propias solicitudes.
+    """
+    autorizacion = request.headers.get('Authorization', '')
+    con_token = bool(config.METRICAS_TOKEN) and hmac.compare_digest(autorizacion, f"Bearer {config.METRICAS_TOKEN}")
+    local = config.METRICAS_LOCALHOST and request.remote_addr in ('127.0.0.1', '::1')
+    admin = current_user.is_authenticated and current_user.rol == 'admin'
+    if not (con_token or local or admin):
+        abort(403)
+    locales = metricas.exponer(proceso=_nombre_proceso())
+    if not eleccion.es_lider:
+        try:
+            _, cuerpo = eleccion_lider.consultar_lider('/metrics')
+            locales = metricas.combinar(cuerpo.decode('utf-8'), locales)
+        except OSError as e:
+            print(f"⚠️ No se pudieron leer las métricas del proceso líder: {e}")
+    return Response(locales, content_type=metricas.TIPO_CONTENIDO)
+
+COLUMNAS_LOGS = ['id', 'fecha', 'usuario_id', 'nombre', 'tipo_evento', 'origen']
+
+def _entero_param(nombre):
+    valor = request.args.get(nombre)
+    if valor in (None, ''):
+        return None
+    return int(valor)  # ValueError -> 400
+
+@web.route('/api/logs')
 @login_required
 def api_logs():
+    """
+    Logs con paginación por cursor sobre logs.id:
+      - sin cursores: los más recientes (id descendente)
+      - since_id=N: solo los posteriores a N, en orden ascendente (deltas)
+      - before_id=N: la página anterior a N, en orden descendente (historial)
+    Filtros: usuario_id, tipo_evento, origen, fecha_inicio, fecha_fin (YYYY-MM-DD).
+    formato=compacto devuelve columnas + filas. Responde 304 si el ETag no cambió.
+    """
     if current_user.rol != 'admin': return jsonify({"error": "No autorizado"}), 403
-    
-    conn = bio.get_db_connection()
-    logs = [dict(row) for row in conn.execute("SELECT l.id, l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen FROM logs l LEFT JOIN usuarios u ON l.usuario_id = u.biometric_id ORDER BY l.id DESC LIMIT 20").fetchall()]
+
+    try:
+        since_id = _entero_param('since_id')
+        before_id = _entero_param('before_id')
+        limite = min(max(_entero_param('limit') or config.API_LOGS_LIMITE, 1), config.API_LOGS_LIMITE_MAX)
+        fecha_ini = request.args.get('fecha_inicio')
+        fecha_fin = request.args.get('fecha_fin')
+        if fecha_ini:
+            datetime.strptime(fecha_ini, '%Y-%m-%d')
+        if fecha_fin:
+            fecha_fin = (datetime.strptime(fecha_fin, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    except ValueError:
+        return jsonify({"error": "Parámetros inválidos"}), 400
+
+    conn = bio.get_db_connection(solo_lectura=True)
+    # El ETag depende del último id (lectura directa del rowid), de las versiones de
+    # `usuarios` (la respuesta lleva el nombre) y de `logs` (borrados del archivado) y de
+    # la consulta pedida: si nada cambió se responde 304 sin ejecutar la consulta.
+    max_id, version_usuarios, version_logs = conn.execute(
+        "SELECT (SELECT MAX(id) FROM logs), (SELECT valor FROM versiones WHERE clave = 'usuarios'), "
+        "(SELECT valor FROM versiones WHERE clave = 'logs')").fetchone()
+    etag = (f"{max_id or 0}-{version_usuarios}-{version_logs}-"
+            f"{hashlib.sha1(request.query_string).hexdigest()[:12]}")
+    if request.if_none_match.contains(etag):
+        conn.close()
+        respuesta = Response(status=304)
+        respuesta.set_etag(etag)
+        return respuesta
+
+    condiciones, params = [], []
+    if since_id is not None:
+        condiciones.append("l.id > ?"); params.append(since_id)
+    if before_id is not None:
+        condiciones.append("l.id < ?"); params.append(before_id)
+    for campo in ('usuario_id', 'tipo_evento', 'origen'):
+        valor = request.args.get(campo)
+        if valor:
+            condiciones.append(f"l.{campo} = ?"); params.append(valor)
+    if fecha_ini:
+        condiciones.append("l.fecha >= ?"); params.append(fecha_ini)
+    if fecha_fin:
+        condiciones.append("l.fecha < ?"); params.append(fecha_fin)
+
+    ascendente = since_id is not None and before_id is None
+    consulta = bio.CONSULTA_LOGS
+    if condiciones:
+        consulta += " WHERE " + " AND ".join(condiciones)
+    consulta += f" ORDER BY l.id {'ASC' if ascendente else 'DESC'} LIMIT ?"
+    filas = conn.execute(consulta, params + [limite]).fetchall()
     conn.close()
-    
-    return jsonify(logs)
 
-@app.route('/descargar_reporte_matricial')
+    ids = [f['id'] for f in filas]
+    cursores = {
+        # since_id: para pedir después solo lo nuevo; before_id: para la página anterior
+        'since_id': max(ids) if ids else since_id,
+        'before_id': min(ids) if len(ids) == limite and not ascendente else None,
+    }
+    if request.args.get('formato') == 'compacto':
+        respuesta = jsonify({'columnas': COLUMNAS_LOGS, 'filas': [list(f) for f in filas], **cursores})
+    else:
+        respuesta = jsonify([dict(f) for f in filas])
+    for nombre, valor in cursores.items():
+        if valor is not None:
+            respuesta.headers[f'X-Cursor-{nombre.replace("_", "-").title()}'] = str(valor)
+    respuesta.set_etag(etag)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+@web.route('/api/logs/stream')
+@login_required
+def api_logs_stream():
+    """
+    Canal Server-Sent Events del monitor en vivo: envía solo los logs nuevos.
+    Se reanuda desde el encabezado Last-Event-ID (o ?ultimo_id=) y, sin eventos
+    nuevos, solo manda un keep-alive sin tocar la base de datos.
+    """
+    if current_user.rol != 'admin': return jsonify({"error": "No autorizado"}), 403
+
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID') or request.args.get('ultimo_id'))
+    except (TypeError, ValueError):
+        ultimo_id = bio.bus.ultimo_id
+
+    def generar(ultimo_id):
+        yield "retry: 3000\n\n"
+        eventos, completo = bio.bus.desde(ultimo_id)
+        while True:
+            if not completo:
+                # El bus ya no tiene lo que falta: se completa una vez desde la BD
+                eventos = bio.logs_posteriores(ultimo_id, config.SSE_HISTORIAL)
+                completo = len(eventos) < config.SSE_HISTORIAL
+            for evento in eventos:
+                ultimo_id = evento['id']
+                yield f"id: {ultimo_id}\nevent: log\ndata: {json.dumps(evento)}\n\n"
+            if completo:
+                eventos, completo = bio.bus.esperar(ultimo_id, config.SSE_KEEPALIVE)
+                if not eventos:
+                    yield ": keep-alive\n\n"
+
+    return Response(stream_with_context(generar(ultimo_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _parametros_reporte(datos):
+    """(inicio, fin, docente_id o None, formato) del formulario de reportes; ValueError si una fecha es inválida."""
+    fecha_ini_str = datos.get('fecha_inicio')
+    fecha_fin_str = datos.get('fecha_fin')
+    end_date = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date() if fecha_fin_str else datetime.now().date()
+    start_date = datetime.strptime(fecha_ini_str, '%Y-%m-%d').date() if fecha_ini_str else end_date - timedelta(days=15)
+    docente_id = datos.get('docente_id')
+    formato = datos.get('formato') or 'xlsx'
+    return start_date, end_date, (None if docente_id in (None, '', 'todos') else str(docente_id)), formato
+
+@web.route('/descargar_reporte_matricial')
 @login_required
 def descargar_reporte_matricial():
-    if current_user.rol != 'admin': return redirect(url_for('login'))
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
     
-    fecha_ini_str = request.args.get('fecha_inicio')
-    fecha_fin_str = request.args.get('fecha_fin')
-    docente_id = request.args.get('docente_id')
-
     try:
-        end_date = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date() if fecha_fin_str else datetime.now().date()
-        start_date = datetime.strptime(fecha_ini_str, '%Y-%m-%d').date() if fecha_ini_str else end_date - timedelta(days=15)
+        start_date, end_date, docente_id, formato = _parametros_reporte(request.args)
     except ValueError:
         flash("Formato de fecha inválido. Use YYYY-MM-DD.", "danger")
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('web.admin_dashboard'))
 
-    date_range = [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
+    conn = bio.get_db_connection(solo_lectura=True)
+    users = trabajos_reporte.usuarios_del_reporte(conn, docente_id)
+    nombre_archivo = f"Reporte_Asistencia.{formato}"
 
-    conn = bio.get_db_connection()
-    if docente_id and docente_id != 'todos':
-        users = conn.execute("SELECT * FROM usuarios WHERE biometric_id = ?", (docente_id,)).fetchall()
-    else:
-        users = conn.execute("SELECT * FROM usuarios WHERE rol='docente'").fetchall()
+    # Una sola consulta por rango; las filas se generan a medida que se escriben
+    if formato == 'csv':
+        filas = reportes.iterar_matriz_asistencia(conn, users, start_date, end_date)
+        conn.close()
+        csv_stream = REPORTE_SEGUNDOS.medir_iterador(reportes.generar_csv_matricial(filas, start_date, end_date),
+                                                     formato='csv')
+        return Response(stream_with_context(csv_stream),
+                        mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={nombre_archivo}'})
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reporte Matricial"
-    
-    # Estilos (sin cambios)
-    blue_fill = PatternFill(start_color="CCECFF", end_color="CCECFF", fill_type="solid")
-    green_fill = PatternFill(start_color="92D050", end_color="92D050", fill_type="solid")
-    orange_fill = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-    gray_fill = PatternFill(start_color="EFEFEF", end_color="EFEFEF", fill_type="solid")
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    wrap_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-
-    ws.merge_cells('A1:Z1')
-    ws['A1'].value = f"Reporte de Asistencia ({start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')})"
-    ws['A1'].fill = blue_fill
-    ws['A1'].alignment = Alignment(horizontal='center')
-
-    headers = ['ID Biométrico', 'Nombre Completo', 'Departamento']
-    for col, txt in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col, value=txt)
-        cell.fill = green_fill
-        cell.border = thin_border
-        ws.column_dimensions[chr(64+col)].width = 25
-
-    for i, day in enumerate(date_range):
-        col_idx = 4 + i
-        cell = ws.cell(row=2, column=col_idx, value=day.strftime('%d/%m'))
-        cell.fill = orange_fill
-        cell.border = thin_border
-        cell.alignment = Alignment(horizontal='center')
-        ws.column_dimensions[cell.column_letter].width = 18
-    
-    corte_jornada = time(13, 50, 0)
-    for row_idx, user in enumerate(users, 3):
-        ws.cell(row=row_idx, column=1, value=user['biometric_id']).border = thin_border
-        ws.cell(row=row_idx, column=2, value=user['nombre']).border = thin_border
-        ws.cell(row=row_idx, column=3, value="Docencia").border = thin_border
-        
-        for col_offset, day in enumerate(date_range):
-            day_str = day.strftime('%Y-%m-%d')
-            logs_db = conn.execute("SELECT fecha FROM logs WHERE usuario_id = ? AND fecha LIKE ?", (user['biometric_id'], f"{day_str}%")).fetchall()
-            
-            marcas_manana, marcas_tarde = [], []
-            for log in logs_db:
-                try:
-                    ts = datetime.fromisoformat(log['fecha'])
-                    if ts.time() <= corte_jornada:
-                        marcas_manana.append(ts)
-                    else:
-                        marcas_tarde.append(ts)
-                except (ValueError, TypeError):
-                    continue
-
-            text_manana = f"{min(marcas_manana).strftime('%H:%M')}-{max(marcas_manana).strftime('%H:%M')}" if len(marcas_manana) > 1 else (marcas_manana[0].strftime('%H:%M') if marcas_manana else "--:--")
-            text_tarde = f"{min(marcas_tarde).strftime('%H:%M')}-{max(marcas_tarde).strftime('%H:%M')}" if len(marcas_tarde) > 1 else (marcas_tarde[0].strftime('%H:%M') if marcas_tarde else "--:--")
-            
-            final_text = f"Mañana: {text_manana}\nTarde: {text_tarde}".strip()
-            
-            cell = ws.cell(row=row_idx, column=4 + col_offset, value=final_text)
-            cell.alignment = wrap_alignment
-            cell.border = thin_border
-            if row_idx % 2 != 0: cell.fill = gray_fill
-    
-    conn.close()
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return send_file(output, download_name="Reporte_Asistencia.xlsx", as_attachment=True)
+    salida = tempfile.TemporaryFile()
+    try:
+        if formato == 'parquet':
+            with REPORTE_SEGUNDOS.medir(formato='parquet'):
+                reportes.escribir_parquet(reportes.iterar_marcas(conn, users, start_date, end_date), start_date, end_date, salida)
+        else:
+            nombre_archivo = "Reporte_Asistencia.xlsx"
+            with REPORTE_SEGUNDOS.medir(formato='xlsx'):
+                reportes.escribir_excel_matricial(reportes.iterar_matriz_asistencia(conn, users, start_date, end_date),
+                                                  start_date, end_date, salida,
+                                                  reportes.resumen_asistencia(conn, users, start_date, end_date))
+    except ImportError:
+        salida.close()
+        flash("La exportación a Parquet requiere instalar 'pyarrow'.", "warning")
+        return redirect(url_for('web.admin_dashboard'))
+    finally:
+        conn.close()
+
+    # El archivo temporal se envía por bloques y se cierra al terminar la respuesta
+    salida.seek(0)
+    return send_file(salida, download_name=nombre_archivo, as_attachment=True)
+
+# --- REPORTES EN SEGUNDO PLANO (ver trabajos_reporte.py) ---
+def _trabajo_json(trabajo):
+    datos = {c: trabajo[c] for c in ('id', 'estado', 'progreso', 'hechos', 'total', 'error', 'formato',
+                                      'fecha_inicio', 'fecha_fin', 'docente_id')}
+    datos['desde_cache'] = bool(trabajo['desde_cache'])
+    datos['url_estado'] = url_for('web.api_estado_reporte', trabajo_id=trabajo['id'])
+    if trabajo['estado'] == 'listo':
+        datos['url_descarga'] = url_for('web.descargar_reporte', trabajo_id=trabajo['id'])
+    return datos
+
+@web.route('/api/reportes', methods=['POST'])
+@login_required
+def api_crear_reporte():
+    """Encola un reporte (mismos campos que el formulario, en JSON o form) y responde 202 con el trabajo."""
+    if current_user.rol != 'admin': return jsonify({"error": "No autorizado"}), 403
+
+    try:
+        inicio, fin, docente_id, formato = _parametros_reporte(request.get_json(silent=True) or request.form)
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD."}), 400
+    if inicio > fin:
+        return jsonify({"error": "La fecha de inicio es posterior a la de fin."}), 400
+    try:
+        trabajo_id = trabajos_reporte.enviar(inicio, fin, docente_id, formato, usuario_id=current_user.id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except trabajos_reporte.Ocupado:
+        return jsonify({"error": "Hay demasiados reportes en cola. Intente de nuevo en unos minutos."}), 503, \
+            {'Retry-After': '30'}
+    datos = _trabajo_json(trabajos_reporte.estado(trabajo_id))
+    return jsonify(datos), 202, {'Location': datos['url_estado']}
+
+@web.route('/api/reportes/<trabajo_id>')
+@login_required
+def api_estado_reporte(trabajo_id):
+    if current_user.rol != 'admin': return jsonify({"error": "No autorizado"}), 403
+
+    trabajo = trabajos_reporte.estado(trabajo_id)
+    if trabajo is None:
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify(_trabajo_json(trabajo))
+
+@web.route('/reportes/<trabajo_id>/descargar')
+@login_required
+def descargar_reporte(trabajo_id):
+    if current_user.rol != 'admin': return redirect(url_for('web.login'))
+
+    trabajo = trabajos_reporte.estado(trabajo_id)
+    if trabajo is None or trabajo['estado'] != 'listo':
+        flash("El reporte no existe o todavía no está listo.", "warning")
+        return redirect(url_for('web.admin_dashboard'))
+    try:
+        archivo = open(trabajos_reporte.ruta_archivo(trabajo['clave'], trabajo['formato']), 'rb')
+    except FileNotFoundError:
+        flash("El reporte ya no está en caché. Vuelva a generarlo.", "warning")
+        return redirect(url_for('web.admin_dashboard'))
+    return send_file(archivo, download_name=f"Reporte_Asistencia.{trabajo['formato']}", as_attachment=True)
+
+# --- ANALÍTICA DE ASISTENCIA (ver analitica_asistencia.py) ---
+@web.route('/api/analitica')
+@login_required
+def api_analitica():
+    """
+    Totales por docente del rango (horas, atrasos, ausencias, jornadas sin salida) y,
+    con ?detalle=1, las métricas día por día. Un docente solo puede ver las suyas.
+    """
+    try:
+        inicio, fin, docente_id, _ = _parametros_reporte(request.args)
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use YYYY-MM-DD."}), 400
+    if inicio > fin or (fin - inicio).days >= config.ANALITICA_MAX_DIAS:
+        return jsonify({"error": f"Rango inválido (máximo {config.ANALITICA_MAX_DIAS} días)."}), 400
+    if current_user.rol != 'admin':
+        docente_id = str(current_user.bio_id)
+
+    try:
+        import analitica_asistencia  # numpy se importa recién aquí
+    except ImportError:
+        return jsonify({"error": "La analítica requiere instalar 'numpy'."}), 501
+    t0 = time.perf_counter()
+    conn = bio.get_db_connection(solo_lectura=True)
+    try:
+        usuarios = trabajos_reporte.usuarios_del_reporte(conn, docente_id)
+        analitica = analitica_asistencia.analizar(conn, usuarios, inicio, fin)
+    finally:
+        conn.close()
+    docentes = analitica.resumen()
+    if request.args.get('detalle') in ('1', 'true'):
+        for i, docente in enumerate(docentes):
+            docente['dias'] = analitica.detalle(i)
+    return jsonify({'fecha_inicio': inicio.isoformat(), 'fecha_fin': fin.isoformat(),
+                    'tolerancia_min': config.HORARIO_TOLERANCIA_MIN, 'docentes': docentes,
+                    'segundos': round(time.perf_counter() - t0, 3)})
 
 # --- RUTAS DE DOCENTE ---
-@app.route('/docente')
+@web.route('/docente')
 @login_required
 def docente_dashboard():
-    conn = bio.get_db_connection()
+    conn = bio.get_db_connection(solo_lectura=True)
     logs = [dict(row) for row in conn.execute("SELECT * FROM logs WHERE usuario_id = ? ORDER BY id DESC LIMIT 10", (current_user.bio_id,)).fetchall()]
     conn.close()
     return render_template('docente.html', logs=logs)
 
-@app.route('/docente/abrir_puerta')
+@web.route('/docente/abrir_puerta')
 @login_required
 def docente_abrir():
     if current_user.rol == 'docente' and current_user.acceso_puerta != 1:
         flash("⛔ No tienes permiso para abrir la puerta.", "warning")
-        return redirect(url_for('docente_dashboard'))
+        return redirect(url_for('web.docente_dashboard'))
 
     exito, msg = bio.abrir_puerta_remota(f"Docente: {current_user.nombre}")
     flash(msg, 'success' if exito else 'danger')
-    return redirect(url_for('docente_dashboard'))
+    return redirect(url_for('web.docente_dashboard'))
 
-@app.route('/docente/marcar_web')
+@web.route('/docente/marcar_web')
 @login_required
 def docente_marcar():
     bio.guardar_log("Ahora", current_user.bio_id, "ASISTENCIA WEB", "Panel Web")
     flash("Asistencia web registrada correctamente.", "success")
-    return redirect(url_for('docente_dashboard'))
+    return redirect(url_for('web.docente_dashboard'))
 
 # --- PERFIL DE USUARIO ---
-@app.route('/perfil')
+@web.route('/perfil')
 @login_required
 def perfil():
     return render_template('cambiar_password.html')
 
-@app.route('/actualizar_password', methods=['POST'])
+@web.route('/actualizar_password', methods=['POST'])
 @login_required
 def actualizar_password():
     current_pw = request.form['current_password']
@@ -386,28 +846,46 @@ def actualizar_password():
 
     if not all([current_pw, new_pw, confirm_pw]):
         flash('Todos los campos son obligatorios.', 'warning')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('web.perfil'))
 
     if new_pw != confirm_pw:
         flash('Las contraseñas nuevas no coinciden.', 'danger')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('web.perfil'))
 
-    conn = bio.get_db_connection()
+    ip = request.remote_addr or ''
+    espera = seguridad.espera_login(current_user.username, ip)
+    if espera:
+        flash(f'Demasiados intentos fallidos. Intente de nuevo en {math.ceil(espera / 60)} minuto(s).', 'danger')
+        return redirect(url_for('web.perfil'))
+
+    conn = bio.get_db_connection(solo_lectura=True)
     user_db = conn.execute("SELECT password FROM usuarios WHERE id = ?", (current_user.id,)).fetchone()
+    conn.close()
 
-    if user_db and check_password_hash(user_db['password'], current_pw):
-        new_hashed_password = generate_password_hash(new_pw, method='pbkdf2:sha256')
+    try:
+        valida = user_db is not None and seguridad.verificar(user_db['password'], current_pw, rehash=False)[0]
+        new_hashed_password = seguridad.generar_hash(new_pw) if valida else None
+    except seguridad.Ocupado:
+        flash('El servidor está ocupado. Intente de nuevo en unos segundos.', 'warning')
+        return redirect(url_for('web.perfil'))
+    seguridad.registrar_login(current_user.username, ip, valida)
+
+    if valida:
+        conn = bio.get_db_connection()
         conn.execute("UPDATE usuarios SET password = ? WHERE id = ?", (new_hashed_password, current_user.id))
         conn.commit()
         conn.close()
         flash('Contraseña actualizada exitosamente.', 'success')
-        return redirect(url_for('admin_dashboard' if current_user.rol == 'admin' else 'docente_dashboard'))
+        return redirect(url_for('web.admin_dashboard' if current_user.rol == 'admin' else 'web.docente_dashboard'))
     else:
-        conn.close()
         flash('La contraseña actual es incorrecta.', 'danger')
-        return redirect(url_for('perfil'))
+        return redirect(url_for('web.perfil'))
 
 if __name__ == '__main__':
     # Se recomienda desactivar el modo debug en producción
+    depuracion = True
     print("--- SERVIDOR REINICIADO CORRECTAMENTE ---")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Con el recargador de debug, el proceso vigilante no atiende peticiones: los servicios
+    # se arrancan solo en el proceso hijo que sirve la app
+    app = crear_app(iniciar_servicios=not depuracion or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
+    app.run(host='0.0.0.0', port=5000, debug=depuracion)
\ No newline at end of file
@@ -0,0 +1,297 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- ARCHIVO MENSUAL DE LOGS ---
+# `logs` crecía sin límite y cada año de historial hacía más lentos dashboards,
+# índices y copias de seguridad. Los meses cerrados (más de ARCHIVO_MESES_ACTIVOS
+# atrás) se mueven a un archivo SQLite por mes (archivo/logs_YYYY-MM.db) con un
+# formato compacto: la fecha como entero (segundos) y el tipo de evento y el origen
+# como códigos enteros de la tabla `codigos`. Cada archivo tiene una vista `logs`
+# con las mismas columnas que la tabla original, así que se puede abrir o adjuntar
+# (ATTACH) y consultar igual. La tabla `logs_archivados` de la BD principal lista
+# los meses movidos. Los reportes leen de asistencia_diaria, que no se archiva;
+# lo que necesita las marcas crudas usa marcas(), que recorre las dos partes.
+#
+# El traslado es idempotente: se copia, se verifica y recién después se borra de
+# `logs`; si se corta a mitad de camino, la siguiente pasada lo completa. Luego el
+# espacio liberado se devuelve al disco con PRAGMA incremental_vacuum, por pasos
+# cortos para no bloquear al escritor de logs.
+
+_ESQUEMA_ARCHIVO = [
+    """CREATE TABLE IF NOT EXISTS {s}codigos (
+           codigo INTEGER PRIMARY KEY,
+           campo TEXT NOT NULL,            -- 'tipo_evento' u 'origen'
+           valor TEXT NOT NULL,
+           UNIQUE (campo, valor)
+       )""",
+    """CREATE TABLE IF NOT EXISTS {s}eventos (
+           id INTEGER PRIMARY KEY,         -- el mismo id que tenía en logs
+           ts INTEGER NOT NULL,            -- 'YYYY-MM-DD HH:MM:SS' local como segundos (strftime('%s'))
+           usuario_id TEXT,
+           tipo INTEGER,
+           origen INTEGER,
+           dispositivo_id INTEGER,
+           serial_no INTEGER
+       )""",
+    "CREATE INDEX IF NOT EXISTS {s}idx_eventos_ts ON eventos (ts)",
+    "CREATE INDEX IF NOT EXISTS {s}idx_eventos_usuario_ts ON eventos (usuario_id, ts)",
+    """CREATE VIEW IF NOT EXISTS {s}logs AS
+       SELECT e.id, datetime(e.ts, 'unixepoch') AS fecha, e.usuario_id, t.valor AS tipo_evento,
+              o.valor AS origen, e.dispositivo_id, e.serial_no
+       FROM eventos e
+       LEFT JOIN codigos t ON t.codigo = e.tipo
+       LEFT JOIN codigos o ON o.codigo = e.origen""",
+]
+
+# Filas del mes que se pueden archivar (con una fecha que strftime entiende)
+_FILAS_MES = "main.logs WHERE fecha >= :desde AND fecha < :hasta AND strftime('%s', fecha) IS NOT NULL"
+
+def crear_tabla(conn):
+    """Registro de meses archivados, en la BD principal."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS logs_archivados (
+            mes TEXT PRIMARY KEY,              -- 'YYYY-MM'
+            archivo TEXT NOT NULL,             -- nombre del archivo dentro del directorio de archivo
+            filas INTEGER NOT NULL,
+            archivado TEXT NOT NULL
+        )
+    """)
+
+# --- Rutas y meses ---
+def _ruta_principal(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def directorio_archivo(ruta_db):
+    return config.ARCHIVO_DIR or os.path.join(os.path.dirname(os.path.abspath(ruta_db)), 'archivo')
+
+def _rango_mes(mes):
+    """'2026-01' -> ('2026-01-01', '2026-02-01')."""
+    inicio = datetime.strptime(mes, '%Y-%m').date()
+    siguiente = (inicio.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return inicio.isoformat(), siguiente.isoformat()
+
+def mes_limite(hoy=None):
+    """Primer día del mes más antiguo que se mantiene en `logs`: todo lo anterior se puede archivar."""
+    hoy = hoy or date.today()
+    mes = hoy.year * 12 + hoy.month - 1 - config.ARCHIVO_MESES_ACTIVOS
+    limite = date(mes // 12, mes % 12 + 1, 1)
+    # Nunca dentro de la ventana de recuperación de eventos de los terminales: un evento
+    # recuperado de un mes ya archivado volvería a `logs` sin su duplicado para compararlo
+    recuperacion = hoy - timedelta(days=config.RECUPERACION_MAX_DIAS)
+    while limite > recuperacion.replace(day=1):
+        limite = (limite - timedelta(days=1)).replace(day=1)
+    return limite
+
+def meses_pendientes(conn, hoy=None):
+    """Meses cerrados que todavía tienen filas en `logs`."""
+    limite = mes_limite(hoy).isoformat()
+    meses = []
+    desde = ''
+    # Un salto por mes con el índice de fecha, sin recorrer todas las filas
+    while True:
+        fila = conn.execute("SELECT MIN(fecha) FROM logs WHERE fecha >= ? AND fecha < ?", (desde, limite)).fetchone()
+        if fila[0] is None or len(fila[0]) < 7:
+            return meses
+        mes = fila[0][:7]
+        try:
+            desde = _rango_mes(mes)[1]
+        except ValueError:
+            return meses  # Fechas que no siguen el formato normalizado: se dejan en `logs`
+        meses.append(mes)
+
+def meses_archivados(conn, desde=None, hasta=None):
+    """[(mes, ruta del archivo)] de los meses archivados que se solapan con [desde, hasta)."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'logs_archivados'").fetchone():
+        return []  # BD todavía sin la migración 8 (p. ej. durante la 5, que recalcula el resumen)
+    filas = conn.execute("SELECT mes, archivo FROM logs_archivados ORDER BY mes").fetchall()
+    directorio = directorio_archivo(_ruta_principal(conn))
+    resultado = []
+    for mes, archivo in filas:
+        inicio, fin = _rango_mes(mes)
+        if (desde is None or fin > desde) and (hasta is None or inicio < hasta):
+            resultado.append((mes, os.path.join(directorio, archivo)))
+    return resultado
+
+# --- Lectura transparente ---
+@contextmanager
+def abrir(ruta):
+    """Conexión de solo lectura a un archivo mensual; su vista `logs` tiene las columnas de `logs`."""
+    archivo = sqlite3.connect(ruta)
+    archivo.execute("PRAGMA query_only = ON")
+    try:
+        yield archivo
+    finally:
+        archivo.close()
+
+def marcas(conn, desde, hasta, usuario_id=None):
+    """
+    Genera (usuario_id, fecha) de los logs con desde <= fecha < hasta ('YYYY-MM-DD'),
+    leyendo los archivos mensuales del rango y luego `logs`. Sin orden garantizado entre partes.
+    """
+    filtro = " AND usuario_id = ?" if usuario_id is not None else ""
+    extra = [usuario_id] if usuario_id is not None else []
+    for _, ruta in meses_archivados(conn, desde, hasta):
+        with abrir(ruta) as archivo:
+            yield from archivo.execute(
+                "SELECT usuario_id, datetime(ts, 'unixepoch') FROM eventos "
+                "WHERE ts >= CAST(strftime('%s', ?) AS INTEGER) AND ts < CAST(strftime('%s', ?) AS INTEGER)" + filtro,
+                [desde, hasta] + extra)
+    yield from conn.execute("SELECT usuario_id, fecha FROM logs WHERE fecha >= ? AND fecha < ?" + filtro,
+                            [desde, hasta] + extra)
+
+# --- Traslado de un mes ---
+def archivar_mes(conn, mes):
+    """
+    Mueve las filas de `mes` ('YYYY-MM') de `logs` a su archivo. `conn` es una conexión
+    propia a la BD principal (sin transacción abierta). Devuelve las filas movidas.
+    """
+    desde, hasta = _rango_mes(mes)
+    directorio = directorio_archivo(_ruta_principal(conn))
+    os.makedirs(directorio, exist_ok=True)
+    nombre = f"logs_{mes}.db"
+    rango = {'desde': desde, 'hasta': hasta}
+
+    conn.execute("ATTACH DATABASE ? AS arch", (os.path.join(directorio, nombre),))
+    try:
+        # 1) Copiar (INSERT OR IGNORE: repetir tras un corte no duplica)
+        with conn:
+            for sentencia in _ESQUEMA_ARCHIVO:
+                conn.execute(sentencia.format(s='arch.'))
+            for campo in ('tipo_evento', 'origen'):
+                conn.execute(f"INSERT OR IGNORE INTO arch.codigos (campo, valor) "
+                             f"SELECT DISTINCT '{campo}', {campo} FROM {_FILAS_MES} AND {campo} IS NOT NULL", rango)
+            conn.execute(f"""
+                INSERT OR IGNORE INTO arch.eventos (id, ts, usuario_id, tipo, origen, dispositivo_id, serial_no)
+                SELECT l.id, CAST(strftime('%s', l.fecha) AS INTEGER), l.usuario_id, t.codigo, o.codigo,
+                       l.dispositivo_id, l.serial_no
+                FROM (SELECT * FROM {_FILAS_MES}) l
+                LEFT JOIN arch.codigos t ON t.campo = 'tipo_evento' AND t.valor = l.tipo_evento
+                LEFT JOIN arch.codigos o ON o.campo = 'origen' AND o.valor = l.origen
+            """, rango)
+
+        # 2) Verificar y 3) borrar de `logs` solo lo que ya está en el archivo
+        with conn:
+            faltan = conn.execute(f"SELECT COUNT(*) FROM {_FILAS_MES} AND id NOT IN (SELECT id FROM arch.eventos)",
+                                  rango).fetchone()[0]
+            if faltan:
+                raise sqlite3.DatabaseError(f"{faltan} fila(s) de {mes} no llegaron al archivo {nombre}")
+            movidas = conn.execute(f"DELETE FROM {_FILAS_MES}", rango).rowcount
+            total = conn.execute("SELECT COUNT(*) FROM arch.eventos").fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO logs_archivados (mes, archivo, filas, archivado) VALUES (?, ?, ?, ?)",
+                         (mes, nombre, total, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+    finally:
+        conn.execute("DETACH DATABASE arch")
+
+    # El archivo ya no cambia: se compacta una vez (sin páginas libres ni WAL)
+    archivo = sqlite3.connect(os.path.join(directorio, nombre))
+    try:
+        archivo.execute("VACUUM")
+    finally:
+        archivo.close()
+    return movidas
+
+# --- Recuperar el espacio liberado ---
+def compactar(conn, paginas_por_paso=None, pausa=None):
+    """
+    Devuelve al disco las páginas libres de la BD principal. La primera vez activa
+    auto_vacuum=INCREMENTAL (requiere un VACUUM completo); después libera por pasos
+    cortos, cada uno en su propia transacción. Devuelve las páginas liberadas.
+    """
+    paginas_por_paso = paginas_por_paso or config.COMPACTAR_PAGINAS_POR_PASO
+    pausa = config.COMPACTAR_PAUSA if pausa is None else pausa
+    libres = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        while conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            conn.execute(f"PRAGMA incremental_vacuum({int(paginas_por_paso)})").fetchall()
+            time.sleep(pausa)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return libres
+
+def ejecutar_mantenimiento(ruta_db=None, hoy=None):
+    """Archiva los meses cerrados pendientes y compacta la BD. Devuelve {mes: filas movidas}."""
+    conn = sqlite3.connect(ruta_db or config.DB_NAME)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        movidos = {}
+        for mes in meses_pendientes(conn, hoy):
+            movidos[mes] = archivar_mes(conn, mes)
+            print(f"🗄️  {movidos[mes]} log(s) de {mes} movidos al archivo mensual.")
+        if movidos or conn.execute("PRAGMA freelist_count").fetchone()[0]:
+            paginas = compactar(conn)
+            if paginas:
+                print(f"🧹 Base de datos compactada: {paginas} página(s) libres devueltas al disco.")
+        return movidos
+    finally:
+        conn.close()
+
+class MantenimientoProgramado:
+    """Hilo que corre ejecutar_mantenimiento() cada día a la hora ARCHIVO_HORA."""
+
+    def __init__(self, ruta_db=None, hora=None):
+        self.ruta_db = ruta_db or config.DB_NAME
+        self.hora = config.ARCHIVO_HORA if hora is None else hora
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def _espera(self):
+        ahora = datetime.now()
+        proxima = ahora.replace(hour=self.hora, minute=0, second=0, microsecond=0)
+        if proxima <= ahora:
+            proxima += timedelta(days=1)
+        return (proxima - ahora).total_seconds()
+
+    def _bucle(self):
+        while not self._detener.wait(self._espera()):
+            try:
+                ejecutar_mantenimiento(self.ruta_db)
+            except Exception as e:
+                print(f"❌ Error en el mantenimiento de logs (se reintenta mañana): {e}")
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="mantenimiento-logs", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+def main(argv=None):
+    """Archiva los meses cerrados de `logs` y compacta la base de datos."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--db', default=config.DB_NAME)
+    parser.add_argument('--mes', action='append', help="Archivar solo este mes (YYYY-MM); se puede repetir")
+    parser.add_argument('--solo-compactar', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not args.mes and not args.solo_compactar:
+        movidos = ejecutar_mantenimiento(args.db)
+        print(f"✅ {len(movidos)} mes(es) archivado(s).")
+        return 0
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        for mes in args.mes or []:
+            try:
+                _rango_mes(mes)
+            except ValueError:
+                parser.error(f"Mes inválido: {mes}. Use YYYY-MM.")
+            print(f"🗄️  {archivar_mes(conn, mes)} log(s) de {mes} movidos al archivo mensual.")
+        print(f"🧹 {compactar(conn)} página(s) libres devueltas al disco.")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import argparse
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+# --- CONFIGURACIÓN (Importada) ---
+import archivo_logs
+import config
+import reportes
+
+# --- RESUMEN DIARIO DE ASISTENCIA ---
+# La tabla asistencia_diaria guarda por docente y día la primera y última marca
+# de cada jornada (mañana/tarde, separadas por reportes.CORTE_JORNADA) y la
+# cantidad de marcas. Se actualiza en la misma transacción que inserta cada
+# lote de logs, así los reportes la leen directamente sin recorrer `logs`.
+# Si cambia CORTE_JORNADA hay que reconstruirla: python asistencia_diaria.py
+# (incluye los meses movidos a los archivos mensuales, ver archivo_logs.py).
+
+# MIN/MAX de SQLite devuelven NULL si un argumento es NULL: el COALESCE conserva el valor existente
+_FUSIONAR = """
+    ON CONFLICT (dia, biometric_id) DO UPDATE SET
+        primera_manana = COALESCE(MIN(primera_manana, excluded.primera_manana), primera_manana, excluded.primera_manana),
+        ultima_manana = COALESCE(MAX(ultima_manana, excluded.ultima_manana), ultima_manana, excluded.ultima_manana),
+        marcas_manana = marcas_manana + excluded.marcas_manana,
+        primera_tarde = COALESCE(MIN(primera_tarde, excluded.primera_tarde), primera_tarde, excluded.primera_tarde),
+        ultima_tarde = COALESCE(MAX(ultima_tarde, excluded.ultima_tarde), ultima_tarde, excluded.ultima_tarde),
+        marcas_tarde = marcas_tarde + excluded.marcas_tarde
+"""
+
+UPSERT_RESUMEN = """
+    INSERT INTO asistencia_diaria (dia, biometric_id, primera_manana, ultima_manana, marcas_manana,
+                                   primera_tarde, ultima_tarde, marcas_tarde)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+""" + _FUSIONAR
+
+# Mismo criterio que reportes.agrupar_marcas: solo fechas 'YYYY-MM-DD HH:MM...' y horas comparadas como texto
+_RESUMIR = """
+    SELECT dia, usuario_id,
+           MIN(CASE WHEN hora <= :corte THEN hora END), MAX(CASE WHEN hora <= :corte THEN hora END),
+           SUM(hora <= :corte),
+           MIN(CASE WHEN hora > :corte THEN hora END), MAX(CASE WHEN hora > :corte THEN hora END),
+           SUM(hora > :corte)
+    FROM (SELECT substr(fecha, 1, 10) AS dia, substr(fecha, 12) AS hora, usuario_id FROM logs
+          WHERE fecha >= :desde AND fecha < :hasta AND typeof(fecha) = 'text'
+            AND length(fecha) >= 16 AND substr(fecha, 11, 1) IN (' ', 'T') AND usuario_id IS NOT NULL)
+    GROUP BY dia, usuario_id
+"""
+
+# Un día con marcas archivadas y en `logs` (p. ej. un evento recuperado tarde) se fusiona con _FUSIONAR
+_RECALCULAR = """
+    INSERT INTO asistencia_diaria (dia, biometric_id, primera_manana, ultima_manana, marcas_manana,
+                                   primera_tarde, ultima_tarde, marcas_tarde)
+""" + _RESUMIR + _FUSIONAR
+
+def crear_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS asistencia_diaria (
+            dia TEXT NOT NULL,
+            biometric_id TEXT NOT NULL,
+            primera_manana TEXT,
+            ultima_manana TEXT,
+            marcas_manana INTEGER NOT NULL DEFAULT 0,
+            primera_tarde TEXT,
+            ultima_tarde TEXT,
+            marcas_tarde INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (dia, biometric_id)
+        ) WITHOUT ROWID
+    """)
+
+def actualizar(conn, filas):
+    """
+    Suma al resumen las marcas (usuario_id, fecha) recién insertadas en `logs`.
+    No confirma: se ejecuta dentro de la transacción del llamador, junto al INSERT de los logs.
+    """
+    grupos = reportes.agrupar_marcas(((str(uid), fecha) for uid, fecha in filas if uid is not None))
+    conn.executemany(UPSERT_RESUMEN, ((dia, uid, *marcas)
+                                      for uid, por_dia in grupos.items() for dia, marcas in por_dia.items()))
+
+def recalcular(conn, desde=None, hasta=None):
+    """
+    Reconstruye el resumen desde `logs` y los meses archivados para los días [desde, hasta]
+    (date; None = sin límite). No confirma: se ejecuta dentro de la transacción del llamador.
+    Devuelve las filas generadas.
+    """
+    dia_desde = desde.strftime('%Y-%m-%d') if desde else ''
+    dia_hasta = (hasta + timedelta(days=1)).strftime('%Y-%m-%d') if hasta else '9999-12-32'
+    parametros = {'corte': reportes.CORTE_JORNADA.strftime('%H:%M:%S'), 'desde': dia_desde, 'hasta': dia_hasta}
+    conn.execute("DELETE FROM asistencia_diaria WHERE dia >= ? AND dia < ?", (dia_desde, dia_hasta))
+    filas = 0
+    # Los archivos se leen con su propia conexión: no se puede hacer ATTACH dentro de una transacción
+    for _, ruta in archivo_logs.meses_archivados(conn, dia_desde, dia_hasta):
+        with archivo_logs.abrir(ruta) as archivo:
+            filas += conn.executemany(UPSERT_RESUMEN, archivo.execute(_RESUMIR, parametros)).rowcount
+    return filas + conn.execute(_RECALCULAR, parametros).rowcount
+
+def main(argv=None):
+    """Reconstruye el resumen diario (todo o un rango de días) a partir de los logs, incluidos los archivados."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--db', default=config.DB_NAME)
+    parser.add_argument('--desde', help="YYYY-MM-DD")
+    parser.add_argument('--hasta', help="YYYY-MM-DD")
+    args = parser.parse_args(argv)
+    try:
+        desde = datetime.strptime(args.desde, '%Y-%m-%d').date() if args.desde else None
+        hasta = datetime.strptime(args.hasta, '%Y-%m-%d').date() if args.hasta else None
+    except ValueError:
+        parser.error("Formato de fecha inválido. Use YYYY-MM-DD.")
+
+    conn = sqlite3.connect(args.db)
+    try:
+        conn.execute("PRAGMA busy_timeout = %d" % config.DB_BUSY_TIMEOUT_MS)
+        with conn:
+            crear_tabla(conn)
+            filas = recalcular(conn, desde, hasta)
+        print(f"✅ Resumen de asistencia reconstruido: {filas} fila(s) docente/día.")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
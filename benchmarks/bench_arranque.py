@@ -0,0 +1,87 @@
+"""
+Benchmark del arranque de la app web: cada repetición es un proceso nuevo que mide
+`import app`, crear_app() y la preparación de la BD (migraciones y directorio), más
+el tiempo total del proceso. También verifica que el arranque no importe dependencias
+pesadas que solo se usan en algunas rutas (pandas, numpy, openpyxl, pyarrow, requests).
+
+El proceso medido no toma el liderazgo: no escucha terminales ni arranca el escritor.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_arranque
+    python -m benchmarks.bench_arranque --repeticiones 10 --limite-ms 400
+
+Sale con código 1 si la mediana de import + crear_app + BD supera --limite-ms o si
+se importó alguna dependencia pesada.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+
+PESADOS = ('pandas', 'numpy', 'openpyxl', 'pyarrow', 'requests')
+
+# Se ejecuta en un proceso nuevo con la ruta de la BD como argumento
+MEDICION = """
+import json, sys, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+import config
+config.DB_NAME = sys.argv[1]
+flask_app = app.crear_app(iniciar_servicios=False)
+t2 = time.perf_counter()
+app.bio.init_db()
+t3 = time.perf_counter()
+flask_app.test_client().get('/')
+t4 = time.perf_counter()
+print(json.dumps({'import': t1 - t0, 'crear_app': t2 - t1, 'bd': t3 - t2, 'primera_peticion': t4 - t3,
+                  'pesados': [m for m in %r if m in sys.modules]}))
+""" % (PESADOS,)
+
+def medir(ruta_db):
+    t0 = time.perf_counter()
+    salida = subprocess.run([sys.executable, '-c', MEDICION, ruta_db], capture_output=True, text=True, check=True)
+    total = time.perf_counter() - t0
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    resultado['proceso'] = total
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--docentes', type=int, default=300, help="Tamaño de la BD sintética")
+    parser.add_argument('--limite-ms', type=float, default=500,
+                        help="Presupuesto para la mediana de import + crear_app + BD (por defecto 500 ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'arranque.db')
+        crear_bd_sintetica(ruta, args.docentes, date(2026, 1, 1), 30)
+        medir(ruta)  # La primera vez aplica las migraciones pendientes y calienta la caché de disco
+        medidas = [medir(ruta) for _ in range(args.repeticiones)]
+
+    print(f"Arranque de la app web ({args.repeticiones} procesos, mediana en ms):")
+    for clave in ('import', 'crear_app', 'bd', 'primera_peticion', 'proceso'):
+        print(f"  {clave:<17} {statistics.median(m[clave] for m in medidas) * 1000:8.1f}")
+    arranque = statistics.median(m['import'] + m['crear_app'] + m['bd'] for m in medidas) * 1000
+    print(f"  {'import+app+bd':<17} {arranque:8.1f}  (presupuesto {args.limite_ms:.0f})")
+
+    pesados = sorted({p for m in medidas for p in m['pesados']})
+    fallo = False
+    if pesados:
+        print(f"❌ El arranque importa dependencias pesadas: {', '.join(pesados)}")
+        fallo = True
+    if arranque > args.limite_ms:
+        print(f"❌ El arranque supera el presupuesto de {args.limite_ms:.0f} ms")
+        fallo = True
+    return 1 if fallo else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Prueba de carga del servidor de producción (servidor.py) contra terminales simulados.
+
+Arranca el simulador Hikvision y servidor.py en procesos aparte, sobre una BD sintética,
+y lanza usuarios virtuales que inician sesión y recorren la app a la vez: docentes que
+abren su panel y administradores que abren el dashboard, consultan /api/logs y descargan
+el reporte matricial (CSV). Mientras tanto, un monitor en vivo (SSE) cuenta los eventos
+que le llegan desde el proceso de ingesta.
+
+Verifica que haya un solo stream abierto por terminal (un único proceso de ingesta),
+que los eventos emitidos por el simulador se guarden y lleguen al monitor, y que no haya
+respuestas con error.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_carga
+    python -m benchmarks.bench_carga --usuarios 40 --procesos 4 --segundos 60 --limite-p95-ms 1500
+
+Sale con código 1 si hubo errores, si el p95 de alguna acción supera --limite-p95-ms o si
+la cantidad de streams abiertos no coincide con la de terminales.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+from werkzeug.security import generate_password_hash
+
+import config
+
+from benchmarks.bench_gateway import percentil, puerto_libre
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+
+CLAVE_ADMIN = 'istae123A*'  # La del admin que crea init_db
+CLAVE_DOCENTES = 'clave-carga'
+
+def preparar_bd(ruta, docentes, dias, terminales, puerto_sim):
+    """BD sintética con terminales y puerta apuntando al simulador y contraseñas conocidas."""
+    inicio = date.today() - timedelta(days=dias)
+    crear_bd_sintetica(ruta, docentes, inicio, dias)
+    conn = sqlite3.connect(ruta)
+    # Un solo hash para todos: generarlo es lento a propósito
+    conn.execute("UPDATE usuarios SET password = ?, acceso_puerta = 1",
+                 (generate_password_hash(CLAVE_DOCENTES, method=config.PASSWORD_METODO),))
+    host = f"127.0.0.1:{puerto_sim}"
+    conn.execute("UPDATE dispositivos SET host = ? WHERE tipo = 'puerta'", (host,))
+    conn.execute("UPDATE dispositivos SET host = ?, usuario = 'admin', clave = 'admin' WHERE tipo = 'terminal'", (host,))
+    puerta_id, = conn.execute("SELECT id FROM dispositivos WHERE tipo = 'puerta'").fetchone()
+    conn.executemany("INSERT INTO dispositivos (nombre, tipo, host, usuario, clave, puerta_id) "
+                     "VALUES (?, 'terminal', ?, 'admin', 'admin', ?)",
+                     [(f"Terminal carga {i}", host, puerta_id) for i in range(2, terminales + 1)])
+    conn.commit()
+    bio_ids = [r[0] for r in conn.execute("SELECT biometric_id FROM usuarios WHERE rol = 'docente'")]
+    conn.close()
+    return bio_ids
+
+def esperar(condicion, timeout, descripcion):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if condicion():
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Tiempo agotado esperando {descripcion}")
+
+class UsuarioVirtual(threading.Thread):
+    def __init__(self, base, credenciales, es_admin, hasta, resultados, semilla):
+        super().__init__(daemon=True)
+        self.base = base
+        self.credenciales = credenciales
+        self.es_admin = es_admin
+        self.hasta = hasta
+        self.resultados = resultados
+        self.rnd = random.Random(semilla)
+
+    def _medir(self, accion, metodo, ruta, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            respuesta = self.sesion.request(metodo, self.base + ruta, timeout=60, **kwargs)
+            respuesta.content  # Incluye la descarga completa (reportes por streaming)
+            ok = respuesta.status_code == 200
+            if accion == 'login':
+                # Con credenciales incorrectas se vuelve a mostrar el formulario con 200, sin redirigir
+                ok = ok and respuesta.url.rstrip('/').endswith(('/admin', '/docente'))
+        except requests.RequestException:
+            ok = False
+        self.resultados.append((accion, (time.perf_counter() - t0) * 1000, ok))
+
+    def run(self):
+        while time.monotonic() < self.hasta:
+            self.sesion = requests.Session()
+            usuario, clave = self.credenciales
+            self._medir('login', 'POST', '/', data={'username': usuario, 'password': clave})
+            for _ in range(self.rnd.randint(2, 5)):
+                if time.monotonic() >= self.hasta:
+                    break
+                if not self.es_admin:
+                    self._medir('panel_docente', 'GET', '/docente')
+                    continue
+                opcion = self.rnd.random()
+                if opcion < 0.4:
+                    self._medir('dashboard_admin', 'GET', '/admin')
+                elif opcion < 0.7:
+                    self._medir('api_logs', 'GET', '/api/logs?limit=50')
+                else:
+                    fin = date.today() - timedelta(days=self.rnd.randrange(30))
+                    inicio = fin - timedelta(days=self.rnd.choice((7, 15, 30)))
+                    self._medir('reporte_csv', 'GET', f'/descargar_reporte_matricial?formato=csv'
+                                f'&fecha_inicio={inicio:%Y-%m-%d}&fecha_fin={fin:%Y-%m-%d}')
+            self._medir('logout', 'GET', '/logout')
+            self.sesion.close()
+
+class MonitorSSE(threading.Thread):
+    """Cuenta los eventos que llegan por /api/logs/stream (de cualquier proceso web)."""
+
+    def __init__(self, base):
+        super().__init__(daemon=True)
+        self.base = base
+        self.eventos = 0
+        self.ids = set()
+
+    def run(self):
+        sesion = requests.Session()
+        sesion.post(self.base + '/', data={'username': 'admin', 'password': CLAVE_ADMIN}, timeout=30)
+        try:
+            with sesion.get(self.base + '/api/logs/stream', stream=True, timeout=(10, 60)) as respuesta:
+                for linea in respuesta.iter_lines():
+                    if linea.startswith(b'id: '):
+                        self.eventos += 1
+                        self.ids.add(int(linea[4:]))
+        except requests.RequestException:
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--usuarios', type=int, default=20, help="Usuarios virtuales simultáneos")
+    parser.add_argument('--admins', type=float, default=0.25, help="Fracción de usuarios administradores")
+    parser.add_argument('--segundos', type=float, default=30)
+    parser.add_argument('--procesos', type=int, default=4, help="Procesos web de servidor.py")
+    parser.add_argument('--hilos', type=int, default=16, help="Hilos por proceso web")
+    parser.add_argument('--docentes', type=int, default=300)
+    parser.add_argument('--dias', type=int, default=90, help="Días de historial en la BD sintética")
+    parser.add_argument('--terminales', type=int, default=4)
+    parser.add_argument('--eventos-por-segundo', type=float, default=2.0, help="Por terminal")
+    parser.add_argument('--limite-p95-ms', type=float, default=2000)
+    args = parser.parse_args()
+
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    procesos = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, 'carga.db')
+        puerto_sim, puerto_web, puerto_lider = puerto_libre(), puerto_libre(), puerto_libre()
+        bio_ids = preparar_bd(ruta, args.docentes, args.dias, args.terminales, puerto_sim)
+        conn = sqlite3.connect(ruta)
+        logs_antes = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0]
+        conn.close()
+
+        salida = open(os.path.join(tmp, 'servidor.log'), 'w')
+        try:
+            procesos.append(subprocess.Popen(
+                [sys.executable, '-m', 'benchmarks.simulador_hikvision', '--puerto', str(puerto_sim),
+                 '--eventos-por-segundo', str(args.eventos_por_segundo)], cwd=raiz, stdout=salida, stderr=salida))
+            procesos.append(subprocess.Popen(
+                [sys.executable, 'servidor.py', '--host', '127.0.0.1', '--puerto', str(puerto_web),
+                 '--procesos', str(args.procesos), '--hilos', str(args.hilos), '--db', ruta,
+                 '--puerto-lider', str(puerto_lider)], cwd=raiz, stdout=salida, stderr=salida))
+            base = f"http://127.0.0.1:{puerto_web}"
+            estado_sim = lambda: requests.get(f"http://127.0.0.1:{puerto_sim}/estado", timeout=2).json()
+            esperar(lambda: requests.get(base + '/', timeout=2).status_code == 200, 60, "al servidor web")
+            esperar(lambda: estado_sim()['streams_abiertos'] >= args.terminales, 60, "los streams de los terminales")
+            eventos_inicio = estado_sim()['eventos']
+
+            monitor = MonitorSSE(base)
+            monitor.start()
+            resultados = []
+            hasta = time.monotonic() + args.segundos
+            n_admins = max(1, round(args.usuarios * args.admins))
+            usuarios = [UsuarioVirtual(base, ('admin', CLAVE_ADMIN) if i < n_admins
+                                       else (f"docente{random.Random(i).choice(bio_ids)}", CLAVE_DOCENTES),
+                                       i < n_admins, hasta, resultados, i)
+                        for i in range(args.usuarios)]
+            t0 = time.perf_counter()
+            for u in usuarios:
+                u.start()
+            for u in usuarios:
+                u.join()
+            duracion = time.perf_counter() - t0
+            estado = estado_sim()
+            time.sleep(1)  # Que el escritor por lotes y el monitor alcancen a los últimos eventos
+        finally:
+            for proceso in reversed(procesos):
+                proceso.terminate()
+            for proceso in procesos:
+                try:
+                    proceso.wait(15)
+                except subprocess.TimeoutExpired:
+                    proceso.kill()
+            salida.close()
+
+        conn = sqlite3.connect(ruta)
+        guardados = conn.execute("SELECT COUNT(*) FROM logs WHERE id > ? AND dispositivo_id IS NOT NULL",
+                                 (logs_antes,)).fetchone()[0]
+        conn.close()
+
+    print(f"Carga: {args.usuarios} usuarios ({n_admins} admin) durante {duracion:.1f} s contra "
+          f"{args.procesos} procesos web x {args.hilos} hilos; {args.terminales} terminales a "
+          f"{args.eventos_por_segundo} ev/s")
+    print(f"  {'acción':<16} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'errores':>8}")
+    fallo = lento = False
+    for accion in sorted({a for a, _, _ in resultados}):
+        tiempos = sorted(t for a, t, _ in resultados if a == accion)
+        errores = sum(1 for a, _, ok in resultados if a == accion and not ok)
+        p95 = percentil(tiempos, 0.95)
+        print(f"  {accion:<16} {len(tiempos):>6} {percentil(tiempos, 0.5):>8.1f} {p95:>8.1f} "
+              f"{percentil(tiempos, 0.99):>8.1f} {tiempos[-1]:>8.1f} {errores:>8}")
+        if errores or p95 > args.limite_p95_ms:
+            lento = True
+    print(f"  {len(resultados) / duracion:.1f} peticiones/s")
+    print(f"Ingesta: {estado['streams_abiertos']} stream(s) abiertos para {args.terminales} terminales, "
+          f"{estado['eventos'] - eventos_inicio} eventos emitidos, {guardados} guardados desde el inicio, "
+          f"{monitor.eventos} recibidos por el monitor en vivo")
+    if estado['streams_abiertos'] != args.terminales:
+        print("❌ La cantidad de streams abiertos no coincide con la de terminales (¿más de un proceso de ingesta?)")
+        fallo = True
+    if not monitor.eventos:
+        print("❌ El monitor en vivo no recibió eventos del proceso de ingesta")
+        fallo = True
+    if lento:
+        print(f"❌ Hubo errores o alguna acción superó el p95 de {args.limite_p95_ms:.0f} ms")
+    return 1 if fallo or lento else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
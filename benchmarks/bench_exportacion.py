@@ -0,0 +1,105 @@
+"""
+Benchmark de memoria de la exportación del reporte: pico de memoria (tracemalloc) y tiempo
+del libro en memoria anterior frente al Excel write-only, el CSV por bloques y Parquet,
+para rangos grandes con toda la planta docente.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_exportacion
+    python -m benchmarks.bench_exportacion --docentes 600 --dias 365 --limite-mb 64
+
+Con --limite-mb el script sale con código 1 si algún formato streaming supera ese pico.
+"""
+import argparse
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import reportes
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+
+def excel_en_memoria(filas, start_date, end_date, destino):
+    """Reproduce el método anterior: Workbook normal, estilos celda por celda y BytesIO."""
+    from openpyxl import Workbook
+    from openpyxl.styles import PatternFill, Alignment, Border, Side
+
+    wb = Workbook()
+    ws = wb.active
+    gray_fill = PatternFill(start_color="EFEFEF", end_color="EFEFEF", fill_type="solid")
+    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    wrap_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    for i, day in enumerate(reportes.rango_fechas(start_date, end_date)):
+        cell = ws.cell(row=2, column=4 + i, value=day.strftime('%d/%m'))
+        cell.alignment = Alignment(horizontal='center')
+    for row_idx, (bio_id, nombre, celdas) in enumerate(filas, 3):
+        ws.cell(row=row_idx, column=1, value=bio_id).border = thin_border
+        ws.cell(row=row_idx, column=2, value=nombre).border = thin_border
+        for col_offset, texto in enumerate(celdas):
+            cell = ws.cell(row=row_idx, column=4 + col_offset, value=texto)
+            cell.alignment = wrap_alignment
+            cell.border = thin_border
+            if row_idx % 2 != 0: cell.fill = gray_fill
+    output = io.BytesIO()
+    wb.save(output)
+    destino.write(output.getvalue())
+
+def csv_por_bloques(filas, start_date, end_date, destino):
+    for bloque in reportes.generar_csv_matricial(filas, start_date, end_date):
+        destino.write(bloque.encode('utf-8'))
+
+FORMATOS = [
+    ("xlsx en memoria (anterior)", excel_en_memoria, reportes.iterar_matriz_asistencia, False),
+    ("xlsx write-only", reportes.escribir_excel_matricial, reportes.iterar_matriz_asistencia, True),
+    ("csv por bloques", csv_por_bloques, reportes.iterar_matriz_asistencia, True),
+    ("parquet", reportes.escribir_parquet, reportes.iterar_marcas, True),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--docentes', type=int, default=300)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--limite-mb', type=float, help="Pico de memoria máximo aceptado para los formatos streaming")
+    args = parser.parse_args()
+
+    excedidos = []
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, "bench.db")
+        inicio = date(2025, 1, 1)
+        filas_logs = crear_bd_sintetica(ruta, args.docentes, inicio, args.dias)
+        end_date = inicio + timedelta(days=args.dias - 1)
+        conn = sqlite3.connect(ruta)
+        conn.row_factory = sqlite3.Row
+        usuarios = conn.execute("SELECT * FROM usuarios WHERE rol='docente'").fetchall()
+
+        print(f"{args.docentes} docentes x {args.dias} días ({filas_logs} filas en logs)")
+        print(f"{'formato':>28} {'pico MB':>9} {'seg':>8} {'archivo MB':>11}")
+        for nombre, escribir, iterar, es_streaming in FORMATOS:
+            with tempfile.TemporaryFile() as destino:
+                tracemalloc.start()
+                t0 = time.perf_counter()
+                try:
+                    escribir(iterar(conn, usuarios, inicio, end_date), inicio, end_date, destino)
+                except ImportError as e:
+                    tracemalloc.stop()
+                    print(f"{nombre:>28} omitido ({e.name} no instalado)")
+                    continue
+                seg = time.perf_counter() - t0
+                pico = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                tamano = destino.tell() / 1e6
+            print(f"{nombre:>28} {pico:>9.1f} {seg:>8.2f} {tamano:>11.2f}")
+            if es_streaming and args.limite_mb and pico > args.limite_mb:
+                excedidos.append(nombre)
+        conn.close()
+
+    if excedidos:
+        print(f"❌ Superan el límite de {args.limite_mb} MB: {', '.join(excedidos)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
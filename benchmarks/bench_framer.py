@@ -0,0 +1,98 @@
+"""
+Benchmark de reproducción del alertStream: alimenta un flujo capturado (o uno sintético
+con el formato multipart de Hikvision, incluyendo imágenes) al separador de eventos,
+en bloques de distintos tamaños, y lo compara con el bucle anterior carácter por carácter.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_framer
+    python -m benchmarks.bench_framer --captura flujo.bin   # bytes crudos del stream
+"""
+import argparse
+import json
+import random
+import time
+
+from framer_stream import FramerAlertStream
+
+TAMANOS_BLOQUE = [256, 4096, 16384, 65536]
+
+def flujo_sintetico(n_eventos=20000, cada_imagen=10, boundary=b"MIME_boundary", semilla=1):
+    """Genera un flujo multipart como el del biométrico: eventos JSON y, cada tanto, una foto."""
+    rnd = random.Random(semilla)
+    imagen = bytes(rnd.randrange(256) for _ in range(20000))
+    partes = []
+    for i in range(n_eventos):
+        evento = json.dumps({
+            "ipAddress": "192.168.1.22", "eventType": "AccessControllerEvent",
+            "dateTime": "2026-03-02T07:58:12-05:00",
+            "AccessControllerEvent": {
+                "deviceName": "Access Controller", "majorEventType": 5, "subEventType": 75,
+                "name": "Docente {prueba}", "employeeNoString": str(100 + i % 300),
+                "serialNo": i, "currentVerifyMode": "cardOrFaceOrFp",
+                "time": "2026-03-02T07:58:12-05:00",
+            },
+        }, indent=4).encode()
+        partes.append(b"--" + boundary + b"\r\nContent-Type: application/json; charset=\"UTF-8\"\r\n"
+                      b"Content-Length: %d\r\n\r\n" % len(evento) + evento + b"\r\n")
+        if cada_imagen and i % cada_imagen == 0:
+            partes.append(b"--" + boundary + b"\r\nContent-Type: image/jpeg\r\n"
+                          b"Content-Length: %d\r\n\r\n" % len(imagen) + imagen + b"\r\n")
+    return b"".join(partes)
+
+def separar_caracter_por_caracter(flujo, tamano_bloque):
+    """Reproduce el bucle anterior de iniciar_escucha_background (buffer += char)."""
+    eventos = 0
+    buffer = ""; llaves = 0; capturando = False
+    for i in range(0, len(flujo), tamano_bloque):
+        for char in flujo[i:i + tamano_bloque].decode('utf-8', errors='ignore'):
+            if char == '{':
+                if not capturando:
+                    capturando = True
+                    buffer = ""
+                llaves += 1
+            if capturando:
+                buffer += char
+                if char == '}':
+                    llaves -= 1
+                    if llaves == 0:
+                        eventos += 1
+                        capturando = False
+    return eventos
+
+def separar_con_framer(flujo, tamano_bloque, boundary=None):
+    framer = FramerAlertStream(boundary)
+    eventos = 0
+    for i in range(0, len(flujo), tamano_bloque):
+        eventos += len(framer.alimentar(flujo[i:i + tamano_bloque]))
+    return eventos
+
+def medir(func, *args):
+    t0 = time.perf_counter()
+    eventos = func(*args)
+    return eventos, time.perf_counter() - t0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--captura', help="Archivo con los bytes crudos de un alertStream capturado")
+    parser.add_argument('--eventos', type=int, default=20000, help="Eventos del flujo sintético")
+    parser.add_argument('--sin-anterior', action='store_true', help="No medir el bucle carácter por carácter")
+    args = parser.parse_args()
+
+    if args.captura:
+        with open(args.captura, 'rb') as f:
+            flujo = f.read()
+    else:
+        flujo = flujo_sintetico(args.eventos)
+    mb = len(flujo) / 1e6
+    print(f"Flujo: {mb:.1f} MB")
+    print(f"{'bloque':>7} {'método':>20} {'eventos':>8} {'seg':>8} {'MB/s':>8} {'eventos/s':>11}")
+    for tamano in TAMANOS_BLOQUE:
+        metodos = [("framer", separar_con_framer)]
+        if not args.sin_anterior:
+            metodos.append(("carácter a carácter", separar_caracter_por_caracter))
+        for nombre, func in metodos:
+            eventos, seg = medir(func, flujo, tamano)
+            print(f"{tamano:>7} {nombre:>20} {eventos:>8} {seg:>8.3f} {mb / seg:>8.1f} {eventos / seg:>11.0f}")
+
+if __name__ == '__main__':
+    main()
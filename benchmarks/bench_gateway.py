@@ -0,0 +1,128 @@
+"""
+Prueba de carga del gateway asyncio: cientos de terminales simulados conectados a la
+vez, más algunos caídos (puerto cerrado) y colgados (aceptan la conexión y no
+responden), para comprobar que las fallas de unos no retrasan los eventos de otros.
+
+El simulador corre en un proceso aparte; el gateway solo cuenta los eventos y mide
+la latencia desde que el simulador los emite (no toca ninguna base de datos).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_gateway
+    python -m benchmarks.bench_gateway --terminales 500 --eventos-por-segundo 2 --segundos 20 --limite-p95-ms 100
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from gateway_dispositivos import GatewayDispositivos
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+async def esperar_puerto(puerto, timeout=10):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', puerto)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"El simulador no abrió el puerto {puerto}")
+
+def percentil(valores, p):
+    return valores[min(len(valores) - 1, int(p * len(valores)))] if valores else float('nan')
+
+async def medir(args, puerto_sim):
+    # Servidor "colgado": acepta conexiones y nunca responde
+    conexiones_colgadas = []
+
+    async def colgar(reader, writer):
+        conexiones_colgadas.append(writer)
+        try:
+            await asyncio.sleep(3600)
+        except asyncio.CancelledError:
+            pass
+
+    colgado = await asyncio.start_server(colgar, '127.0.0.1', 0)
+    puerto_colgado = colgado.sockets[0].getsockname()[1]
+    puerto_cerrado = puerto_libre()
+
+    terminales = []
+    for i in range(args.terminales):
+        terminales.append({'id': i, 'nombre': f"sim-{i}", 'host': f"127.0.0.1:{puerto_sim}",
+                           'usuario': 'admin', 'clave': 'admin', 'ruta_stream': None, 'sano': True})
+    for i in range(args.caidos):
+        terminales.append({'id': 10000 + i, 'nombre': f"caido-{i}", 'host': f"127.0.0.1:{puerto_cerrado}",
+                           'usuario': 'admin', 'clave': 'admin', 'ruta_stream': None, 'sano': False})
+    for i in range(args.colgados):
+        terminales.append({'id': 20000 + i, 'nombre': f"colgado-{i}", 'host': f"127.0.0.1:{puerto_colgado}",
+                           'usuario': 'admin', 'clave': 'admin', 'ruta_stream': None, 'sano': False})
+
+    latencias = []
+    por_terminal = {t['id']: 0 for t in terminales}
+
+    def al_evento(terminal, evento):
+        latencias.append((time.time() - json.loads(evento)['_emitido']) * 1000)
+        por_terminal[terminal['id']] += 1
+
+    gateway = GatewayDispositivos(terminales, al_evento, backoff_min=0.5, backoff_max=5, timeout=args.timeout)
+    tarea = asyncio.create_task(gateway.ejecutar())
+    await asyncio.sleep(args.segundos)
+    gateway.detener()
+    await tarea
+    colgado.close()
+    for w in conexiones_colgadas:
+        w.close()
+    return terminales, gateway.estado, latencias, por_terminal
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--terminales', type=int, default=300, help="Terminales sanos simulados")
+    parser.add_argument('--caidos', type=int, default=20, help="Terminales con el puerto cerrado")
+    parser.add_argument('--colgados', type=int, default=20, help="Terminales que aceptan y no responden")
+    parser.add_argument('--eventos-por-segundo', type=float, default=1.0, help="Por terminal")
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=2, help="Timeout de lectura del gateway")
+    parser.add_argument('--limite-p95-ms', type=float, help="Sale con código 1 si la latencia p95 lo supera")
+    args = parser.parse_args()
+
+    puerto_sim = puerto_libre()
+    sim = subprocess.Popen([sys.executable, '-m', 'benchmarks.simulador_hikvision', '--puerto', str(puerto_sim),
+                            '--eventos-por-segundo', str(args.eventos_por_segundo), '--imagen-cada', '10'],
+                           stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(esperar_puerto(puerto_sim))
+        terminales, estado, latencias, por_terminal = asyncio.run(medir(args, puerto_sim))
+    finally:
+        sim.terminate()
+        sim.wait()
+
+    sanos = [t['id'] for t in terminales if t['sano']]
+    con_eventos = sum(1 for i in sanos if por_terminal[i] > 0)
+    total = len(latencias)
+    latencias.sort()
+    fallidos = [estado[t['id']] for t in terminales if not t['sano']]
+    print(f"{args.terminales} terminales sanos, {args.caidos} caídos, {args.colgados} colgados; {args.segundos:.0f}s")
+    print(f"  terminales sanos con eventos: {con_eventos}/{len(sanos)}")
+    print(f"  eventos recibidos: {total} ({total / args.segundos:.0f}/s); "
+          f"mínimo por terminal sano: {min((por_terminal[i] for i in sanos), default=0)}")
+    print(f"  latencia emisión -> gateway (ms): p50={percentil(latencias, 0.5):.1f} "
+          f"p95={percentil(latencias, 0.95):.1f} max={latencias[-1] if latencias else float('nan'):.1f}")
+    if fallidos:
+        print(f"  reintentos de los fallidos: {sum(e['fallos_seguidos'] for e in fallidos)} "
+              f"(p. ej. '{fallidos[0]['ultimo_error']}')")
+
+    if args.limite_p95_ms and percentil(latencias, 0.95) > args.limite_p95_ms:
+        print(f"❌ La latencia p95 supera {args.limite_p95_ms} ms")
+        return 1
+    return 0 if con_eventos == len(sanos) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Benchmark de la importación masiva de docentes (importacion_docentes.py) con archivos
+sintéticos de 10.000 filas: crea los docentes desde un CSV, los actualiza desde un XLSX
+y mide cada etapa (lectura, validación, hash, escritura en una transacción) y la
+exportación por streaming.
+
+El hash de 10.000 contraseñas con config.PASSWORD_METODO cuesta decenas de minutos de
+CPU, así que por defecto las importaciones usan un método barato y el costo real se
+mide aparte con una muestra: en un solo proceso y en el pool de --procesos procesos,
+y se extrapola a --filas. Con --completo las importaciones usan el método real.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_importacion
+    python -m benchmarks.bench_importacion --filas 10000 --procesos 4 --limite-segundos 20
+
+Con --limite-segundos el script sale con código 1 si alguna importación, sin contar la
+etapa de hash, tarda más que eso.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import config
+import importacion_docentes
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+
+METODO_BARATO = 'pbkdf2:sha256:1'
+
+def escribir_archivos(tmp, filas):
+    """CSV de alta y XLSX de actualización (otros nombres y permisos, sin contraseña) con `filas` docentes."""
+    from openpyxl import Workbook
+
+    ruta_csv = os.path.join(tmp, 'docentes.csv')
+    with open(ruta_csv, 'w', encoding='utf-8-sig', newline='') as f:
+        f.write("Nombre Completo;ID Biométrico;Usuario;Contraseña;Acceso\n")
+        for i in range(filas):
+            f.write(f"Docente Importado {i};{10000 + i};importado{i};clave-{i:05d};{'sí' if i % 3 else 'no'}\n")
+
+    ruta_xlsx = os.path.join(tmp, 'docentes.xlsx')
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Docentes")
+    ws.append(importacion_docentes.COLUMNAS_EXPORTACION)
+    for i in range(filas):
+        ws.append([f"Docente Actualizado {i}", 10000 + i, f"importado{i}", None, 'no' if i % 3 else 'si'])
+    wb.save(ruta_xlsx)
+    return ruta_csv, ruta_xlsx
+
+def importar(ruta, modo, procesos):
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    t0 = time.perf_counter()
+    resultado = importacion_docentes.importar(contenido, os.path.basename(ruta), modo, procesos)
+    total = time.perf_counter() - t0
+    if resultado['errores']:
+        raise RuntimeError(f"La importación de {ruta} falló: {resultado['errores'][:3]}")
+    return resultado, total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=10000)
+    parser.add_argument('--docentes', type=int, default=300, help="Docentes que ya existen en la BD")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1, help="Procesos del pool de hashes")
+    parser.add_argument('--muestra', type=int, default=64, help="Contraseñas hasheadas con el método real")
+    parser.add_argument('--completo', action='store_true', help="Importar con config.PASSWORD_METODO")
+    parser.add_argument('--limite-segundos', type=float, help="Máximo por importación sin contar el hash")
+    args = parser.parse_args()
+
+    metodo_real = config.PASSWORD_METODO
+    lento = False
+    with tempfile.TemporaryDirectory() as tmp:
+        config.DB_NAME = os.path.join(tmp, 'bench.db')
+        crear_bd_sintetica(config.DB_NAME, args.docentes, date(2025, 1, 1), 1)
+        ruta_csv, ruta_xlsx = escribir_archivos(tmp, args.filas)
+        if not args.completo:
+            config.PASSWORD_METODO = METODO_BARATO
+
+        print(f"{args.filas} filas sobre {args.docentes} docentes existentes; hash con "
+              f"{config.PASSWORD_METODO} en {args.procesos} proceso(s)")
+        print(f"{'importación':>22} {'lectura':>8} {'valid.':>8} {'hash':>8} {'escrit.':>8} {'total s':>8} {'filas/s':>9}")
+        for nombre, ruta, modo in (("crear desde CSV", ruta_csv, 'crear'), ("actualizar desde XLSX", ruta_xlsx, 'actualizar')):
+            resultado, total = importar(ruta, modo, args.procesos)
+            t = resultado['tiempos']
+            print(f"{nombre:>22} {t['lectura']:>8.2f} {t['validacion']:>8.2f} {t['hash']:>8.2f} "
+                  f"{t['escritura']:>8.2f} {total:>8.2f} {args.filas / total:>9.0f}")
+            if args.limite_segundos and total - t['hash'] > args.limite_segundos:
+                lento = True
+
+        t0 = time.perf_counter()
+        with tempfile.TemporaryFile() as destino:
+            for bloque in importacion_docentes.generar_csv(importacion_docentes.iterar_docentes()):
+                destino.write(bloque.encode('utf-8'))
+            tamano = destino.tell()
+        print(f"{'exportar CSV':>22} {time.perf_counter() - t0:>44.2f} s ({tamano / 1e6:.2f} MB)")
+        t0 = time.perf_counter()
+        with tempfile.TemporaryFile() as destino:
+            importacion_docentes.escribir_excel(importacion_docentes.iterar_docentes(), destino)
+        print(f"{'exportar XLSX':>22} {time.perf_counter() - t0:>44.2f} s")
+
+    if not args.completo:
+        muestra = [f"clave-{i:05d}" for i in range(args.muestra)]
+        print(f"Hash con {metodo_real} (muestra de {args.muestra}):")
+        for procesos in sorted({1, args.procesos}):
+            t0 = time.perf_counter()
+            importacion_docentes.hashear(muestra, procesos, metodo_real)
+            por_hash = (time.perf_counter() - t0) / args.muestra
+            print(f"  {procesos:>2} proceso(s): {1 / por_hash:>7.1f} hashes/s -> "
+                  f"{args.filas} filas en ~{args.filas * por_hash / 60:.1f} min")
+
+    if lento:
+        print(f"❌ Alguna importación superó {args.limite_segundos:.0f} s sin contar el hash")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Benchmark del reporte matricial: tiempo de generación según cantidad de filas en `logs`
+y cantidad de docentes, comparando el método anterior (una consulta por celda), una sola consulta sobre
+`logs` agrupada en Python y la lectura del resumen `asistencia_diaria` de `reportes.py`.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_reporte
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import reportes
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+
+# (docentes, días de historial en la BD) ; el reporte siempre pide los últimos 30 días
+ESCENARIOS = [(10, 60), (50, 60), (100, 120), (300, 120), (300, 365)]
+DIAS_REPORTE = 30
+# El método por celda se omite cuando sería demasiado lento de medir
+MAX_CELDAS_METODO_ANTERIOR = 3000
+
+def reporte_por_celda(conn, usuarios, start_date, end_date):
+    """Reproduce el método anterior: una consulta LIKE por cada docente x día."""
+    corte = reportes.CORTE_JORNADA
+    matriz = []
+    for u in usuarios:
+        celdas = []
+        for day in reportes.rango_fechas(start_date, end_date):
+            filas = conn.execute("SELECT fecha FROM logs WHERE usuario_id = ? AND fecha LIKE ?",
+                                 (u['biometric_id'], f"{day.strftime('%Y-%m-%d')}%")).fetchall()
+            manana, tarde = [], []
+            for f in filas:
+                ts = datetime.fromisoformat(f['fecha'])
+                (manana if ts.time() <= corte else tarde).append(ts)
+            celdas.append((min(manana) if manana else None, max(tarde) if tarde else None))
+        matriz.append(celdas)
+    return matriz
+
+def reporte_desde_logs(conn, usuarios, start_date, end_date):
+    """Una consulta por rango sobre `logs`, agrupando las marcas en Python (sin el resumen)."""
+    ids_validos = {str(u['biometric_id']) for u in usuarios}
+    filas = conn.execute("SELECT usuario_id, fecha FROM logs WHERE fecha >= ? AND fecha < ?",
+                         (start_date.strftime('%Y-%m-%d'), (end_date + timedelta(days=1)).strftime('%Y-%m-%d')))
+    return reportes.agrupar_marcas(filas, ids_validos)
+
+def medir(func, *args):
+    t0 = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - t0
+
+def main():
+    print(f"{'docentes':>9} {'filas logs':>11} {'celdas':>7} {'por celda (s)':>14} {'desde logs (s)':>15} "
+          f"{'resumen (s)':>12} {'con excel (s)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_docentes, dias in ESCENARIOS:
+            ruta = os.path.join(tmp, f"bench_{n_docentes}_{dias}.db")
+            inicio = date(2025, 1, 1)
+            filas = crear_bd_sintetica(ruta, n_docentes, inicio, dias)
+
+            conn = sqlite3.connect(ruta)
+            conn.row_factory = sqlite3.Row
+            usuarios = conn.execute("SELECT * FROM usuarios WHERE rol='docente'").fetchall()
+            end_date = inicio + timedelta(days=dias - 1)
+            start_date = end_date - timedelta(days=DIAS_REPORTE - 1)
+            celdas = n_docentes * DIAS_REPORTE
+
+            t_anterior = "omitido"
+            if celdas <= MAX_CELDAS_METODO_ANTERIOR:
+                t_anterior = f"{medir(reporte_por_celda, conn, usuarios, start_date, end_date):.3f}"
+            t_logs = medir(reporte_desde_logs, conn, usuarios, start_date, end_date)
+            t_nuevo = medir(reportes.construir_matriz_asistencia, conn, usuarios, start_date, end_date)
+
+            t0 = time.perf_counter()
+            matriz = reportes.construir_matriz_asistencia(conn, usuarios, start_date, end_date)
+            reportes.escribir_excel_matricial(matriz, start_date, end_date, os.path.join(tmp, "r.xlsx"))
+            t_excel = time.perf_counter() - t0
+            conn.close()
+
+            print(f"{n_docentes:>9} {filas:>11} {celdas:>7} {t_anterior:>14} {t_logs:>15.3f} "
+                  f"{t_nuevo:>12.3f} {t_excel:>14.3f}")
+
+if __name__ == '__main__':
+    main()
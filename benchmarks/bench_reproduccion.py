@@ -0,0 +1,166 @@
+"""
+Ingesta y apertura de punta a punta sin hardware: el simulador Hikvision (en un proceso
+aparte) reproduce una grabación del alertStream en cada terminal registrado y hace de
+NodeMCU; en este proceso corren el gateway, el pipeline, el escritor por lotes y los
+controladores de puerta de biometrico_driver, como en el proceso de ingesta real.
+
+Sin --grabacion se usa una sintética (benchmarks.simulador_hikvision.grabacion_sintetica)
+con marcas de los docentes de la BD. Todos los terminales reproducen la misma grabación:
+se esperan terminales x eventos filas nuevas en logs. Cada terminal tiene su propia ruta
+de stream (alertStream?terminal=N), así el simulador retoma su reproducción tras una
+desconexión; el bloque cortado se reenvía y lo descarta la deduplicación.
+
+Mide eventos guardados por segundo, errores y descartes de cada etapa, reconexiones, y
+los comandos a la puerta (enviados, colapsados, fallidos, latencia p50/p95).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_reproduccion
+    python -m benchmarks.bench_reproduccion --terminales 8 --eventos 5000 --velocidad 0
+    python -m benchmarks.bench_reproduccion --grabacion sesion.hikrec --velocidad 10 \\
+        --prob-malformado 0.01 --prob-401 0.05 --prob-desconexion 0.001 \\
+        --latencia-puerta-ms 150 --prob-fallo-puerta 0.05 --limite-segundos 60
+
+Sale con código 1 si no se guardaron todas las filas esperadas dentro de --limite-segundos.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import requests
+
+import config
+
+from benchmarks.bench_gateway import esperar_puerto, puerto_libre
+from benchmarks.datos_sinteticos import crear_bd_sintetica
+from benchmarks.simulador_hikvision import RUTA_STREAM, grabacion_sintetica, leer_grabacion
+from benchmarks.suite import silencio
+
+def preparar_bd(ruta, docentes, terminales, puerto_sim, con_puerta):
+    """BD sintética con `terminales` terminales y la puerta apuntando al simulador."""
+    crear_bd_sintetica(ruta, docentes, date.today() - timedelta(days=7), 7)
+    conn = sqlite3.connect(ruta)
+    # Una fracción de los docentes con permiso de puerta (con_puerta = 0.5 -> uno de cada dos)
+    cada = max(1, round(1 / con_puerta)) if con_puerta else 0
+    conn.execute("UPDATE usuarios SET acceso_puerta = (? > 0 AND id % ? = 0)", (cada, max(cada, 1)))
+    host = f"127.0.0.1:{puerto_sim}"
+    conn.execute("UPDATE dispositivos SET host = ? WHERE tipo = 'puerta'", (host,))
+    conn.execute("UPDATE dispositivos SET host = ?, usuario = 'admin', clave = 'admin', ruta_stream = ? "
+                 "WHERE tipo = 'terminal'", (host, f"{RUTA_STREAM}?terminal=1"))
+    puerta_id, = conn.execute("SELECT id FROM dispositivos WHERE tipo = 'puerta'").fetchone()
+    conn.executemany("INSERT INTO dispositivos (nombre, tipo, host, usuario, clave, ruta_stream, puerta_id) "
+                     "VALUES (?, 'terminal', ?, 'admin', 'admin', ?, ?)",
+                     [(f"Terminal reproducción {i}", host, f"{RUTA_STREAM}?terminal={i}", puerta_id)
+                      for i in range(2, terminales + 1)])
+    conn.commit()
+    ultimo_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM logs").fetchone()[0]
+    conn.close()
+    return ultimo_id
+
+def contar_nuevos(ruta, ultimo_id):
+    conn = sqlite3.connect(ruta)
+    n = conn.execute("SELECT COUNT(*) FROM logs WHERE id > ?", (ultimo_id,)).fetchone()[0]
+    conn.close()
+    return n
+
+def esperar_guardados(ruta, ultimo_id, esperados, limite):
+    """Espera hasta tener `esperados` filas nuevas o agotar `limite` s. Devuelve (filas, segundos)."""
+    t0 = time.perf_counter()
+    guardados = 0
+    while time.perf_counter() - t0 < limite:
+        guardados = contar_nuevos(ruta, ultimo_id)
+        if guardados >= esperados:
+            break
+        time.sleep(0.1)
+    return guardados, time.perf_counter() - t0
+
+def argumentos_simulador(args, puerto, ruta_grabacion):
+    return [sys.executable, '-m', 'benchmarks.simulador_hikvision', '--puerto', str(puerto),
+            '--reproducir', ruta_grabacion, '--velocidad', str(args.velocidad), '--semilla', '1',
+            '--prob-malformado', str(args.prob_malformado), '--prob-401', str(args.prob_401),
+            '--prob-desconexion', str(args.prob_desconexion),
+            '--latencia-puerta-ms', str(args.latencia_puerta_ms), '--prob-fallo-puerta', str(args.prob_fallo_puerta)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grabacion', help="Grabación de --grabar o captura cruda (por defecto, una sintética)")
+    parser.add_argument('--eventos', type=int, default=2000, help="Eventos de la grabación sintética")
+    parser.add_argument('--eventos-por-segundo', type=float, default=5.0, help="Tasa de la grabación sintética")
+    parser.add_argument('--docentes', type=int, default=300)
+    parser.add_argument('--con-puerta', type=float, default=0.5, help="Fracción de docentes con permiso de puerta")
+    parser.add_argument('--terminales', type=int, default=4)
+    parser.add_argument('--velocidad', type=float, default=0, help="1 = tiempo original, N = N veces más rápido, 0 = sin esperas")
+    parser.add_argument('--prob-malformado', type=float, default=0.0)
+    parser.add_argument('--prob-401', type=float, default=0.0)
+    parser.add_argument('--prob-desconexion', type=float, default=0.0)
+    parser.add_argument('--latencia-puerta-ms', type=float, default=50)
+    parser.add_argument('--prob-fallo-puerta', type=float, default=0.0)
+    parser.add_argument('--limite-segundos', type=float, default=120, help="Espera máxima hasta tener todas las filas")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.grabacion:
+            ruta_grabacion = args.grabacion
+            grabacion = leer_grabacion(ruta_grabacion)
+        else:
+            ruta_grabacion = os.path.join(tmp, 'sintetica.hikrec')
+            grabacion = grabacion_sintetica(args.eventos, args.eventos_por_segundo, args.docentes, imagen_cada=10)
+            grabacion.guardar(ruta_grabacion)
+        # Filas esperadas: las marcas de la grabación (los latidos y otros eventos no se guardan)
+        marcas = grabacion.eventos
+        esperados = marcas * args.terminales
+        print(f"Grabación: {marcas} eventos en {grabacion.duracion:.0f} s; {args.terminales} terminales, "
+              f"velocidad {args.velocidad or 'máxima'}")
+
+        puerto_sim = puerto_libre()
+        config.DB_NAME = os.path.join(tmp, 'reproduccion.db')
+        with silencio():
+            ultimo_id = preparar_bd(config.DB_NAME, args.docentes, args.terminales, puerto_sim, args.con_puerta)
+        sim = subprocess.Popen(argumentos_simulador(args, puerto_sim, ruta_grabacion), stdout=subprocess.DEVNULL)
+        # Silencio también al cortar el simulador: el gateway avisa de cada stream cerrado
+        with silencio():
+            try:
+                asyncio.run(esperar_puerto(puerto_sim))
+                import biometrico_driver as bio
+
+                bio.init_db()
+                bio.iniciar_escritor_logs()
+                bio.iniciar_escucha_en_hilo()
+                guardados, segundos = esperar_guardados(config.DB_NAME, ultimo_id, esperados, args.limite_segundos)
+                # Los comandos a la puerta siguen saliendo tras la última fila guardada
+                time.sleep(min(5, max(config.PUERTA_TIMEOUT) + 1))
+                estado_sim = requests.get(f"http://127.0.0.1:{puerto_sim}/estado", timeout=5).json()
+                terminales = bio.estado_terminales()
+                pipeline = bio.estado_pipeline()
+                puertas = bio.estado_puertas()
+            finally:
+                sim.terminate()
+                sim.wait()
+
+    print(f"  filas guardadas: {guardados}/{esperados} en {segundos:.1f} s ({guardados / segundos:.0f}/s)")
+    print(f"  conexiones al stream: {sum(t['conexiones'] for t in terminales)} "
+          f"(simulador: {estado_sim['malformados']} malformados, {estado_sim['rechazos_401']} 401, "
+          f"{estado_sim['desconexiones']} desconexiones)")
+    for nombre, etapa in pipeline.items():
+        print(f"  {nombre:<15} procesados={etapa['procesados']} descartados={etapa['descartados']} "
+              f"errores={etapa['errores']}" + (f" duplicados={etapa['duplicados']}" if 'duplicados' in etapa else ""))
+    for host, p in puertas.items():
+        print(f"  puerta {host}: enviados={p['enviados']} colapsados={p['colapsados']} errores={p['errores']} "
+              f"latencia p50={p['latencia_ms']['p50']} p95={p['latencia_ms']['p95']} ms "
+              f"(simulador: {estado_sim['aperturas']} abiertas, {estado_sim['aperturas_fallidas']} fallidas)")
+    print(json.dumps({'filas_por_segundo': round(guardados / segundos, 1), 'guardadas': guardados,
+                      'esperadas': esperados}))
+
+    if guardados < esperados:
+        print(f"❌ Faltan {esperados - guardados} filas tras {args.limite_segundos:.0f} s")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
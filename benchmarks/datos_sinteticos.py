@@ -0,0 +1,210 @@
+"""
+Genera una base de datos sintética con el esquema de la app: N docentes y M años de
+tráfico de `logs` con horarios mixtos (doble jornada, matutinos, vespertinos y de fin de
+semana, con sus turnos en `horarios`), ráfagas de marcas en los cambios de turno,
+ausencias, salidas sin marcar, marcas repetidas e intentos de huella fallidos.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.datos_sinteticos prueba.db --docentes 600 --anios 2
+    python -m benchmarks.datos_sinteticos prueba.db --docentes 50 --anios 1 --desde 2025-01-01 --semilla 7
+
+No reemplaza un archivo existente salvo con --reemplazar.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import horarios
+import migraciones
+
+# --- DATOS SINTÉTICOS PARA BENCHMARKS ---
+# Crea una base de datos con el mismo esquema que la app y la llena con
+# docentes y marcas de asistencia. crear_bd_sintetica genera un patrón fijo
+# (cuatro marcas diarias alrededor de las mismas horas, todos los días), útil para
+# comparar tiempos; crear_bd_realista, el tráfico de una institución real.
+
+def crear_esquema(ruta):
+    """Crea las tablas base de la app en la ruta indicada (sin crear el usuario admin)."""
+    conn = sqlite3.connect(ruta)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            biometric_id TEXT UNIQUE,
+            nombre TEXT NOT NULL,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            rol TEXT DEFAULT 'docente',
+            acceso_puerta INTEGER DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fecha DATETIME,
+            usuario_id TEXT,
+            tipo_evento TEXT,
+            origen TEXT
+        )
+    ''')
+    conn.commit()
+    return conn
+
+def generar_marcas(bio_ids, fecha_inicio, dias, marcas_por_dia=4, semilla=1):
+    """Genera tuplas (fecha, usuario_id, tipo_evento, origen) ordenadas por fecha."""
+    rnd = random.Random(semilla)
+    horas_base = [(7, 30), (12, 30), (14, 0), (18, 0), (10, 0), (16, 0)]
+    filas = []
+    for d in range(dias):
+        dia = datetime.combine(fecha_inicio + timedelta(days=d), datetime.min.time())
+        for uid in bio_ids:
+            for h, m in horas_base[:marcas_por_dia]:
+                ts = dia + timedelta(hours=h, minutes=m, seconds=rnd.randint(-1800, 1800))
+                filas.append((ts.strftime("%Y-%m-%d %H:%M:%S"), uid, "ASISTENCIA", "Huella"))
+    filas.sort()
+    return filas
+
+def crear_bd_sintetica(ruta, n_docentes, fecha_inicio, dias, marcas_por_dia=4, semilla=1):
+    """
+    Crea (o reemplaza) una base de datos con n_docentes y sus marcas durante `dias` días.
+    Devuelve la cantidad de filas insertadas en `logs`.
+    """
+    conn = crear_esquema(ruta)
+    conn.execute("DELETE FROM usuarios")
+    conn.execute("DELETE FROM logs")
+    bio_ids = [str(100 + i) for i in range(n_docentes)]
+    conn.executemany(
+        "INSERT INTO usuarios (biometric_id, nombre, username, password, rol) VALUES (?, ?, ?, 'x', 'docente')",
+        [(b, f"Docente {b}", f"docente{b}") for b in bio_ids]
+    )
+    filas = generar_marcas(bio_ids, fecha_inicio, dias, marcas_por_dia, semilla)
+    conn.executemany("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen) VALUES (?, ?, ?, ?)", filas)
+    conn.commit()
+    # Mismos índices que una instalación real
+    migraciones.aplicar_migraciones(conn)
+    conn.close()
+    return len(filas)
+
+# --- Tráfico realista ---
+# (nombre, peso, turnos (días de la semana, jornada, entrada, salida)). El perfil de doble
+# jornada coincide con el horario general de config.py y no necesita filas en `horarios`.
+PERFILES = [
+    ('doble_jornada', 70, [((0, 1, 2, 3, 4), 0, '07:30', '12:30'), ((0, 1, 2, 3, 4), 1, '14:00', '18:00')]),
+    ('matutino', 15, [((0, 1, 2, 3, 4), 0, '07:30', '12:30')]),
+    ('vespertino', 10, [((0, 1, 2, 3, 4), 1, '18:00', '22:00')]),
+    ('fin_de_semana', 5, [((5,), 0, '08:00', '12:00'), ((5,), 1, '13:00', '17:00')]),
+]
+PROB_AUSENCIA = 0.04       # Día programado sin ninguna marca
+PROB_ATRASO = 0.08         # Llegada con un atraso exponencial (media 15 min)
+PROB_SIN_SALIDA = 0.04     # Jornada sin marca de salida
+PROB_REPETIDA = 0.02       # Marca repetida segundos después (el docente no vio la confirmación)
+PROB_FALLO = 0.03          # Marca precedida de 1 a 3 intentos fallidos de huella
+
+def _minutos(hora):
+    h, m = hora.split(':')
+    return int(h) * 60 + int(m)
+
+def asignar_perfiles(n_docentes, semilla=1):
+    """Perfil (índice en PERFILES) de cada docente, con los pesos de PERFILES."""
+    rnd = random.Random(semilla)
+    return rnd.choices(range(len(PERFILES)), weights=[p[1] for p in PERFILES], k=n_docentes)
+
+def generar_trafico(bio_ids, perfiles, fecha_inicio, dias, semilla=1):
+    """
+    Genera, día por día, listas de tuplas (fecha, usuario_id, tipo_evento, origen) ordenadas
+    por fecha. Las llegadas se concentran unos minutos antes de la entrada de cada turno,
+    así que cada cambio de turno produce una ráfaga de marcas de toda la planta.
+    """
+    rnd = random.Random(semilla)
+    turnos = [[(set(d), _minutos(e), _minutos(s)) for d, _, e, s in p[2]] for p in PERFILES]
+    for n in range(dias):
+        dia = fecha_inicio + timedelta(days=n)
+        prefijo, dia_semana = dia.isoformat() + ' ', dia.weekday()
+        eventos = []
+
+        def marcar(uid, segundo):
+            if rnd.random() < PROB_FALLO:
+                for _ in range(rnd.randint(1, 3)):
+                    segundo_fallo = max(0, segundo - rnd.randint(3, 20))
+                    eventos.append((segundo_fallo, uid if rnd.random() < 0.5 else 'Desconocido', "FALLO INTENTO"))
+            eventos.append((segundo, uid, "ASISTENCIA"))
+            if rnd.random() < PROB_REPETIDA:
+                eventos.append((segundo + rnd.randint(2, 40), uid, "ASISTENCIA"))
+
+        for uid, perfil in zip(bio_ids, perfiles):
+            del_dia = [(e, s) for dias_semana, e, s in turnos[perfil] if dia_semana in dias_semana]
+            if not del_dia or rnd.random() < PROB_AUSENCIA:
+                continue
+            for entrada, salida in del_dia:
+                llegada = entrada * 60 + rnd.gauss(-360, 420)
+                if rnd.random() < PROB_ATRASO:
+                    llegada = entrada * 60 + rnd.expovariate(1 / 900)
+                marcar(uid, int(llegada))
+                if rnd.random() >= PROB_SIN_SALIDA:
+                    marcar(uid, int(salida * 60 + rnd.gauss(240, 480)))
+
+        eventos.sort()
+        yield [(f"{prefijo}{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}", uid, tipo, "Huella")
+               for s, uid, tipo in eventos if 0 <= s < 86400]
+
+def crear_bd_realista(ruta, n_docentes, fecha_inicio, dias, semilla=1):
+    """
+    Crea (o reemplaza) una base de datos con n_docentes de perfiles mixtos, sus turnos en
+    `horarios` (vigentes desde fecha_inicio) y su tráfico durante `dias` días.
+    Devuelve la cantidad de filas insertadas en `logs`.
+    """
+    conn = crear_esquema(ruta)
+    conn.execute("DELETE FROM usuarios")
+    conn.execute("DELETE FROM logs")
+    bio_ids = [str(100 + i) for i in range(n_docentes)]
+    perfiles = asignar_perfiles(n_docentes, semilla)
+    conn.executemany(
+        "INSERT INTO usuarios (biometric_id, nombre, username, password, rol) VALUES (?, ?, ?, 'x', 'docente')",
+        [(b, f"Docente {b}", f"docente{b}") for b in bio_ids]
+    )
+    filas = 0
+    for lote in generar_trafico(bio_ids, perfiles, fecha_inicio, dias, semilla):
+        conn.executemany("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen) VALUES (?, ?, ?, ?)", lote)
+        filas += len(lote)
+    conn.commit()
+    # Los logs van antes de las migraciones: así el resumen diario y las versiones por día se arman de una vez
+    migraciones.aplicar_migraciones(conn)
+    conn.row_factory = sqlite3.Row
+    ids = dict(conn.execute("SELECT biometric_id, id FROM usuarios").fetchall())
+    with conn:
+        for b, perfil in zip(bio_ids, perfiles):
+            if perfil == 0:
+                continue
+            for dias_semana, jornada, entrada, salida in PERFILES[perfil][2]:
+                horarios.agregar(conn, ids[b], dias_semana, jornada, entrada, salida, fecha_inicio.isoformat())
+    conn.close()
+    return filas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('ruta', help="Archivo SQLite a crear")
+    parser.add_argument('--docentes', type=int, default=600)
+    parser.add_argument('--anios', type=float, default=1)
+    parser.add_argument('--desde', help="Primer día (YYYY-MM-DD); por defecto, --anios antes de hoy")
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--reemplazar', action='store_true')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.ruta) and not args.reemplazar:
+        parser.error(f"{args.ruta} ya existe (use --reemplazar para sobrescribirlo).")
+    dias = round(365.25 * args.anios)
+    try:
+        inicio = datetime.strptime(args.desde, '%Y-%m-%d').date() if args.desde else date.today() - timedelta(days=dias)
+    except ValueError:
+        parser.error("Formato de fecha inválido. Use YYYY-MM-DD.")
+    t0 = time.perf_counter()
+    filas = crear_bd_realista(args.ruta, args.docentes, inicio, dias, args.semilla)
+    print(f"✅ {args.ruta}: {args.docentes} docentes, {dias} días desde {inicio}, {filas} filas en logs "
+          f"({time.perf_counter() - t0:.1f} s)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
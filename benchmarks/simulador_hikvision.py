@@ -0,0 +1,578 @@
+"""
+Simulador local de terminales Hikvision (alertStream ISAPI con autenticación Digest
+y búsqueda de eventos AcsEvent) y de la puerta NodeMCU (/api/abrir), para pruebas
+del gateway sin hardware.
+
+Cada conexión a /ISAPI/Event/notification/alertStream se comporta como un terminal
+independiente: emite eventos de acceso (y, cada tanto, una foto) a la tasa indicada.
+Para simular cientos de terminales, registrar en `dispositivos` cientos de filas
+apuntando al mismo host:puerto.
+
+Todos los eventos emitidos quedan en un historial común que responde la búsqueda
+POST /ISAPI/AccessControl/AcsEvent?format=json (pensada para probar con un solo
+terminal). GET /estado devuelve los streams abiertos y los contadores en JSON.
+Con --cortar-cada se simulan cortes: se cierran los streams, se rechazan
+las reconexiones durante --duracion-corte segundos y, mientras tanto, se siguen
+generando marcas que solo quedan en el historial (las que hay que recuperar).
+
+Grabación y reproducción: --grabar guarda los bloques del alertStream de un terminal
+real (o de otro simulador) con el instante en que llegó cada uno; --reproducir los
+vuelve a emitir en cada conexión, a la velocidad original (--velocidad 1), N veces más
+rápido (--velocidad N) o sin esperas (--velocidad 0). También acepta una captura cruda
+sin tiempos (la de bench_framer --captura), que se emite sin esperas. Si la ruta del
+stream trae una consulta (p. ej. ruta_stream = '...alertStream?terminal=3' en
+`dispositivos`), la reproducción de ese terminal sigue tras una reconexión desde el
+bloque que quedó cortado; sin consulta, cada conexión empieza desde el principio.
+
+Fallas inyectadas (probabilidades entre 0 y 1):
+  --prob-malformado   por evento (o bloque reproducido): antes se envía una parte JSON
+                      truncada, bytes sueltos o, con --chunked, un bloque con tamaño inválido
+  --prob-401          por petición al stream o a la búsqueda: 401 aunque la clave sea válida
+  --prob-desconexion  por evento (o bloque): se envía la mitad y se corta la conexión
+La puerta (/api/abrir, como node.ino) responde tras --latencia-puerta-ms (±50%) y con
+--prob-fallo-puerta cierra la conexión sin responder o se cuelga hasta que el cliente
+se rinde, como un NodeMCU reiniciándose o sin Wi-Fi.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.simulador_hikvision --puerto 8081 --eventos-por-segundo 2
+    python -m benchmarks.simulador_hikvision --puerto 8081 --cortar-cada 20 --duracion-corte 5
+    python -m benchmarks.simulador_hikvision --grabar sesion.hikrec --terminal 192.168.1.22 --duracion 600
+    python -m benchmarks.simulador_hikvision --puerto 8081 --reproducir sesion.hikrec --velocidad 10 \\
+        --prob-malformado 0.01 --prob-401 0.05 --prob-desconexion 0.002 \\
+        --latencia-puerta-ms 150 --prob-fallo-puerta 0.05
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import config
+import gateway_dispositivos
+from framer_stream import FramerAlertStream
+
+RUTA_STREAM = '/ISAPI/Event/notification/alertStream'
+RUTA_BUSQUEDA = '/ISAPI/AccessControl/AcsEvent'
+BOUNDARY = b"MIME_boundary"
+_PARAMETRO = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([^\s,]+))')
+
+# Archivo de grabación: MAGIA, una línea JSON con la cabecera (content_type, terminal,
+# inicio) y luego registros (segundos desde el inicio, largo) + bytes del bloque.
+MAGIA_GRABACION = b"HIKREC1\n"
+_REGISTRO = struct.Struct('<dI')
+BLOQUE_CAPTURA = 16 * 1024      # Tamaño de bloque al reproducir una captura cruda
+PUERTA_COLGADA_S = 30           # Una puerta "colgada" no responde durante este tiempo
+LATIDO_S = 10                   # Sin marcas, el terminal envía un evento videoloss cada ~10 s
+
+def evento_acceso(empleado, serial, sub_evento=75, ahora=None):
+    """JSON de un AccessControllerEvent con el formato del terminal (incluye la hora de emisión)."""
+    ahora = ahora or datetime.now().astimezone()
+    return json.dumps({
+        "ipAddress": "127.0.0.1", "eventType": "AccessControllerEvent",
+        "dateTime": ahora.isoformat(timespec='seconds'),
+        "AccessControllerEvent": {
+            "deviceName": "Access Controller", "majorEventType": 5, "subEventType": sub_evento,
+            "name": f"Docente {empleado}", "employeeNoString": str(empleado),
+            "serialNo": serial, "currentVerifyMode": "cardOrFaceOrFp",
+            "time": ahora.isoformat(timespec='seconds'),
+        },
+        "_emitido": time.time(),
+    }, indent=4).encode()
+
+def evento_latido(ahora=None):
+    """Latido que el terminal envía por el alertStream cuando no hay otros eventos."""
+    ahora = ahora or datetime.now().astimezone()
+    return json.dumps({
+        "ipAddress": "127.0.0.1", "dateTime": ahora.isoformat(timespec='seconds'), "activePostCount": 0,
+        "eventType": "videoloss", "eventState": "inactive", "eventDescription": "videoloss alarm",
+    }, indent=4).encode()
+
+def parte_multipart(tipo, cuerpo):
+    return (b"--" + BOUNDARY + b"\r\nContent-Type: " + tipo + b"\r\n"
+            b"Content-Length: %d\r\n\r\n" % len(cuerpo) + cuerpo + b"\r\n")
+
+# --- Grabaciones ---
+class Grabacion:
+    """Bloques de un alertStream con su instante relativo y los eventos que contiene cada uno."""
+
+    def __init__(self, content_type, bloques, terminal=None, inicio=None):
+        self.content_type = content_type
+        self.bloques = bloques          # [(segundos desde el inicio, bytes)]
+        self.terminal = terminal
+        self.inicio = inicio
+        # Eventos completos al terminar cada bloque (para los contadores del simulador)
+        framer = FramerAlertStream()
+        self.eventos_por_bloque = [len(framer.alimentar(datos)) for _, datos in bloques]
+
+    @property
+    def eventos(self):
+        return sum(self.eventos_por_bloque)
+
+    @property
+    def duracion(self):
+        return self.bloques[-1][0] if self.bloques else 0.0
+
+    def guardar(self, ruta):
+        with open(ruta, 'wb') as f:
+            escribir_cabecera_grabacion(f, self.content_type, self.terminal, self.inicio)
+            for t, datos in self.bloques:
+                f.write(_REGISTRO.pack(t, len(datos)) + datos)
+
+def escribir_cabecera_grabacion(f, content_type, terminal=None, inicio=None):
+    cabecera = {'content_type': content_type, 'terminal': terminal,
+                'inicio': inicio or datetime.now().astimezone().isoformat(timespec='seconds')}
+    f.write(MAGIA_GRABACION + json.dumps(cabecera).encode() + b"\n")
+
+def leer_grabacion(ruta):
+    """
+    Lee una grabación de --grabar. Un archivo sin la marca se toma como captura cruda
+    (bytes del cuerpo del stream, sin tiempos): se parte en bloques que salen sin esperas.
+    """
+    with open(ruta, 'rb') as f:
+        datos = f.read()
+    if not datos.startswith(MAGIA_GRABACION):
+        bloques = [(0.0, datos[i:i + BLOQUE_CAPTURA]) for i in range(0, len(datos), BLOQUE_CAPTURA)]
+        # Sin boundary en la cabecera HTTP: el framer lo detecta en la primera línea
+        return Grabacion("multipart/mixed", bloques)
+    fin_cabecera = datos.index(b"\n", len(MAGIA_GRABACION))
+    cabecera = json.loads(datos[len(MAGIA_GRABACION):fin_cabecera])
+    bloques = []
+    pos = fin_cabecera + 1
+    while pos < len(datos):
+        if pos + _REGISTRO.size > len(datos):
+            break  # Registro cortado (grabación interrumpida)
+        t, largo = _REGISTRO.unpack_from(datos, pos)
+        pos += _REGISTRO.size
+        bloques.append((t, datos[pos:pos + largo]))
+        pos += largo
+    return Grabacion(cabecera.get('content_type') or "multipart/mixed", bloques,
+                     cabecera.get('terminal'), cabecera.get('inicio'))
+
+def grabacion_sintetica(eventos, eventos_por_segundo=1.0, empleados=300, imagen_cada=0, semilla=1):
+    """Grabación de `eventos` marcas (llegadas de Poisson) con el formato del terminal, sin hardware."""
+    rnd = random.Random(semilla)
+    imagen = rnd.randbytes(20000)
+    inicio = datetime.now().astimezone().replace(microsecond=0)
+    bloques = []
+    t = 0.0
+    for serial in range(1, eventos + 1):
+        t += rnd.expovariate(eventos_por_segundo)
+        momento = datetime.fromtimestamp(inicio.timestamp() + t).astimezone()
+        datos = parte_multipart(b'application/json; charset="UTF-8"',
+                                evento_acceso(100 + rnd.randrange(empleados), serial, ahora=momento))
+        if imagen_cada and serial % imagen_cada == 0:
+            datos += parte_multipart(b"image/jpeg", imagen)
+        bloques.append((t, datos))
+    return Grabacion(f"multipart/mixed; boundary={BOUNDARY.decode()}", bloques,
+                     'sintético', inicio.isoformat())
+
+async def grabar(ruta, host, usuario, clave, duracion=0, ruta_stream=None, timeout=None):
+    """
+    Abre el alertStream de `host` (con Digest, como el gateway) y guarda en `ruta` cada
+    bloque recibido con su instante, hasta `duracion` segundos (0 = hasta que se corte).
+    Devuelve (bloques, bytes).
+    """
+    terminal = {'host': host, 'ruta_stream': ruta_stream}
+    auth = gateway_dispositivos.AutenticacionDigest(usuario, clave)
+    # Sin eventos por la noche el terminal puede callar mucho tiempo: timeout amplio
+    timeout = timeout or max(300, config.GATEWAY_TIMEOUT_LECTURA)
+    reader, writer, cabeceras = await gateway_dispositivos.abrir_stream(terminal, auth, timeout)
+    bloques = total = 0
+    try:
+        with open(ruta, 'wb') as f:
+            escribir_cabecera_grabacion(f, gateway_dispositivos.cabecera(cabeceras, 'content-type', ''), host)
+            t0 = time.monotonic()
+
+            async def copiar():
+                nonlocal bloques, total
+                async for bloque in gateway_dispositivos.leer_cuerpo(reader, cabeceras, timeout,
+                                                                    config.STREAM_TAMANO_BLOQUE):
+                    f.write(_REGISTRO.pack(time.monotonic() - t0, len(bloque)) + bloque)
+                    bloques += 1
+                    total += len(bloque)
+
+            try:
+                await asyncio.wait_for(copiar(), duracion or None)
+            except asyncio.TimeoutError:
+                pass  # Fin de la duración pedida (o el terminal dejó de enviar)
+    finally:
+        writer.close()
+    return bloques, total
+
+class SimuladorHikvision:
+    def __init__(self, eventos_por_segundo=1.0, usuario='admin', clave='admin', empleados=300,
+                 imagen_cada=0, chunked=False, token_puerta='istae1805A', max_resultados=30,
+                 historial=200000, cortar_cada=0, duracion_corte=5, grabacion=None, velocidad=1.0,
+                 en_bucle=False, prob_malformado=0.0, prob_401=0.0, prob_desconexion=0.0,
+                 latencia_puerta_ms=0, prob_fallo_puerta=0.0, semilla=None):
+        self.eventos_por_segundo = eventos_por_segundo
+        self.usuario = usuario
+        self.clave = clave
+        self.empleados = empleados
+        self.imagen_cada = imagen_cada
+        self.chunked = chunked
+        self.token_puerta = token_puerta
+        self.max_resultados = max_resultados  # Los terminales reales limitan maxResults (~30)
+        self.cortar_cada = cortar_cada
+        self.duracion_corte = duracion_corte
+        self.grabacion = grabacion    # Grabacion a reproducir en cada conexión (None = eventos sintéticos)
+        self.velocidad = velocidad    # 1 = tiempo original, N = N veces más rápido, 0 = sin esperas
+        self.en_bucle = en_bucle
+        self.prob_malformado = prob_malformado
+        self.prob_401 = prob_401
+        self.prob_desconexion = prob_desconexion
+        self.latencia_puerta_ms = latencia_puerta_ms
+        self.prob_fallo_puerta = prob_fallo_puerta
+        self._rnd = random.Random(semilla)  # Decisiones de las fallas inyectadas
+        self.realm = "IP Camera(SIM)"
+        self._imagen = os.urandom(20000)
+        self._serial = 0
+        self._streams = set()
+        self._cursores = {}  # Próximo bloque de la grabación por terminal (consulta de la ruta del stream)
+        self._en_corte = False
+        # (hora, info de la búsqueda) de cada evento emitido, en orden
+        self.historial = deque(maxlen=historial)
+        self.conexiones = 0
+        self.eventos = 0
+        self.eventos_en_corte = 0
+        self.busquedas = 0
+        self.aperturas = 0
+        self.malformados = 0
+        self.rechazos_401 = 0
+        self.desconexiones = 0
+        self.aperturas_fallidas = 0
+
+    # --- Autenticación Digest (lado servidor) ---
+    def _desafio(self):
+        nonce = os.urandom(16).hex()
+        return f'Digest qop="auth", realm="{self.realm}", nonce="{nonce}", stale="FALSE"'
+
+    def _autorizado(self, metodo, cabecera):
+        if not cabecera or not cabecera.lower().startswith('digest '):
+            return False
+        p = {m[0].lower(): m[1] or m[2] for m in _PARAMETRO.findall(cabecera[7:])}
+
+        def H(texto):
+            return hashlib.md5(texto.encode()).hexdigest()
+
+        ha1 = H(f"{self.usuario}:{self.realm}:{self.clave}")
+        ha2 = H(f"{metodo}:{p.get('uri', '')}")
+        if p.get('qop') == 'auth':
+            esperado = H(f"{ha1}:{p.get('nonce')}:{p.get('nc')}:{p.get('cnonce')}:auth:{ha2}")
+        else:
+            esperado = H(f"{ha1}:{p.get('nonce')}:{ha2}")
+        return p.get('username') == self.usuario and p.get('response') == esperado
+
+    # --- Eventos e historial ---
+    def _nuevo_evento(self, rnd):
+        """Registra en el historial un evento nuevo y devuelve su JSON de stream."""
+        self._serial += 1
+        empleado = 100 + rnd.randrange(self.empleados)
+        ahora = datetime.now().astimezone()
+        self.historial.append((ahora, {
+            "major": 5, "minor": 75, "time": ahora.isoformat(timespec='seconds'),
+            "employeeNoString": str(empleado), "name": f"Docente {empleado}",
+            "serialNo": self._serial, "currentVerifyMode": "cardOrFaceOrFp",
+        }))
+        return evento_acceso(empleado, self._serial, ahora=ahora)
+
+    def buscar(self, condicion):
+        """Respuesta de AcsEvent para un AcsEventCond (filtra por major/minor y rango de horas)."""
+        self.busquedas += 1
+        inicio = datetime.fromisoformat(condicion['startTime'])
+        fin = datetime.fromisoformat(condicion['endTime'])
+        major, minor = condicion.get('major', 0), condicion.get('minor', 0)
+        coincidencias = [info for hora, info in self.historial if inicio <= hora <= fin
+                         and (not major or info['major'] == major) and (not minor or info['minor'] == minor)]
+        posicion = condicion.get('searchResultPosition', 0)
+        pagina = coincidencias[posicion:posicion + min(condicion.get('maxResults', 10), self.max_resultados)]
+        if not coincidencias:
+            estado = "NO MATCH"
+        elif posicion + len(pagina) < len(coincidencias):
+            estado = "MORE"
+        else:
+            estado = "OK"
+        return {"AcsEvent": {"searchID": condicion.get('searchID'), "responseStatusStrg": estado,
+                             "numOfMatches": len(pagina), "totalMatches": len(coincidencias), "InfoList": pagina}}
+
+    async def _cortes(self):
+        """Cada `cortar_cada` s corta los streams y, durante el corte, sigue generando marcas."""
+        rnd = random.Random()
+        intervalo = 1.0 / self.eventos_por_segundo if self.eventos_por_segundo > 0 else 1
+        while True:
+            await asyncio.sleep(self.cortar_cada)
+            self._en_corte = True
+            for writer in list(self._streams):
+                writer.close()
+            fin = time.monotonic() + self.duracion_corte
+            while time.monotonic() < fin:
+                await asyncio.sleep(intervalo)
+                self._nuevo_evento(rnd)
+                self.eventos_en_corte += 1
+            self._en_corte = False
+
+    # --- Servidor ---
+    async def _responder(self, writer, codigo, texto, cuerpo=b"", extra=()):
+        cabeceras = [f"HTTP/1.1 {codigo} {texto}", f"Content-Length: {len(cuerpo)}"]
+        if not any(e.lower().startswith('content-type:') for e in extra):
+            cabeceras.append("Content-Type: text/plain")
+        writer.write(("\r\n".join(cabeceras + list(extra)) + "\r\n\r\n").encode() + cuerpo)
+        await writer.drain()
+
+    async def _escribir(self, writer, datos):
+        if self.chunked:
+            datos = b"%x\r\n" % len(datos) + datos + b"\r\n"
+        writer.write(datos)
+        await writer.drain()
+
+    def _falla(self, probabilidad):
+        return probabilidad > 0 and self._rnd.random() < probabilidad
+
+    def _malformado(self):
+        """Bytes que un terminal con problemas podría mandar entre dos partes válidas."""
+        tipos = ['json_truncado', 'basura'] + (['chunk_invalido'] if self.chunked else [])
+        tipo = self._rnd.choice(tipos)
+        if tipo == 'json_truncado':
+            evento = evento_acceso(100 + self._rnd.randrange(self.empleados), 0)
+            return tipo, parte_multipart(b'application/json; charset="UTF-8"', evento[:len(evento) // 2])
+        if tipo == 'basura':
+            return tipo, self._rnd.randbytes(self._rnd.randrange(1, 512))
+        return tipo, b"zz\r\n"  # Tamaño de bloque chunked que no es hexadecimal
+
+    async def _generar(self, rnd):
+        """Eventos sintéticos (y fotos cada tanto): produce (bytes, eventos) a la tasa configurada."""
+        serial = 0  # Eventos de esta conexión (para intercalar fotos)
+        intervalo = 1.0 / self.eventos_por_segundo if self.eventos_por_segundo > 0 else None
+        # Desfase inicial para que los terminales no emitan todos a la vez
+        await asyncio.sleep(rnd.uniform(0, intervalo or 1))
+        while True:
+            serial += 1
+            datos = parte_multipart(b'application/json; charset="UTF-8"', self._nuevo_evento(rnd))
+            if self.imagen_cada and serial % self.imagen_cada == 0:
+                datos += parte_multipart(b"image/jpeg", self._imagen)
+            yield datos, 1
+            await asyncio.sleep(intervalo * rnd.uniform(0.8, 1.2) if intervalo else 3600)
+
+    async def _reproducir(self, rnd, terminal):
+        """
+        Bloques de la grabación con sus tiempos escalados por `velocidad`. Con `terminal`,
+        arranca desde su cursor y lo avanza con cada bloque que se llegó a enviar entero.
+        """
+        bloques = self.grabacion.bloques
+        eventos_por_bloque = self.grabacion.eventos_por_bloque
+        pos = self._cursores.get(terminal, 0) if terminal else 0
+        if self.velocidad > 0 and pos < len(bloques):
+            # Como con los eventos sintéticos, los terminales no arrancan todos a la vez
+            await asyncio.sleep(rnd.uniform(0, min(1.0, (bloques[pos][0] - (bloques[pos - 1][0] if pos else 0))
+                                                    / self.velocidad)))
+        while True:
+            inicio = time.monotonic() - (bloques[pos][0] / self.velocidad if self.velocidad > 0 and pos < len(bloques) else 0)
+            for i in range(pos, len(bloques)):
+                t, datos = bloques[i]
+                if self.velocidad > 0:
+                    espera = inicio + t / self.velocidad - time.monotonic()
+                    if espera > 0:
+                        await asyncio.sleep(espera)
+                else:
+                    await asyncio.sleep(0)  # Sin esperas, pero cediendo el loop a las demás conexiones
+                yield datos, eventos_por_bloque[i]
+                if terminal:
+                    self._cursores[terminal] = i + 1
+            if not self.en_bucle or not bloques:
+                break
+            pos = 0
+            if terminal:
+                self._cursores[terminal] = 0
+        # Terminada la grabación, el stream queda abierto solo con latidos, como un terminal sin
+        # marcas (y así se nota si el cliente se fue)
+        while True:
+            await asyncio.sleep(LATIDO_S)
+            yield parte_multipart(b'application/json; charset="UTF-8"', evento_latido()), 0
+
+    async def _vigilar_cliente(self, reader, writer):
+        """El cliente no envía nada más por el stream: EOF (o error) significa que se fue."""
+        try:
+            await reader.read()
+        except ConnectionError:
+            pass
+        self._streams.discard(writer)
+        writer.close()
+
+    async def _stream(self, reader, writer, terminal=None):
+        self.conexiones += 1
+        content_type = self.grabacion.content_type if self.grabacion else f"multipart/mixed; boundary={BOUNDARY.decode()}"
+        cabeceras = ["HTTP/1.1 200 OK", "Connection: keep-alive", f"Content-Type: {content_type}"]
+        if self.chunked:
+            cabeceras.append("Transfer-Encoding: chunked")
+        writer.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode())
+        await writer.drain()
+        rnd = random.Random()
+        fuente = self._reproducir(rnd, terminal) if self.grabacion else self._generar(rnd)
+        self._streams.add(writer)
+        vigilante = asyncio.create_task(self._vigilar_cliente(reader, writer))
+        try:
+            async for datos, eventos in fuente:
+                if writer.is_closing():
+                    break
+                if self._falla(self.prob_malformado):
+                    self.malformados += 1
+                    tipo, malformado = self._malformado()
+                    if tipo == 'chunk_invalido':
+                        writer.write(malformado)  # Sin el marco chunked: rompe el cuerpo
+                    else:
+                        await self._escribir(writer, malformado)
+                if self._falla(self.prob_desconexion):
+                    # Corte a mitad de una parte: el cliente ve el cuerpo incompleto y EOF
+                    self.desconexiones += 1
+                    await self._escribir(writer, datos[:len(datos) // 2])
+                    break
+                await self._escribir(writer, datos)
+                self.eventos += eventos
+        finally:
+            vigilante.cancel()
+            await fuente.aclose()
+            self._streams.discard(writer)
+
+    async def _abrir_puerta(self, writer, consulta):
+        """Como /api/abrir de node.ino, con la latencia y las fallas configuradas. False = cerrar."""
+        if self.latencia_puerta_ms:
+            await asyncio.sleep(self.latencia_puerta_ms * self._rnd.uniform(0.5, 1.5) / 1000)
+        if self._falla(self.prob_fallo_puerta):
+            self.aperturas_fallidas += 1
+            if self._rnd.random() < 0.5:
+                await asyncio.sleep(PUERTA_COLGADA_S)  # Colgada: el cliente se rinde por timeout
+            return False  # Cierra sin responder (reinicio del NodeMCU, Wi-Fi caído)
+        if parse_qs(consulta).get('token', [''])[0] == self.token_puerta:
+            self.aperturas += 1
+            await self._responder(writer, 200, "OK", b"OK_ABRIENDO")
+        else:
+            await self._responder(writer, 403, "Forbidden", b"ERROR_TOKEN")
+        return True
+
+    async def atender(self, reader, writer):
+        try:
+            while True:
+                try:
+                    cabeza = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lineas = cabeza.decode('latin-1').split("\r\n")
+                metodo, ruta, _ = lineas[0].split(' ', 2)
+                cabeceras = {}
+                for linea in lineas[1:]:
+                    clave, _, valor = linea.partition(':')
+                    cabeceras[clave.strip().lower()] = valor.strip()
+                url = urlsplit(ruta)
+                cuerpo = await reader.readexactly(int(cabeceras.get('content-length', 0)))
+
+                if url.path in (RUTA_STREAM, RUTA_BUSQUEDA) and (
+                        not self._autorizado(metodo, cabeceras.get('authorization')) or self._falla(self.prob_401)):
+                    if cabeceras.get('authorization'):
+                        self.rechazos_401 += 1
+                    await self._responder(writer, 401, "Unauthorized", b"401", [f"WWW-Authenticate: {self._desafio()}"])
+                elif url.path == RUTA_STREAM:
+                    if self._en_corte:
+                        await self._responder(writer, 503, "Service Unavailable", b"")
+                        return
+                    await self._stream(reader, writer, url.query)
+                    return
+                elif url.path == RUTA_BUSQUEDA and metodo == 'POST':
+                    respuesta = json.dumps(self.buscar(json.loads(cuerpo)['AcsEventCond'])).encode()
+                    await self._responder(writer, 200, "OK", respuesta, ["Content-Type: application/json"])
+                elif url.path == '/estado':
+                    # Contadores para las pruebas de carga (streams abiertos = terminales escuchados)
+                    await self._responder(writer, 200, "OK", json.dumps(self.estado()).encode(),
+                                          ["Content-Type: application/json"])
+                elif url.path == '/api/abrir':
+                    if not await self._abrir_puerta(writer, url.query):
+                        return
+                else:
+                    await self._responder(writer, 404, "Not Found", b"")
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    def estado(self):
+        return {'streams_abiertos': len(self._streams), 'conexiones': self.conexiones, 'eventos': self.eventos,
+                'aperturas': self.aperturas, 'aperturas_fallidas': self.aperturas_fallidas,
+                'malformados': self.malformados, 'rechazos_401': self.rechazos_401,
+                'desconexiones': self.desconexiones}
+
+    async def iniciar(self, host='127.0.0.1', puerto=0):
+        """Abre el servidor y devuelve el asyncio.Server (puerto real en server.sockets[0])."""
+        if self.cortar_cada:
+            self._tarea_cortes = asyncio.create_task(self._cortes())
+        return await asyncio.start_server(self.atender, host, puerto, backlog=1024)
+
+async def _principal(args):
+    grabacion = None
+    if args.reproducir:
+        grabacion = leer_grabacion(args.reproducir)
+        print(f"📼 {args.reproducir}: {len(grabacion.bloques)} bloques, {grabacion.eventos} eventos, "
+              f"{grabacion.duracion:.0f} s grabados", flush=True)
+    sim = SimuladorHikvision(args.eventos_por_segundo, args.usuario, args.clave,
+                             imagen_cada=args.imagen_cada, chunked=args.chunked,
+                             cortar_cada=args.cortar_cada, duracion_corte=args.duracion_corte,
+                             grabacion=grabacion, velocidad=args.velocidad, en_bucle=args.en_bucle,
+                             prob_malformado=args.prob_malformado, prob_401=args.prob_401,
+                             prob_desconexion=args.prob_desconexion, latencia_puerta_ms=args.latencia_puerta_ms,
+                             prob_fallo_puerta=args.prob_fallo_puerta, semilla=args.semilla)
+    servidor = await sim.iniciar(args.host, args.puerto)
+    print(f"🛰️  Simulador Hikvision escuchando en {args.host}:{servidor.sockets[0].getsockname()[1]}", flush=True)
+    async with servidor:
+        while True:
+            await asyncio.sleep(10)
+            print(f"   conexiones={sim.conexiones} eventos={sim.eventos} en_corte={sim.eventos_en_corte} "
+                  f"busquedas={sim.busquedas} aperturas={sim.aperturas} malformados={sim.malformados} "
+                  f"401={sim.rechazos_401} desconexiones={sim.desconexiones} "
+                  f"aperturas_fallidas={sim.aperturas_fallidas}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8081)
+    parser.add_argument('--eventos-por-segundo', type=float, default=1.0, help="Por cada terminal conectado")
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--clave', default='admin')
+    parser.add_argument('--imagen-cada', type=int, default=0, help="Enviar una foto cada N eventos (0 = nunca)")
+    parser.add_argument('--chunked', action='store_true', help="Responder con Transfer-Encoding: chunked")
+    parser.add_argument('--cortar-cada', type=float, default=0, help="Cortar los streams cada N segundos (0 = nunca)")
+    parser.add_argument('--duracion-corte', type=float, default=5, help="Segundos que se rechazan las reconexiones")
+    parser.add_argument('--reproducir', metavar='ARCHIVO', help="Grabación (o captura cruda) a emitir en cada conexión")
+    parser.add_argument('--velocidad', type=float, default=1.0, help="1 = tiempo original, N = N veces más rápido, 0 = sin esperas")
+    parser.add_argument('--en-bucle', action='store_true', help="Repetir la grabación al terminar")
+    parser.add_argument('--prob-malformado', type=float, default=0.0)
+    parser.add_argument('--prob-401', type=float, default=0.0)
+    parser.add_argument('--prob-desconexion', type=float, default=0.0)
+    parser.add_argument('--latencia-puerta-ms', type=float, default=0.0, help="Latencia media de /api/abrir")
+    parser.add_argument('--prob-fallo-puerta', type=float, default=0.0)
+    parser.add_argument('--semilla', type=int, help="Semilla de las fallas inyectadas")
+    parser.add_argument('--grabar', metavar='ARCHIVO', help="Grabar el alertStream de --terminal en vez de simular")
+    parser.add_argument('--terminal', default=config.IP_BIO, help="host[:puerto] a grabar")
+    parser.add_argument('--duracion', type=float, default=0, help="Segundos a grabar (0 = hasta que se corte)")
+    args = parser.parse_args()
+    try:
+        if args.grabar:
+            print(f"⏺️  Grabando el alertStream de {args.terminal} en {args.grabar} (Ctrl+C para terminar)...", flush=True)
+            bloques, total = asyncio.run(grabar(args.grabar, args.terminal, args.usuario, args.clave, args.duracion))
+            print(f"✅ {bloques} bloques, {total / 1024:.0f} KB grabados.")
+        else:
+            asyncio.run(_principal(args))
+    except gateway_dispositivos.ErrorGateway as e:
+        print(f"❌ El terminal respondió {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,345 @@
+"""
+Suite de benchmarks de punta a punta con escenarios fijos y una línea base guardada.
+
+Sobre una BD con tráfico realista (benchmarks/datos_sinteticos.py: --docentes docentes
+durante --dias días, semilla fija) mide:
+  procesar_json   eventos/s de biometrico_driver.procesar_json (decodificar, clasificar,
+                  guardar y revisar el permiso de puerta, en serie)
+  guardar_log     inserciones/s de guardar_log directo y a través del escritor por lotes
+  api_logs        latencia p50/p95 de /api/logs (recientes, since_id, before_id, filtros)
+  admin           latencia p50/p95 de /admin
+  reporte         tiempo y pico de memoria del reporte matricial (Excel de un mes, CSV
+                  del año) y de GET /api/analitica del año
+  login           inicios de sesión por segundo con config.PASSWORD_METODO, en serie y
+                  con --hilos clientes a la vez
+
+Los resultados se comparan con benchmarks/linea_base.json. Una métrica empeora si
+cambia más de --tolerancia en su mala dirección (más tiempo o memoria, menos por
+segundo). La línea base solo es comparable en la misma máquina y con los mismos
+parámetros: regénerela con --guardar al cambiar de equipo.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.suite                       # compara con la línea base
+    python -m benchmarks.suite --guardar             # corre y guarda la línea base
+    python -m benchmarks.suite --solo reporte,login --tolerancia 0.15
+
+Sale con código 1 si alguna métrica empeora más de la tolerancia.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import config
+from benchmarks.bench_gateway import percentil
+from benchmarks.datos_sinteticos import crear_bd_realista
+
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base.json')
+INICIO = date(2025, 1, 1)
+CLAVE_ADMIN = 'istae123A*'  # La del admin que crea init_db
+CLAVE_DOCENTES = 'clave-suite'
+
+def metrica(valor, unidad, mejor):
+    """`mejor`: 'menor' (tiempo, memoria) o 'mayor' (por segundo)."""
+    return {'valor': round(valor, 4), 'unidad': unidad, 'mejor': mejor}
+
+@contextlib.contextmanager
+def silencio():
+    """Descarta los print de la app (un renglón por log guardado) mientras se mide."""
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        yield
+
+def latencias(cliente, urls, repeticiones):
+    """Milisegundos de cada GET (recorre `urls` `repeticiones` veces); falla ante un error HTTP."""
+    tiempos = []
+    for _ in range(repeticiones):
+        for url in urls:
+            t0 = time.perf_counter()
+            respuesta = cliente.get(url)
+            tiempos.append((time.perf_counter() - t0) * 1000)
+            if respuesta.status_code >= 400:
+                raise RuntimeError(f"GET {url} respondió {respuesta.status_code}")
+    tiempos.sort()
+    return tiempos
+
+def verificar_guardados(desde, esperados):
+    """guardar_log no propaga errores (solo los imprime): se confirma que las filas estén en la BD."""
+    conn = sqlite3.connect(config.DB_NAME)
+    guardados = conn.execute("SELECT COUNT(*) FROM logs WHERE fecha >= ?", (desde,)).fetchone()[0]
+    conn.close()
+    if guardados != esperados:
+        raise RuntimeError(f"Se esperaban {esperados} logs desde {desde} y hay {guardados}")
+
+def evento_json(uid, momento, serie, sub_evento=75):
+    return json.dumps({'AccessControllerEvent': {
+        'majorEventType': 5, 'subEventType': sub_evento, 'employeeNoString': uid,
+        'time': momento.strftime('%Y-%m-%dT%H:%M:%S-05:00'), 'serialNo': serie}})
+
+# --- Escenarios ---
+# Cada uno recibe el contexto (ver preparar) y devuelve {nombre: metrica(...)}.
+
+def escenario_procesar_json(ctx):
+    import biometrico_driver as bio
+
+    n = ctx['args'].eventos
+    momento = datetime.combine(ctx['fin'] + timedelta(days=1), datetime.min.time()) + timedelta(hours=7)
+    eventos = [evento_json(ctx['bio_ids'][i % len(ctx['bio_ids'])], momento + timedelta(seconds=i), i,
+                           39 if i % 20 == 0 else 75) for i in range(n)]
+    with silencio():
+        t0 = time.perf_counter()
+        for evento in eventos:
+            bio.procesar_json(evento)
+        segundos = time.perf_counter() - t0
+    verificar_guardados(momento.strftime('%Y-%m-%d'), n)
+    return {'eventos_por_s': metrica(n / segundos, 'eventos/s', 'mayor')}
+
+def escenario_guardar_log(ctx):
+    import biometrico_driver as bio
+
+    n = ctx['args'].eventos
+    momento = datetime.combine(ctx['fin'] + timedelta(days=2), datetime.min.time()) + timedelta(hours=7)
+    fechas = [(momento + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S') for i in range(n * 10)]
+    uids = ctx['bio_ids']
+    with silencio():
+        t0 = time.perf_counter()
+        for i in range(n):
+            bio.guardar_log(fechas[i], uids[i % len(uids)], "ASISTENCIA", "Huella")
+        directo = n / (time.perf_counter() - t0)
+
+        # Por lotes: diez veces más eventos, contando hasta que el último está en la BD
+        bio.iniciar_escritor_logs()
+        t0 = time.perf_counter()
+        for i in range(n, n * 10):
+            bio.guardar_log(fechas[i], uids[i % len(uids)], "ASISTENCIA", "Huella")
+        bio.detener_escritor_logs()
+        por_lotes = n * 9 / (time.perf_counter() - t0)
+    verificar_guardados(fechas[0], n * 10)
+    return {'directo_por_s': metrica(directo, 'logs/s', 'mayor'),
+            'por_lotes_por_s': metrica(por_lotes, 'logs/s', 'mayor')}
+
+def escenario_api_logs(ctx):
+    cliente = ctx['admin']
+    ultimo = ctx['ultimo_id']
+    uid = ctx['bio_ids'][0]
+    urls = ['/api/logs', f'/api/logs?since_id={ultimo - 50}', f'/api/logs?before_id={ultimo // 2}',
+            f'/api/logs?usuario_id={uid}', f'/api/logs?before_id={ultimo // 2}&usuario_id={uid}',
+            f'/api/logs?tipo_evento=FALLO%20INTENTO&fecha_inicio={INICIO}&fecha_fin={INICIO + timedelta(days=30)}',
+            '/api/logs?formato=compacto']
+    tiempos = latencias(cliente, urls, ctx['args'].repeticiones)
+    return {'p50_ms': metrica(percentil(tiempos, 0.5), 'ms', 'menor'),
+            'p95_ms': metrica(percentil(tiempos, 0.95), 'ms', 'menor')}
+
+def escenario_admin(ctx):
+    tiempos = latencias(ctx['admin'], ['/admin'], ctx['args'].repeticiones * 2)
+    return {'p50_ms': metrica(percentil(tiempos, 0.5), 'ms', 'menor'),
+            'p95_ms': metrica(percentil(tiempos, 0.95), 'ms', 'menor')}
+
+def escenario_reporte(ctx):
+    import reportes
+
+    conn = sqlite3.connect(config.DB_NAME)
+    conn.row_factory = sqlite3.Row
+    usuarios = conn.execute("SELECT * FROM usuarios WHERE rol='docente'").fetchall()
+    fin_mes = INICIO + timedelta(days=30)
+
+    def excel_mes(destino):
+        resumen = reportes.resumen_asistencia(conn, usuarios, INICIO, fin_mes)
+        reportes.escribir_excel_matricial(reportes.iterar_matriz_asistencia(conn, usuarios, INICIO, fin_mes),
+                                          INICIO, fin_mes, destino, resumen)
+
+    def csv_anio(destino):
+        filas = reportes.iterar_matriz_asistencia(conn, usuarios, INICIO, ctx['fin'])
+        for bloque in reportes.generar_csv_matricial(filas, INICIO, ctx['fin']):
+            destino.write(bloque.encode('utf-8'))
+
+    # Las importaciones (openpyxl, numpy) se pagan una vez por proceso: fuera de la medición
+    reportes.resumen_asistencia(conn, usuarios[:1], INICIO, INICIO)
+    import openpyxl  # noqa: F401
+
+    resultado = {}
+    try:
+        for nombre, generar in (('excel_mes', excel_mes), ('csv_anio', csv_anio)):
+            with tempfile.TemporaryFile() as destino:
+                t0 = time.perf_counter()
+                generar(destino)
+                resultado[f'{nombre}_s'] = metrica(time.perf_counter() - t0, 's', 'menor')
+            # El pico se mide en otra pasada: tracemalloc hace más lento el código que observa
+            with tempfile.TemporaryFile() as destino:
+                tracemalloc.start()
+                generar(destino)
+                pico = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+            resultado[f'{nombre}_pico_mb'] = metrica(pico, 'MB', 'menor')
+    finally:
+        conn.close()
+
+    tiempos = latencias(ctx['admin'], [f'/api/analitica?fecha_inicio={INICIO}&fecha_fin={ctx["fin"]}'], 3)
+    resultado['analitica_anio_s'] = metrica(percentil(tiempos, 0.5) / 1000, 's', 'menor')
+    return resultado
+
+def escenario_login(ctx):
+    n, hilos = ctx['args'].logins, ctx['args'].hilos
+    usuarios = [f"docente{b}" for b in ctx['bio_ids'][:n]]
+
+    def iniciar_sesiones(nombres):
+        cliente = ctx['flask'].test_client()
+        for nombre in nombres:
+            respuesta = cliente.post('/', data={'username': nombre, 'password': CLAVE_DOCENTES})
+            if respuesta.status_code != 302:
+                raise RuntimeError(f"El login de {nombre} respondió {respuesta.status_code}")
+            cliente.get('/logout')
+
+    t0 = time.perf_counter()
+    iniciar_sesiones(usuarios)
+    en_serie = n / (time.perf_counter() - t0)
+
+    errores = []
+    def hilo(nombres):
+        try:
+            iniciar_sesiones(nombres)
+        except Exception as e:
+            errores.append(e)
+    trabajadores = [threading.Thread(target=hilo, args=(usuarios[i::hilos],)) for i in range(hilos)]
+    t0 = time.perf_counter()
+    for t in trabajadores:
+        t.start()
+    for t in trabajadores:
+        t.join()
+    concurrente = n / (time.perf_counter() - t0)
+    if errores:
+        raise errores[0]
+    return {'en_serie_por_s': metrica(en_serie, 'logins/s', 'mayor'),
+            'concurrente_por_s': metrica(concurrente, 'logins/s', 'mayor')}
+
+ESCENARIOS = {
+    'procesar_json': escenario_procesar_json,
+    'guardar_log': escenario_guardar_log,
+    'api_logs': escenario_api_logs,
+    'admin': escenario_admin,
+    'reporte': escenario_reporte,
+    'login': escenario_login,
+}
+
+# --- Preparación y comparación ---
+def preparar(args, tmp):
+    """BD realista en `tmp`, admin y contraseñas conocidas, y la app con un cliente ya logueado como admin."""
+    from werkzeug.security import generate_password_hash
+
+    config.DB_NAME = os.path.join(tmp, 'suite.db')
+    t0 = time.perf_counter()
+    with silencio():
+        filas = crear_bd_realista(config.DB_NAME, args.docentes, INICIO, args.dias)
+    conn = sqlite3.connect(config.DB_NAME)
+    # Un solo hash para todos: generarlo es lento a propósito
+    conn.execute("UPDATE usuarios SET password = ?", (generate_password_hash(CLAVE_DOCENTES, method=config.PASSWORD_METODO),))
+    conn.commit()
+    bio_ids = [r[0] for r in conn.execute("SELECT biometric_id FROM usuarios WHERE rol = 'docente' ORDER BY id")]
+    ultimo_id = conn.execute("SELECT MAX(id) FROM logs").fetchone()[0]
+    conn.close()
+    print(f"BD: {args.docentes} docentes x {args.dias} días, {filas} filas en logs ({time.perf_counter() - t0:.1f} s)")
+
+    import app
+    with silencio():
+        app.bio.init_db()  # Crea el admin
+        flask_app = app.crear_app(dispositivos=False)
+    admin = flask_app.test_client()
+    if admin.post('/', data={'username': 'admin', 'password': CLAVE_ADMIN}).status_code != 302:
+        raise RuntimeError("No se pudo iniciar sesión como admin")
+    return {'args': args, 'flask': flask_app, 'admin': admin, 'bio_ids': bio_ids, 'ultimo_id': ultimo_id,
+            'fin': INICIO + timedelta(days=args.dias - 1)}
+
+def parametros(args):
+    return {'docentes': args.docentes, 'dias': args.dias, 'eventos': args.eventos, 'logins': args.logins,
+            'hilos': args.hilos, 'repeticiones': args.repeticiones, 'password_metodo': config.PASSWORD_METODO}
+
+def maquina():
+    return {'sistema': platform.platform(), 'python': platform.python_version(),
+            'procesador': platform.processor() or platform.machine(), 'cpus': os.cpu_count(),
+            'sqlite': sqlite3.sqlite_version}
+
+def comparar(actual, base, tolerancia):
+    """Imprime la comparación con la línea base y devuelve las métricas que empeoraron."""
+    peores = []
+    print(f"\n{'métrica':<32} {'base':>10} {'actual':>10} {'cambio':>8}")
+    for nombre, m in actual.items():
+        b = base.get(nombre)
+        if b is None or not b['valor']:
+            print(f"{nombre:<32} {'-':>10} {m['valor']:>10.4g} {'nueva':>8}")
+            continue
+        cambio = (m['valor'] - b['valor']) / b['valor']
+        empeora = cambio > tolerancia if m['mejor'] == 'menor' else cambio < -tolerancia
+        if empeora:
+            peores.append(nombre)
+        print(f"{nombre:<32} {b['valor']:>10.4g} {m['valor']:>10.4g} {cambio:>+7.0%} {'❌' if empeora else ''}")
+    return peores
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solo', help=f"Escenarios separados por comas ({', '.join(ESCENARIOS)})")
+    parser.add_argument('--docentes', type=int, default=300)
+    parser.add_argument('--dias', type=int, default=365)
+    parser.add_argument('--eventos', type=int, default=2000, help="Eventos de procesar_json y guardar_log")
+    parser.add_argument('--logins', type=int, default=24)
+    parser.add_argument('--hilos', type=int, default=4, help="Clientes a la vez en el escenario login")
+    parser.add_argument('--repeticiones', type=int, default=30, help="Vueltas de los escenarios de latencia")
+    parser.add_argument('--linea-base', default=LINEA_BASE)
+    parser.add_argument('--guardar', action='store_true', help="Guardar los resultados como línea base")
+    parser.add_argument('--tolerancia', type=float, default=0.25, help="Empeoramiento relativo aceptado (0.25 = 25 %%)")
+    args = parser.parse_args()
+
+    elegidos = args.solo.split(',') if args.solo else list(ESCENARIOS)
+    desconocidos = [e for e in elegidos if e not in ESCENARIOS]
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(desconocidos)}")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = preparar(args, tmp)
+        for nombre in elegidos:
+            t0 = time.perf_counter()
+            for metrica_nombre, m in ESCENARIOS[nombre](ctx).items():
+                resultados[f"{nombre}.{metrica_nombre}"] = m
+                print(f"  {nombre}.{metrica_nombre:<24} {m['valor']:>10.4g} {m['unidad']}")
+            print(f"✅ {nombre} ({time.perf_counter() - t0:.1f} s)")
+        import biometrico_driver
+        biometrico_driver.detener_escritor_logs()
+
+    if args.guardar:
+        anterior = {}
+        if os.path.exists(args.linea_base) and args.solo:
+            with open(args.linea_base, encoding='utf-8') as f:
+                anterior = json.load(f)['metricas']  # Con --solo se conservan los demás escenarios
+        with open(args.linea_base, 'w', encoding='utf-8') as f:
+            json.dump({'fecha': date.today().isoformat(), 'maquina': maquina(), 'parametros': parametros(args),
+                       'metricas': dict(anterior, **resultados)}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 Línea base guardada en {args.linea_base}")
+        return 0
+
+    if not os.path.exists(args.linea_base):
+        print(f"⚠️ No hay línea base en {args.linea_base}: ejecute con --guardar para crearla.")
+        return 0
+    with open(args.linea_base, encoding='utf-8') as f:
+        base = json.load(f)
+    if base['parametros'] != parametros(args):
+        print(f"⚠️ La línea base usó otros parámetros ({base['parametros']}): la comparación es orientativa.")
+    if base['maquina'] != maquina():
+        print(f"⚠️ La línea base es de otra máquina ({base['maquina']['procesador']}, "
+              f"{base['maquina']['cpus']} CPU): la comparación es orientativa.")
+    peores = comparar(resultados, base['metricas'], args.tolerancia)
+    if peores:
+        print(f"❌ Empeoraron más de {args.tolerancia:.0%}: {', '.join(peores)}")
+        return 1
+    print(f"✅ Ninguna métrica empeoró más de {args.tolerancia:.0%} respecto a la línea base del {base['fecha']}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
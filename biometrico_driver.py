@@ -1,5 +1,6 @@
-import requests
-from requests.auth import HTTPDigestAuth
+import asyncio
+import atexit
+import threading
 import json
 import sqlite3
 import time
@@ -8,13 +9,24 @@ from werkzeug.security import generate_password_hash
 
 # --- CONFIGURACIÓN (Importada) ---
 import config
+import bus_eventos
+import cambios_bd
+import directorio_usuarios
+import escritor_logs
+import gateway_dispositivos
+import metricas
+import migraciones
+import pipeline_eventos
+import pool_db
+import recuperacion_eventos
 
 # --- BASE DE DATOS ---
-def get_db_connection():
-    """Establece conexión con la base de datos."""
-    conn = sqlite3.connect(config.DB_NAME, check_same_thread=False)
-    conn.row_factory = sqlite3.Row 
-    return conn
+def get_db_connection(solo_lectura=False):
+    """
+    Presta una conexión del pool (WAL, PRAGMAs ajustados). `conn.close()` la devuelve al pool.
+    Con solo_lectura=True se usa el pool de lectura, que no compite con el escritor de eventos.
+    """
+    return pool_db.obtener_pool(config.DB_NAME, solo_lectura).adquirir()
 
 def init_db():
     """Inicializa la base de datos y crea las tablas si no existen."""
@@ -41,13 +53,15 @@ def init_db():
             origen TEXT
         )
     ''')
+    # Índices y cambios de esquema versionados (PRAGMA user_version)
+    migraciones.aplicar_migraciones(conn)
     
     # Crear admin por defecto si no existe
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM usuarios WHERE username = 'admin'")
     if cursor.fetchone() is None:
         # ¡IMPORTANTE! Se guarda la contraseña hasheada, no en texto plano.
-        hashed_password = generate_password_hash('istae123A*', method='pbkdf2:sha256')
+        hashed_password = generate_password_hash('istae123A*', method=config.PASSWORD_METODO)
         try:
             conn.execute("INSERT INTO usuarios (biometric_id, nombre, username, password, rol, acceso_puerta) VALUES (?, ?, ?, ?, ?, ?)", 
                          ('999', 'Admin Principal', 'admin', hashed_password, 'admin', 1))
@@ -56,53 +70,145 @@ def init_db():
         except sqlite3.IntegrityError:
             # Esto podría pasar en un caso raro de concurrencia
             pass
+    # Los eventos con id mayor que este se publican en el bus a medida que se guardan
+    bus.fijar_punto_partida(conn.execute("SELECT MAX(id) FROM logs").fetchone()[0])
     conn.close()
+    # La primera huella ya no espera a leer la tabla de usuarios
+    directorio.invalidar()
+    directorio.cargar()
+
+# --- DIRECTORIO DE USUARIOS (caché de id / biometric_id -> usuario) ---
+directorio = directorio_usuarios.DirectorioUsuarios()
+
+# --- BUS DE EVENTOS (canal en vivo del dashboard) ---
+bus = bus_eventos.BusEventos()
+
+CONSULTA_LOGS = ("SELECT l.id, l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen "
+                 "FROM logs l LEFT JOIN usuarios u ON l.usuario_id = u.biometric_id")
+
+def _publicar_logs(filas):
+    """Publica en el bus las filas recién guardadas [(id, fecha, uid, evento, origen), ...]."""
+    if observador.activo:
+        # El observador las lee en orden de id junto con las de otros procesos
+        observador.avisar()
+        return
+    nombres = directorio.nombres({f[2] for f in filas})
+    bus.publicar([
+        {'id': id_log, 'fecha': fecha, 'usuario_id': uid, 'nombre': nombres.get(uid), 'tipo_evento': evento, 'origen': origen}
+        for id_log, fecha, uid, evento, origen in filas
+    ])
+
+def logs_posteriores(ultimo_id, limite):
+    """Lee de la BD los logs con id > ultimo_id (para ponerse al día cuando el bus no los tiene)."""
+    conn = get_db_connection(solo_lectura=True)
+    filas = [dict(row) for row in conn.execute(f"{CONSULTA_LOGS} WHERE l.id > ? ORDER BY l.id LIMIT ?", (ultimo_id, limite)).fetchall()]
+    conn.close()
+    return filas
+
+# --- CAMBIOS DE OTROS PROCESOS (ver cambios_bd.py) ---
+_version_usuarios = None
+
+def _sincronizar(conn):
+    """Invalida el directorio si cambió `usuarios` y publica en el bus los logs nuevos, de cualquier proceso."""
+    global _version_usuarios
+    version = conn.execute("SELECT valor FROM versiones WHERE clave = 'usuarios'").fetchone()
+    if version is not None and version[0] != _version_usuarios:
+        if _version_usuarios is not None:
+            directorio.invalidar()
+        _version_usuarios = version[0]
+    while True:
+        filas = [dict(row) for row in conn.execute(f"{CONSULTA_LOGS} WHERE l.id > ? ORDER BY l.id LIMIT ?",
+                                                   (bus.ultimo_id, config.SSE_HISTORIAL))]
+        bus.publicar(filas)
+        if len(filas) < config.SSE_HISTORIAL:
+            return
+
+observador = cambios_bd.ObservadorCambios(_sincronizar)
+
+def iniciar_sincronizacion():
+    """Arranca el observador de cambios; desde entonces el bus se alimenta solo desde la BD."""
+    observador.iniciar()
+
+# --- ESCRITOR DE LOGS POR LOTES ---
+_escritor = None
+
+def iniciar_escritor_logs():
+    """Arranca el escritor por lotes; desde entonces guardar_log solo encola los eventos."""
+    global _escritor
+    if _escritor is None:
+        atexit.register(detener_escritor_logs)
+    if _escritor is None or not _escritor.activo:
+        _escritor = escritor_logs.EscritorLogs(al_confirmar=_publicar_logs)
+        _escritor.iniciar()
+
+def detener_escritor_logs():
+    """Escribe los eventos pendientes y detiene el escritor."""
+    if _escritor is not None:
+        _escritor.detener()
 
 # --- FUNCIONES LÓGICAS ---
-def guardar_log(fecha, uid, evento, origen):
-    """Guarda un evento en la tabla de logs."""
+def guardar_log(fecha, uid, evento, origen, dispositivo_id=None, serial_no=None):
+    """
+    Guarda un evento en la tabla de logs (vía el escritor por lotes si está activo).
+    Los eventos de un terminal llevan su id y número de serie: si ya estaban guardados se ignoran.
+    """
     try:
         if fecha == "Ahora": 
             fecha = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        if _escritor is not None and _escritor.activo:
+            _escritor.encolar(fecha, uid, evento, origen, dispositivo_id, serial_no)
+            return
         
         conn = get_db_connection()
-        conn.execute("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen) VALUES (?, ?, ?, ?)", (fecha, uid, evento, origen))
-        conn.commit()
+        with pool_db.transaccion_escritura(conn, 'directo'):
+            insertadas = escritor_logs.insertar_logs(
+                conn, [escritor_logs.fila_log(fecha, uid, evento, origen, dispositivo_id, serial_no)])
         conn.close()
-        print(f"✅ LOG GUARDADO: {uid} | {evento} ({origen})")
+        if insertadas:
+            print(f"✅ LOG GUARDADO: {uid} | {evento} ({origen})")
+            _publicar_logs(insertadas)
     except Exception as e:
         print(f"❌ Error guardando log: {e}")
 
-def abrir_puerta_fisica():
+# --- PUERTAS (NodeMCU) ---
+# Un controlador de larga vida por puerta: la de config.IP_NODE (apertura desde la web)
+# y las de la tabla dispositivos asociadas a cada terminal.
+_puertas = {}
+_puertas_lock = threading.Lock()
+
+def obtener_controlador_puerta(puerta=None):
+    """
+    Controlador de la puerta (conexión, DNS y hilo propios), creado al primer uso.
+    `puerta` es un dict de la tabla dispositivos (id, host, token); None = config.IP_NODE.
+    """
+    # Importado al primer uso: trae `requests`, que la app web no necesita para arrancar
+    import controlador_puerta
+
+    clave = puerta['id'] if puerta else None
+    with _puertas_lock:
+        if clave not in _puertas:
+            if puerta:
+                _puertas[clave] = controlador_puerta.ControladorPuerta(host=puerta['host'], token=puerta['token'])
+            else:
+                _puertas[clave] = controlador_puerta.ControladorPuerta()
+        return _puertas[clave]
+
+def abrir_puerta_fisica(origen="", esperar=True, puerta=None):
     """
     Envía la señal al NodeMCU para abrir la puerta.
-    Utiliza una Sesión para garantizar que la conexión se cierre correctamente.
+    Con esperar=False vuelve de inmediato y devuelve el Future del comando; si no,
+    espera la respuesta y devuelve True/False.
     """
-    url = f"http://{config.IP_NODE}/api/abrir?token={config.TOKEN_NODE}"
-    try:
-        with requests.Session() as s:
-            # Timeout: 2s para conectar, 3s para recibir respuesta
-            r = s.get(url, timeout=(2, 3))
-        
-        if r.status_code == 200:
-            print("🔓 PUERTA ABIERTA (Vía NodeMCU)")
-            return True
-        else:
-            print(f"⚠️ NodeMCU respondió con error: {r.status_code} - {r.text}")
-            return False
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Error de conexión con NodeMCU ({config.IP_NODE}): {e}")
-        return False
-    except Exception as e:
-        print(f"⚠️ Ocurrió un error inesperado en abrir_puerta_fisica: {e}")
-        return False
+    futuro = obtener_controlador_puerta(puerta).abrir(origen)
+    return futuro.result() if esperar else futuro
 
 def abrir_puerta_remota(solicitante):
     """
     Lógica para abrir la puerta desde la App Web (Admin o Docente).
     Registra el log y después intenta abrir la puerta.
     """
-    if abrir_puerta_fisica():
+    if abrir_puerta_fisica(solicitante):
         # Solo si la puerta abrió correctamente, se guarda el log
         guardar_log("Ahora", solicitante, "APERTURA WEB", "Panel Web")
         return True, "Puerta Abierta Correctamente"
@@ -110,94 +216,241 @@ def abrir_puerta_remota(solicitante):
         return False, "Error: No se pudo conectar con el módulo de puerta (NodeMCU)"
 
 # --- PROCESAMIENTO INTELIGENTE DE EVENTOS DEL BIOMÉTRICO ---
-def verificar_permiso_y_abrir(biometric_id):
+EVENTO_A_RELE = metricas.histograma(
+    'evento_a_rele_segundos', "Desde que llega la marca del terminal hasta que el NodeMCU confirma la apertura.")
+
+def _observar_evento_a_rele(recibido):
+    def al_terminar(futuro):
+        if not futuro.cancelled() and futuro.exception() is None and futuro.result():
+            EVENTO_A_RELE.observar(time.perf_counter() - recibido)
+    return al_terminar
+
+def verificar_permiso_y_abrir(biometric_id, terminal=None, recibido=None):
     """
-    Busca al usuario en la BD por su ID biométrico. 
-    Si tiene `acceso_puerta = 1`, manda la señal para abrir el NodeMCU.
+    Busca al usuario por su ID biométrico en el directorio en memoria (sin ir a la BD).
+    Si tiene `acceso_puerta = 1`, manda la señal para abrir el NodeMCU: la puerta
+    asociada al terminal, o la de config.IP_NODE si no se indica terminal.
+    `recibido` (time.perf_counter() de la llegada del evento) mide la latencia hasta el relé.
     """
-    conn = get_db_connection()
-    user = conn.execute("SELECT acceso_puerta, nombre FROM usuarios WHERE biometric_id = ?", (biometric_id,)).fetchone()
-    conn.close()
+    user = directorio.por_biometric_id(biometric_id)
 
     if user:
         if user['acceso_puerta'] == 1:
+            if terminal is not None and terminal.get('puerta') is None:
+                print(f"ℹ️  Usuario '{user['nombre']}' marcó en '{terminal['nombre']}', que no tiene puerta asociada.")
+                return
             print(f"ℹ️  Usuario '{user['nombre']}' tiene permiso. Abriendo puerta...")
-            abrir_puerta_fisica()
+            # No bloquea: el gateway sigue leyendo eventos mientras se envía el comando
+            futuro = abrir_puerta_fisica(f"Huella: {biometric_id}", esperar=False,
+                                         puerta=terminal['puerta'] if terminal else None)
+            if recibido is not None:
+                futuro.add_done_callback(_observar_evento_a_rele(recibido))
         else:
             print(f"ℹ️  Usuario '{user['nombre']}' marcó asistencia, pero no tiene permiso de puerta.")
     else:
         print(f"⚠️ ID Biométrico desconocido '{biometric_id}' marcó asistencia.")
 
-def procesar_json(json_raw):
+def decodificar_evento(json_raw):
+    """JSON del biométrico -> dict del AccessControllerEvent (None si es otro tipo de evento)."""
+    evt = json.loads(json_raw).get('AccessControllerEvent')
+    return evt if isinstance(evt, dict) else None
+
+def clasificar_evento(evt):
     """
-    Decodifica el JSON del biométrico y actúa según el tipo de evento.
+    Decide qué hacer con un AccessControllerEvent. Devuelve (fecha, uid, tipo_evento, origen, abre_puerta)
+    o None si el evento no se registra.
     """
-    try:
-        data = json.loads(json_raw)
-        evt = data.get('AccessControllerEvent', {})
-        major_evt = evt.get('majorEventType', 0)
-        sub_evt = evt.get('subEventType', 0)
-        
-        # Evento principal 5 = Evento de control de acceso
-        if major_evt == 5:
-            uid = evt.get('employeeNoString', 'Desconocido')
-            fecha_raw = evt.get('time', '')
-            fecha = fecha_raw.split('+')[0].replace('T', ' ') if fecha_raw else "Ahora"
-            
-            # Sub-evento de verificación válida (ej. huella correcta)
-            if sub_evt in [1, 38, 75]:
-                guardar_log(fecha, uid, "ASISTENCIA", "Huella")
-                verificar_permiso_y_abrir(uid)
-            # Sub-evento de fallo (ej. huella incorrecta)
-            elif sub_evt == 39: 
-                guardar_log("Ahora", uid, "FALLO INTENTO", "Huella")
+    # Evento principal 5 = Evento de control de acceso
+    if evt.get('majorEventType', 0) != 5:
+        return None
+    sub_evt = evt.get('subEventType', 0)
+    uid = evt.get('employeeNoString', 'Desconocido')
+    fecha_raw = evt.get('time', '')
+    # 'YYYY-MM-DD HH:MM:SS' sin zona horaria (+hh:mm o -hh:mm), ordenable como texto
+    fecha = fecha_raw[:19].replace('T', ' ') if fecha_raw else "Ahora"
+
+    # Sub-evento de verificación válida (ej. huella correcta)
+    if sub_evt in [1, 38, 75]:
+        return fecha, uid, "ASISTENCIA", "Huella", True
+    # Sub-evento de fallo (ej. huella incorrecta). Con la hora del terminal, igual que la
+    # asistencia, para que el mismo evento recuperado tras un corte no se guarde dos veces
+    if sub_evt == 39:
+        return fecha, uid, "FALLO INTENTO", "Huella", False
+    return None
+
+def clave_evento(evt, terminal=None):
+    """Identidad de un evento para descartar los que el terminal reenvía tras reconectar."""
+    return (terminal['id'] if terminal else None, evt.get('employeeNoString'), evt.get('time'), evt.get('serialNo'))
 
+def _origen_dispositivo(evt, terminal):
+    """(dispositivo_id, serial_no) del evento para logs; sin terminal, el evento no se deduplica en la BD."""
+    if terminal is None or evt.get('serialNo') is None:
+        return None, None
+    return terminal['id'], evt['serialNo']
+
+def procesar_json(json_raw, terminal=None):
+    """
+    Decodifica el JSON del biométrico y actúa según el tipo de evento, todo en serie
+    en el hilo que llama. El gateway usa en su lugar el pipeline por etapas.
+    `terminal` es el dispositivo del que vino el evento (ver gateway_dispositivos).
+    """
+    recibido = time.perf_counter()
+    try:
+        evt = decodificar_evento(json_raw)
+        clasificado = clasificar_evento(evt) if evt is not None else None
+        if clasificado:
+            fecha, uid, tipo_evento, origen, abre_puerta = clasificado
+            guardar_log(fecha, uid, tipo_evento, origen, *_origen_dispositivo(evt, terminal))
+            if abre_puerta:
+                verificar_permiso_y_abrir(uid, terminal, recibido)
     except Exception as e:
         print(f"❌ Error procesando JSON: {e}\nRaw: {json_raw}")
 
+# --- PIPELINE DE EVENTOS ---
+# gateway (separa eventos del stream) -> decodificación -> clasificación y deduplicación
+#   -> persistencia (escritor por lotes) y, si corresponde, acción (permiso + puerta)
+# Cada item lleva el time.perf_counter() de llegada al gateway, para medir la latencia hasta el relé.
+_pipeline = None
+_deduplicador = None
+
+def _etapa_decodificar(item, emitir):
+    terminal, json_raw, recibido = item
+    evt = decodificar_evento(json_raw)
+    if evt is None:
+        return False
+    emitir('clasificacion', (terminal, evt, recibido))
+
+def _etapa_clasificar(item, emitir):
+    terminal, evt, recibido = item
+    clasificado = clasificar_evento(evt)
+    if clasificado is None or _deduplicador.visto(clave_evento(evt, terminal)):
+        return False
+    fecha, uid, tipo_evento, origen, abre_puerta = clasificado
+    emitir('persistencia', (fecha, uid, tipo_evento, origen) + _origen_dispositivo(evt, terminal))
+    if abre_puerta:
+        emitir('accion', (uid, terminal, recibido))
+
+def _etapa_persistir(item, emitir):
+    guardar_log(*item)
+
+def _etapa_accionar(item, emitir):
+    verificar_permiso_y_abrir(*item)
+
+def iniciar_pipeline():
+    """Arranca (una sola vez) el pipeline de eventos y lo devuelve."""
+    global _pipeline, _deduplicador
+    if _pipeline is None:
+        _deduplicador = pipeline_eventos.Deduplicador()
+        _pipeline = pipeline_eventos.PipelineEventos([
+            # Un solo hilo hasta la persistencia: los eventos llegan a la deduplicación y a logs
+            # en el orden del stream (con dos decodificadores, uno podía adelantar al otro)
+            pipeline_eventos.Etapa('decodificacion', _etapa_decodificar, 1),
+            pipeline_eventos.Etapa('clasificacion', _etapa_clasificar, 1),
+            pipeline_eventos.Etapa('persistencia', _etapa_persistir, 1),
+            pipeline_eventos.Etapa('accion', _etapa_accionar, config.PIPELINE_HILOS_ACCION),
+        ])
+        atexit.register(_pipeline.detener)
+    _pipeline.iniciar()
+    return _pipeline
+
+def estado_pipeline():
+    """Eventos por segundo, profundidad de cola y contadores de cada etapa."""
+    if _pipeline is None:
+        return {}
+    estado = _pipeline.estadisticas()
+    estado['clasificacion']['duplicados'] = _deduplicador.duplicados
+    return estado
+
+# --- RECUPERACIÓN DE EVENTOS TRAS UN CORTE ---
+def _guardar_recuperados(terminal, eventos):
+    """
+    Inserta en una transacción los eventos de una página de la búsqueda del terminal
+    (sin abrir la puerta: ya pasaron). Devuelve cuántos no estaban guardados.
+    """
+    filas = []
+    for evt in eventos:
+        clasificado = clasificar_evento(evt)
+        if clasificado is None:
+            continue
+        fecha, uid, tipo_evento, origen, _ = clasificado
+        if fecha == "Ahora":
+            continue  # Sin hora no se puede ubicar ni deduplicar
+        filas.append(escritor_logs.fila_log(fecha, uid, tipo_evento, origen, *_origen_dispositivo(evt, terminal)))
+    if not filas:
+        return 0
+    conn = get_db_connection()
+    try:
+        with pool_db.transaccion_escritura(conn, 'recuperacion'):
+            insertadas = escritor_logs.insertar_logs(conn, filas)
+    finally:
+        conn.close()
+    _publicar_logs(insertadas)
+    return len(insertadas)
+
+def _cursor_recuperacion(terminal):
+    conn = get_db_connection(solo_lectura=True)
+    try:
+        return recuperacion_eventos.cursor(conn, terminal['id'])
+    finally:
+        conn.close()
+
+async def recuperar_eventos_terminal(terminal):
+    """Al (re)conectar un terminal, trae de su historial los eventos posteriores al último guardado."""
+    desde = await asyncio.to_thread(_cursor_recuperacion, terminal)
+    return await recuperacion_eventos.recuperar(
+        terminal, desde, lambda eventos: asyncio.to_thread(_guardar_recuperados, terminal, eventos))
+
 # --- MONITOR EN SEGUNDO PLANO ---
+_gateway = None
+
 def iniciar_escucha_background():
     """
-    Se conecta al stream de eventos del biométrico y lo escucha indefinidamente.
+    Escucha indefinidamente los streams de eventos de todos los terminales activos de
+    la tabla dispositivos, con un event loop asyncio (una tarea por terminal), y pasa
+    cada evento al pipeline por etapas. Tras cada (re)conexión recupera del terminal
+    los eventos ocurridos durante el corte.
     Se ejecuta en un hilo separado para no bloquear la app web.
     """
-    print(f"📡 ESCUCHANDO BIOMÉTRICO ({config.IP_BIO})...")
-    while True:
-        try:
-            auth = HTTPDigestAuth(config.USER_BIO, config.PASS_BIO)
-            with requests.get(config.URL_STREAM_BIO, auth=auth, stream=True, timeout=90) as r:
-                
-                if r.status_code == 200:
-                    print("✅ Conexión al stream de eventos establecida.")
-                    buffer = ""; llaves = 0; capturando = False
-                    
-                    for chunk in r.iter_content(chunk_size=256): # Aumentado chunk_size para eficiencia
-                        if chunk:
-                            char_chunk = chunk.decode('utf-8', errors='ignore')
-                            for char in char_chunk:
-                                if char == '{':
-                                    if not capturando: 
-                                        capturando = True
-                                        buffer = ""
-                                    llaves += 1
-                                
-                                if capturando:
-                                    buffer += char
-                                    if char == '}':
-                                        llaves -= 1
-                                        if llaves == 0:
-                                            procesar_json(buffer)
-                                            capturando = False
-                elif r.status_code == 401:
-                    print("❌ Error de autenticación (401) con el biométrico. Revisa USER_BIO y PASS_BIO en config.py.")
-                    time.sleep(30) # Espera más tiempo si la autenticación falla
-                else:
-                    print(f"⚠️ Stream desconectado (Código: {r.status_code}). Reconectando en 10 segundos...")
-                    time.sleep(10)
-
-        except requests.exceptions.ConnectionError as e:
-            print(f"❌ Error de conexión con el biométrico ({config.IP_BIO}). Revisa la IP y la red. Reintentando en 15s... Error: {e}")
-            time.sleep(15)
-        except Exception as e:
-            print(f"❌ Error inesperado en el hilo de escucha: {e}. Reconectando en 15s...")
-            time.sleep(15)
\ No newline at end of file
+    global _gateway
+    conn = get_db_connection(solo_lectura=True)
+    terminales = gateway_dispositivos.cargar_terminales(conn)
+    conn.close()
+
+    pipeline = iniciar_pipeline()
+    print(f"📡 ESCUCHANDO {len(terminales)} TERMINAL(ES): {', '.join(t['nombre'] for t in terminales)}")
+    _gateway = gateway_dispositivos.GatewayDispositivos(
+        terminales, al_evento=lambda terminal, evento: pipeline.recibir_async((terminal, evento, time.perf_counter())),
+        al_conectar=recuperar_eventos_terminal)
+    asyncio.run(_gateway.ejecutar())
+
+# --- MÉTRICAS LEÍDAS AL EXPONER /metrics ---
+def _por_etapa(campo):
+    return lambda: {(nombre,): e[campo] for nombre, e in estado_pipeline().items()}
+
+metricas.callback('pipeline_procesados_total', "Items procesados por cada etapa del pipeline de eventos.",
+                  'counter', _por_etapa('procesados'), ('etapa',))
+metricas.callback('pipeline_descartados_total', "Items descartados por cada etapa (otro tipo de evento, duplicado).",
+                  'counter', _por_etapa('descartados'), ('etapa',))
+metricas.callback('pipeline_errores_total', "Items que fallaron en cada etapa.",
+                  'counter', _por_etapa('errores'), ('etapa',))
+metricas.callback('pipeline_en_cola', "Items esperando en la cola de cada etapa.",
+                  'gauge', _por_etapa('en_cola'), ('etapa',))
+metricas.callback('gateway_terminales_conectados', "Terminales con el alertStream abierto.", 'gauge',
+                  lambda: sum(1 for e in estado_terminales() if e['conectado']) if _gateway is not None else None)
+metricas.callback('directorio_consultas_total', "Búsquedas en el directorio de usuarios en memoria, por resultado.",
+                  'counter', lambda: {('acierto',): directorio.aciertos, ('fallo',): directorio.fallos}, ('resultado',))
+
+def iniciar_escucha_en_hilo():
+    """Arranca iniciar_escucha_background() en un hilo daemon y lo devuelve."""
+    hilo = threading.Thread(target=iniciar_escucha_background, name="gateway-dispositivos", daemon=True)
+    hilo.start()
+    return hilo
+
+def estado_puertas():
+    """Estadísticas de cada controlador de puerta creado, por host."""
+    with _puertas_lock:
+        return {c.host: c.estadisticas() for c in _puertas.values()}
+
+def estado_terminales():
+    """Estado de conexión y contadores de cada terminal (vacío si el gateway no arrancó)."""
+    return list(_gateway.estado.values()) if _gateway is not None else []
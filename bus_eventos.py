@@ -0,0 +1,65 @@
+import threading
+from collections import deque
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- BUS DE EVENTOS EN MEMORIA ---
+# guardar_log publica aquí cada fila apenas se confirma en la BD y los suscriptores
+# (el canal SSE del dashboard) esperan en una Condition: mientras no haya eventos
+# nuevos no se hace ningún trabajo ni consulta. Se guardan los últimos
+# SSE_HISTORIAL eventos para reanudar con Last-Event-ID sin ir a la BD.
+
+class BusEventos:
+    def __init__(self, capacidad=None):
+        self.capacidad = capacidad or config.SSE_HISTORIAL
+        self._cond = threading.Condition()
+        self._eventos = deque()
+        self._ultimo_id = 0
+        # Todo evento con id mayor que este está en memoria (None = aún no se sabe)
+        self._cubierto_desde = None
+
+    @property
+    def ultimo_id(self):
+        return self._ultimo_id
+
+    def fijar_punto_partida(self, max_id):
+        """Indica el último id que ya estaba en la BD antes de empezar a publicar."""
+        with self._cond:
+            if self._cubierto_desde is None:
+                self._cubierto_desde = max_id or 0
+                self._ultimo_id = max(self._ultimo_id, self._cubierto_desde)
+
+    def publicar(self, eventos):
+        """Agrega eventos (dicts con 'id' creciente) y despierta a los suscriptores."""
+        if not eventos:
+            return
+        with self._cond:
+            for evento in eventos:
+                if len(self._eventos) >= self.capacidad:
+                    descartado = self._eventos.popleft()
+                    if self._cubierto_desde is not None:
+                        self._cubierto_desde = max(self._cubierto_desde, descartado['id'])
+                self._eventos.append(evento)
+                self._ultimo_id = max(self._ultimo_id, evento['id'])
+            self._cond.notify_all()
+
+    def desde(self, ultimo_id):
+        """
+        Devuelve (eventos con id > ultimo_id, completo). Si completo es False, puede haber
+        eventos más antiguos que ya no están en memoria y hay que leerlos de la BD.
+        """
+        with self._cond:
+            return self._desde(ultimo_id)
+
+    def _desde(self, ultimo_id):
+        completo = self._cubierto_desde is not None and ultimo_id >= self._cubierto_desde
+        if ultimo_id >= self._ultimo_id:
+            return [], completo
+        return [e for e in self._eventos if e['id'] > ultimo_id], completo
+
+    def esperar(self, ultimo_id, timeout):
+        """Bloquea hasta que haya eventos con id > ultimo_id o pase el timeout; devuelve como desde()."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._ultimo_id > ultimo_id, timeout)
+            return self._desde(ultimo_id)
@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- CAMBIOS DE LA BD HECHOS POR OTROS PROCESOS ---
+# Con varios procesos (ver servidor.py), los logs los guarda el proceso de ingesta y
+# los usuarios se editan desde cualquier proceso web, pero el bus del monitor en vivo
+# y el directorio de usuarios viven en la memoria de cada proceso. Un hilo por proceso
+# consulta `PRAGMA data_version` en una conexión propia: el número cambia solo cuando
+# otra conexión (de este u otro proceso) confirma una escritura, y leerlo no toca
+# ninguna tabla. Cuando cambia se llama a `al_cambiar(conn)`, que lee solo lo nuevo.
+# avisar() evita esperar al siguiente sondeo cuando el cambio lo hizo este proceso.
+
+class ObservadorCambios:
+    def __init__(self, al_cambiar, ruta_db=None, intervalo=None):
+        self.al_cambiar = al_cambiar
+        self.ruta_db = ruta_db  # None: config.DB_NAME al iniciar
+        self.intervalo = intervalo or config.PROCESOS_SONDEO
+        self._aviso = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.cambios = 0
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def avisar(self):
+        """Despierta al hilo para que lea los cambios ya confirmados sin esperar el sondeo."""
+        self._aviso.set()
+
+    def _bucle(self):
+        conn = sqlite3.connect(self.ruta_db or config.DB_NAME, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.row_factory = sqlite3.Row
+        try:
+            version = None
+            while not self._detener.is_set():
+                avisado = self._aviso.wait(self.intervalo)
+                self._aviso.clear()
+                try:
+                    actual = conn.execute("PRAGMA data_version").fetchone()[0]
+                    if actual != version or avisado:
+                        version = actual
+                        self.cambios += 1
+                        self.al_cambiar(conn)
+                except Exception as e:
+                    print(f"⚠️ Error leyendo cambios de la BD: {e}")
+        finally:
+            conn.close()
+
+    def iniciar(self):
+        if not self.activo:
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name="observador-cambios", daemon=True)
+            self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        self._aviso.set()
@@ -4,9 +4,74 @@
 # Puedes generar una con: python -c 'import secrets; print(secrets.token_hex(16))'
 SECRET_KEY = 'tesis_secreta'
 
+# --- Contraseñas e inicio de sesión (ver seguridad.py) ---
+# Método de generate_password_hash de Werkzeug. Los hashes con otro método se regeneran
+# al iniciar sesión. Más costo = más seguro y más CPU por login (scrypt:32768:8:1 ≈ 0,1 s).
+PASSWORD_METODO = 'scrypt:32768:8:1'
+PASSWORD_HILOS = 2           # Hashes calculados a la vez por proceso web
+PASSWORD_COLA = 32           # Hashes en espera antes de responder 503 "ocupado"
+PASSWORD_TIMEOUT = 10        # Segundos máximos de espera de un hash
+LOGIN_VENTANA = 300          # Segundos de la ventana de intentos fallidos
+LOGIN_FALLOS_POR_USUARIO = 5 # Fallos por usuario en la ventana antes de bloquearlo
+LOGIN_FALLOS_POR_IP = 30     # Fallos por IP en la ventana (cualquier usuario)
+
 # --- Base de Datos ---
 DB_NAME = "sistema_tesis.db"
 
+# Pool de conexiones (ver pool_db.py). Las conexiones de lectura no bloquean al escritor (modo WAL).
+DB_POOL_LECTURA = 8          # Conexiones simultáneas de solo lectura
+DB_POOL_ESCRITURA = 4        # Conexiones simultáneas de escritura
+DB_POOL_TIMEOUT = 10         # Segundos de espera por una conexión libre antes de fallar
+DB_BUSY_TIMEOUT_MS = 5000    # Espera ante un bloqueo de SQLite antes de dar "database is locked"
+DB_MMAP_SIZE = 256 * 1024 * 1024  # Bytes del archivo leídos vía mmap
+DB_CACHE_SENTENCIAS = 256    # Sentencias preparadas en caché por conexión
+
+# Archivo mensual de logs (ver archivo_logs.py). Los meses cerrados se mueven a archivo/logs_YYYY-MM.db.
+ARCHIVO_DIR = None           # None: carpeta "archivo" junto a la BD
+ARCHIVO_MESES_ACTIVOS = 3    # Meses completos que quedan en `logs` además del mes en curso
+ARCHIVO_HORA = 3             # Hora del día (0-23) del archivado y la compactación diarios
+COMPACTAR_PAGINAS_POR_PASO = 1000  # Páginas devueltas al disco por transacción de incremental_vacuum
+COMPACTAR_PAUSA = 0.05       # Segundos entre pasos, para dejar escribir al escritor de logs
+
+# Horario general (ver horarios.py): se usa mientras la tabla `horarios` no tenga turnos
+# generales. Los docentes con turnos propios (vespertinos, fines de semana, medio tiempo) usan los suyos.
+HORARIO_ENTRADA_MANANA = '07:30'  # Entrada de la jornada de la mañana ('HH:MM'; None = sin jornada)
+HORARIO_SALIDA_MANANA = '12:30'
+HORARIO_ENTRADA_TARDE = '14:00'   # Entrada de la jornada de la tarde ('HH:MM'; None = sin jornada)
+HORARIO_SALIDA_TARDE = '18:00'
+HORARIO_DIAS_LABORABLES = (0, 1, 2, 3, 4)  # Lunes=0 ... Domingo=6
+HORARIO_MARGEN_ENTRADA_MIN = 10   # Marcas hasta N min antes de la entrada de la tarde ya cuentan en ella (13:50)
+HORARIO_TOLERANCIA_MIN = 10       # Minutos de gracia antes de contar un atraso (analitica_asistencia.py)
+ANALITICA_MAX_DIAS = 731     # Rango máximo de GET /api/analitica
+
+# Reportes en segundo plano (ver trabajos_reporte.py). Los archivos generados quedan en caché
+# en reportes_cache/ junto a la BD hasta que llega una marca nueva en su rango de fechas.
+REPORTES_CACHE_DIR = None    # None: carpeta "reportes_cache" junto a la BD
+REPORTES_CACHE_HORAS = 24    # Un archivo sin pedidos durante este tiempo se borra
+REPORTES_CACHE_MAX_MB = 500  # Tope del tamaño de la caché (se borran primero los menos usados)
+REPORTES_HILOS = 2           # Reportes generados a la vez por proceso web
+REPORTES_COLA = 20           # Reportes en espera por proceso antes de responder 503 "ocupado"
+REPORTES_LATIDO = 1.0        # Segundos entre actualizaciones del avance de un trabajo
+REPORTES_EXPIRA = 120        # Segundos sin latido para dar un trabajo por interrumpido
+
+# Escritor de logs por lotes (ver escritor_logs.py). El spool se guarda junto a la BD (<DB_NAME>.spool).
+ESCRITOR_LOTE_MAX = 200      # Eventos máximos por transacción
+ESCRITOR_INTERVALO = 0.5     # Segundos máximos que un evento espera antes de escribirse
+ESCRITOR_CAPACIDAD = 5000    # Eventos en cola antes de frenar al lector del stream
+ESCRITOR_SPOOL_FSYNC = False # True: fsync por evento (sobrevive a cortes de luz, más lento)
+
+# --- Procesos de la app web (ver eleccion_lider.py) ---
+# Con varios procesos, solo el que liga este puerto local escucha los terminales y usa
+# el escritor por lotes. Si dos instalaciones comparten máquina, usar puertos distintos.
+LIDER_PUERTO = 47615
+LIDER_REINTENTO = 5          # Segundos entre intentos de tomar el liderazgo si otro proceso lo tiene
+PROCESOS_SONDEO = 0.25       # Segundos entre lecturas de PRAGMA data_version (logs y usuarios de otros procesos)
+
+# Servidor de producción (ver servidor.py): un proceso de ingesta y SERVIDOR_PROCESOS procesos web
+SERVIDOR_PUERTO = 5000
+SERVIDOR_PROCESOS = 4        # Procesos web (waitress); conviene uno por núcleo
+SERVIDOR_HILOS = 16          # Hilos por proceso web; cada monitor en vivo abierto ocupa uno
+
 # --- Dispositivos en Red ---
 # IP del terminal biométrico Hikvision
 IP_BIO = '192.168.1.22'
@@ -17,5 +82,52 @@ PASS_BIO = 'istae1804A' # La contraseña de tu dispositivo
 IP_NODE = 'puerta-tesis.local'
 TOKEN_NODE = 'istae1805A' # Debe coincidir con el token en el código de Arduino/NodeMCU
 
-# --- URLs de API (se construyen a partir de las IPs) ---
-URL_STREAM_BIO = f'http://{IP_BIO}/ISAPI/Event/notification/alertStream'
+# Controlador de la puerta (ver controlador_puerta.py)
+PUERTA_VENTANA_RELE = 2.0    # Segundos que el relé queda activo (duracionApertura en node.ino): no se reenvía
+PUERTA_DNS_TTL = 300         # Segundos que se reutiliza la IP resuelta de IP_NODE (mDNS)
+PUERTA_TIMEOUT = (2, 3)      # Segundos para conectar / recibir respuesta del NodeMCU
+PUERTA_HISTORIAL_LATENCIAS = 200  # Últimas latencias guardadas para las estadísticas
+
+# --- API de logs ---
+API_LOGS_LIMITE = 20         # Filas por página por defecto en /api/logs
+API_LOGS_LIMITE_MAX = 500    # Máximo permitido con ?limit=
+
+# --- Métricas (GET /metrics, formato Prometheus) ---
+# /metrics responde a administradores con sesión iniciada y, con token, a quien envíe
+# "Authorization: Bearer <token>" (p. ej. Prometheus).
+METRICAS_TOKEN = None
+# Aceptar además cualquier petición desde 127.0.0.1/::1. Solo sin proxy inverso en el mismo
+# equipo: detrás de uno, todas las peticiones llegan desde localhost.
+METRICAS_LOCALHOST = False
+
+# --- Monitor en vivo (Server-Sent Events) ---
+SSE_HISTORIAL = 500          # Últimos eventos en memoria para reanudar con Last-Event-ID
+SSE_KEEPALIVE = 15           # Segundos entre comentarios de keep-alive sin eventos
+
+# --- Gateway de dispositivos (ver gateway_dispositivos.py) ---
+# Los terminales y puertas se registran en la tabla `dispositivos`; IP_BIO/IP_NODE
+# solo se usan para cargarla la primera vez y para la apertura desde la web.
+GATEWAY_BACKOFF_MIN = 1      # Segundos de espera tras la primera falla de un terminal
+GATEWAY_BACKOFF_MAX = 60     # Tope de la espera exponencial entre reconexiones
+GATEWAY_TIMEOUT_LECTURA = 90 # Segundos sin recibir datos antes de dar la conexión por caída
+
+# --- Recuperación de eventos tras una reconexión (búsqueda AcsEvent de ISAPI) ---
+RECUPERACION_LOTE = 100      # Eventos pedidos por página (maxResults); el terminal puede devolver menos
+RECUPERACION_MAX_DIAS = 7    # Tope de días hacia atrás, aunque el último evento guardado sea más antiguo
+
+# --- Pipeline de eventos (ver pipeline_eventos.py) ---
+PIPELINE_CAPACIDAD_COLA = 1000       # Eventos en cola por etapa antes de frenar a la anterior
+PIPELINE_HILOS_ACCION = 4            # Hilos que verifican permisos y piden abrir la puerta
+PIPELINE_DEDUP_CAPACIDAD = 50000     # Eventos recientes recordados para descartar reenvíos
+
+# --- Stream de eventos ---
+STREAM_TAMANO_BLOQUE = 16 * 1024   # Bytes máximos leídos por bloque del alertStream
+FRAMER_MAX_EVENTO = 1024 * 1024    # Un evento JSON más grande que esto se descarta
+
+# --- Importación masiva de docentes (ver importacion_docentes.py) ---
+IMPORTACION_PROCESOS = None  # Procesos que calculan los hashes; None: uno por núcleo
+IMPORTACION_MAX_FILAS = 20000  # Docentes por archivo
+IMPORTACION_MAX_BYTES = 16 * 1024 * 1024  # Tamaño máximo de un archivo subido (y de cualquier petición)
+IMPORTACION_MAX_HASHES_WEB = 200  # Contraseñas por archivo desde la web (~20 s de scrypt en un núcleo); más, por CLI
+IMPORTACION_LATIDO = 5       # Segundos entre latidos de la importación en curso
+IMPORTACION_EXPIRA = 60      # Segundos sin latido para dar por terminada una importación (proceso caído)
@@ -0,0 +1,151 @@
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import metricas
+
+# --- CONTROLADOR DE LA PUERTA (NodeMCU) ---
+# Antes cada apertura creaba una sesión nueva: resolución mDNS de puerta-tesis.local,
+# conexión TCP nueva y hasta 5 s de timeouts dentro del hilo que lee el stream.
+# Ahora hay un solo controlador de larga vida que:
+#   - mantiene la conexión HTTP abierta (keep-alive) y la dirección resuelta con un TTL,
+#   - envía los comandos desde un hilo propio: quien pide abrir no espera (salvo que quiera),
+#   - colapsa las aperturas repetidas mientras el relé sigue activo (PUERTA_VENTANA_RELE),
+#   - registra la latencia de cada comando.
+
+APERTURA_SEGUNDOS = metricas.histograma(
+    'puerta_apertura_segundos', "Duración de cada comando de apertura al NodeMCU (incluye reintento).", ('puerta',))
+APERTURAS = metricas.contador(
+    'puerta_aperturas_total', "Comandos de apertura enviados al NodeMCU, por resultado (ok/error).",
+    ('puerta', 'resultado'))
+APERTURAS_COLAPSADAS = metricas.contador(
+    'puerta_aperturas_colapsadas_total', "Pedidos de apertura resueltos con un comando en curso o reciente.",
+    ('puerta',))
+
+class ControladorPuerta:
+    def __init__(self, host=None, token=None, ventana=None, ttl_dns=None, timeout=None):
+        self.host = host or config.IP_NODE
+        self.token = token or config.TOKEN_NODE
+        self.ventana = config.PUERTA_VENTANA_RELE if ventana is None else ventana
+        self.ttl_dns = config.PUERTA_DNS_TTL if ttl_dns is None else ttl_dns
+        self.timeout = timeout or config.PUERTA_TIMEOUT
+
+        partes = urlsplit(f"http://{self.host}")
+        self._nombre, self._puerto = partes.hostname, partes.port or 80
+
+        self._sesion = requests.Session()
+        self._sesion.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+        # Un solo hilo: los comandos al relé salen en orden y nunca se solapan
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="puerta")
+        self._lock = threading.Lock()
+        self._direccion = None
+        self._direccion_vence = 0.0
+        self._ultimo = None          # Future del último comando enviado
+        self._ultimo_fin = 0.0       # Momento (monotonic) en que terminó
+
+        self.enviados = 0
+        self.colapsados = 0
+        self.errores = 0
+        self.latencias_ms = deque(maxlen=config.PUERTA_HISTORIAL_LATENCIAS)
+
+    # --- Resolución con caché ---
+    def _resolver(self):
+        ahora = time.monotonic()
+        if self._direccion is None or ahora >= self._direccion_vence:
+            info = socket.getaddrinfo(self._nombre, self._puerto, type=socket.SOCK_STREAM)
+            ip = info[0][4][0]
+            self._direccion = f"[{ip}]" if ':' in ip else ip
+            self._direccion_vence = ahora + self.ttl_dns
+        return self._direccion
+
+    def olvidar_direccion(self):
+        """Fuerza una nueva resolución (p. ej. si el NodeMCU cambió de IP por DHCP)."""
+        self._direccion = None
+
+    # --- Envío (en el hilo del controlador) ---
+    def _peticion(self):
+        url = f"http://{self._resolver()}:{self._puerto}/api/abrir"
+        return self._sesion.get(url, params={'token': self.token}, timeout=self.timeout,
+                                headers={'Host': self.host})
+
+    def _enviar(self, origen):
+        t0 = time.perf_counter()
+        exito = False
+        try:
+            try:
+                r = self._peticion()
+            except requests.exceptions.ConnectionError:
+                # Dirección vencida o conexión keep-alive cerrada por el NodeMCU: un reintento
+                self.olvidar_direccion()
+                r = self._peticion()
+            ms = (time.perf_counter() - t0) * 1000
+            self.latencias_ms.append(ms)
+            if r.status_code == 200:
+                print(f"🔓 PUERTA ABIERTA (Vía NodeMCU) en {ms:.0f} ms [{origen}]")
+                exito = True
+                return True
+            self.errores += 1
+            print(f"⚠️ NodeMCU respondió con error: {r.status_code} - {r.text}")
+            return False
+        except (requests.exceptions.RequestException, OSError) as e:
+            self.errores += 1
+            self.olvidar_direccion()
+            print(f"⚠️ Error de conexión con NodeMCU ({self.host}): {e}")
+            return False
+        except Exception as e:
+            self.errores += 1
+            print(f"⚠️ Ocurrió un error inesperado abriendo la puerta: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._ultimo_fin = time.monotonic()
+            APERTURA_SEGUNDOS.observar(time.perf_counter() - t0, puerta=self.host)
+            APERTURAS.inc(puerta=self.host, resultado='ok' if exito else 'error')
+
+    # --- API pública ---
+    def abrir(self, origen=""):
+        """
+        Pide abrir la puerta sin bloquear y devuelve un Future con True/False.
+        Si ya hay una apertura en curso, o una exitosa dentro de la ventana del relé,
+        devuelve esa misma en lugar de enviar otro comando.
+        """
+        with self._lock:
+            ultimo = self._ultimo
+            if ultimo is not None:
+                en_curso = not ultimo.done()
+                reciente = (not en_curso and not ultimo.cancelled() and ultimo.result()
+                            and time.monotonic() - self._ultimo_fin < self.ventana)
+                if en_curso or reciente:
+                    self.colapsados += 1
+                    APERTURAS_COLAPSADAS.inc(puerta=self.host)
+                    return ultimo
+            self.enviados += 1
+            self._ultimo = self._ejecutor.submit(self._enviar, origen)
+            return self._ultimo
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)
+        self._sesion.close()
+
+    def estadisticas(self):
+        latencias = sorted(self.latencias_ms)
+
+        def percentil(p):
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))], 1) if latencias else None
+
+        return {
+            'enviados': self.enviados,
+            'colapsados': self.colapsados,
+            'errores': self.errores,
+            'latencia_ms': {'p50': percentil(0.50), 'p95': percentil(0.95),
+                            'max': round(latencias[-1], 1) if latencias else None,
+                            'ultima': round(self.latencias_ms[-1], 1) if self.latencias_ms else None},
+        }
@@ -0,0 +1,91 @@
+import threading
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import pool_db
+
+# --- DIRECTORIO DE USUARIOS EN MEMORIA ---
+# load_user (en cada petición web) y verificar_permiso_y_abrir (en cada huella,
+# antes de accionar el relé) consultaban `usuarios` en la BD. La tabla es chica,
+# así que se guarda completa en memoria indexada por id y por biometric_id.
+# Las rutas que modifican usuarios llaman a invalidar(); la siguiente consulta
+# vuelve a cargar la tabla (una sola consulta) y el resto se sirve de memoria.
+
+COLUMNAS = ('id', 'biometric_id', 'nombre', 'username', 'rol', 'acceso_puerta')
+
+class DirectorioUsuarios:
+    def __init__(self, ruta_db=None):
+        self.ruta_db = ruta_db or config.DB_NAME
+        self._lock = threading.Lock()
+        self._por_id = None
+        self._por_bio = None
+        self._version = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.recargas = 0
+
+    def _leer_tabla(self):
+        conn = pool_db.obtener_pool(self.ruta_db, solo_lectura=True).adquirir()
+        try:
+            columnas = {row[1] for row in conn.execute("PRAGMA table_info(usuarios)")}
+            # acceso_puerta puede faltar en una BD sin migrar
+            campos = ", ".join(c if c in columnas else f"0 AS {c}" for c in COLUMNAS)
+            return [dict(row) for row in conn.execute(f"SELECT {campos} FROM usuarios").fetchall()]
+        finally:
+            conn.close()
+
+    def cargar(self):
+        """Lee la tabla completa y reemplaza los índices en memoria."""
+        with self._lock:
+            version = self._version
+        usuarios = self._leer_tabla()
+        por_id = {u['id']: u for u in usuarios}
+        por_bio = {str(u['biometric_id']): u for u in usuarios if u['biometric_id'] is not None}
+        with self._lock:
+            # Si se invalidó mientras se leía, lo leído puede estar desactualizado: no se instala
+            if version == self._version:
+                self._por_id, self._por_bio = por_id, por_bio
+                self.recargas += 1
+        return por_id, por_bio
+
+    def invalidar(self):
+        """Descarta lo cargado; llamar después de confirmar cualquier cambio en `usuarios`."""
+        with self._lock:
+            self._version += 1
+            self._por_id = self._por_bio = None
+
+    def _indices(self):
+        with self._lock:
+            if self._por_id is not None:
+                self.aciertos += 1
+                return self._por_id, self._por_bio
+            self.fallos += 1
+        return self.cargar()
+
+    def por_id(self, user_id):
+        """Devuelve el dict del usuario (sin contraseña) o None."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        return self._indices()[0].get(user_id)
+
+    def por_biometric_id(self, biometric_id):
+        """Devuelve el dict del usuario (sin contraseña) o None."""
+        return self._indices()[1].get(str(biometric_id))
+
+    def nombres(self, biometric_ids):
+        """{biometric_id: nombre} de los ids conocidos."""
+        por_bio = self._indices()[1]
+        return {b: por_bio[b]['nombre'] for b in biometric_ids if b in por_bio}
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'recargas': self.recargas,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'usuarios': len(self._por_id) if self._por_id is not None else None,
+            }
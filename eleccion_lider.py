@@ -0,0 +1,121 @@
+import http.client
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- ELECCIÓN DE PROCESO LÍDER ---
+# Con varios procesos sirviendo la app web (gunicorn -w N, waitress, el recargador de
+# Flask), cada uno arrancaba su propio escritor de logs y su propio gateway: conexiones
+# duplicadas a cada terminal, eventos guardados N veces y un mismo archivo spool escrito
+# por varios procesos. El líder es el proceso que logra ligar 127.0.0.1:LIDER_PUERTO;
+# el sistema operativo libera el puerto si muere, y otro proceso toma su lugar en el
+# siguiente reintento. Los demás procesos solo atienden la web y escriben directo en la BD.
+#
+# El mismo socket sirve para preguntarle al líder por lo que solo él tiene en memoria
+# (estado de terminales y pipeline, métricas de los dispositivos): servir() atiende GET
+# en 127.0.0.1:LIDER_PUERTO y consultar_lider() lo usa desde los otros procesos.
+
+class EleccionLider:
+    def __init__(self, puerto=None, reintento=None):
+        self.puerto = config.LIDER_PUERTO if puerto is None else puerto
+        self.reintento = reintento or config.LIDER_REINTENTO
+        self._socket = None
+        self._hilo = None
+
+    @property
+    def es_lider(self):
+        return self._socket is not None
+
+    def intentar(self):
+        """Intenta tomar el liderazgo (no bloquea). Devuelve True si este proceso es el líder."""
+        if self._socket is not None:
+            return True
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            # Windows: sin esto, otro proceso con SO_REUSEADDR podría ligar el mismo puerto
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+        try:
+            s.bind(('127.0.0.1', self.puerto))
+        except OSError:
+            s.close()
+            return False
+        s.set_inheritable(False)  # Los procesos hijos no heredan el liderazgo
+        self._socket = s
+        return True
+
+    def esperar_liderazgo(self, al_ganar):
+        """
+        Llama a `al_ganar()` una sola vez, cuando este proceso sea el líder: enseguida si el
+        puerto está libre y, si no, desde un hilo que reintenta cada `reintento` segundos.
+        """
+        if self.intentar():
+            al_ganar()
+            return
+        if self._hilo is not None:
+            return
+
+        def reintentar():
+            while not self.intentar():
+                threading.Event().wait(self.reintento)
+            print("👑 Este proceso tomó el liderazgo: arranca los servicios de dispositivos.")
+            al_ganar()
+
+        self._hilo = threading.Thread(target=reintentar, name="eleccion-lider", daemon=True)
+        self._hilo.start()
+
+    def servir(self, rutas):
+        """
+        Atiende GET en el socket del liderazgo desde un hilo. `rutas` es
+        {ruta: funcion() -> (tipo de contenido, bytes)}. Solo tiene efecto en el líder.
+        """
+        if self._socket is None:
+            return
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                funcion = rutas.get(self.path)
+                if funcion is None:
+                    self.send_error(404)
+                    return
+                try:
+                    tipo, cuerpo = funcion()
+                except Exception as e:
+                    print(f"⚠️ Error atendiendo {self.path} en el proceso líder: {e}")
+                    self.send_error(500)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', tipo)
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer(self._socket.getsockname(), Manejador, bind_and_activate=False)
+        servidor.socket.close()
+        servidor.socket = self._socket
+        servidor.server_activate()  # listen() sobre el socket ya ligado
+        threading.Thread(target=servidor.serve_forever, name="estado-lider", daemon=True).start()
+
+    def liberar(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+def consultar_lider(ruta, puerto=None, timeout=2):
+    """GET a una ruta servida por el proceso líder; devuelve (tipo de contenido, bytes) o lanza OSError."""
+    conexion = http.client.HTTPConnection('127.0.0.1', config.LIDER_PUERTO if puerto is None else puerto,
+                                          timeout=timeout)
+    try:
+        conexion.request('GET', ruta)
+        respuesta = conexion.getresponse()
+        cuerpo = respuesta.read()
+        if respuesta.status != 200:
+            raise OSError(f"El proceso líder respondió {respuesta.status} a {ruta}")
+        return respuesta.getheader('Content-Type', ''), cuerpo
+    finally:
+        conexion.close()
@@ -0,0 +1,200 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# --- CONFIGURACIÓN (Importada) ---
+import asistencia_diaria
+import config
+import pool_db
+
+# --- ESCRITOR DE LOGS POR LOTES ---
+# Los eventos se encolan y un hilo dedicado los inserta en una sola transacción
+# por lote (al llegar a ESCRITOR_LOTE_MAX eventos o cada ESCRITOR_INTERVALO s).
+# Antes de encolarse, cada evento se anota en un archivo "spool" con un número de
+# secuencia; la tabla escritor_spool guarda, en la misma transacción del lote, el
+# último número confirmado. Si el proceso muere a mitad de un lote, al reiniciar
+# se reinsertan del spool solo los eventos que no llegaron a confirmarse.
+
+# OR IGNORE: un evento de terminal (dispositivo_id, fecha, serial_no) que ya está en la BD
+# (p. ej. recuperado de la búsqueda de eventos tras un corte) no se duplica
+INSERT_LOG = ("INSERT OR IGNORE INTO logs (fecha, usuario_id, tipo_evento, origen, dispositivo_id, serial_no) "
+              "VALUES (?, ?, ?, ?, ?, ?)")
+
+def fila_log(fecha, uid, evento, origen, dispositivo_id=None, serial_no=None):
+    return (fecha, uid, evento, origen, dispositivo_id, serial_no)
+
+def insertar_logs(conn, filas):
+    """
+    Inserta filas de fila_log() y actualiza el resumen diario, dentro de la transacción del
+    llamador. Devuelve [(id, fecha, uid, evento, origen)] solo de las filas realmente nuevas.
+    """
+    insertadas = []
+    for fila in filas:
+        cur = conn.execute(INSERT_LOG, fila)
+        if cur.rowcount:
+            insertadas.append((cur.lastrowid,) + tuple(fila[:4]))
+    asistencia_diaria.actualizar(conn, [(uid, fecha) for _, fecha, uid, _, _ in insertadas])
+    return insertadas
+
+_FIN = object()
+
+class EscritorLogs:
+    def __init__(self, ruta_db=None, tamano_lote=None, intervalo=None, capacidad=None, fsync=None,
+                 al_confirmar=None):
+        self.ruta_db = ruta_db or config.DB_NAME
+        # Se llama con [(id, fecha, uid, evento, origen), ...] después de cada commit
+        self.al_confirmar = al_confirmar
+        self.ruta_spool = self.ruta_db + ".spool"
+        self.tamano_lote = tamano_lote or config.ESCRITOR_LOTE_MAX
+        self.intervalo = intervalo or config.ESCRITOR_INTERVALO
+        self.fsync = config.ESCRITOR_SPOOL_FSYNC if fsync is None else fsync
+        self._cola = queue.Queue(maxsize=capacidad or config.ESCRITOR_CAPACIDAD)
+        self._spool_lock = threading.Lock()
+        self._spool = None
+        self._seq = 0
+        self._hilo = None
+
+    @property
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    # --- Spool ---
+    def _ultimo_confirmado(self, conn):
+        row = conn.execute("SELECT ultimo_seq FROM escritor_spool WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def _recuperar_spool(self):
+        """Inserta los eventos del spool que no llegaron a confirmarse y lo vacía."""
+        pendientes = []
+        if os.path.exists(self.ruta_spool):
+            with open(self.ruta_spool, encoding='utf-8') as f:
+                for linea in f:
+                    try:
+                        seq, fila = json.loads(linea)
+                    except ValueError:
+                        continue  # Línea cortada por una caída a mitad de escritura
+                    pendientes.append((seq, fila_log(*fila)))
+
+        conn = pool_db.obtener_pool(self.ruta_db).adquirir()
+        try:
+            ultimo = self._ultimo_confirmado(conn)
+            pendientes = [(seq, fila) for seq, fila in pendientes if seq > ultimo]
+            if pendientes:
+                self._notificar(self._confirmar(conn, pendientes))
+                print(f"♻️  {len(pendientes)} evento(s) recuperado(s) del spool tras un cierre inesperado.")
+            self._seq = max([ultimo] + [seq for seq, _ in pendientes])
+        finally:
+            conn.close()
+
+        self._spool = open(self.ruta_spool, 'w', encoding='utf-8')
+
+    def _vaciar_spool_si_al_dia(self, seq_confirmado):
+        # Sin bloquear: si un productor tiene el lock (esperando cupo en la cola) se vacía después
+        if not self._spool_lock.acquire(blocking=False):
+            return
+        try:
+            if seq_confirmado == self._seq and self._spool is not None:
+                self._spool.seek(0)
+                self._spool.truncate()
+        finally:
+            self._spool_lock.release()
+
+    # --- Ciclo de vida ---
+    def iniciar(self):
+        if self.activo:
+            return
+        self._recuperar_spool()
+        self._hilo = threading.Thread(target=self._bucle, name="escritor-logs", daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout=10):
+        """Escribe todo lo pendiente en la cola y detiene el hilo."""
+        if not self.activo:
+            return
+        self._cola.put(_FIN)
+        self._hilo.join(timeout)
+        with self._spool_lock:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+
+    # --- Productores ---
+    def encolar(self, fecha, uid, evento, origen, dispositivo_id=None, serial_no=None):
+        """
+        Anota el evento en el spool y lo encola. Si la cola está llena, espera (contrapresión)
+        mientras el hilo escritor siga vivo; si murió, el evento queda en el spool y se
+        insertará al reiniciar. Devuelve True si quedó encolado.
+        """
+        fila = fila_log(fecha, uid, evento, origen, dispositivo_id, serial_no)
+        with self._spool_lock:
+            self._seq += 1
+            seq = self._seq
+            self._spool.write(json.dumps([seq, fila], ensure_ascii=False) + "\n")
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            # Se encola dentro del lock para que la cola quede en orden de secuencia
+            while True:
+                try:
+                    self._cola.put((seq, fila), timeout=1)
+                    return True
+                except queue.Full:
+                    if not self.activo:
+                        print("❌ Escritor de logs detenido: el evento quedó en el spool.")
+                        return False
+
+    # --- Hilo escritor ---
+    def _confirmar(self, conn, lote):
+        """Inserta el lote (y su resumen diario) en una transacción y devuelve las filas nuevas con su id."""
+        with pool_db.transaccion_escritura(conn, 'escritor'):
+            insertadas = insertar_logs(conn, [fila for _, fila in lote])
+            conn.execute("INSERT OR REPLACE INTO escritor_spool (id, ultimo_seq) VALUES (1, ?)", (lote[-1][0],))
+        return insertadas
+
+    def _notificar(self, insertadas):
+        if self.al_confirmar is None:
+            return
+        try:
+            self.al_confirmar(insertadas)
+        except Exception as e:
+            print(f"⚠️ Error notificando logs guardados: {e}")
+
+    def _bucle(self):
+        terminar = False
+        while not terminar:
+            item = self._cola.get()
+            if item is _FIN:
+                break
+            lote = [item]
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = limite - time.monotonic()
+                try:
+                    item = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _FIN:
+                    terminar = True
+                    break
+                lote.append(item)
+            self._escribir_lote(lote)
+
+    def _escribir_lote(self, lote):
+        while True:
+            try:
+                conn = pool_db.obtener_pool(self.ruta_db).adquirir()
+                try:
+                    insertadas = self._confirmar(conn, lote)
+                finally:
+                    conn.close()
+                break
+            except Exception as e:
+                # El lote sigue en el spool; se reintenta sin perder eventos
+                print(f"❌ Error guardando lote de {len(lote)} log(s): {e}. Reintentando en 1s...")
+                time.sleep(1)
+        for _, fecha, uid, evento, origen in insertadas:
+            print(f"✅ LOG GUARDADO: {uid} | {evento} ({origen})")
+        self._vaciar_spool_si_al_dia(lote[-1][0])
+        self._notificar(insertadas)
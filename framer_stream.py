@@ -0,0 +1,214 @@
+import re
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- SEPARADOR DE EVENTOS DEL alertStream ---
+# El biométrico Hikvision envía un flujo multipart: cada parte trae sus cabeceras
+# (Content-Type, Content-Length) y un cuerpo JSON, o una imagen que se descarta.
+# El separador trabaja sobre bytes: busca boundaries y cabeceras con bytes.find
+# (en C) y corta cada cuerpo una sola vez, así el costo es O(n) en lo recibido.
+# Si el flujo no trae boundary, se usa como respaldo el conteo de llaves,
+# ignorando las que aparecen dentro de cadenas JSON.
+
+_ESPECIALES_JSON = re.compile(rb'[{}"\\]')
+_FIN_CABECERAS = b"\r\n\r\n"
+_COMPACTAR_DESDE = 64 * 1024
+
+def boundary_desde_content_type(content_type):
+    """Extrae el boundary de 'multipart/mixed; boundary=MIME_boundary' (o None)."""
+    if not content_type:
+        return None
+    for parte in content_type.split(';'):
+        clave, _, valor = parte.strip().partition('=')
+        if clave.lower() == 'boundary' and valor:
+            return valor.strip().strip('"')
+    return None
+
+def _leer_cabeceras(texto):
+    tipo, largo = '', None
+    for linea in texto.split("\r\n"):
+        clave, _, valor = linea.partition(':')
+        clave = clave.strip().lower()
+        if clave == 'content-type':
+            tipo = valor.strip().lower()
+        elif clave == 'content-length':
+            try:
+                largo = int(valor.strip())
+            except ValueError:
+                largo = None
+    return tipo, largo
+
+class FramerAlertStream:
+    """
+    Recibe los bloques de bytes del stream con `alimentar()` y devuelve la lista
+    de eventos JSON completos (bytes) que se pudieron separar hasta el momento.
+    """
+
+    def __init__(self, boundary=None, max_evento=None):
+        self.max_evento = max_evento or config.FRAMER_MAX_EVENTO
+        self._buf = bytearray()
+        self._pos = 0            # Inicio de lo que falta procesar
+        self._marca = None
+        if boundary:
+            self.fijar_boundary(boundary)
+        # Estado multipart
+        self._parte = None       # (content_type, content_length) de la parte en curso
+        self._descartar = 0      # Bytes de una parte no JSON que faltan por saltar
+        self._buscar_desde = 0
+        # Estado del respaldo por conteo de llaves
+        self._inicio = -1
+        self._nivel = 0
+        self._en_cadena = False
+        self._scan = 0
+
+    def fijar_boundary(self, boundary):
+        if isinstance(boundary, str):
+            boundary = boundary.encode('latin-1')
+        self._marca = boundary if boundary.startswith(b"--") else b"--" + boundary
+
+    def alimentar(self, datos):
+        eventos = []
+        if self._descartar:
+            saltados = min(self._descartar, len(datos))
+            self._descartar -= saltados
+            datos = datos[saltados:]
+        self._buf += datos
+        if self._marca is None and self._inicio < 0 and self._detectar_boundary():
+            return eventos  # Llegó solo parte de la primera línea; se decide con el próximo bloque
+        if self._marca is not None:
+            self._separar_partes(eventos)
+        else:
+            self._separar_por_llaves(eventos)
+        self._compactar()
+        return eventos
+
+    def _detectar_boundary(self):
+        """
+        Un flujo multipart empieza con una línea '--boundary'. Devuelve True si todavía
+        no hay datos suficientes para saber si el flujo es multipart.
+        """
+        buf = self._buf
+        inicio = self._pos
+        while inicio < len(buf) and buf[inicio] in b" \t\r\n":
+            inicio += 1
+        if inicio == len(buf) or (len(buf) - inicio < 2 and buf[inicio] == 0x2D):
+            return True
+        if buf.startswith(b"--", inicio):
+            fin = buf.find(b"\r\n", inicio)
+            if fin < 0:
+                return True
+            self._marca = bytes(buf[inicio:fin]).strip()
+            self._pos = inicio
+        return False
+
+    def _separar_partes(self, eventos):
+        buf, marca = self._buf, self._marca
+        while True:
+            if self._descartar:
+                return
+            if self._parte is None:
+                i = buf.find(marca, self._pos)
+                if i < 0:
+                    # Lo anterior a un posible boundary incompleto es basura
+                    self._pos = max(self._pos, len(buf) - len(marca) + 1)
+                    return
+                j = buf.find(_FIN_CABECERAS, i)
+                if j < 0:
+                    self._pos = i
+                    return
+                self._parte = _leer_cabeceras(bytes(buf[i + len(marca):j]).decode('latin-1'))
+                self._pos = self._buscar_desde = j + len(_FIN_CABECERAS)
+
+            tipo, largo = self._parte
+            es_json = 'json' in tipo or not tipo
+            if largo is not None:
+                disponible = len(buf) - self._pos
+                if not es_json or largo > self.max_evento:
+                    # Imágenes y otras partes: se saltan sin acumularlas
+                    saltados = min(largo, disponible)
+                    self._pos += saltados
+                    self._descartar = largo - saltados
+                    self._parte = None
+                    continue
+                if disponible < largo:
+                    return
+                cuerpo = bytes(buf[self._pos:self._pos + largo])
+                self._pos += largo
+            elif es_json:
+                # Parte JSON sin Content-Length: se delimita contando llaves
+                if not self._separar_por_llaves(eventos, uno=True):
+                    return
+                self._parte = None
+                continue
+            else:
+                k = buf.find(marca, self._buscar_desde)
+                if k < 0:
+                    self._buscar_desde = max(self._pos, len(buf) - len(marca) + 1)
+                    return
+                self._pos = k
+                self._parte = None
+                continue
+            self._parte = None
+
+            cuerpo = cuerpo.strip()
+            if cuerpo.startswith(b"{"):
+                eventos.append(cuerpo)
+
+    def _separar_por_llaves(self, eventos, uno=False):
+        """
+        Respaldo: delimita objetos JSON contando llaves fuera de las cadenas.
+        Con uno=True se detiene tras el primer objeto y devuelve True si lo completó.
+        """
+        buf = self._buf
+        i = max(self._scan, self._pos)
+        while True:
+            if self._inicio < 0:
+                k = buf.find(b"{", i)
+                if k < 0:
+                    self._pos = self._scan = len(buf)
+                    return False
+                self._inicio, self._nivel, self._en_cadena = k, 0, False
+                i = k
+            m = _ESPECIALES_JSON.search(buf, i)
+            if m is None:
+                self._scan = max(i, len(buf))
+                if len(buf) - self._inicio > self.max_evento:
+                    # Evento demasiado grande o flujo corrupto: se descarta
+                    self._inicio = -1
+                    self._pos = self._scan
+                return False
+            p = m.start()
+            c = buf[p]
+            i = p + 1
+            if self._en_cadena:
+                if c == 0x5C:     # '\' escapa el siguiente byte (puede llegar en el próximo bloque)
+                    i = p + 2
+                elif c == 0x22:   # '"'
+                    self._en_cadena = False
+            elif c == 0x22:
+                self._en_cadena = True
+            elif c == 0x7B:       # '{'
+                self._nivel += 1
+            elif c == 0x7D:       # '}'
+                self._nivel -= 1
+                if self._nivel == 0:
+                    eventos.append(bytes(buf[self._inicio:i]))
+                    self._inicio = -1
+                    self._pos = self._scan = i
+                    if uno:
+                        return True
+            self._scan = i
+
+    def _compactar(self):
+        # Se borra lo ya procesado de vez en cuando (costo amortizado O(n))
+        pos = self._pos
+        if self._inicio >= 0:
+            pos = min(pos, self._inicio)
+        if pos and (pos >= _COMPACTAR_DESDE or pos == len(self._buf)):
+            del self._buf[:pos]
+            self._pos -= pos
+            self._buscar_desde = max(0, self._buscar_desde - pos)
+            self._scan = max(0, self._scan - pos)
+            if self._inicio >= 0:
+                self._inicio -= pos
@@ -0,0 +1,370 @@
+import asyncio
+import hashlib
+import inspect
+import os
+import random
+import re
+import time
+from urllib.parse import urlsplit
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import framer_stream
+import metricas
+
+# --- GATEWAY DE DISPOSITIVOS (asyncio) ---
+# Un solo hilo con un event loop mantiene abiertas las conexiones alertStream de
+# todos los terminales de la tabla `dispositivos`. Cada terminal es una tarea
+# independiente con su propio back-off de reconexión: si un equipo se cae o deja
+# de responder, solo su tarea espera; los eventos de los demás siguen llegando.
+# El cliente HTTP (GET/POST + autenticación Digest + chunked) está escrito sobre
+# asyncio.open_connection para no depender de librerías externas.
+
+RUTA_STREAM = '/ISAPI/Event/notification/alertStream'
+_PARAMETRO_DIGEST = re.compile(r'(\w+)\s*=\s*(?:"([^"]*)"|([^\s,]+))')
+_HASHES = {'MD5': hashlib.md5, 'MD5-SESS': hashlib.md5, 'SHA-256': hashlib.sha256, 'SHA-256-SESS': hashlib.sha256}
+
+EVENTOS = metricas.contador('gateway_eventos_total', "Eventos separados del alertStream, por terminal.", ('terminal',))
+RECONEXIONES = metricas.contador(
+    'gateway_reconexiones_total', "Conexiones al alertStream perdidas o fallidas (cada una lleva a un reintento).",
+    ('terminal',))
+RECUPERADOS = metricas.contador(
+    'gateway_eventos_recuperados_total', "Eventos nuevos traídos del historial del terminal tras reconectar.",
+    ('terminal',))
+
+class ErrorGateway(Exception):
+    """Respuesta inesperada de un terminal (no 200, sin autenticación válida, etc.)."""
+
+# --- Autenticación Digest (RFC 7616) ---
+class AutenticacionDigest:
+    def __init__(self, usuario, clave):
+        self.usuario = usuario or ''
+        self.clave = clave or ''
+        self._desafio = None
+        self._nc = 0
+
+    def actualizar(self, cabeceras_www):
+        """Toma el desafío Digest de las cabeceras WWW-Authenticate de una respuesta 401."""
+        for valor in cabeceras_www:
+            esquema, _, resto = valor.strip().partition(' ')
+            if esquema.lower() == 'digest':
+                self._desafio = {m[0].lower(): m[1] or m[2] for m in _PARAMETRO_DIGEST.findall(resto)}
+                self._nc = 0
+                return True
+        return False
+
+    def cabecera(self, metodo, uri):
+        """Valor de Authorization para la petición, o None si aún no hay desafío."""
+        d = self._desafio
+        if d is None:
+            return None
+        algoritmo = d.get('algorithm', 'MD5').upper()
+        h = _HASHES.get(algoritmo, hashlib.md5)
+
+        def H(texto):
+            return h(texto.encode()).hexdigest()
+
+        self._nc += 1
+        nc, cnonce = f"{self._nc:08x}", os.urandom(8).hex()
+        ha1 = H(f"{self.usuario}:{d.get('realm', '')}:{self.clave}")
+        if algoritmo.endswith('-SESS'):
+            ha1 = H(f"{ha1}:{d['nonce']}:{cnonce}")
+        ha2 = H(f"{metodo}:{uri}")
+        qops = [q.strip() for q in d.get('qop', '').split(',') if q.strip()]
+        partes = [f'username="{self.usuario}"', f'realm="{d.get("realm", "")}"', f'nonce="{d.get("nonce", "")}"',
+                  f'uri="{uri}"', f'algorithm={algoritmo}']
+        if 'auth' in qops:
+            respuesta = H(f"{ha1}:{d.get('nonce', '')}:{nc}:{cnonce}:auth:{ha2}")
+            partes += ['qop=auth', f'nc={nc}', f'cnonce="{cnonce}"']
+        else:
+            respuesta = H(f"{ha1}:{d.get('nonce', '')}:{ha2}")
+        partes.append(f'response="{respuesta}"')
+        if 'opaque' in d:
+            partes.append(f'opaque="{d["opaque"]}"')
+        return "Digest " + ", ".join(partes)
+
+# --- Cliente HTTP mínimo ---
+def separar_host(host, puerto_defecto=80):
+    """'192.168.1.22' o '192.168.1.22:8080' -> (host, puerto)."""
+    partes = urlsplit(f"http://{host}")
+    return partes.hostname, partes.port or puerto_defecto
+
+async def leer_cabecera_respuesta(reader, timeout):
+    """Lee la línea de estado y las cabeceras. Devuelve (código, {nombre: [valores]})."""
+    bloque = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    lineas = bloque.decode('latin-1').split("\r\n")
+    partes = lineas[0].split(' ', 2)
+    if len(partes) < 2 or not partes[0].startswith('HTTP/'):
+        raise ErrorGateway(f"Respuesta HTTP inválida: {lineas[0]!r}")
+    cabeceras = {}
+    for linea in lineas[1:]:
+        if ':' in linea:
+            clave, _, valor = linea.partition(':')
+            cabeceras.setdefault(clave.strip().lower(), []).append(valor.strip())
+    return int(partes[1]), cabeceras
+
+def cabecera(cabeceras, nombre, defecto=None):
+    valores = cabeceras.get(nombre)
+    return valores[-1] if valores else defecto
+
+async def leer_cuerpo(reader, cabeceras, timeout, tamano_bloque):
+    """Generador asíncrono con los bytes del cuerpo (chunked, con Content-Length o hasta EOF)."""
+    if 'chunked' in cabecera(cabeceras, 'transfer-encoding', '').lower():
+        while True:
+            linea = await asyncio.wait_for(reader.readline(), timeout)
+            if not linea:
+                return
+            largo = int(linea.split(b';')[0].strip() or b'0', 16)
+            if largo == 0:
+                return
+            while largo:
+                datos = await asyncio.wait_for(reader.read(min(largo, tamano_bloque)), timeout)
+                if not datos:
+                    return
+                largo -= len(datos)
+                yield datos
+            await asyncio.wait_for(reader.readexactly(2), timeout)  # CRLF del fin de bloque
+    else:
+        restante = cabecera(cabeceras, 'content-length')
+        restante = int(restante) if restante is not None else None
+        while restante is None or restante > 0:
+            n = tamano_bloque if restante is None else min(restante, tamano_bloque)
+            datos = await asyncio.wait_for(reader.read(n), timeout)
+            if not datos:
+                return
+            if restante is not None:
+                restante -= len(datos)
+            yield datos
+
+async def descartar_cuerpo(reader, cabeceras, timeout):
+    async for _ in leer_cuerpo(reader, cabeceras, timeout, 64 * 1024):
+        pass
+
+def peticion(metodo, host, ruta, autorizacion=None, cuerpo=b"", tipo="application/json"):
+    lineas = [f"{metodo} {ruta} HTTP/1.1", f"Host: {host}", "Accept: */*", "Connection: keep-alive"]
+    if autorizacion:
+        lineas.append(f"Authorization: {autorizacion}")
+    if cuerpo:
+        lineas += [f"Content-Type: {tipo}", f"Content-Length: {len(cuerpo)}"]
+    return ("\r\n".join(lineas) + "\r\n\r\n").encode('latin-1') + cuerpo
+
+class ConexionISAPI:
+    """
+    Conexión keep-alive a un terminal para peticiones ISAPI cortas (respuesta completa
+    en memoria), con autenticación Digest. Si el terminal cerró la conexión reutilizada,
+    se reconecta una vez.
+    """
+
+    def __init__(self, terminal, auth=None, timeout=None):
+        self.terminal = terminal
+        self.auth = auth or AutenticacionDigest(terminal.get('usuario'), terminal.get('clave'))
+        self.timeout = timeout or config.GATEWAY_TIMEOUT_LECTURA
+        self._reader = self._writer = None
+
+    async def _conectar(self):
+        nombre_host, puerto = separar_host(self.terminal['host'])
+        self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(nombre_host, puerto), self.timeout)
+
+    async def solicitar(self, metodo, ruta, cuerpo=b""):
+        """Envía la petición y devuelve (código, cabeceras, cuerpo en bytes)."""
+        reutilizada = self._writer is not None
+        autenticada = False
+        while True:
+            if self._writer is None:
+                await self._conectar()
+            try:
+                self._writer.write(peticion(metodo, self.terminal['host'], ruta, self.auth.cabecera(metodo, ruta), cuerpo))
+                await self._writer.drain()
+                codigo, cabeceras = await leer_cabecera_respuesta(self._reader, self.timeout)
+                datos = b"".join([b async for b in leer_cuerpo(self._reader, cabeceras, self.timeout, 64 * 1024)])
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.cerrar()
+                if not reutilizada:
+                    raise
+                reutilizada = False
+                continue
+            except BaseException:
+                self.cerrar()
+                raise
+            reutilizada = False
+            if 'close' in cabecera(cabeceras, 'connection', '').lower():
+                self.cerrar()
+            if codigo == 401 and not autenticada and self.auth.actualizar(cabeceras.get('www-authenticate', [])):
+                autenticada = True
+                continue
+            return codigo, cabeceras, datos
+
+    def cerrar(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+async def abrir_stream(terminal, auth, timeout):
+    """
+    Conecta al alertStream del terminal (reintentando una vez con Digest tras un 401)
+    y devuelve (reader, writer, cabeceras) con la respuesta 200 lista para leer el cuerpo.
+    """
+    nombre_host, puerto = separar_host(terminal['host'])
+    ruta = terminal.get('ruta_stream') or RUTA_STREAM
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(nombre_host, puerto), timeout)
+    try:
+        for intento in range(2):
+            writer.write(peticion('GET', terminal['host'], ruta, auth.cabecera('GET', ruta)))
+            await writer.drain()
+            codigo, cabeceras = await leer_cabecera_respuesta(reader, timeout)
+            if codigo == 200:
+                return reader, writer, cabeceras
+            if codigo == 401 and intento == 0 and auth.actualizar(cabeceras.get('www-authenticate', [])):
+                await descartar_cuerpo(reader, cabeceras, timeout)
+                if 'close' in cabecera(cabeceras, 'connection', '').lower():
+                    writer.close()
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(nombre_host, puerto), timeout)
+                continue
+            raise ErrorGateway(f"HTTP {codigo}")
+        raise ErrorGateway("HTTP 401")
+    except BaseException:
+        writer.close()
+        raise
+
+# --- Gateway ---
+class GatewayDispositivos:
+    """
+    Escucha los terminales indicados (dicts con id, nombre, host, usuario, clave y
+    ruta_stream) y llama a `al_evento(terminal, json_bytes)` con cada evento recibido.
+    `al_evento` se ejecuta en el event loop: debe ser rápido (encolar, no esperar);
+    si devuelve un awaitable, se espera antes de seguir leyendo ese terminal.
+    `al_conectar(terminal)`, opcional, es una corrutina que se lanza aparte cada vez
+    que un terminal (re)conecta, p. ej. para recuperar los eventos perdidos durante
+    el corte; si devuelve un número, se suma a 'recuperados' en el estado.
+    """
+
+    def __init__(self, terminales, al_evento, backoff_min=None, backoff_max=None, timeout=None, al_conectar=None):
+        self.terminales = list(terminales)
+        self.al_evento = al_evento
+        self.al_conectar = al_conectar
+        self.backoff_min = backoff_min or config.GATEWAY_BACKOFF_MIN
+        self.backoff_max = backoff_max or config.GATEWAY_BACKOFF_MAX
+        self.timeout = timeout or config.GATEWAY_TIMEOUT_LECTURA
+        self.estado = {t['id']: {'nombre': t['nombre'], 'conectado': False, 'eventos': 0, 'conexiones': 0,
+                                 'fallos_seguidos': 0, 'ultimo_error': None, 'ultimo_evento': None,
+                                 'recuperando': False, 'recuperados': 0}
+                       for t in self.terminales}
+        self._loop = None
+        self._tareas = []
+        self._al_conectar_tareas = {}
+
+    def _espera_reconexion(self, estado, autenticacion_fallida=False):
+        """Back-off exponencial con jitter, por terminal."""
+        espera = min(self.backoff_max, self.backoff_min * 2 ** min(estado['fallos_seguidos'], 16))
+        if autenticacion_fallida:
+            espera = max(espera, min(30, self.backoff_max))
+        return espera * random.uniform(0.5, 1.0)
+
+    async def _tras_conectar(self, terminal, estado):
+        estado['recuperando'] = True
+        try:
+            recuperados = await self.al_conectar(terminal)
+            if isinstance(recuperados, int):
+                estado['recuperados'] += recuperados
+                RECUPERADOS.inc(recuperados, terminal=terminal['nombre'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ [{terminal['nombre']}] Error al recuperar eventos tras conectar: {e}")
+        finally:
+            estado['recuperando'] = False
+
+    def _lanzar_al_conectar(self, terminal, estado):
+        # Una sola a la vez por terminal: si la anterior sigue en curso, ya cubre este corte
+        previa = self._al_conectar_tareas.get(terminal['id'])
+        if self.al_conectar is None or (previa is not None and not previa.done()):
+            return
+        self._al_conectar_tareas[terminal['id']] = asyncio.create_task(
+            self._tras_conectar(terminal, estado), name=f"al-conectar-{terminal['id']}")
+
+    async def _escuchar(self, terminal):
+        estado = self.estado[terminal['id']]
+        auth = AutenticacionDigest(terminal.get('usuario'), terminal.get('clave'))
+        while True:
+            writer = None
+            autenticacion_fallida = False
+            try:
+                reader, writer, cabeceras = await abrir_stream(terminal, auth, self.timeout)
+                estado.update(conectado=True, fallos_seguidos=0, ultimo_error=None)
+                estado['conexiones'] += 1
+                print(f"✅ [{terminal['nombre']}] Conexión al stream de eventos establecida.")
+                self._lanzar_al_conectar(terminal, estado)
+                boundary = framer_stream.boundary_desde_content_type(cabecera(cabeceras, 'content-type'))
+                framer = framer_stream.FramerAlertStream(boundary)
+                async for bloque in leer_cuerpo(reader, cabeceras, self.timeout, config.STREAM_TAMANO_BLOQUE):
+                    for evento in framer.alimentar(bloque):
+                        estado['eventos'] += 1
+                        estado['ultimo_evento'] = time.time()
+                        EVENTOS.inc(terminal=terminal['nombre'])
+                        try:
+                            resultado = self.al_evento(terminal, evento)
+                            if inspect.isawaitable(resultado):
+                                await resultado
+                        except Exception as e:
+                            print(f"❌ [{terminal['nombre']}] Error procesando evento: {e}")
+                estado['ultimo_error'] = "Stream cerrado por el terminal"
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                estado['ultimo_error'] = f"Sin datos durante {self.timeout}s"
+            except ErrorGateway as e:
+                autenticacion_fallida = str(e) == "HTTP 401"
+                estado['ultimo_error'] = str(e)
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                estado['ultimo_error'] = f"{type(e).__name__}: {e}"
+            finally:
+                estado['conectado'] = False
+                if writer is not None:
+                    writer.close()
+
+            espera = self._espera_reconexion(estado, autenticacion_fallida)
+            estado['fallos_seguidos'] += 1
+            RECONEXIONES.inc(terminal=terminal['nombre'])
+            print(f"⚠️ [{terminal['nombre']}] {estado['ultimo_error']}. Reconectando en {espera:.0f}s...")
+            await asyncio.sleep(espera)
+
+    async def ejecutar(self):
+        """Corre hasta que se llame a detener(): una tarea por terminal."""
+        self._loop = asyncio.get_running_loop()
+        self._tareas = [asyncio.create_task(self._escuchar(t), name=f"terminal-{t['id']}") for t in self.terminales]
+        if not self._tareas:
+            print("⚠️ No hay terminales activos en la tabla dispositivos.")
+            return
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        for tarea in self._al_conectar_tareas.values():
+            tarea.cancel()
+        await asyncio.gather(*self._al_conectar_tareas.values(), return_exceptions=True)
+
+    def detener(self):
+        """Cancela todas las tareas (se puede llamar desde otro hilo)."""
+        if self._loop is None:
+            return
+        for tarea in self._tareas:
+            self._loop.call_soon_threadsafe(tarea.cancel)
+
+# --- Dispositivos en la BD ---
+def cargar_terminales(conn):
+    """
+    Terminales activos con su puerta asociada: lista de dicts con la clave 'puerta'
+    (dict con id, nombre, host y token, o None si el terminal no abre ninguna puerta).
+    """
+    filas = conn.execute("""
+        SELECT t.id, t.nombre, t.host, t.usuario, t.clave, t.ruta_stream,
+               p.id AS puerta_id, p.nombre AS puerta_nombre, p.host AS puerta_host, p.token AS puerta_token
+        FROM dispositivos t
+        LEFT JOIN dispositivos p ON p.id = t.puerta_id AND p.tipo = 'puerta' AND p.activo = 1
+        WHERE t.tipo = 'terminal' AND t.activo = 1
+        ORDER BY t.id
+    """).fetchall()
+    terminales = []
+    for f in filas:
+        t = {k: f[k] for k in ('id', 'nombre', 'host', 'usuario', 'clave', 'ruta_stream')}
+        t['puerta'] = ({'id': f['puerta_id'], 'nombre': f['puerta_nombre'], 'host': f['puerta_host'],
+                        'token': f['puerta_token']} if f['puerta_id'] is not None else None)
+        terminales.append(t)
+    return terminales
@@ -0,0 +1,339 @@
+import argparse
+import sqlite3
+import sys
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import reportes
+
+# --- HORARIOS POR DOCENTE ---
+# Cada fila de `horarios` es un turno: docente (NULL = horario general), día de la
+# semana, jornada (0 = primera/mañana, 1 = segunda/tarde o noche), hora de entrada y
+# de salida, y vigencia [desde, hasta]. Un docente con turnos propios vigentes en una
+# fecha usa solo los suyos ese día (un día de la semana sin turnos es libre: medio
+# tiempo, fines de semana); si no tiene, usa el general. Sin filas generales, el
+# horario general es el de config.py (HORARIO_*).
+#
+# Las marcas de un día se reparten entre las dos jornadas con un corte: la entrada de
+# la segunda jornada menos HORARIO_MARGEN_ENTRADA_MIN (14:00 - 10 min = el 13:50 de
+# reportes.CORTE_JORNADA). Sin segunda jornada todo cuenta en la primera, y en un día
+# sin turnos se usa CORTE_JORNADA.
+#
+# IndiceHorarios compila las filas una sola vez en intervalos de vigencia por docente:
+# los días (ordinales, ordenados) en que cambia su horario y la semana tipo de cada
+# intervalo. Ubicar el horario de una fecha es una búsqueda binaria, y el de un rango
+# completo (matrices) un solo np.searchsorted por docente con horario propio, sin
+# recorrer filas ni días en Python.
+
+DIAS_SEMANA = ('Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo')
+JORNADAS = ('Mañana', 'Tarde / Noche')
+# Cortes de un día con una sola jornada: todas las marcas cuentan en ella (las marcas
+# se comparan con `segundo > corte`, así -1 manda todo a la tarde y 86400 a la mañana)
+FIN_DIA = 86400
+INICIO_DIA = -1
+_PRIMER_DIA = date.min.toordinal()
+
+_Turno = namedtuple('_Turno', 'dia_semana jornada entrada salida desde hasta')  # Segundos y ordinales
+
+class ErrorHorario(Exception):
+    """Turno inválido (horas, días, vigencia o choque con la otra jornada)."""
+
+def crear_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS horarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER REFERENCES usuarios (id) ON DELETE CASCADE,  -- NULL = horario general
+            dia_semana INTEGER NOT NULL CHECK (dia_semana BETWEEN 0 AND 6),  -- Lunes=0 ... Domingo=6
+            jornada INTEGER NOT NULL CHECK (jornada IN (0, 1)),
+            entrada TEXT NOT NULL,              -- 'HH:MM'
+            salida TEXT NOT NULL,               -- 'HH:MM', después de la entrada
+            desde TEXT NOT NULL,                -- 'YYYY-MM-DD', primer día de vigencia
+            hasta TEXT                          -- último día de vigencia (NULL = sin fin)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_horarios_usuario ON horarios (usuario_id, dia_semana, jornada)")
+
+def _segundos(hora):
+    """'HH:MM' -> segundos desde la medianoche."""
+    try:
+        t = datetime.strptime(hora.strip(), '%H:%M')
+    except (AttributeError, ValueError):
+        raise ErrorHorario(f"Hora inválida: {hora!r}. Use HH:MM.")
+    return t.hour * 3600 + t.minute * 60
+
+def _fecha(texto):
+    try:
+        return datetime.strptime(texto.strip(), '%Y-%m-%d').date()
+    except (AttributeError, ValueError):
+        raise ErrorHorario(f"Fecha inválida: {texto!r}. Use YYYY-MM-DD.")
+
+# --- Edición ---
+def listar(conn, usuario_id):
+    """Turnos de un docente (usuarios.id) o, con None, los del horario general."""
+    return conn.execute("SELECT * FROM horarios WHERE usuario_id IS ? ORDER BY dia_semana, jornada, desde",
+                        (usuario_id,)).fetchall()
+
+def agregar(conn, usuario_id, dias_semana, jornada, entrada, salida, desde, hasta=None):
+    """
+    Agrega el turno en cada día de `dias_semana` con vigencia [desde, hasta] ('YYYY-MM-DD';
+    hasta None = sin fin). Donde se superpone con un turno existente de la misma jornada, el
+    nuevo lo reemplaza: el anterior se acorta (o se parte en dos) para conservar el resto de
+    su vigencia. No confirma: se ejecuta dentro de la transacción del llamador.
+    Devuelve la cantidad de turnos agregados.
+    """
+    try:
+        dias_semana = sorted({int(d) for d in dias_semana})
+        jornada = int(jornada)
+    except (TypeError, ValueError):
+        raise ErrorHorario("Días de la semana o jornada inválidos.")
+    if not dias_semana or not all(0 <= d <= 6 for d in dias_semana):
+        raise ErrorHorario("Seleccione al menos un día de la semana.")
+    if jornada not in (0, 1):
+        raise ErrorHorario("La jornada debe ser 0 (mañana) o 1 (tarde / noche).")
+    if _segundos(entrada) >= _segundos(salida):
+        raise ErrorHorario("La salida debe ser posterior a la entrada (los turnos no cruzan la medianoche).")
+    inicio, fin = _fecha(desde), _fecha(hasta) if hasta else None
+    if fin and fin < inicio:
+        raise ErrorHorario("La vigencia termina antes de empezar.")
+    desde, hasta = inicio.isoformat(), fin.isoformat() if fin else None
+
+    # Vigencias que se cruzan con [desde, hasta]
+    cruce = "usuario_id IS ? AND dia_semana = ? AND desde <= COALESCE(?, '9999-12-31') AND COALESCE(hasta, '9999-12-31') >= ?"
+    for dia in dias_semana:
+        # La primera jornada debe terminar antes de que empiece la segunda
+        for otro in conn.execute(f"SELECT entrada, salida FROM horarios WHERE {cruce} AND jornada = ?",
+                                 (usuario_id, dia, hasta, desde, 1 - jornada)):
+            primera, segunda = ((entrada, salida), tuple(otro)) if jornada == 0 else (tuple(otro), (entrada, salida))
+            if _segundos(primera[1]) > _segundos(segunda[0]):
+                raise ErrorHorario(f"{DIAS_SEMANA[dia]}: la mañana ({primera[0]}-{primera[1]}) se cruza con "
+                                   f"la tarde ({segunda[0]}-{segunda[1]}).")
+        for existente in conn.execute(f"SELECT * FROM horarios WHERE {cruce} AND jornada = ?",
+                                      (usuario_id, dia, hasta, desde, jornada)).fetchall():
+            antes = (existente['desde'], (inicio - timedelta(days=1)).isoformat()) if existente['desde'] < desde else None
+            despues = None
+            if fin and (existente['hasta'] is None or existente['hasta'] > hasta):
+                despues = ((fin + timedelta(days=1)).isoformat(), existente['hasta'])
+            if antes is None and despues is None:
+                conn.execute("DELETE FROM horarios WHERE id = ?", (existente['id'],))
+                continue
+            conn.execute("UPDATE horarios SET desde = ?, hasta = ? WHERE id = ?", (*(antes or despues), existente['id']))
+            if antes and despues:
+                conn.execute("INSERT INTO horarios (usuario_id, dia_semana, jornada, entrada, salida, desde, hasta) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (usuario_id, dia, jornada, existente['entrada'], existente['salida'], *despues))
+    conn.executemany("INSERT INTO horarios (usuario_id, dia_semana, jornada, entrada, salida, desde, hasta) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     [(usuario_id, dia, jornada, entrada.strip(), salida.strip(), desde, hasta) for dia in dias_semana])
+    return len(dias_semana)
+
+def eliminar(conn, turno_id, usuario_id):
+    """Borra un turno del docente (o del horario general con None). Devuelve si existía."""
+    return conn.execute("DELETE FROM horarios WHERE id = ? AND usuario_id IS ?", (turno_id, usuario_id)).rowcount > 0
+
+# --- Índice de intervalos ---
+def _semana_config():
+    """Semana tipo del horario general de config.py."""
+    semana = [(None, None) for _ in range(7)]
+    turnos = [(config.HORARIO_ENTRADA_MANANA, config.HORARIO_SALIDA_MANANA),
+              (config.HORARIO_ENTRADA_TARDE, config.HORARIO_SALIDA_TARDE)]
+    turnos = tuple((_segundos(e), _segundos(s)) if e else None for e, s in turnos)
+    for dia in config.HORARIO_DIAS_LABORABLES:
+        semana[dia] = turnos
+    return semana
+
+class _Intervalos:
+    """
+    Horario de un docente (o el general): `limites[k]` es el primer día (ordinal) del
+    intervalo k y `semanas[k]` su semana tipo, 7 pares (turno de la mañana, de la tarde)
+    con (entrada, salida) en segundos o None; None si en ese intervalo no hay turnos vigentes.
+    """
+
+    def __init__(self, turnos=None, semana=None):
+        self._arreglos = None
+        if semana is not None:
+            self.limites, self.semanas = [_PRIMER_DIA], [semana]
+            return
+        cambios = {t.desde for t in turnos} | {t.hasta + 1 for t in turnos if t.hasta is not None}
+        self.limites = sorted(cambios | {_PRIMER_DIA})
+        self.semanas = []
+        for inicio in self.limites:
+            vigentes = [t for t in turnos if t.desde <= inicio and (t.hasta is None or t.hasta >= inicio)]
+            if not vigentes:
+                self.semanas.append(None)
+                continue
+            semana = [[None, None] for _ in range(7)]
+            for t in vigentes:
+                semana[t.dia_semana][t.jornada] = (t.entrada, t.salida)
+            self.semanas.append([tuple(d) for d in semana])
+
+    def semana(self, ordinal):
+        return self.semanas[bisect_right(self.limites, ordinal) - 1]
+
+    def tramos(self, inicio, fin):
+        """(semana, primer día, último día) de cada intervalo que se cruza con [inicio, fin] (ordinales)."""
+        k = bisect_right(self.limites, inicio) - 1
+        while k < len(self.limites) and self.limites[k] <= fin:
+            ultimo = self.limites[k + 1] - 1 if k + 1 < len(self.limites) else fin
+            yield self.semanas[k], max(inicio, self.limites[k]), min(fin, ultimo)
+            k += 1
+
+class IndiceHorarios:
+    """
+    Horarios compilados a intervalos de vigencia (ver el comentario del módulo), por
+    biometric_id. `turnos(...)`, `corte(...)` consultan una fecha; `matrices(...)` un
+    rango completo con numpy.
+    """
+
+    def __init__(self, filas, margen_min=None, corte_defecto=None):
+        margen = config.HORARIO_MARGEN_ENTRADA_MIN if margen_min is None else margen_min
+        self.margen = margen * 60
+        corte = corte_defecto or reportes.CORTE_JORNADA
+        self.corte_defecto = corte.hour * 3600 + corte.minute * 60 + corte.second
+        por_docente = {}
+        for biometric_id, dia_semana, jornada, entrada, salida, desde, hasta in filas:
+            turno = _Turno(dia_semana, jornada, _segundos(entrada), _segundos(salida),
+                           _fecha(desde).toordinal(), _fecha(hasta).toordinal() if hasta else None)
+            por_docente.setdefault(None if biometric_id is None else str(biometric_id), []).append(turno)
+        general = por_docente.pop(None, None)
+        self.general = _Intervalos(general) if general else _Intervalos(semana=_semana_config())
+        self.propios = {b: _Intervalos(turnos) for b, turnos in por_docente.items()}
+
+    def _semana(self, biometric_id, ordinal):
+        propios = self.propios.get(str(biometric_id))
+        semana = propios.semana(ordinal) if propios else None
+        if semana is None:
+            semana = self.general.semana(ordinal)
+        return semana or [(None, None)] * 7
+
+    def turnos(self, biometric_id, dia):
+        """(turno de la mañana, turno de la tarde) del docente en la fecha `dia`: (entrada, salida) o None."""
+        return self._semana(biometric_id, dia.toordinal())[dia.weekday()]
+
+    def _corte_turnos(self, turnos):
+        primera, segunda = turnos
+        if primera and segunda:
+            return max(segunda[0] - self.margen, primera[0])
+        if segunda:
+            # Solo tarde/noche: una llegada temprana no debe quedar en una mañana vacía
+            return INICIO_DIA
+        return FIN_DIA if primera else self.corte_defecto
+
+    def corte(self, biometric_id, dia):
+        """Segundo del día que separa las marcas de la mañana (<=) de las de la tarde (>)."""
+        return self._corte_turnos(self.turnos(biometric_id, dia))
+
+    def _difiere(self, intervalos, inicio, fin):
+        for semana, a, b in intervalos.tramos(inicio, fin):
+            if semana is None:
+                continue
+            dias = range(7) if b - a >= 6 else {date.fromordinal(o).weekday() for o in range(a, b + 1)}
+            if any(self._corte_turnos(semana[d]) != self.corte_defecto for d in dias):
+                return True
+        return False
+
+    def con_corte_distinto(self, biometric_ids, inicio, fin):
+        """biometric_ids cuyo corte entre jornadas difiere de CORTE_JORNADA algún día de [inicio, fin]."""
+        inicio, fin = inicio.toordinal(), fin.toordinal()
+        ids = {str(b) for b in biometric_ids}
+        if self._difiere(self.general, inicio, fin):
+            return ids
+        return {b for b in ids if b in self.propios and self._difiere(self.propios[b], inicio, fin)}
+
+    def _arreglos(self, intervalos):
+        """(limites, turnos (k, 7, 2, 2) con NaN, cortes (k, 7), cubierto (k,)) de numpy, calculados una vez."""
+        import numpy as np
+
+        if intervalos._arreglos is None:
+            vacia = [(None, None)] * 7
+            turnos = np.array([[[t if t else (np.nan, np.nan) for t in dia] for dia in (s or vacia)]
+                               for s in intervalos.semanas], dtype=np.float64)
+            cortes = np.array([[self._corte_turnos(dia) for dia in (s or vacia)] for s in intervalos.semanas],
+                              dtype=np.int32)
+            cubierto = np.array([s is not None for s in intervalos.semanas])
+            intervalos._arreglos = (np.array(intervalos.limites, dtype=np.int64), turnos, cortes, cubierto)
+        return intervalos._arreglos
+
+    def matrices(self, biometric_ids, dias):
+        """
+        Horario de cada docente y día del rango: entradas y salidas programadas (segundos;
+        NaN sin turno), arreglos (docentes, días, 2), y el corte entre jornadas, (docentes, días).
+        """
+        import numpy as np
+
+        ordinales = np.array([d.toordinal() for d in dias], dtype=np.int64)
+        dia_semana = np.array([d.weekday() for d in dias], dtype=np.int64)
+
+        def expandir(intervalos):
+            limites, turnos, cortes, cubierto = self._arreglos(intervalos)
+            k = np.searchsorted(limites, ordinales, side='right') - 1
+            return turnos[k, dia_semana], cortes[k, dia_semana], cubierto[k]
+
+        turnos_general, cortes_general, _ = expandir(self.general)
+        n = len(biometric_ids)
+        turnos = np.broadcast_to(turnos_general, (n, *turnos_general.shape)).copy()
+        cortes = np.broadcast_to(cortes_general, (n, len(dias))).copy()
+        for i, biometric_id in enumerate(biometric_ids):
+            propios = self.propios.get(str(biometric_id))
+            if propios:
+                turnos_propios, cortes_propios, cubierto = expandir(propios)
+                turnos[i, cubierto] = turnos_propios[cubierto]
+                cortes[i, cubierto] = cortes_propios[cubierto]
+        return turnos[..., 0], turnos[..., 1], cortes
+
+def cargar(conn):
+    """Índice con todos los turnos vigentes de docentes existentes y los generales."""
+    return IndiceHorarios(conn.execute(
+        "SELECT u.biometric_id, h.dia_semana, h.jornada, h.entrada, h.salida, h.desde, h.hasta "
+        "FROM horarios h LEFT JOIN usuarios u ON u.id = h.usuario_id "
+        "WHERE h.usuario_id IS NULL OR u.id IS NOT NULL").fetchall())
+
+def main(argv=None):
+    """Lista, agrega o elimina turnos de un docente (--docente, por biometric_id) o del horario general."""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('--db', default=config.DB_NAME)
+    parser.add_argument('--docente', help="biometric_id (sin él: horario general)")
+    sub = parser.add_subparsers(dest='accion', required=True)
+    sub.add_parser('listar')
+    nuevo = sub.add_parser('agregar')
+    nuevo.add_argument('--dias', required=True, help="Días de la semana, Lunes=0: p. ej. 0,1,2,3,4")
+    nuevo.add_argument('--jornada', type=int, choices=(0, 1), required=True, help="0 = mañana, 1 = tarde / noche")
+    nuevo.add_argument('--entrada', required=True, help="HH:MM")
+    nuevo.add_argument('--salida', required=True, help="HH:MM")
+    nuevo.add_argument('--desde', default=date.today().isoformat(), help="YYYY-MM-DD (por defecto, hoy)")
+    nuevo.add_argument('--hasta', help="YYYY-MM-DD (por defecto, sin fin)")
+    borrar = sub.add_parser('eliminar')
+    borrar.add_argument('id', type=int)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        usuario_id = None
+        if args.docente:
+            fila = conn.execute("SELECT id FROM usuarios WHERE biometric_id = ?", (args.docente,)).fetchone()
+            if not fila:
+                parser.error(f"No existe el docente con biometric_id {args.docente}.")
+            usuario_id = fila['id']
+        with conn:
+            if args.accion == 'agregar':
+                try:
+                    n = agregar(conn, usuario_id, args.dias.split(','), args.jornada, args.entrada, args.salida,
+                                args.desde, args.hasta)
+                except ErrorHorario as e:
+                    parser.error(str(e))
+                print(f"✅ {n} turno(s) agregado(s).")
+            elif args.accion == 'eliminar':
+                print("✅ Turno eliminado." if eliminar(conn, args.id, usuario_id) else "⚠️ No existe ese turno.")
+        for t in listar(conn, usuario_id):
+            print(f"{t['id']:>5}  {DIAS_SEMANA[t['dia_semana']]:<10} {JORNADAS[t['jornada']]:<14} "
+                  f"{t['entrada']}-{t['salida']}  {t['desde']} a {t['hasta'] or 'sin fin'}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,427 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import get_context
+
+from werkzeug.security import generate_password_hash
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import metricas
+import pool_db
+
+# --- IMPORTACIÓN Y EXPORTACIÓN MASIVA DE DOCENTES ---
+# Al inicio de cada semestre se cargan cientos o miles de docentes de una planilla.
+# Un archivo (CSV o XLSX) se procesa en tres pasos:
+# 1. lectura y validación de todas las filas contra la BD y entre sí (duplicados,
+#    IDs biométricos ocupados, campos vacíos); con un solo error no se guarda nada
+#    y se devuelve la lista completa de errores con su número de fila;
+# 2. hash de las contraseñas en un pool de IMPORTACION_PROCESOS procesos: con scrypt
+#    cada hash cuesta ~0,1 s de CPU, 10.000 filas son ~20 min en un solo núcleo;
+# 3. escritura de todo el archivo en una única transacción (o entra todo o nada).
+# Una sola importación a la vez en todos los procesos: la que corre ocupa la fila de
+# `importacion_en_curso` y renueva su latido desde un hilo. Desde la web solo se aceptan
+# archivos con hasta IMPORTACION_MAX_HASHES_WEB contraseñas; los más grandes van por la
+# línea de comandos, que no tiene el límite de tiempo de una petición.
+# La exportación usa los mismos encabezados (la contraseña va vacía), así que el
+# archivo exportado se puede editar y volver a importar en modo "actualizar".
+
+# Encabezado normalizado (minúsculas, sin tildes) -> campo
+ENCABEZADOS = {
+    'nombre': 'nombre', 'nombre completo': 'nombre', 'docente': 'nombre',
+    'biometric_id': 'biometric_id', 'bio_id': 'biometric_id', 'id biometrico': 'biometric_id',
+    'username': 'username', 'usuario': 'username', 'usuario login': 'username',
+    'password': 'password', 'contrasena': 'password', 'clave': 'password',
+    'acceso_puerta': 'acceso_puerta', 'acceso': 'acceso_puerta', 'permiso de puerta': 'acceso_puerta',
+}
+COLUMNAS_EXPORTACION = ['nombre', 'biometric_id', 'username', 'password', 'acceso_puerta']
+OBLIGATORIAS = ('nombre', 'biometric_id', 'username')
+VALORES_SI = {'1', 'si', 'true', 'x', 'yes'}
+VALORES_NO = {'', '0', 'no', 'false'}
+MODOS = ('crear', 'actualizar')
+EXTENSIONES = ('.csv', '.xlsx')
+
+IMPORTACION_SEGUNDOS = metricas.histograma(
+    'importacion_docentes_segundos', "Duración de cada etapa de la importación masiva de docentes.", ('etapa',),
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 900, 1800))
+ACCESO_LOTE = metricas.contador(
+    'acceso_puerta_lote_total', "Docentes cuyo permiso de puerta cambió por una actualización en lote.",
+    ('estado',))
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede leer (formato, encabezados o tamaño)."""
+
+def crear_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS importacion_en_curso (
+            id INTEGER PRIMARY KEY CHECK (id = 1),  -- a lo sumo una fila
+            dueno TEXT NOT NULL,
+            latido REAL NOT NULL
+        )
+    """)
+
+class _BloqueoImportacion:
+    """
+    Ocupa la fila de `importacion_en_curso` mientras dura una importación y renueva el
+    latido cada IMPORTACION_LATIDO segundos. Si el proceso muere, la fila se da por
+    libre a los IMPORTACION_EXPIRA segundos sin latido.
+    """
+
+    def __init__(self):
+        self.dueno = uuid.uuid4().hex
+        self._fin = threading.Event()
+
+    def tomar(self):
+        ahora = time.time()
+        conn = pool_db.obtener_pool(config.DB_NAME).adquirir()
+        try:
+            with pool_db.transaccion_escritura(conn, 'importacion'):
+                conn.execute("DELETE FROM importacion_en_curso WHERE latido < ?", (ahora - config.IMPORTACION_EXPIRA,))
+                tomado = conn.execute("INSERT OR IGNORE INTO importacion_en_curso (id, dueno, latido) VALUES (1, ?, ?)",
+                                      (self.dueno, ahora)).rowcount == 1
+        finally:
+            conn.close()
+        if tomado:
+            threading.Thread(target=self._latir, name="importacion-latido", daemon=True).start()
+        return tomado
+
+    def _latir(self):
+        while not self._fin.wait(config.IMPORTACION_LATIDO):
+            self._escribir("UPDATE importacion_en_curso SET latido = ? WHERE dueno = ?", (time.time(), self.dueno))
+
+    def soltar(self):
+        self._fin.set()
+        self._escribir("DELETE FROM importacion_en_curso WHERE dueno = ?", (self.dueno,))
+
+    def _escribir(self, sql, parametros):
+        conn = pool_db.obtener_pool(config.DB_NAME).adquirir()
+        try:
+            with conn:
+                conn.execute(sql, parametros)
+        except sqlite3.Error as e:
+            print(f"⚠️ Error actualizando el bloqueo de la importación: {e}")
+        finally:
+            conn.close()
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto or '').strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+def _celda(valor):
+    """Valor de celda como texto; los números enteros de Excel (101.0) quedan como '101'."""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+# --- Lectura ---
+def _filas_csv(contenido):
+    try:
+        texto = contenido.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = contenido.decode('latin-1')  # CSV guardado por Excel en Windows
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(io.StringIO(texto, newline=''), dialecto)
+
+def _filas_xlsx(contenido):
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(io.BytesIO(contenido), read_only=True, data_only=True)
+    except Exception as e:
+        raise ErrorImportacion(f"No se pudo abrir el archivo Excel: {e}")
+    try:
+        for fila in wb.worksheets[0].iter_rows(values_only=True):
+            yield [_celda(v) for v in fila]
+    finally:
+        wb.close()
+
+def leer_archivo(contenido, nombre_archivo):
+    """
+    Devuelve [(número de fila, {campo: texto})] del CSV o XLSX, sin las filas vacías.
+    La primera fila debe tener los encabezados (ver ENCABEZADOS).
+    """
+    extension = os.path.splitext(nombre_archivo or '')[1].lower()
+    if extension not in EXTENSIONES:
+        raise ErrorImportacion("Formato no soportado: use un archivo .csv o .xlsx.")
+    filas = _filas_xlsx(contenido) if extension == '.xlsx' else _filas_csv(contenido)
+
+    encabezado = next(filas, None)
+    campos = [ENCABEZADOS.get(_normalizar(c)) for c in encabezado or []]
+    faltantes = [c for c in OBLIGATORIAS if c not in campos]
+    if faltantes:
+        raise ErrorImportacion(f"Faltan columnas obligatorias: {', '.join(faltantes)}.")
+
+    registros = []
+    for numero, fila in enumerate(filas, start=2):
+        registro = {campo: _celda(valor) for campo, valor in zip(campos, fila) if campo}
+        if not any(registro.values()):
+            continue
+        if len(registros) >= config.IMPORTACION_MAX_FILAS:
+            raise ErrorImportacion(f"El archivo supera el máximo de {config.IMPORTACION_MAX_FILAS} docentes.")
+        registros.append((numero, registro))
+    return registros
+
+# --- Validación ---
+def validar(conn, registros, modo='crear'):
+    """
+    Valida las filas contra la BD y entre sí. Devuelve (nuevos, cambios, errores):
+    - nuevos: dicts con los docentes a crear;
+    - cambios: dicts con el id del docente existente y los campos a actualizar;
+    - errores: [(número de fila, mensaje)].
+    En modo 'crear' un usuario ya existente es un error; en 'actualizar' se actualiza
+    (por username) y la contraseña vacía o el permiso ausente conservan el valor actual.
+    """
+    if modo not in MODOS:
+        raise ValueError(f"Modo de importación desconocido: {modo}")
+    existentes = {r['username']: r for r in conn.execute(
+        "SELECT id, biometric_id, username, rol, acceso_puerta FROM usuarios")}
+    dueno_bio = {r['biometric_id']: r['username'] for r in existentes.values()}
+
+    nuevos, cambios, errores = [], [], []
+    usernames, bio_ids = {}, {}
+    for numero, r in registros:
+        errores_fila = []
+        for campo in OBLIGATORIAS:
+            if not r.get(campo):
+                errores_fila.append(f"'{campo}' está vacío")
+        username, bio_id = r.get('username', ''), r.get('biometric_id', '')
+        if bio_id and not bio_id.isdigit():
+            errores_fila.append(f"biometric_id '{bio_id}' no es un número")
+        if username and username in usernames:
+            errores_fila.append(f"username '{username}' repetido (fila {usernames[username]})")
+        if bio_id and bio_id in bio_ids:
+            errores_fila.append(f"biometric_id {bio_id} repetido (fila {bio_ids[bio_id]})")
+        usernames.setdefault(username, numero)
+        bio_ids.setdefault(bio_id, numero)
+
+        acceso = _normalizar(r['acceso_puerta']) if 'acceso_puerta' in r else None
+        if acceso is not None and acceso not in VALORES_SI | VALORES_NO:
+            errores_fila.append(f"acceso_puerta '{r['acceso_puerta']}' no es sí/no")
+        acceso = None if acceso is None else int(acceso in VALORES_SI)
+
+        actual = existentes.get(username)
+        if actual is not None and modo == 'crear':
+            errores_fila.append(f"el usuario '{username}' ya existe")
+        elif actual is not None and actual['rol'] != 'docente':
+            errores_fila.append(f"el usuario '{username}' no es docente")
+        if bio_id and dueno_bio.get(bio_id, username) != username:
+            errores_fila.append(f"biometric_id {bio_id} ya pertenece a '{dueno_bio[bio_id]}'")
+        if actual is None and not r.get('password'):
+            errores_fila.append("'password' está vacío")
+
+        if errores_fila:
+            errores.extend((numero, e) for e in errores_fila)
+        elif actual is None:
+            nuevos.append({'biometric_id': bio_id, 'nombre': r['nombre'], 'username': username,
+                           'password': r['password'], 'acceso_puerta': acceso or 0})
+        else:
+            cambios.append({'id': actual['id'], 'biometric_id': bio_id, 'nombre': r['nombre'],
+                            'password': r.get('password') or None,
+                            'acceso_puerta': actual['acceso_puerta'] if acceso is None else acceso})
+    return nuevos, cambios, errores
+
+# --- Hash en paralelo ---
+def hashear(passwords, procesos=None, metodo=None):
+    """
+    Hash de cada contraseña con `metodo` (config.PASSWORD_METODO), repartido en un pool
+    de procesos: scrypt/pbkdf2 no escalan con hilos más allá de los núcleos y así el GIL
+    del proceso web queda libre. Cada contraseña lleva su propia sal aunque se repita.
+    """
+    procesos = procesos or config.IMPORTACION_PROCESOS or os.cpu_count() or 1
+    metodo = metodo or config.PASSWORD_METODO
+    if procesos <= 1 or len(passwords) <= procesos:
+        return [generate_password_hash(p, metodo) for p in passwords]
+    # "spawn" igual en Windows y Linux: los hijos no heredan hilos ni conexiones del proceso web
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=get_context('spawn')) as pool:
+        bloque = max(1, min(64, len(passwords) // (procesos * 4)))
+        return list(pool.map(generate_password_hash, passwords, repeat(metodo), chunksize=bloque))
+
+# --- Importación completa ---
+def importar(contenido, nombre_archivo, modo='crear', procesos=None, max_hashes=None):
+    """
+    Lee, valida, hashea y guarda un archivo de docentes. Devuelve un dict con
+    'creados', 'actualizados', 'errores' [(fila, mensaje)] y 'tiempos' {etapa: segundos}.
+    Si hay errores no se guarda nada. Una sola importación a la vez en todos los procesos;
+    con `max_hashes`, ErrorImportacion si el archivo trae más contraseñas que eso.
+    """
+    bloqueo = _BloqueoImportacion()
+    if not bloqueo.tomar():
+        raise ErrorImportacion("Ya hay una importación en curso. Intente de nuevo cuando termine.")
+    try:
+        tiempos = {}
+
+        def etapa(nombre, t0):
+            tiempos[nombre] = time.perf_counter() - t0
+            IMPORTACION_SEGUNDOS.observar(tiempos[nombre], etapa=nombre)
+            return time.perf_counter()
+
+        t = time.perf_counter()
+        registros = leer_archivo(contenido, nombre_archivo)
+        t = etapa('lectura', t)
+        conn = pool_db.obtener_pool(config.DB_NAME, solo_lectura=True).adquirir()
+        try:
+            nuevos, cambios, errores = validar(conn, registros, modo)
+        finally:
+            conn.close()
+        t = etapa('validacion', t)
+        resultado = {'creados': 0, 'actualizados': 0, 'errores': errores, 'tiempos': tiempos}
+        if errores:
+            return resultado
+
+        con_password = [r for r in nuevos + cambios if r['password']]
+        if max_hashes is not None and len(con_password) > max_hashes:
+            raise ErrorImportacion(
+                f"El archivo trae {len(con_password)} contraseñas y desde la web se aceptan hasta {max_hashes}. "
+                f"Impórtelo en el servidor con: python importacion_docentes.py {nombre_archivo} --modo {modo}")
+        for r, hash_ in zip(con_password, hashear([r['password'] for r in con_password], procesos)):
+            r['password'] = hash_
+        t = etapa('hash', t)
+
+        conn = pool_db.obtener_pool(config.DB_NAME).adquirir()
+        try:
+            with pool_db.transaccion_escritura(conn, 'importacion'):
+                conn.executemany(
+                    "INSERT INTO usuarios (biometric_id, nombre, username, password, rol, acceso_puerta) "
+                    "VALUES (:biometric_id, :nombre, :username, :password, 'docente', :acceso_puerta)", nuevos)
+                conn.executemany(
+                    "UPDATE usuarios SET biometric_id = :biometric_id, nombre = :nombre, "
+                    "password = COALESCE(:password, password), acceso_puerta = :acceso_puerta WHERE id = :id",
+                    cambios)
+        except sqlite3.IntegrityError as e:
+            # Otro administrador cambió usuarios mientras se calculaban los hashes
+            resultado['errores'] = [(0, f"Conflicto con cambios hechos durante la importación ({e}); no se guardó nada.")]
+            return resultado
+        finally:
+            conn.close()
+        etapa('escritura', t)
+        resultado.update(creados=len(nuevos), actualizados=len(cambios))
+        return resultado
+    finally:
+        bloqueo.soltar()
+
+# --- Permiso de puerta en lote ---
+def actualizar_acceso(conn, estado, ids=None, biometric_ids=None, texto=None, todos=False):
+    """
+    Da (estado=True) o quita el permiso de puerta a varios docentes con un solo UPDATE:
+    por lista de ids, de biometric_ids, por texto (nombre, username o ID biométrico que
+    lo contengan) o a todos. Los administradores nunca se tocan. Solo se escriben las
+    filas cuyo permiso cambia; devuelve cuántas fueron. Hace commit. `estado` debe ser un
+    bool (TypeError si no): el texto "false" de un JSON mal armado no puede dar acceso.
+    """
+    if not isinstance(estado, bool):
+        raise TypeError("'estado' debe ser true o false")
+    condiciones, parametros = ["rol = 'docente'", "acceso_puerta IS NOT :estado"], {'estado': int(estado)}
+    if ids is not None:
+        condiciones.append("id IN (SELECT value FROM json_each(:ids))")
+        parametros['ids'] = _json_lista(ids, int)
+    if biometric_ids is not None:
+        condiciones.append("biometric_id IN (SELECT value FROM json_each(:bio_ids))")
+        parametros['bio_ids'] = _json_lista(biometric_ids, str)
+    if texto:
+        condiciones.append("(nombre LIKE :texto OR username LIKE :texto OR biometric_id LIKE :texto)")
+        parametros['texto'] = f"%{texto}%"
+    if ids is None and biometric_ids is None and not texto and not todos:
+        raise ValueError("Indique ids, biometric_ids, texto o todos")
+    with conn:
+        cambiados = conn.execute(
+            f"UPDATE usuarios SET acceso_puerta = :estado WHERE {' AND '.join(condiciones)}", parametros).rowcount
+    ACCESO_LOTE.inc(cambiados, estado='con_acceso' if estado else 'sin_acceso')
+    return cambiados
+
+def _json_lista(valores, tipo):
+    """Lista JSON de valores convertidos a `tipo` (ValueError si alguno no se puede)."""
+    if not isinstance(valores, (list, tuple)):
+        raise ValueError("Se esperaba una lista")
+    return json.dumps([tipo(v) for v in valores])
+
+# --- Exportación ---
+def iterar_docentes(lote=1000):
+    """
+    Docentes en orden de id, en páginas de `lote`; cada página usa una conexión del
+    pool y la devuelve enseguida, así una descarga lenta no retiene conexiones.
+    """
+    ultimo = 0
+    while True:
+        conn = pool_db.obtener_pool(config.DB_NAME, solo_lectura=True).adquirir()
+        try:
+            filas = conn.execute(
+                "SELECT id, nombre, biometric_id, username, acceso_puerta FROM usuarios "
+                "WHERE rol = 'docente' AND id > ? ORDER BY id LIMIT ?", (ultimo, lote)).fetchall()
+        finally:
+            conn.close()
+        for fila in filas:
+            yield [fila['nombre'], fila['biometric_id'], fila['username'], '', 'si' if fila['acceso_puerta'] else 'no']
+        if len(filas) < lote:
+            return
+        ultimo = filas[-1]['id']
+
+def generar_csv(filas, filas_por_bloque=500):
+    """Bloques de texto CSV con los encabezados de importación (la columna password va vacía)."""
+    buffer = io.StringIO()
+    buffer.write('\ufeff')  # BOM: Excel reconoce el UTF-8 (tildes y ñ)
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_EXPORTACION)
+    for i, fila in enumerate(filas, start=1):
+        writer.writerow(fila)
+        if i % filas_por_bloque == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def escribir_excel(filas, destino):
+    """Escribe los docentes en un libro write-only (la memoria no crece con la cantidad de filas)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Docentes")
+    ws.append(COLUMNAS_EXPORTACION)
+    for fila in filas:
+        ws.append(fila)
+    wb.save(destino)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Importa docentes desde un CSV o XLSX (útil para archivos grandes, sin límite de tiempo de la web).")
+    parser.add_argument('archivo')
+    parser.add_argument('--modo', choices=MODOS, default='crear')
+    parser.add_argument('--procesos', type=int, default=None, help="Procesos para los hashes (por defecto, los núcleos)")
+    parser.add_argument('--db', default=config.DB_NAME)
+    args = parser.parse_args(argv)
+    config.DB_NAME = args.db
+
+    import biometrico_driver
+    biometrico_driver.init_db()
+    with open(args.archivo, 'rb') as f:
+        contenido = f.read()
+    try:
+        resultado = importar(contenido, args.archivo, args.modo, args.procesos)
+    except ErrorImportacion as e:
+        print(f"❌ {e}")
+        return 1
+    for fila, mensaje in resultado['errores']:
+        print(f"  Fila {fila}: {mensaje}")
+    tiempos = ', '.join(f"{etapa} {s:.2f} s" for etapa, s in resultado['tiempos'].items())
+    if resultado['errores']:
+        print(f"❌ {len(resultado['errores'])} error(es); no se guardó nada ({tiempos}).")
+        return 1
+    print(f"✅ {resultado['creados']} docentes creados y {resultado['actualizados']} actualizados ({tiempos}).")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
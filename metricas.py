@@ -0,0 +1,193 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# --- MÉTRICAS (formato de texto de Prometheus) ---
+# Registro mínimo de contadores e histogramas en memoria, sin dependencias externas.
+# Cada módulo declara sus métricas al importarse (p. ej. la latencia de la puerta en
+# controlador_puerta.py) y las actualiza en el camino crítico con un lock corto;
+# GET /metrics las expone todas en el formato que entiende Prometheus.
+# Los valores que ya llevan otros objetos (colas del pipeline, terminales conectados)
+# se leen en el momento de exponerlos con `callback`.
+# Con varios procesos (servidor.py) cada uno tiene su registro: exponer(proceso=...)
+# agrega esa etiqueta a todas las series y combinar() junta las exposiciones.
+
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _numero(valor):
+    if valor == math.inf:
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in list(zip(nombres, valores)) + list(extra)]
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}, no {tuple(etiquetas)}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+
+    def _cabecera(self):
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+class Contador(_Metrica):
+    tipo = 'counter'
+
+    def inc(self, n=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + n
+
+    def valor(self, **etiquetas):
+        return self._series.get(self._clave(etiquetas), 0)
+
+    def exponer(self, fijas=()):
+        with self._lock:
+            series = sorted(self._series.items())
+        return self._cabecera() + [f"{self.nombre}{_etiquetas(self.etiquetas, c, fijas)} {_numero(v)}"
+                                   for c, v in series]
+
+class Histograma(_Metrica):
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        i = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # [cuentas por bucket (sin acumular) + la de +Inf, suma]
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][i] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa los segundos que tarda el bloque `with` (también si lanza una excepción)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - t0, **etiquetas)
+
+    def medir_iterador(self, iterable, **etiquetas):
+        """Recorre `iterable` y observa cuánto tardó en agotarse (p. ej. una respuesta por streaming)."""
+        with self.medir(**etiquetas):
+            yield from iterable
+
+    def exponer(self, fijas=()):
+        with self._lock:
+            series = sorted((c, list(cuentas), suma) for c, (cuentas, suma) in self._series.items())
+        lineas = self._cabecera()
+        for clave, cuentas, suma in series:
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets + (math.inf,), cuentas):
+                acumulado += cuenta
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, list(fijas) + [('le', _numero(limite))])} "
+                              f"{acumulado}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave, fijas)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave, fijas)} {acumulado}")
+        return lineas
+
+class Callback(_Metrica):
+    """
+    Métrica cuyo valor se lee al exponer: `funcion()` devuelve un número o, si hay
+    etiquetas, un dict {(valores de etiquetas): número}.
+    """
+
+    def __init__(self, nombre, ayuda, tipo, funcion, etiquetas=()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.tipo = tipo
+        self.funcion = funcion
+
+    def exponer(self, fijas=()):
+        try:
+            valores = self.funcion()
+        except Exception as e:
+            print(f"⚠️ Error leyendo la métrica {self.nombre}: {e}")
+            return []
+        if not self.etiquetas:
+            valores = {(): valores} if valores is not None else {}
+        return self._cabecera() + [f"{self.nombre}{_etiquetas(self.etiquetas, c, fijas)} {_numero(v)}"
+                                   for c, v in sorted(valores.items()) if v is not None]
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        """Registra la métrica; si ya había una con ese nombre (p. ej. al recargar un módulo), la reemplaza."""
+        with self._lock:
+            self._metricas[metrica.nombre] = metrica
+        return metrica
+
+    def exponer(self, **fijas):
+        """Todas las métricas; `fijas` son etiquetas que se agregan a cada serie (p. ej. proceso='ingesta')."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas += metrica.exponer(tuple(fijas.items()))
+        return "\n".join(lineas) + "\n"
+
+REGISTRO = Registro()
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+def contador(nombre, ayuda, etiquetas=()):
+    return REGISTRO.registrar(Contador(nombre, ayuda, etiquetas))
+
+def histograma(nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+    return REGISTRO.registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+def callback(nombre, ayuda, tipo, funcion, etiquetas=()):
+    return REGISTRO.registrar(Callback(nombre, ayuda, tipo, funcion, etiquetas))
+
+def exponer(**fijas):
+    return REGISTRO.exponer(**fijas)
+
+def combinar(*textos):
+    """
+    Une exposiciones de varios procesos (cada una con su etiqueta `proceso`): Prometheus
+    rechaza una métrica con dos cabeceras, así que las series de cada una van juntas
+    bajo la primera cabecera HELP/TYPE que aparezca.
+    """
+    familias = {}  # nombre -> (cabecera, series)
+    for texto in textos:
+        familia = None
+        for linea in texto.splitlines():
+            if linea.startswith('# HELP '):
+                nombre = linea.split(' ', 3)[2]
+                nueva = nombre not in familias
+                familia = familias.setdefault(nombre, ([linea], []))
+            elif linea.startswith('# TYPE '):
+                if nueva:
+                    familia[0].append(linea)
+            elif linea and familia is not None:
+                familia[1].append(linea)
+    lineas = []
+    for cabecera, series in familias.values():
+        lineas += cabecera + series
+    return "\n".join(lineas) + "\n"
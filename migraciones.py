@@ -0,0 +1,321 @@
+import sqlite3
+import sys
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import archivo_logs
+import asistencia_diaria
+import horarios
+import importacion_docentes
+import trabajos_reporte
+
+# --- MIGRACIONES VERSIONADAS DEL ESQUEMA ---
+# La versión aplicada se guarda en `PRAGMA user_version`. Cada migración se
+# ejecuta una sola vez, dentro de su propia transacción, y en orden.
+# Para agregar una migración: escribir la función y añadirla al final de MIGRACIONES.
+
+def _columnas(conn, tabla):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({tabla})")}
+
+def _m001_acceso_puerta(conn):
+    """Agrega la columna de permiso de puerta (antes en actualizar_db.py)."""
+    if 'acceso_puerta' not in _columnas(conn, 'usuarios'):
+        conn.execute("ALTER TABLE usuarios ADD COLUMN acceso_puerta INTEGER DEFAULT 0")
+        conn.execute("UPDATE usuarios SET acceso_puerta = 1 WHERE rol = 'admin'")
+
+def _m002_fechas_normalizadas(conn):
+    """
+    Normaliza `logs.fecha` a 'YYYY-MM-DD HH:MM:SS' (sin 'T' ni zona horaria)
+    para que el texto ordene cronológicamente y se pueda consultar por rango.
+    """
+    conn.execute("""
+        UPDATE logs SET fecha = replace(substr(fecha, 1, 19), 'T', ' ')
+        WHERE fecha GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]T*'
+           OR (fecha GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] *' AND length(fecha) > 19)
+    """)
+
+def _m003_indices_logs(conn):
+    """Índices para el dashboard del docente, los reportes por rango y el JOIN con usuarios."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_usuario_fecha ON logs (usuario_id, fecha)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_fecha ON logs (fecha)")
+    conn.execute("ANALYZE")
+
+def _m004_escritor_spool(conn):
+    """Último número de secuencia del spool confirmado por el escritor de logs por lotes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS escritor_spool (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            ultimo_seq INTEGER NOT NULL
+        )
+    """)
+
+def _m005_asistencia_diaria(conn):
+    """Resumen diario de asistencia por docente, calculado a partir de los logs existentes."""
+    asistencia_diaria.crear_tabla(conn)
+    asistencia_diaria.recalcular(conn)
+
+def _m006_dispositivos(conn):
+    """
+    Tabla de dispositivos (terminales biométricos y puertas NodeMCU). Cada terminal
+    indica la puerta que abre. Se carga con el terminal y la puerta de config.py.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dispositivos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT UNIQUE NOT NULL,
+            tipo TEXT NOT NULL CHECK (tipo IN ('terminal', 'puerta')),
+            host TEXT NOT NULL,                 -- 'ip', 'ip:puerto' o nombre mDNS
+            usuario TEXT,                       -- terminal: usuario ISAPI (Digest)
+            clave TEXT,                         -- terminal: contraseña ISAPI
+            ruta_stream TEXT DEFAULT '/ISAPI/Event/notification/alertStream',
+            token TEXT,                         -- puerta: token del NodeMCU
+            puerta_id INTEGER REFERENCES dispositivos (id) ON DELETE SET NULL,
+            activo INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    if conn.execute("SELECT COUNT(*) FROM dispositivos").fetchone()[0] == 0:
+        puerta_id = conn.execute("INSERT INTO dispositivos (nombre, tipo, host, token) VALUES ('Puerta principal', 'puerta', ?, ?)",
+                                 (config.IP_NODE, config.TOKEN_NODE)).lastrowid
+        conn.execute("INSERT INTO dispositivos (nombre, tipo, host, usuario, clave, puerta_id) "
+                     "VALUES ('Biométrico principal', 'terminal', ?, ?, ?, ?)",
+                     (config.IP_BIO, config.USER_BIO, config.PASS_BIO, puerta_id))
+
+def _m007_logs_por_dispositivo(conn):
+    """
+    Terminal y número de serie de cada evento en `logs`. El índice único evita duplicar
+    un evento que llega por el stream y también por la búsqueda de recuperación, y sirve
+    para leer la fecha del último evento guardado de cada terminal (el cursor de la
+    recuperación). Incluye la fecha por si el terminal reinicia su numeración.
+    """
+    columnas = _columnas(conn, 'logs')
+    if 'dispositivo_id' not in columnas:
+        conn.execute("ALTER TABLE logs ADD COLUMN dispositivo_id INTEGER")
+    if 'serial_no' not in columnas:
+        conn.execute("ALTER TABLE logs ADD COLUMN serial_no INTEGER")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_logs_dispositivo_evento "
+                 "ON logs (dispositivo_id, fecha, serial_no) WHERE serial_no IS NOT NULL")
+
+def _m008_logs_archivados(conn):
+    """Registro de los meses de `logs` movidos a archivos mensuales (ver archivo_logs.py)."""
+    archivo_logs.crear_tabla(conn)
+
+def _m009_versiones(conn):
+    """
+    Contador de cambios por tabla, incrementado por triggers. Los procesos que guardan
+    `usuarios` en memoria lo leen para saber si otro proceso la modificó (ver cambios_bd.py).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS versiones (
+            clave TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("INSERT OR IGNORE INTO versiones (clave, valor) VALUES ('usuarios', 0)")
+    for operacion in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS usuarios_version_{operacion.lower()} AFTER {operacion} ON usuarios
+            BEGIN
+                UPDATE versiones SET valor = valor + 1 WHERE clave = 'usuarios';
+            END
+        """)
+
+def _m010_version_usuarios_sin_password(conn):
+    """
+    El directorio en memoria no guarda contraseñas: cambiar solo la contraseña (p. ej. el
+    rehash al iniciar sesión) ya no obliga a los demás procesos a recargar `usuarios`.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS usuarios_version_update")
+    conn.execute("""
+        CREATE TRIGGER usuarios_version_update
+        AFTER UPDATE OF id, biometric_id, nombre, username, rol, acceso_puerta ON usuarios
+        BEGIN
+            UPDATE versiones SET valor = valor + 1 WHERE clave = 'usuarios';
+        END
+    """)
+
+def _m011_trabajos_reporte(conn):
+    """
+    Versión por día de `logs` (clave 'logs:YYYY-MM-DD' en versiones, incrementada por
+    trigger) y tabla de trabajos de reporte: un reporte en caché sigue siendo válido
+    mientras no cambien las versiones de los días de su rango (ver trabajos_reporte.py).
+    """
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS logs_version_dia AFTER INSERT ON logs
+        BEGIN
+            INSERT INTO versiones (clave, valor) VALUES ('logs:' || substr(NEW.fecha, 1, 10), 1)
+            ON CONFLICT (clave) DO UPDATE SET valor = valor + 1;
+        END
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO versiones (clave, valor)
+        SELECT 'logs:' || substr(fecha, 1, 10), COUNT(*) FROM logs GROUP BY substr(fecha, 1, 10)
+    """)
+    trabajos_reporte.crear_tabla(conn)
+
+def _m012_horarios(conn):
+    """
+    Tabla de turnos por docente (ver horarios.py). Un trigger incrementa la versión
+    'horarios' (los reportes en caché dependen de ella) y otro borra los turnos del
+    docente eliminado, porque las conexiones no activan PRAGMA foreign_keys.
+    """
+    horarios.crear_tabla(conn)
+    conn.execute("INSERT OR IGNORE INTO versiones (clave, valor) VALUES ('horarios', 0)")
+    for operacion in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS horarios_version_{operacion.lower()} AFTER {operacion} ON horarios
+            BEGIN
+                UPDATE versiones SET valor = valor + 1 WHERE clave = 'horarios';
+            END
+        """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS usuarios_borrar_horarios AFTER DELETE ON usuarios
+        BEGIN
+            DELETE FROM horarios WHERE usuario_id = OLD.id;
+        END
+    """)
+
+def _m013_importacion_en_curso(conn):
+    """Fila de la importación de docentes en curso: una a la vez entre procesos (ver importacion_docentes.py)."""
+    importacion_docentes.crear_tabla(conn)
+
+def _m014_version_logs(conn):
+    """
+    Versión 'logs', incrementada al borrar o modificar filas de `logs` (el archivado
+    mensual). Las de cada día solo cuentan inserciones; el ETag de /api/logs usa las dos.
+    """
+    conn.execute("INSERT OR IGNORE INTO versiones (clave, valor) VALUES ('logs', 0)")
+    for operacion in ('UPDATE', 'DELETE'):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS logs_version_{operacion.lower()} AFTER {operacion} ON logs
+            BEGIN
+                UPDATE versiones SET valor = valor + 1 WHERE clave = 'logs';
+            END
+        """)
+
+MIGRACIONES = [
+    (1, "Columna acceso_puerta en usuarios", _m001_acceso_puerta),
+    (2, "Formato ordenable de logs.fecha", _m002_fechas_normalizadas),
+    (3, "Índices de logs (usuario_id, fecha) y (fecha)", _m003_indices_logs),
+    (4, "Tabla escritor_spool del escritor de logs por lotes", _m004_escritor_spool),
+    (5, "Tabla asistencia_diaria (resumen diario incremental)", _m005_asistencia_diaria),
+    (6, "Tabla dispositivos (terminales y puertas)", _m006_dispositivos),
+    (7, "Terminal y número de serie en logs (recuperación de eventos)", _m007_logs_por_dispositivo),
+    (8, "Tabla logs_archivados (archivo mensual de logs)", _m008_logs_archivados),
+    (9, "Tabla versiones y triggers de cambios en usuarios", _m009_versiones),
+    (10, "Trigger de usuarios sin cambios de contraseña", _m010_version_usuarios_sin_password),
+    (11, "Versión por día de logs y tabla trabajos_reporte", _m011_trabajos_reporte),
+    (12, "Tabla horarios (turnos por docente con vigencia)", _m012_horarios),
+    (13, "Tabla importacion_en_curso (una importación de docentes a la vez)", _m013_importacion_en_curso),
+    (14, "Versión 'logs' por borrado o edición de logs", _m014_version_logs),
+]
+
+def version_actual(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def aplicar_migraciones(conn):
+    """
+    Aplica en orden las migraciones pendientes sobre una conexión abierta.
+    Devuelve la lista de versiones aplicadas.
+    """
+    aplicadas = []
+    nivel_original = conn.isolation_level
+    conn.isolation_level = None  # Control manual de BEGIN/COMMIT para incluir el DDL
+    try:
+        for version, descripcion, migracion in MIGRACIONES:
+            if version <= version_actual(conn):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo aplicarla mientras esperábamos el bloqueo
+                if version <= version_actual(conn):
+                    conn.execute("ROLLBACK")
+                    continue
+                migracion(conn)
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            aplicadas.append(version)
+            print(f"🛠️  Migración {version} aplicada: {descripcion}")
+    finally:
+        conn.isolation_level = nivel_original
+    return aplicadas
+
+# --- VERIFICACIÓN DE PLANES DE CONSULTA ---
+# Consultas del camino crítico. Ninguna debe recorrer completa una tabla;
+# `permitir_scan` lista los alias que sí pueden recorrerse (p. ej. un
+# ORDER BY id DESC LIMIT n, que lee solo las últimas filas por rowid).
+CONSULTAS_CRITICAS = [
+    ("load_user", "SELECT * FROM usuarios WHERE id = ?", (1,), ()),
+    ("login", "SELECT * FROM usuarios WHERE username = ?", ('admin',), ()),
+    ("verificar_permiso_y_abrir", "SELECT acceso_puerta, nombre FROM usuarios WHERE biometric_id = ?", ('1',), ()),
+    ("docente_dashboard", "SELECT * FROM logs WHERE usuario_id = ? ORDER BY id DESC LIMIT 10", ('1',), ()),
+    ("reporte_rango", "SELECT usuario_id, fecha FROM logs WHERE fecha >= ? AND fecha < ?",
+     ('2026-01-01', '2026-02-01'), ()),
+    ("reporte_docente", "SELECT usuario_id, fecha FROM logs WHERE fecha >= ? AND fecha < ? AND usuario_id = ?",
+     ('2026-01-01', '2026-02-01', '1'), ()),
+    ("resumen_rango", "SELECT biometric_id, dia, primera_manana, ultima_manana, marcas_manana, primera_tarde, "
+     "ultima_tarde, marcas_tarde FROM asistencia_diaria WHERE dia >= ? AND dia <= ?", ('2026-01-01', '2026-01-31'), ()),
+    ("resumen_docente", "SELECT biometric_id, dia, primera_manana, ultima_manana, marcas_manana, primera_tarde, "
+     "ultima_tarde, marcas_tarde FROM asistencia_diaria WHERE dia >= ? AND dia <= ? AND biometric_id = ?",
+     ('2026-01-01', '2026-01-31', '1'), ()),
+    ("version_rango", "SELECT clave, valor FROM versiones WHERE clave >= ? AND clave <= ?",
+     ('logs:2026-01-01', 'logs:2026-01-31'), ()),
+    ("trabajo_por_clave", "SELECT * FROM trabajos_reporte WHERE clave = ? AND estado IN ('pendiente', 'en_curso')",
+     ('x',), ()),
+    ("horarios_docente", "SELECT * FROM horarios WHERE usuario_id IS ? ORDER BY dia_semana, jornada, desde",
+     (1,), ()),
+    ("cursor_dispositivo", "SELECT MAX(fecha) FROM logs WHERE dispositivo_id = ? AND serial_no IS NOT NULL",
+     (1,), ()),
+    ("api_logs_join", "SELECT l.id, l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen FROM logs l "
+     "LEFT JOIN usuarios u ON l.usuario_id = u.biometric_id ORDER BY l.id DESC LIMIT 20", (), ('l',)),
+    ("api_logs_since_id", "SELECT l.id, l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen FROM logs l "
+     "LEFT JOIN usuarios u ON l.usuario_id = u.biometric_id WHERE l.id > ? ORDER BY l.id ASC LIMIT 20", (100,), ()),
+    ("api_logs_before_id_docente", "SELECT l.id, l.fecha, l.usuario_id, u.nombre, l.tipo_evento, l.origen FROM logs l "
+     "LEFT JOIN usuarios u ON l.usuario_id = u.biometric_id WHERE l.id < ? AND l.usuario_id = ? "
+     "ORDER BY l.id DESC LIMIT 20", (100, '1'), ()),
+]
+
+def recorridos_completos(conn, sql, params=(), permitir_scan=()):
+    """
+    Devuelve las líneas de EXPLAIN QUERY PLAN que recorren una tabla completa.
+    Un 'SCAN ... USING COVERING INDEX' también cuenta: lee el índice entero.
+    """
+    problemas = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+        detalle = row[-1]
+        if not detalle.startswith("SCAN "):
+            continue
+        tabla = detalle.split()[1]
+        if tabla not in permitir_scan:
+            problemas.append(detalle)
+    return problemas
+
+def verificar_planes(conn):
+    """Revisa CONSULTAS_CRITICAS y devuelve {nombre_consulta: [recorridos completos]} con los fallos."""
+    fallos = {}
+    for nombre, sql, params, permitir_scan in CONSULTAS_CRITICAS:
+        problemas = recorridos_completos(conn, sql, params, permitir_scan)
+        if problemas:
+            fallos[nombre] = problemas
+    return fallos
+
+def main(ruta=None):
+    """Actualiza la base de datos en el lugar y verifica que las consultas críticas usen índices."""
+    conn = sqlite3.connect(ruta or config.DB_NAME)
+    try:
+        aplicadas = aplicar_migraciones(conn)
+        print(f"✅ Esquema en versión {version_actual(conn)} ({len(aplicadas)} migración(es) aplicada(s)).")
+
+        fallos = verificar_planes(conn)
+        for nombre, problemas in fallos.items():
+            print(f"❌ La consulta '{nombre}' recorre la tabla completa: {'; '.join(problemas)}")
+        if not fallos:
+            print(f"✅ Las {len(CONSULTAS_CRITICAS)} consultas críticas usan índices.")
+        return 1 if fallos else 0
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -0,0 +1,159 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- PIPELINE DE EVENTOS POR ETAPAS ---
+# Cada etapa tiene su cola acotada y sus propios hilos; una etapa lenta solo llena
+# su cola (y frena a la anterior cuando se llena), sin detener a las demás.
+# La función de una etapa recibe (item, emitir) y llama emitir('otra_etapa', item)
+# para pasar el resultado; si devuelve False, el item se cuenta como descartado.
+
+_FIN = object()
+
+class _Medidor:
+    """Cuenta eventos por segundo en una ventana deslizante de `ventana` segundos."""
+
+    def __init__(self, ventana=10):
+        self.ventana = ventana
+        self._cubetas = [0] * ventana
+        self._segundos = [0] * ventana
+        self._lock = threading.Lock()
+
+    def sumar(self, n=1):
+        ahora = int(time.monotonic())
+        i = ahora % self.ventana
+        with self._lock:
+            if self._segundos[i] != ahora:
+                self._segundos[i], self._cubetas[i] = ahora, 0
+            self._cubetas[i] += n
+
+    def tasa(self):
+        desde = int(time.monotonic()) - self.ventana
+        with self._lock:
+            total = sum(c for c, s in zip(self._cubetas, self._segundos) if s > desde)
+        return total / self.ventana
+
+class Etapa:
+    def __init__(self, nombre, funcion, hilos=1, capacidad=None):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.hilos = hilos
+        self.cola = queue.Queue(maxsize=capacidad or config.PIPELINE_CAPACIDAD_COLA)
+        self.procesados = 0
+        self.descartados = 0
+        self.errores = 0
+        self._medidor = _Medidor()
+        self._lock = threading.Lock()
+        self._hilos = []
+
+    def _trabajar(self, emitir):
+        while True:
+            item = self.cola.get()
+            if item is _FIN:
+                return
+            emitidos = []
+            try:
+                descartado = self.funcion(item, lambda destino, salida: emitidos.append((destino, salida))) is False
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                print(f"❌ Error en la etapa '{self.nombre}' del pipeline: {e}")
+                continue
+            # Se emite fuera del try: si la cola siguiente está llena, esta etapa espera (contrapresión)
+            for destino, salida in emitidos:
+                emitir(destino, salida)
+            with self._lock:
+                self.procesados += 1
+                if descartado:
+                    self.descartados += 1
+            self._medidor.sumar()
+
+    def iniciar(self, emitir):
+        self._hilos = [threading.Thread(target=self._trabajar, args=(emitir,), name=f"pipeline-{self.nombre}-{i}",
+                                        daemon=True) for i in range(self.hilos)]
+        for h in self._hilos:
+            h.start()
+
+    def detener(self, timeout):
+        for _ in self._hilos:
+            self.cola.put(_FIN)
+        for h in self._hilos:
+            h.join(timeout)
+
+    def estadisticas(self):
+        with self._lock:
+            return {'hilos': self.hilos, 'en_cola': self.cola.qsize(), 'capacidad': self.cola.maxsize,
+                    'procesados': self.procesados, 'descartados': self.descartados, 'errores': self.errores,
+                    'eventos_por_segundo': round(self._medidor.tasa(), 2)}
+
+class PipelineEventos:
+    """
+    Etapas en orden (la primera es la entrada). Cualquier etapa puede emitir hacia
+    cualquier otra por nombre, así una etapa puede repartir a varias (p. ej.
+    clasificación -> persistencia y acción).
+    """
+
+    def __init__(self, etapas):
+        self.etapas = {e.nombre: e for e in etapas}
+        self.entrada = etapas[0]
+        self._activo = False
+
+    def _emitir(self, destino, item):
+        self.etapas[destino].cola.put(item)
+
+    @property
+    def activo(self):
+        return self._activo
+
+    def iniciar(self):
+        if self._activo:
+            return
+        for etapa in self.etapas.values():
+            etapa.iniciar(self._emitir)
+        self._activo = True
+
+    def detener(self, timeout=10):
+        """Deja vaciar cada etapa en orden (la entrada primero) y detiene los hilos."""
+        for etapa in self.etapas.values():
+            etapa.detener(timeout)
+        self._activo = False
+
+    def recibir(self, item):
+        """Encola un item en la etapa de entrada (espera si la cola está llena)."""
+        self.entrada.cola.put(item)
+
+    async def recibir_async(self, item):
+        """Como recibir(), pero sin bloquear el event loop cuando la cola está llena."""
+        try:
+            self.entrada.cola.put_nowait(item)
+        except queue.Full:
+            await asyncio.to_thread(self.entrada.cola.put, item)
+
+    def estadisticas(self):
+        return {nombre: etapa.estadisticas() for nombre, etapa in self.etapas.items()}
+
+class Deduplicador:
+    """Recuerda las últimas `capacidad` claves vistas (LRU) para descartar eventos reenviados."""
+
+    def __init__(self, capacidad=None):
+        self.capacidad = capacidad or config.PIPELINE_DEDUP_CAPACIDAD
+        self._claves = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicados = 0
+
+    def visto(self, clave):
+        """True si la clave ya se había visto (y la cuenta como duplicado); si no, la recuerda."""
+        with self._lock:
+            if clave in self._claves:
+                self._claves.move_to_end(clave)
+                self.duplicados += 1
+                return True
+            self._claves[clave] = None
+            if len(self._claves) > self.capacidad:
+                self._claves.popitem(last=False)
+            return False
@@ -0,0 +1,169 @@
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import metricas
+
+# --- POOL DE CONEXIONES SQLITE ---
+# Las conexiones se reutilizan en lugar de abrirse y cerrarse en cada consulta.
+# Hay un pool de escritura y otro de solo lectura por archivo de base de datos:
+# en modo WAL los lectores (reportes, dashboards) nunca bloquean al escritor
+# de eventos del biométrico, y viceversa.
+
+ESPERA_POOL = metricas.histograma(
+    'sqlite_pool_espera_segundos', "Espera por una conexión libre cuando el pool estaba agotado.", ('modo',))
+ESPERA_BLOQUEO = metricas.histograma(
+    'sqlite_espera_bloqueo_segundos', "Espera por el bloqueo de escritura de SQLite (busy_timeout) al iniciar "
+    "una transacción.", ('via',))
+BLOQUEOS = metricas.contador(
+    'sqlite_bloqueos_total', "Transacciones que no obtuvieron el bloqueo de escritura antes del busy_timeout.", ('via',))
+COMMIT_SEGUNDOS = metricas.histograma(
+    'sqlite_transaccion_segundos', "Duración de las transacciones de escritura, desde el bloqueo hasta el commit.",
+    ('via',))
+
+class ConexionPool:
+    """
+    Envoltura de sqlite3.Connection prestada por un pool.
+    Se usa igual que una conexión normal; `close()` la devuelve al pool en vez de cerrarla.
+    Si el código que la pidió no llama a `close()` (p. ej. por una excepción), se devuelve
+    sola cuando la envoltura deja de usarse.
+    """
+    def __init__(self, pool, conn):
+        object.__setattr__(self, '_conn', conn)
+        object.__setattr__(self, '_devolucion', weakref.finalize(self, pool._devolver, conn))
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+    def __setattr__(self, nombre, valor):
+        # row_factory, isolation_level, etc. se aplican a la conexión real
+        setattr(self._conn, nombre, valor)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def execute(self, *args):
+        return self._conn.execute(*args)
+
+    def close(self):
+        """Devuelve la conexión al pool (solo la primera llamada tiene efecto)."""
+        self._devolucion()
+
+class PoolConexiones:
+    """Pool acotado de conexiones a un archivo SQLite, compartido entre hilos."""
+
+    def __init__(self, ruta, tamano, solo_lectura=False):
+        self.ruta = ruta
+        self.solo_lectura = solo_lectura
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+        self._cerrado = False
+
+    def _crear(self):
+        conn = sqlite3.connect(self.ruta, check_same_thread=False,
+                               timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+                               cached_statements=config.DB_CACHE_SENTENCIAS)
+        conn.row_factory = sqlite3.Row
+        if not self.solo_lectura:
+            conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(config.DB_BUSY_TIMEOUT_MS)}")
+        conn.execute(f"PRAGMA mmap_size={int(config.DB_MMAP_SIZE)}")
+        if self.solo_lectura:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def adquirir(self, timeout=None):
+        """
+        Presta una conexión del pool (creándola si no hay libres).
+        Si todas están en uso espera hasta `timeout` segundos antes de fallar.
+        """
+        timeout = config.DB_POOL_TIMEOUT if timeout is None else timeout
+        if not self._cupos.acquire(blocking=False):
+            with ESPERA_POOL.medir(modo='lectura' if self.solo_lectura else 'escritura'):
+                obtenido = self._cupos.acquire(timeout=timeout)
+            if not obtenido:
+                raise sqlite3.OperationalError(f"Pool de conexiones agotado ({self.ruta})")
+        try:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                conn = self._crear()
+        except Exception:
+            self._cupos.release()
+            raise
+        return ConexionPool(self, conn)
+
+    def _devolver(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()  # Lo no confirmado por quien la usó se descarta
+            conn.row_factory = sqlite3.Row
+            conn.isolation_level = ''
+            if self._cerrado:
+                conn.close()
+            else:
+                self._libres.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._cupos.release()
+
+    def cerrar(self):
+        """Cierra las conexiones libres; las prestadas se cierran al devolverse."""
+        self._cerrado = True
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+
+@contextmanager
+def transaccion_escritura(conn, via):
+    """
+    Como `with conn:`, pero toma el bloqueo de escritura al empezar (BEGIN IMMEDIATE)
+    para medir por separado la espera por otro escritor y la duración hasta el commit.
+    `via` identifica quién escribe en las métricas (p. ej. 'escritor', 'directo').
+    """
+    t0 = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError:
+        BLOQUEOS.inc(via=via)
+        raise
+    t1 = time.perf_counter()
+    ESPERA_BLOQUEO.observar(t1 - t0, via=via)
+    with conn:
+        yield conn
+    COMMIT_SEGUNDOS.observar(time.perf_counter() - t1, via=via)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def obtener_pool(ruta, solo_lectura=False):
+    """Devuelve (creándolo la primera vez) el pool de lectura o de escritura de una base de datos."""
+    clave = (ruta, solo_lectura)
+    pool = _pools.get(clave)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(clave)
+            if pool is None:
+                tamano = config.DB_POOL_LECTURA if solo_lectura else config.DB_POOL_ESCRITURA
+                pool = _pools[clave] = PoolConexiones(ruta, tamano, solo_lectura)
+    return pool
+
+def cerrar_pools():
+    """Cierra todos los pools (al apagar la aplicación o en los benchmarks)."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.cerrar()
+        _pools.clear()
@@ -0,0 +1,93 @@
+import json
+import uuid
+from datetime import datetime, timedelta
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import gateway_dispositivos
+
+# --- RECUPERACIÓN DE EVENTOS TRAS UN CORTE ---
+# El alertStream solo entrega lo que ocurre mientras la conexión está abierta: las
+# marcas hechas durante un corte de red o un reinicio de la app se perdían. Al
+# (re)conectar un terminal se pide su historial con la búsqueda AcsEvent de ISAPI,
+# desde la fecha del último evento guardado de ese terminal (el cursor, leído de
+# `logs` con el índice de la migración 7), en páginas de RECUPERACION_LOTE eventos.
+# Los eventos ya guardados se ignoran al insertar (índice único por terminal,
+# fecha y número de serie), así que repetir una página o un rango no duplica nada.
+
+RUTA_BUSQUEDA = '/ISAPI/AccessControl/AcsEvent?format=json'
+FORMATO_FECHA = "%Y-%m-%d %H:%M:%S"
+
+def cursor(conn, dispositivo_id):
+    """Fecha ('YYYY-MM-DD HH:MM:SS') del último evento guardado del terminal, o None."""
+    return conn.execute("SELECT MAX(fecha) FROM logs WHERE dispositivo_id = ? AND serial_no IS NOT NULL",
+                        (dispositivo_id,)).fetchone()[0]
+
+def _hora_iso(fecha):
+    # Las fechas de `logs` no guardan zona horaria: se asume la del servidor, que es la
+    # misma que tiene configurada el terminal en una instalación normal
+    return fecha.astimezone().isoformat(timespec='seconds')
+
+def rango_busqueda(desde, ahora=None, max_dias=None):
+    """
+    (inicio, fin) en ISO 8601 con zona para la búsqueda, a partir del cursor `desde`.
+    El inicio es inclusivo: el último evento guardado vuelve y se ignora al insertar.
+    """
+    ahora = ahora or datetime.now()
+    limite = ahora - timedelta(days=config.RECUPERACION_MAX_DIAS if max_dias is None else max_dias)
+    inicio = max(datetime.strptime(desde, FORMATO_FECHA), limite)
+    return _hora_iso(inicio), _hora_iso(ahora)
+
+def evento_desde_busqueda(info):
+    """Item de InfoList de la búsqueda -> dict con los campos del AccessControllerEvent del stream."""
+    return {
+        'majorEventType': info.get('major', 0), 'subEventType': info.get('minor', 0),
+        'employeeNoString': info.get('employeeNoString') or str(info.get('employeeNo', 'Desconocido')),
+        'name': info.get('name'), 'time': info.get('time', ''), 'serialNo': info.get('serialNo'),
+    }
+
+async def buscar_eventos(conexion, inicio, fin, lote=None):
+    """
+    Generador asíncrono con las páginas de eventos de control de acceso (major 5) entre
+    `inicio` y `fin`, ya convertidas con evento_desde_busqueda().
+    """
+    id_busqueda = uuid.uuid4().hex
+    posicion = 0
+    while True:
+        cuerpo = json.dumps({'AcsEventCond': {
+            'searchID': id_busqueda, 'searchResultPosition': posicion,
+            'maxResults': lote or config.RECUPERACION_LOTE,
+            'major': 5, 'minor': 0, 'startTime': inicio, 'endTime': fin,
+        }}).encode()
+        codigo, _, datos = await conexion.solicitar('POST', RUTA_BUSQUEDA, cuerpo)
+        if codigo != 200:
+            raise gateway_dispositivos.ErrorGateway(f"Búsqueda AcsEvent: HTTP {codigo}")
+        respuesta = json.loads(datos).get('AcsEvent', {})
+        eventos = respuesta.get('InfoList') or []
+        if eventos:
+            yield [evento_desde_busqueda(info) for info in eventos]
+        posicion += len(eventos)
+        if respuesta.get('responseStatusStrg') != 'MORE' or not eventos:
+            return
+
+async def recuperar(terminal, desde, guardar, lote=None, timeout=None):
+    """
+    Busca en el terminal los eventos desde el cursor `desde` y llama a `guardar(eventos)`
+    (corrutina que devuelve cuántos eran nuevos) con cada página. Devuelve el total de nuevos.
+    Sin cursor (terminal nunca visto) no se recupera nada: solo cuenta lo que llegue por el stream.
+    """
+    if desde is None:
+        return 0
+    inicio, fin = rango_busqueda(desde)
+    conexion = gateway_dispositivos.ConexionISAPI(terminal, timeout=timeout)
+    nuevos = leidos = 0
+    try:
+        async for eventos in buscar_eventos(conexion, inicio, fin, lote):
+            leidos += len(eventos)
+            nuevos += await guardar(eventos)
+    finally:
+        conexion.cerrar()
+    if nuevos:
+        print(f"♻️  [{terminal['nombre']}] {nuevos} evento(s) recuperado(s) del historial del terminal "
+              f"({leidos} revisados desde {desde}).")
+    return nuevos
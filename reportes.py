@@ -0,0 +1,264 @@
+import csv
+import io
+from datetime import datetime, timedelta, time
+
+import archivo_logs
+
+# --- MOTOR DE REPORTES DE ASISTENCIA ---
+# Lee todo el rango de fechas en una sola consulta y arma la matriz
+# (docente x día) en una única pasada, en lugar de una consulta por celda.
+# Las marcas por día salen del resumen asistencia_diaria (ver asistencia_diaria.py),
+# que separa las jornadas con CORTE_JORNADA. Los docentes cuyo horario (ver horarios.py)
+# pone otro corte en algún día del rango se recalculan desde las marcas crudas de `logs`
+# y de los meses archivados (ver archivo_logs.py), con analitica_asistencia.
+
+CORTE_JORNADA = time(13, 50, 0)
+SIN_MARCA = "--:--"
+
+def rango_fechas(start_date, end_date):
+    """Devuelve la lista de días (date) entre start_date y end_date, inclusive."""
+    return [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
+
+def _texto_jornada(primera, ultima, cantidad):
+    """Formatea una jornada como 'HH:MM-HH:MM', 'HH:MM' o '--:--'."""
+    if not cantidad:
+        return SIN_MARCA
+    if cantidad == 1:
+        return primera[:5]
+    return f"{primera[:5]}-{ultima[:5]}"
+
+def texto_celda(marcas):
+    """
+    Convierte las marcas de un día [primera, ultima, cantidad] de mañana seguidas de las de tarde
+    en el texto que se muestra en la celda del reporte.
+    """
+    if marcas is None:
+        return f"Mañana: {SIN_MARCA}\nTarde: {SIN_MARCA}"
+    return f"Mañana: {_texto_jornada(*marcas[0:3])}\nTarde: {_texto_jornada(*marcas[3:6])}"
+
+def agrupar_marcas(filas, ids_validos=None, corte_jornada=CORTE_JORNADA):
+    """
+    Agrupa en una sola pasada las filas (usuario_id, fecha) por (biometric_id, día, jornada),
+    descartando los usuario_id que no estén en ids_validos (None = conservar todos).
+    Devuelve {biometric_id: {'YYYY-MM-DD': [primera_m, ultima_m, n_m, primera_t, ultima_t, n_t]}}.
+
+    Las horas se comparan como texto 'HH:MM:SS', que ordena igual que la hora real,
+    así que no hace falta parsear cada fecha con datetime.
+    """
+    corte = corte_jornada.strftime('%H:%M:%S')
+    grupos = {}
+    for uid, fecha in filas:
+        if (ids_validos is not None and uid not in ids_validos) or not isinstance(fecha, str) or len(fecha) < 16 or fecha[10] not in ' T':
+            continue
+        dia, hora = fecha[:10], fecha[11:]
+        por_dia = grupos.setdefault(uid, {})
+        marcas = por_dia.get(dia)
+        if marcas is None:
+            marcas = por_dia[dia] = [None, None, 0, None, None, 0]
+        i = 0 if hora <= corte else 3
+        if not marcas[i + 2]:
+            marcas[i] = marcas[i + 1] = hora
+        elif hora < marcas[i]:
+            marcas[i] = hora
+        elif hora > marcas[i + 1]:
+            marcas[i + 1] = hora
+        marcas[i + 2] += 1
+    return grupos
+
+def _grupos_desde_logs(conn, dias, ids_validos, corte_jornada):
+    """Recalcula las marcas del rango desde las filas crudas (una consulta a `logs` y una por mes archivado)."""
+    hasta = (datetime.strptime(dias[-1], '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    usuario_id = next(iter(ids_validos)) if len(ids_validos) == 1 else None
+    return agrupar_marcas(archivo_logs.marcas(conn, dias[0], hasta, usuario_id), ids_validos, corte_jornada)
+
+def _grupos_desde_resumen(conn, dias, ids_validos):
+    """Lee las marcas del rango ya agrupadas de la tabla asistencia_diaria."""
+    consulta = ("SELECT biometric_id, dia, primera_manana, ultima_manana, marcas_manana, primera_tarde, "
+                "ultima_tarde, marcas_tarde FROM asistencia_diaria WHERE dia >= ? AND dia <= ?")
+    params = [dias[0], dias[-1]]
+    if len(ids_validos) == 1:
+        consulta += " AND biometric_id = ?"
+        params.append(next(iter(ids_validos)))
+    grupos = {}
+    for bio_id, dia, *marcas in conn.execute(consulta, params):
+        if bio_id in ids_validos:
+            grupos.setdefault(bio_id, {})[dia] = marcas
+    return grupos
+
+def _grupos_con_horario(conn, usuarios, start_date, end_date, indice):
+    """Marcas del rango de `usuarios` desde las filas crudas, separadas con el corte de cada docente y día."""
+    import analitica_asistencia
+
+    dias = rango_fechas(start_date, end_date)
+    ids = [u['biometric_id'] for u in usuarios]
+    _, _, cortes = indice.matrices(ids, dias)
+    marcas = analitica_asistencia.cargar_marcas(conn, usuarios, start_date, end_date)
+    agrupadas = analitica_asistencia.agrupar(marcas, len(ids), len(dias), cortes)
+    return analitica_asistencia.como_grupos(*agrupadas, ids, dias)
+
+def iterar_marcas(conn, usuarios, start_date, end_date, corte_jornada=CORTE_JORNADA):
+    """
+    Obtiene todas las marcas del rango con UNA consulta y devuelve un generador de
+    (biometric_id, nombre, [marcas del día o None, por cada día del rango]).
+    Con el corte por defecto cada docente usa el de su horario (ver horarios.py): se lee
+    el resumen asistencia_diaria y solo los docentes con otro corte se recalculan desde
+    las marcas crudas. Con otro `corte_jornada`, fijo para todos, se recalcula todo desde
+    `logs` y los meses archivados. La consulta se hace al llamar; las filas se arman a
+    medida que se consumen.
+    """
+    dias = [d.strftime('%Y-%m-%d') for d in rango_fechas(start_date, end_date)]
+    if not dias:
+        return ((u['biometric_id'], u['nombre'], []) for u in usuarios)
+    ids_validos = {str(u['biometric_id']) for u in usuarios}
+
+    if corte_jornada == CORTE_JORNADA:
+        import horarios  # horarios.py importa este módulo
+
+        indice = horarios.cargar(conn)
+        propios = indice.con_corte_distinto(ids_validos, start_date, end_date)
+        grupos = _grupos_desde_resumen(conn, dias, ids_validos - propios) if len(propios) < len(ids_validos) else {}
+        if propios:
+            grupos.update(_grupos_con_horario(conn, [u for u in usuarios if str(u['biometric_id']) in propios],
+                                              start_date, end_date, indice))
+    else:
+        grupos = _grupos_desde_logs(conn, dias, ids_validos, corte_jornada)
+
+    def filas():
+        for u in usuarios:
+            por_dia = grupos.get(str(u['biometric_id']), {})
+            yield u['biometric_id'], u['nombre'], [por_dia.get(dia) for dia in dias]
+    return filas()
+
+def iterar_matriz_asistencia(conn, usuarios, start_date, end_date, corte_jornada=CORTE_JORNADA):
+    """Como iterar_marcas, pero con el texto de cada celda del reporte."""
+    return ((bio_id, nombre, [texto_celda(m) for m in marcas])
+            for bio_id, nombre, marcas in iterar_marcas(conn, usuarios, start_date, end_date, corte_jornada))
+
+def construir_matriz_asistencia(conn, usuarios, start_date, end_date, corte_jornada=CORTE_JORNADA):
+    """Matriz completa en memoria: lista de (biometric_id, nombre, [texto_celda por día])."""
+    return list(iterar_matriz_asistencia(conn, usuarios, start_date, end_date, corte_jornada))
+
+# --- ESCRITORES (Excel en modo streaming, CSV y Parquet) ---
+def _estilos_reporte():
+    """Estilos con nombre: se registran una vez en el libro y cada celda solo los referencia."""
+    from openpyxl.styles import NamedStyle, PatternFill, Alignment, Border, Side
+
+    def relleno(color):
+        return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+    borde = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    centrado = Alignment(horizontal='center')
+    ajustado = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    return [
+        NamedStyle(name='rep_titulo', fill=relleno("CCECFF"), alignment=centrado),
+        NamedStyle(name='rep_encabezado', fill=relleno("92D050"), border=borde),
+        NamedStyle(name='rep_dia', fill=relleno("FFC000"), border=borde, alignment=centrado),
+        NamedStyle(name='rep_dato', border=borde),
+        NamedStyle(name='rep_celda', border=borde, alignment=ajustado),
+        NamedStyle(name='rep_celda_gris', fill=relleno("EFEFEF"), border=borde, alignment=ajustado),
+    ]
+
+def resumen_asistencia(conn, usuarios, start_date, end_date):
+    """
+    (encabezados, filas) de la hoja "Resumen" con los totales por docente de
+    analitica_asistencia (horas, atrasos, ausencias); None si numpy no está instalado.
+    """
+    try:
+        import analitica_asistencia
+    except ImportError:
+        return None
+    analitica = analitica_asistencia.analizar(conn, usuarios, start_date, end_date)
+    return analitica_asistencia.COLUMNAS_RESUMEN, analitica.filas_resumen()
+
+def escribir_excel_matricial(filas, start_date, end_date, destino, resumen=None):
+    """
+    Escribe el reporte matricial en `destino` (ruta o archivo binario) con un libro
+    en modo write-only: cada fila se serializa al disco apenas se genera, así la
+    memoria no crece con el tamaño del reporte. Con `resumen` (ver resumen_asistencia)
+    agrega la hoja "Resumen".
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    for estilo in _estilos_reporte():
+        wb.add_named_style(estilo)
+    ws = wb.create_sheet("Reporte Matricial")
+
+    def celda(valor, estilo):
+        c = WriteOnlyCell(ws, value=valor)
+        c.style = estilo
+        return c
+
+    dias = rango_fechas(start_date, end_date)
+    for col in range(1, 4):
+        ws.column_dimensions[get_column_letter(col)].width = 25
+    for i in range(len(dias)):
+        ws.column_dimensions[get_column_letter(4 + i)].width = 18
+    ws.merged_cells.add('A1:Z1')
+
+    ws.append([celda(f"Reporte de Asistencia ({start_date.strftime('%d/%m/%Y')} al {end_date.strftime('%d/%m/%Y')})", 'rep_titulo')])
+    ws.append([celda(txt, 'rep_encabezado') for txt in ['ID Biométrico', 'Nombre Completo', 'Departamento']] +
+              [celda(day.strftime('%d/%m'), 'rep_dia') for day in dias])
+
+    for row_idx, (bio_id, nombre, celdas) in enumerate(filas, 3):
+        estilo = 'rep_celda_gris' if row_idx % 2 != 0 else 'rep_celda'
+        ws.append([celda(bio_id, 'rep_dato'), celda(nombre, 'rep_dato'), celda("Docencia", 'rep_dato')] +
+                  [celda(texto, estilo) for texto in celdas])
+
+    if resumen is not None:
+        encabezados, filas_resumen = resumen
+        hoja = wb.create_sheet("Resumen")
+        hoja.column_dimensions['B'].width = 30
+        encabezado = []
+        for txt in encabezados:
+            c = WriteOnlyCell(hoja, value=txt)
+            c.style = 'rep_encabezado'
+            encabezado.append(c)
+        hoja.append(encabezado)
+        for fila in filas_resumen:
+            hoja.append(fila)
+
+    wb.save(destino)
+
+def generar_csv_matricial(filas, start_date, end_date, filas_por_bloque=200):
+    """Generador de bloques de texto CSV con el mismo formato matricial del Excel."""
+    buffer = io.StringIO()
+    buffer.write('\ufeff')  # BOM: Excel reconoce el UTF-8 (tildes y ñ)
+    writer = csv.writer(buffer)
+    writer.writerow(['ID Biométrico', 'Nombre Completo', 'Departamento'] +
+                    [day.strftime('%d/%m/%Y') for day in rango_fechas(start_date, end_date)])
+    for i, (bio_id, nombre, celdas) in enumerate(filas, 1):
+        writer.writerow([bio_id, nombre, "Docencia"] + [texto.replace("\n", " | ") for texto in celdas])
+        if i % filas_por_bloque == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def escribir_parquet(filas_marcas, start_date, end_date, destino, filas_por_grupo=5000):
+    """
+    Escribe las marcas en formato largo (una fila por docente y día, columnas tipadas)
+    a un archivo Parquet, por grupos de filas. Requiere `pyarrow` (dependencia opcional).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    esquema = pa.schema([
+        ('biometric_id', pa.string()), ('nombre', pa.string()), ('fecha', pa.date32()),
+        ('primera_manana', pa.string()), ('ultima_manana', pa.string()), ('marcas_manana', pa.int32()),
+        ('primera_tarde', pa.string()), ('ultima_tarde', pa.string()), ('marcas_tarde', pa.int32()),
+    ])
+    dias = rango_fechas(start_date, end_date)
+    vacio = [None, None, 0, None, None, 0]
+    with pq.ParquetWriter(destino, esquema) as writer:
+        grupo = []
+        for bio_id, nombre, marcas_por_dia in filas_marcas:
+            for dia, marcas in zip(dias, marcas_por_dia):
+                grupo.append((str(bio_id), nombre, dia, *(marcas or vacio)))
+            if len(grupo) >= filas_por_grupo:
+                writer.write_table(pa.Table.from_pylist([dict(zip(esquema.names, f)) for f in grupo], esquema))
+                grupo = []
+        if grupo:
+            writer.write_table(pa.Table.from_pylist([dict(zip(esquema.names, f)) for f in grupo], esquema))
@@ -14,7 +14,7 @@ def reset_password():
     
     try:
         # Genera el hash de la nueva contraseña
-        nuevo_hash = generate_password_hash(nueva_password, method='pbkdf2:sha256')
+        nuevo_hash = generate_password_hash(nueva_password, method=config.PASSWORD_METODO)
         
         conn = sqlite3.connect(config.DB_NAME)
         cursor = conn.cursor()
@@ -0,0 +1,174 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as EsperaAgotada
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import metricas
+
+# --- CONTRASEÑAS Y LÍMITE DE INTENTOS DE LOGIN ---
+# Verificar un hash cuesta CPU a propósito (pbkdf2 de Werkzeug con 1.000.000 de
+# iteraciones: ~0,5 s de un núcleo). Al inicio del semestre cientos de docentes
+# entran a la vez y cualquier script de fuerza bruta puede hacer lo mismo; cada
+# verificación ocupaba el hilo de la petición y el núcleo completo. Ahora:
+# - el método y su costo salen de config.PASSWORD_METODO; un hash guardado con otro
+#   método se vuelve a generar al iniciar sesión (rehash transparente);
+# - los hashes se calculan en un pool de PASSWORD_HILOS hilos (hashlib libera el GIL)
+#   con a lo sumo PASSWORD_COLA pendientes: si se llena, la petición recibe 503
+#   enseguida en lugar de encolarse detrás de un ataque, y el resto de las rutas
+#   sigue teniendo CPU;
+# - antes de tocar el hash se aplican los límites por usuario y por IP: los intentos
+#   rechazados no cuestan más que un diccionario.
+# Los contadores de intentos viven en la memoria de cada proceso web.
+
+class Ocupado(Exception):
+    """Hay demasiados hashes pendientes; reintentar en unos segundos."""
+
+_pool = None
+_pool_lock = threading.Lock()
+_cupos = None
+_metodos = {}  # config.PASSWORD_METODO -> método tal como Werkzeug lo escribe en el hash
+_metodos_lock = threading.Lock()
+
+HASH_SEGUNDOS = metricas.histograma(
+    'password_hash_segundos', "Tiempo de cálculo de cada hash de contraseña, por operación.", ('operacion',))
+LOGIN_INTENTOS = metricas.contador(
+    'login_intentos_total', "Intentos de inicio de sesión, por resultado (ok, fallo, limitado, ocupado).",
+    ('resultado',))
+
+def _ejecutar(operacion, funcion, *args):
+    """Corre `funcion(*args)` en el pool de hashes y espera el resultado (Ocupado si no hay lugar)."""
+    global _pool, _cupos
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=config.PASSWORD_HILOS, thread_name_prefix="hash-password")
+            _cupos = threading.BoundedSemaphore(config.PASSWORD_HILOS + config.PASSWORD_COLA)
+    if not _cupos.acquire(blocking=False):
+        raise Ocupado()
+
+    def tarea():
+        try:
+            with HASH_SEGUNDOS.medir(operacion=operacion):
+                return funcion(*args)
+        finally:
+            _cupos.release()
+
+    futuro = _pool.submit(tarea)
+    try:
+        return futuro.result(timeout=config.PASSWORD_TIMEOUT)
+    except EsperaAgotada:
+        if futuro.cancel():  # No llegó a empezar: su cupo no lo libera nadie más
+            _cupos.release()
+        raise Ocupado()
+
+def generar_hash(password):
+    """Hash con config.PASSWORD_METODO, calculado en el pool acotado."""
+    return _ejecutar('generar', generate_password_hash, password, config.PASSWORD_METODO)
+
+def verificar(hash_guardado, password, rehash=True):
+    """
+    Devuelve (válida, hash nuevo o None). Si la contraseña es válida pero el hash se generó
+    con otro método o costo, devuelve además el hash con el método actual para guardarlo
+    (salvo rehash=False, p. ej. si se va a reemplazar por una contraseña nueva).
+    """
+    if not hash_guardado or not es_hash(hash_guardado):
+        return False, None
+    if not _ejecutar('verificar', check_password_hash, hash_guardado, password):
+        return False, None
+    if rehash and necesita_rehash(hash_guardado):
+        try:
+            return True, generar_hash(password)
+        except Ocupado:
+            return True, None  # Se actualiza en el próximo inicio de sesión
+    return True, None
+
+def metodo_de(hash_guardado):
+    """'pbkdf2:sha256:600000$sal$hash' -> 'pbkdf2:sha256:600000'."""
+    return hash_guardado.split('$', 1)[0]
+
+def es_hash(valor):
+    """True si `valor` tiene el formato de generate_password_hash (y no es una contraseña en texto plano)."""
+    return bool(valor) and valor.count('$') == 2 and metodo_de(valor).split(':', 1)[0] in ('pbkdf2', 'scrypt')
+
+def metodo_normalizado(metodo=None):
+    """
+    Prefijo que Werkzeug escribe en los hashes de `metodo` (por defecto config.PASSWORD_METODO):
+    expande los parámetros omitidos ('scrypt' -> 'scrypt:32768:8:1', 'pbkdf2:sha256' ->
+    'pbkdf2:sha256:1000000'). Se obtiene generando un hash una sola vez por método.
+    """
+    metodo = metodo or config.PASSWORD_METODO
+    with _metodos_lock:
+        if metodo not in _metodos:
+            _metodos[metodo] = metodo_de(generate_password_hash('', metodo))
+        return _metodos[metodo]
+
+def necesita_rehash(hash_guardado):
+    return metodo_de(hash_guardado) != metodo_normalizado()
+
+# --- Límite de intentos ---
+class LimitadorIntentos:
+    """
+    Ventana deslizante de intentos fallidos por clave (usuario o IP): con `maximo` en
+    los últimos `ventana` segundos, los siguientes se rechazan hasta que venza el más
+    antiguo. Guarda a lo sumo `max_claves` claves (descarta las menos recientes).
+    """
+
+    def __init__(self, maximo, ventana, max_claves=10000):
+        self.maximo = maximo
+        self.ventana = ventana
+        self.max_claves = max_claves
+        self._lock = threading.Lock()
+        self._intentos = OrderedDict()
+
+    def _vigentes(self, clave, ahora):
+        intentos = self._intentos.get(clave)
+        if intentos is None:
+            return None
+        while intentos and intentos[0] <= ahora - self.ventana:
+            intentos.popleft()
+        return intentos
+
+    def espera(self, clave):
+        """Segundos que faltan para poder intentar de nuevo (0 = permitido)."""
+        ahora = time.monotonic()
+        with self._lock:
+            intentos = self._vigentes(clave, ahora)
+            if not intentos or len(intentos) < self.maximo:
+                return 0
+            return max(0.0, intentos[0] + self.ventana - ahora)
+
+    def registrar(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            intentos = self._vigentes(clave, ahora)
+            if intentos is None:
+                intentos = self._intentos[clave] = deque()
+            intentos.append(ahora)
+            self._intentos.move_to_end(clave)
+            while len(self._intentos) > self.max_claves:
+                self._intentos.popitem(last=False)
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._intentos.pop(clave, None)
+
+# Solo cuentan los fallos: toda una institución puede entrar desde la misma IP (NAT).
+# Un login correcto reinicia los del usuario, pero no los de la IP (si no, una cuenta
+# válida serviría para seguir probando contraseñas de otras).
+por_usuario = LimitadorIntentos(config.LOGIN_FALLOS_POR_USUARIO, config.LOGIN_VENTANA)
+por_ip = LimitadorIntentos(config.LOGIN_FALLOS_POR_IP, config.LOGIN_VENTANA)
+
+def espera_login(usuario, ip):
+    """Segundos que debe esperar este intento (0 = se puede verificar la contraseña)."""
+    return max(por_usuario.espera(usuario.lower()), por_ip.espera(ip))
+
+def registrar_login(usuario, ip, correcto):
+    if correcto:
+        por_usuario.reiniciar(usuario.lower())
+    else:
+        por_usuario.registrar(usuario.lower())
+        por_ip.registrar(ip)
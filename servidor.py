@@ -0,0 +1,137 @@
+"""
+Servidor de producción: un proceso de ingesta (terminales, escritor de logs, archivado)
+y varios procesos web (waitress) que comparten el mismo puerto.
+
+Uso (desde la raíz del proyecto):
+    python servidor.py
+    python servidor.py --procesos 4 --hilos 16 --puerto 5000
+"""
+import argparse
+import multiprocessing
+import signal
+import socket
+import sys
+import threading
+import time
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+
+# --- SERVIDOR CON VARIOS PROCESOS ---
+# app.py con el servidor de desarrollo de Flask atiende todo en un proceso: un reporte
+# pesado o la recarga de un dashboard compiten por el GIL con los eventos de los
+# terminales. Aquí el supervisor aplica las migraciones, liga el puerto una sola vez y
+# arranca un proceso de ingesta, único dueño de los streams de los terminales (es el
+# líder, ver eleccion_lider.py), y SERVIDOR_PROCESOS procesos web que reciben el socket
+# ya ligado (funciona igual en Windows y en Linux) y leen la BD por el pool. Los logs
+# nuevos y los cambios de usuarios llegan a cada proceso por cambios_bd.py.
+# Si un proceso termina, el supervisor lo vuelve a arrancar.
+#
+# Los hijos se crean con "spawn" (lo único disponible en Windows): importan app.py
+# después de aplicar los ajustes de config que reciben del supervisor.
+
+def _aplicar_ajustes(ajustes):
+    for nombre, valor in ajustes.items():
+        setattr(config, nombre, valor)
+    # El supervisor detiene a los hijos: Ctrl+C en la consola no les llega como KeyboardInterrupt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Con SIGTERM se sale por sys.exit, así el escritor de logs vacía su cola (atexit)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+def proceso_ingesta(ajustes):
+    _aplicar_ajustes(ajustes)
+    import app
+    app.bio.init_db()
+    app.bio.iniciar_sincronizacion()
+    app.iniciar_ingesta()
+    print("🛰️  Proceso de ingesta listo.", flush=True)
+    threading.Event().wait()  # Los servicios corren en hilos
+
+def proceso_web(ajustes, sock, hilos):
+    _aplicar_ajustes(ajustes)
+    import waitress
+    import app
+    aplicacion = app.crear_app(dispositivos=False)
+    waitress.serve(aplicacion, sockets=[sock], threads=hilos, ident='SistemaTesis')
+
+class Supervisor:
+    def __init__(self, host, puerto, procesos, hilos, ajustes):
+        self.host = host
+        self.puerto = puerto
+        self.procesos = procesos
+        self.hilos = hilos
+        self.ajustes = ajustes
+        self._contexto = multiprocessing.get_context('spawn')
+        self._hijos = {}  # nombre -> (Process, función, argumentos)
+        self._socket = None
+
+    def _arrancar(self, nombre, funcion, argumentos):
+        proceso = self._contexto.Process(target=funcion, args=argumentos, name=nombre, daemon=False)
+        proceso.start()
+        self._hijos[nombre] = (proceso, funcion, argumentos)
+
+    def iniciar(self):
+        # Migraciones una sola vez, antes de que los procesos abran la BD
+        import biometrico_driver
+        biometrico_driver.init_db()
+
+        self._socket = socket.create_server((self.host, self.puerto), backlog=1024)
+        self._arrancar('ingesta', proceso_ingesta, (self.ajustes,))
+        for i in range(self.procesos):
+            self._arrancar(f'web-{i + 1}', proceso_web, (self.ajustes, self._socket, self.hilos))
+        print(f"🌐 Servidor en http://{self.host}:{self.puerto} "
+              f"({self.procesos} procesos web x {self.hilos} hilos + 1 de ingesta)", flush=True)
+
+    def vigilar(self, intervalo=1.0):
+        """Vuelve a arrancar los procesos que terminen; no retorna hasta KeyboardInterrupt/SystemExit."""
+        while True:
+            time.sleep(intervalo)
+            for nombre, (proceso, funcion, argumentos) in list(self._hijos.items()):
+                if not proceso.is_alive():
+                    print(f"⚠️ El proceso {nombre} terminó (código {proceso.exitcode}): se vuelve a arrancar.",
+                          flush=True)
+                    self._arrancar(nombre, funcion, argumentos)
+
+    def detener(self, timeout=10):
+        for proceso, _, _ in self._hijos.values():
+            if proceso.is_alive():
+                proceso.terminate()
+        for proceso, _, _ in self._hijos.values():
+            proceso.join(timeout)
+            if proceso.is_alive():
+                proceso.kill()
+        if self._socket is not None:
+            self._socket.close()
+
+def main(argv=None):
+    multiprocessing.freeze_support()  # Necesario en el ejecutable de PyInstaller (Windows)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--puerto', type=int, default=config.SERVIDOR_PUERTO)
+    parser.add_argument('--procesos', type=int, default=config.SERVIDOR_PROCESOS, help="Procesos web")
+    parser.add_argument('--hilos', type=int, default=config.SERVIDOR_HILOS, help="Hilos por proceso web")
+    parser.add_argument('--db', default=config.DB_NAME)
+    parser.add_argument('--puerto-lider', type=int, default=config.LIDER_PUERTO,
+                        help="Puerto local de la elección de líder (distinto por instalación)")
+    args = parser.parse_args(argv)
+    if args.procesos < 1:
+        parser.error("--procesos debe ser al menos 1")
+
+    ajustes = {'DB_NAME': args.db, 'LIDER_PUERTO': args.puerto_lider}
+    for nombre, valor in ajustes.items():
+        setattr(config, nombre, valor)
+    # SIGTERM (p. ej. systemd o la prueba de carga) detiene a los hijos igual que Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    supervisor = Supervisor(args.host, args.puerto, args.procesos, args.hilos, ajustes)
+    try:
+        supervisor.iniciar()
+        supervisor.vigilar()
+    except (KeyboardInterrupt, SystemExit):
+        print("🛑 Deteniendo el servidor...", flush=True)
+    finally:
+        supervisor.detener()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
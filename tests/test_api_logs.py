@@ -0,0 +1,75 @@
+"""
+GET /api/logs: el ETag cambia al renombrar un docente o archivar un mes, no solo
+cuando entra un log nuevo.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_api_logs
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import app
+import archivo_logs
+import config
+import directorio_usuarios
+import migraciones
+from benchmarks.datos_sinteticos import crear_esquema
+
+class EtagLogs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = config.DB_NAME
+        config.DB_NAME = os.path.join(self.tmp.name, 'logs.db')
+        conn = crear_esquema(config.DB_NAME)
+        conn.executemany("INSERT INTO usuarios (biometric_id, nombre, username, password, rol) VALUES (?, ?, ?, 'x', ?)",
+                         [('1', 'Administrador', 'admin', 'admin'), ('117', 'Docente 117', 'docente117', 'docente')])
+        conn.executemany("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen) VALUES (?, '117', 'ASISTENCIA', 'Huella')",
+                         [('2025-01-15 08:00:00',), ('2025-02-17 08:00:00',)])
+        conn.commit()
+        migraciones.aplicar_migraciones(conn)
+        conn.close()
+        self.directorio = mock.patch.object(app.bio, 'directorio', directorio_usuarios.DirectorioUsuarios(config.DB_NAME))
+        self.directorio.start()
+        self.cliente = app.crear_app(iniciar_servicios=False).test_client()
+        with self.cliente.session_transaction() as sesion:
+            sesion['_user_id'] = '1'
+
+    def tearDown(self):
+        self.directorio.stop()
+        config.DB_NAME = self.db
+        self.tmp.cleanup()
+
+    def etag(self):
+        respuesta = self.cliente.get('/api/logs')
+        self.assertEqual(respuesta.status_code, 200)
+        # Con el ETag anterior, la misma consulta sin cambios responde 304
+        self.assertEqual(self.cliente.get('/api/logs', headers={'If-None-Match': respuesta.headers['ETag']})
+                         .status_code, 304)
+        return respuesta.headers['ETag']
+
+    def ejecutar(self, sql):
+        conn = sqlite3.connect(config.DB_NAME)
+        with conn:
+            conn.execute(sql)
+        conn.close()
+
+    def test_renombrar_docente(self):
+        antes = self.etag()
+        self.ejecutar("UPDATE usuarios SET nombre = 'Docente Renombrado' WHERE biometric_id = '117'")
+        self.assertNotEqual(self.etag(), antes)
+
+    def test_archivar_mes(self):
+        antes = self.etag()
+        conn = sqlite3.connect(config.DB_NAME)
+        try:
+            self.assertEqual(archivo_logs.archivar_mes(conn, '2025-01'), 1)
+        finally:
+            conn.close()
+        self.assertNotEqual(self.etag(), antes)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Horarios por docente: corte entre jornadas y métricas de analitica_asistencia.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_horarios
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+import horarios
+import migraciones
+import reportes
+from benchmarks.datos_sinteticos import crear_esquema
+
+try:
+    import numpy  # noqa: F401
+except ImportError:
+    numpy = None
+
+JUEVES = date(2025, 5, 22)
+
+class CorteSoloTarde(unittest.TestCase):
+    """Un docente con solo turno de tarde/noche que llega antes de entrada - margen."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        ruta = os.path.join(self.tmp.name, 'horarios.db')
+        conn = crear_esquema(ruta)
+        conn.execute("INSERT INTO usuarios (biometric_id, nombre, username, password) "
+                     "VALUES ('117', 'Docente 117', 'docente117', 'x')")
+        migraciones.aplicar_migraciones(conn)
+        usuario_id, = conn.execute("SELECT id FROM usuarios WHERE biometric_id = '117'").fetchone()
+        horarios.agregar(conn, usuario_id, [0, 1, 2, 3, 4], 1, '18:00', '22:00', '2025-01-01')
+        conn.executemany("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen) VALUES (?, '117', 'ASISTENCIA', 'Huella')",
+                         [(f"{JUEVES} 17:46:51",), (f"{JUEVES} 22:06:09",)])
+        conn.commit()
+        conn.row_factory = sqlite3.Row
+        self.conn = conn
+        self.usuarios = [{'id': usuario_id, 'biometric_id': '117', 'nombre': 'Docente 117'}]
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_corte_manda_todo_a_la_tarde(self):
+        indice = horarios.cargar(self.conn)
+        self.assertIsNone(indice.turnos('117', JUEVES)[0])
+        # La llegada temprana (17:46) no puede quedar en una mañana sin turno
+        self.assertLess(indice.corte('117', JUEVES), horarios._segundos('17:46'))
+        self.assertIn('117', indice.con_corte_distinto(['117'], JUEVES, JUEVES))
+
+    @unittest.skipIf(numpy is None, "analitica_asistencia necesita numpy")
+    def test_analitica_llegada_temprana(self):
+        import analitica_asistencia
+
+        a = analitica_asistencia.analizar(self.conn, self.usuarios, JUEVES, JUEVES, hoy=date(2025, 6, 1))
+        dia, = a.detalle(0)
+        self.assertEqual(dia['marcas'], 2)
+        self.assertEqual(dia['sin_salida'], 0)
+        self.assertEqual(dia['atraso_min'], 0.0)
+        self.assertAlmostEqual(dia['horas'], 4.32, places=2)
+
+    @unittest.skipIf(numpy is None, "el reporte recalcula los cortes propios con numpy")
+    def test_reporte_llegada_temprana(self):
+        (_, _, (marcas,)), = reportes.iterar_marcas(self.conn, self.usuarios, JUEVES, JUEVES)
+        self.assertEqual(marcas, [None, None, 0, '17:46:51', '22:06:09', 2])
+
+    @unittest.skipIf(numpy is None, "analitica_asistencia necesita numpy")
+    def test_sin_marcas_en_el_rango(self):
+        import analitica_asistencia
+
+        a = analitica_asistencia.analizar(self.conn, self.usuarios, date(2026, 5, 1), date(2026, 5, 31))
+        self.assertEqual(a.resumen()[0]['dias_con_marcas'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
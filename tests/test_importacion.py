@@ -0,0 +1,83 @@
+"""
+Importación de docentes: una sola a la vez entre procesos, tope de contraseñas para la
+web y permiso de puerta en lote.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_importacion
+"""
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import config
+import importacion_docentes
+import migraciones
+from benchmarks.datos_sinteticos import crear_esquema
+
+def _csv(filas):
+    lineas = ["nombre;biometric_id;username;password;acceso_puerta"]
+    lineas += [f"Docente {i};{500 + i};importado{i};clave-{i};no" for i in range(filas)]
+    return "\n".join(lineas).encode()
+
+class Importacion(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = config.DB_NAME, config.PASSWORD_METODO
+        config.DB_NAME = os.path.join(self.tmp.name, 'importacion.db')
+        config.PASSWORD_METODO = 'pbkdf2:sha256:1000'  # Barato: solo importa que haya hash
+        conn = crear_esquema(config.DB_NAME)
+        migraciones.aplicar_migraciones(conn)
+        conn.close()
+
+    def tearDown(self):
+        config.DB_NAME, config.PASSWORD_METODO = self.config
+        self.tmp.cleanup()
+
+    def ejecutar(self, sql, parametros=()):
+        conn = sqlite3.connect(config.DB_NAME)
+        with conn:
+            filas = conn.execute(sql, parametros).fetchall()
+        conn.close()
+        return filas
+
+    def docentes_importados(self):
+        return self.ejecutar("SELECT COUNT(*) FROM usuarios WHERE username LIKE 'importado%'")[0][0]
+
+    def test_otra_importacion_en_curso(self):
+        # Otro proceso con latido reciente
+        self.ejecutar("INSERT INTO importacion_en_curso (id, dueno, latido) VALUES (1, 'otro', ?)", (time.time(),))
+        with self.assertRaisesRegex(importacion_docentes.ErrorImportacion, "en curso"):
+            importacion_docentes.importar(_csv(2), 'docentes.csv', procesos=1)
+        self.assertEqual(self.docentes_importados(), 0)
+
+    def test_importacion_de_un_proceso_caido(self):
+        self.ejecutar("INSERT INTO importacion_en_curso (id, dueno, latido) VALUES (1, 'otro', ?)",
+                      (time.time() - 2 * config.IMPORTACION_EXPIRA,))
+        resultado = importacion_docentes.importar(_csv(2), 'docentes.csv', procesos=1)
+        self.assertEqual(resultado['creados'], 2)
+        self.assertEqual(self.ejecutar("SELECT COUNT(*) FROM importacion_en_curso"), [(0,)])
+
+    def test_web_rechaza_archivos_con_muchas_contrasenas(self):
+        with self.assertRaisesRegex(importacion_docentes.ErrorImportacion, "python importacion_docentes.py"):
+            importacion_docentes.importar(_csv(3), 'docentes.csv', procesos=1, max_hashes=2)
+        self.assertEqual(self.docentes_importados(), 0)
+        # El bloqueo quedó libre
+        self.assertEqual(importacion_docentes.importar(_csv(2), 'docentes.csv', procesos=1, max_hashes=2)['creados'], 2)
+
+    def test_acceso_en_lote_solo_con_booleanos(self):
+        importacion_docentes.importar(_csv(2), 'docentes.csv', procesos=1)
+        conn = sqlite3.connect(config.DB_NAME)
+        try:
+            for estado in ("false", "true", 0, 1, None):
+                with self.assertRaises(TypeError):
+                    importacion_docentes.actualizar_acceso(conn, estado, todos=True)
+            self.assertEqual(self.ejecutar("SELECT SUM(acceso_puerta) FROM usuarios WHERE rol = 'docente'"), [(0,)])
+            self.assertEqual(importacion_docentes.actualizar_acceso(conn, True, todos=True), 2)
+        finally:
+            conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
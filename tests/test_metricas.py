@@ -0,0 +1,86 @@
+"""
+GET /metrics con varios procesos: un proceso web expone sus series y las del líder,
+cada una con su etiqueta `proceso` y una sola cabecera por métrica.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_metricas
+"""
+import unittest
+from unittest import mock
+
+import app
+import config
+import eleccion_lider
+import metricas
+
+def _exposicion_del_lider():
+    registro = metricas.Registro()
+    registro.registrar(metricas.Histograma('http_solicitud_segundos', "ayuda", ('ruta', 'metodo', 'codigo')))
+    registro.registrar(metricas.Contador('puerta_comandos_total', "ayuda", ('resultado',))).inc(resultado='ok')
+    return registro.exponer(proceso='ingesta').encode()
+
+class MetricasDeVariosProcesos(unittest.TestCase):
+
+    def setUp(self):
+        self.token = config.METRICAS_TOKEN
+        config.METRICAS_TOKEN = 'secreto'
+        self.cliente = app.crear_app(iniciar_servicios=False).test_client()
+
+    def tearDown(self):
+        config.METRICAS_TOKEN = self.token
+
+    def pedir(self):
+        return self.cliente.get('/metrics', headers={'Authorization': 'Bearer secreto'}).get_data(as_text=True)
+
+    def test_combinar_una_cabecera_por_metrica(self):
+        a = metricas.Registro()
+        a.registrar(metricas.Contador('x_total', "ayuda")).inc()
+        b = metricas.Registro()
+        b.registrar(metricas.Contador('x_total', "ayuda")).inc(3)
+        texto = metricas.combinar(a.exponer(proceso='ingesta'), b.exponer(proceso='web-1'))
+        self.assertEqual(texto.splitlines(), ['# HELP x_total ayuda', '# TYPE x_total counter',
+                                              'x_total{proceso="ingesta"} 1', 'x_total{proceso="web-1"} 3'])
+
+    def test_web_expone_sus_series_y_las_del_lider(self):
+        self.assertFalse(app.eleccion.es_lider)
+        self.pedir()  # Deja una observación de http_solicitud_segundos en este proceso
+        with mock.patch.object(eleccion_lider, 'consultar_lider',
+                               return_value=(metricas.TIPO_CONTENIDO, _exposicion_del_lider())):
+            texto = self.pedir()
+        local = f'proceso="{app._nombre_proceso()}"'
+        self.assertIn('puerta_comandos_total{resultado="ok",proceso="ingesta"} 1', texto)
+        self.assertIn(f'http_solicitud_segundos_count{{ruta="web.metrics",metodo="GET",codigo="200",{local}}}', texto)
+        self.assertEqual(texto.count('# TYPE http_solicitud_segundos histogram'), 1)
+
+    def test_lider_caido_expone_las_locales(self):
+        with mock.patch.object(eleccion_lider, 'consultar_lider', side_effect=OSError("sin líder")):
+            texto = self.pedir()
+        self.assertIn('# TYPE http_solicitud_segundos histogram', texto)
+
+class AccesoMetricas(unittest.TestCase):
+    """Detrás de un proxy en el mismo equipo todas las peticiones llegan desde 127.0.0.1."""
+
+    def setUp(self):
+        self.config = config.METRICAS_TOKEN, config.METRICAS_LOCALHOST
+        config.METRICAS_TOKEN = 'secreto'
+        self.cliente = app.crear_app(iniciar_servicios=False).test_client()
+
+    def tearDown(self):
+        config.METRICAS_TOKEN, config.METRICAS_LOCALHOST = self.config
+
+    def pedir(self, **encabezados):
+        with mock.patch.object(eleccion_lider, 'consultar_lider', side_effect=OSError("sin líder")):
+            return self.cliente.get('/metrics', headers=encabezados,
+                                    environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code
+
+    def test_localhost_sin_token_no_basta(self):
+        self.assertEqual(self.pedir(), 403)
+        self.assertEqual(self.pedir(Authorization='Bearer otro'), 403)
+        self.assertEqual(self.pedir(Authorization='Bearer secreto'), 200)
+
+    def test_localhost_confiable_si_se_configura(self):
+        config.METRICAS_LOCALHOST = True
+        self.assertEqual(self.pedir(), 200)
+
+if __name__ == '__main__':
+    unittest.main()
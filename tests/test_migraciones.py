@@ -0,0 +1,40 @@
+"""
+Migraciones: una BD migrada desde el esquema original resuelve cada consulta de
+migraciones.CONSULTAS_CRITICAS con índices (sin recorrer tablas completas).
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_migraciones
+"""
+import os
+import tempfile
+import unittest
+
+import migraciones
+from benchmarks.datos_sinteticos import crear_esquema
+
+class PlanesDeConsultas(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = crear_esquema(os.path.join(self.tmp.name, 'planes.db'))
+        migraciones.aplicar_migraciones(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def test_esquema_al_dia(self):
+        self.assertEqual(migraciones.version_actual(self.conn), migraciones.MIGRACIONES[-1][0])
+        self.assertEqual(migraciones.aplicar_migraciones(self.conn), [])
+
+    def test_consultas_criticas_usan_indices(self):
+        for nombre, sql, params, permitir_scan in migraciones.CONSULTAS_CRITICAS:
+            with self.subTest(consulta=nombre):
+                self.assertEqual(migraciones.recorridos_completos(self.conn, sql, params, permitir_scan), [])
+
+    def test_detecta_un_indice_perdido(self):
+        self.conn.execute("DROP INDEX idx_logs_fecha")
+        self.assertIn('reporte_rango', migraciones.verificar_planes(self.conn))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Recuperación de eventos tras un corte contra el terminal simulado (búsqueda AcsEvent de
+benchmarks/simulador_hikvision.py, con Digest y páginas cortas como los equipos reales).
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_recuperacion
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import config
+import migraciones
+from benchmarks.datos_sinteticos import crear_esquema
+from benchmarks.simulador_hikvision import SimuladorHikvision
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import biometrico_driver as bio
+
+class RecuperacionTrasCorte(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_anterior = config.DB_NAME
+        config.DB_NAME = os.path.join(self.tmp.name, 'recuperacion.db')
+        conn = crear_esquema(config.DB_NAME)
+        with contextlib.redirect_stdout(io.StringIO()):
+            migraciones.aplicar_migraciones(conn)
+        self.terminal_id, = conn.execute("SELECT id FROM dispositivos WHERE tipo = 'terminal'").fetchone()
+        conn.close()
+        self.sim = SimuladorHikvision(max_resultados=7)  # Fuerza varias páginas
+
+    def tearDown(self):
+        config.DB_NAME = self.db_anterior
+        self.tmp.cleanup()
+
+    def marcas(self, momentos):
+        for momento in momentos:
+            self.sim._serial += 1
+            self.sim.historial.append((momento, {
+                "major": 5, "minor": 75, "time": momento.isoformat(timespec='seconds'),
+                "employeeNoString": "105", "name": "Docente 105", "serialNo": self.sim._serial,
+            }))
+
+    def guardar_cursor(self, momento, serial):
+        """Último evento guardado del terminal antes del corte (lo que habría dejado el stream)."""
+        conn = sqlite3.connect(config.DB_NAME)
+        conn.execute("INSERT INTO logs (fecha, usuario_id, tipo_evento, origen, dispositivo_id, serial_no) "
+                     "VALUES (?, '105', 'ASISTENCIA', 'Huella', ?, ?)",
+                     (momento.strftime('%Y-%m-%d %H:%M:%S'), self.terminal_id, serial))
+        conn.commit()
+        conn.close()
+
+    def filas(self):
+        conn = sqlite3.connect(config.DB_NAME)
+        n, = conn.execute("SELECT COUNT(*) FROM logs WHERE dispositivo_id = ?", (self.terminal_id,)).fetchone()
+        conn.close()
+        return n
+
+    async def recuperar(self):
+        servidor = await self.sim.iniciar()
+        terminal = {'id': self.terminal_id, 'nombre': 'Terminal de prueba', 'usuario': self.sim.usuario,
+                    'clave': self.sim.clave, 'ruta_stream': None,
+                    'host': f"127.0.0.1:{servidor.sockets[0].getsockname()[1]}"}
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                return await bio.recuperar_eventos_terminal(terminal)
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+
+    def test_recupera_el_corte_sin_duplicar(self):
+        ahora = datetime.now().astimezone().replace(microsecond=0)
+        antes = [ahora - timedelta(hours=2, minutes=i) for i in range(5, 0, -1)]
+        corte = [ahora - timedelta(minutes=90 - 3 * i) for i in range(20)]
+        self.marcas(antes + corte)
+        self.guardar_cursor(antes[-1], len(antes))  # El inicio de la búsqueda es inclusivo: vuelve y se ignora
+
+        self.assertEqual(asyncio.run(self.recuperar()), len(corte))
+        self.assertEqual(self.filas(), 1 + len(corte))
+        self.assertGreater(self.sim.busquedas, 1)  # Recorrió varias páginas
+        # Reconectar de nuevo no vuelve a insertar nada
+        self.assertEqual(asyncio.run(self.recuperar()), 0)
+        self.assertEqual(self.filas(), 1 + len(corte))
+
+    def test_terminal_sin_cursor_no_recupera(self):
+        self.marcas([datetime.now().astimezone().replace(microsecond=0) - timedelta(minutes=5)])
+        self.assertEqual(asyncio.run(self.recuperar()), 0)
+        self.assertEqual(self.sim.busquedas, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Contraseñas: el rehash al iniciar sesión solo ocurre si el hash es de otro método o costo.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_seguridad
+"""
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+import config
+import seguridad
+
+class Rehash(unittest.TestCase):
+
+    def setUp(self):
+        self.metodo = config.PASSWORD_METODO
+
+    def tearDown(self):
+        config.PASSWORD_METODO = self.metodo
+
+    def test_metodo_abreviado_no_rehashea(self):
+        # Werkzeug guarda 'scrypt:32768:8:1$...' aunque se le pida 'scrypt'
+        config.PASSWORD_METODO = 'scrypt'
+        guardado = generate_password_hash('clave', 'scrypt')
+        self.assertEqual(seguridad.metodo_normalizado(), seguridad.metodo_de(guardado))
+        self.assertFalse(seguridad.necesita_rehash(guardado))
+        self.assertEqual(seguridad.verificar(guardado, 'clave'), (True, None))
+
+    def test_metodo_completo_no_rehashea(self):
+        config.PASSWORD_METODO = 'pbkdf2:sha256:1000'
+        guardado = generate_password_hash('clave', config.PASSWORD_METODO)
+        self.assertEqual(seguridad.verificar(guardado, 'clave'), (True, None))
+
+    def test_otro_costo_rehashea(self):
+        config.PASSWORD_METODO = 'pbkdf2:sha256:1000'
+        guardado = generate_password_hash('clave', 'pbkdf2:sha256:2000')
+        valida, nuevo = seguridad.verificar(guardado, 'clave')
+        self.assertTrue(valida)
+        self.assertEqual(seguridad.metodo_de(nuevo), 'pbkdf2:sha256:1000')
+        self.assertFalse(seguridad.necesita_rehash(nuevo))
+
+    def test_clave_incorrecta(self):
+        config.PASSWORD_METODO = 'pbkdf2:sha256:1000'
+        guardado = generate_password_hash('clave', 'pbkdf2:sha256:2000')
+        self.assertEqual(seguridad.verificar(guardado, 'otra'), (False, None))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Trabajos de reporte: el latido cubre toda la vida del trabajo y limpiar_cache no borra
+el temporal de un trabajo que sigue latiendo.
+
+Uso (desde la raíz del proyecto):
+    python -m unittest tests.test_trabajos_reporte
+"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import date
+from unittest import mock
+
+import config
+import migraciones
+import reportes
+import trabajos_reporte
+from benchmarks.datos_sinteticos import crear_esquema
+
+class ConCacheTemporal(unittest.TestCase):
+    """BD migrada y carpeta de caché temporales."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.config = config.DB_NAME, config.REPORTES_CACHE_DIR
+        config.DB_NAME = os.path.join(self.tmp.name, 'reportes.db')
+        config.REPORTES_CACHE_DIR = os.path.join(self.tmp.name, 'cache')
+        os.makedirs(config.REPORTES_CACHE_DIR)
+        conn = crear_esquema(config.DB_NAME)
+        migraciones.aplicar_migraciones(conn)
+        conn.close()
+
+    def tearDown(self):
+        config.DB_NAME, config.REPORTES_CACHE_DIR = self.config
+        self.tmp.cleanup()
+
+class TemporalesDeTrabajos(ConCacheTemporal):
+
+    def trabajo(self, estado, latido):
+        trabajo_id = uuid.uuid4().hex
+        conn = trabajos_reporte._conexion()
+        with conn:
+            conn.execute("INSERT INTO trabajos_reporte (id, clave, formato, fecha_inicio, fecha_fin, estado, creado, "
+                         "actualizado) VALUES (?, 'clave', 'xlsx', '2025-01-01', '2025-12-31', ?, ?, ?)",
+                         (trabajo_id, estado, latido, latido))
+        conn.close()
+        return trabajo_id
+
+    def temporal(self, trabajo_id, antiguedad):
+        """Temporal del trabajo sin modificarse desde hace `antiguedad` segundos (write_only no escribe hasta save)."""
+        ruta = f"{trabajos_reporte.ruta_archivo('clave', 'xlsx')}.{trabajo_id}.tmp"
+        open(ruta, 'wb').close()
+        hace = time.time() - antiguedad
+        os.utime(ruta, (hace, hace))
+        return ruta
+
+    def test_trabajo_largo_con_latido_conserva_su_temporal(self):
+        ahora = time.time()
+        ruta = self.temporal(self.trabajo('en_curso', ahora), 10 * config.REPORTES_EXPIRA)
+        trabajos_reporte.limpiar_cache(ahora)
+        self.assertTrue(os.path.exists(ruta))
+
+    def test_temporales_huerfanos(self):
+        ahora = time.time()
+        sin_latido = self.temporal(self.trabajo('en_curso', ahora - 2 * config.REPORTES_EXPIRA), 0)
+        terminado = self.temporal(self.trabajo('error', ahora), 0)
+        sin_trabajo = self.temporal(uuid.uuid4().hex, 0)
+        trabajos_reporte.limpiar_cache(ahora)
+        for ruta in (sin_latido, terminado, sin_trabajo):
+            self.assertFalse(os.path.exists(ruta), ruta)
+
+    def test_archivos_listos_se_conservan(self):
+        ruta = trabajos_reporte.ruta_archivo('clave', 'csv')
+        open(ruta, 'wb').close()
+        trabajos_reporte.limpiar_cache()
+        self.assertTrue(os.path.exists(ruta))
+
+class LatidoDeTrabajos(ConCacheTemporal):
+    """Un tramo largo sin avance fila a fila (resumen, wb.save) no deja el trabajo por interrumpido."""
+
+    def setUp(self):
+        super().setUp()
+        self.tiempos = config.REPORTES_LATIDO, config.REPORTES_EXPIRA
+        config.REPORTES_LATIDO, config.REPORTES_EXPIRA = 0.05, 0.3
+
+    def tearDown(self):
+        config.REPORTES_LATIDO, config.REPORTES_EXPIRA = self.tiempos
+        super().tearDown()
+
+    def test_tramo_sin_filas_mas_largo_que_la_expiracion(self):
+        continuar = threading.Event()
+
+        def csv_lento(filas, inicio, fin):
+            list(filas)
+            continuar.wait(10)  # Sin avance, como un wb.save de un xlsx grande
+            yield "reporte\n"
+
+        inicio, fin = date(2025, 1, 1), date(2025, 1, 31)
+        with mock.patch.object(reportes, 'generar_csv_matricial', csv_lento):
+            trabajo_id = trabajos_reporte.enviar(inicio, fin, None, 'csv')
+            try:
+                time.sleep(3 * config.REPORTES_EXPIRA)
+                self.assertEqual(trabajos_reporte.estado(trabajo_id)['estado'], 'en_curso')
+                # Un pedido igual se suma al mismo trabajo en vez de arrancar otro
+                self.assertEqual(trabajos_reporte.enviar(inicio, fin, None, 'csv'), trabajo_id)
+            finally:
+                # Que el trabajo termine antes de que tearDown devuelva config.DB_NAME a la BD real
+                continuar.set()
+                for _ in range(100):
+                    if trabajos_reporte._activos.get(trabajo_id, 'fin') == 'fin':
+                        break
+                    time.sleep(0.05)
+        self.assertEqual(trabajos_reporte.estado(trabajo_id)['estado'], 'listo')
+
+if __name__ == '__main__':
+    unittest.main()
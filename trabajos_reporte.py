@@ -0,0 +1,334 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+# --- CONFIGURACIÓN (Importada) ---
+import config
+import metricas
+import pool_db
+import reportes
+
+# --- TRABAJOS DE REPORTE EN SEGUNDO PLANO ---
+# /descargar_reporte_matricial arma el archivo dentro de la petición: un rango largo
+# supera el tiempo de espera de un proxy y ocupa un hilo web, y dos administradores
+# que piden lo mismo pagan dos veces. Aquí un reporte es un trabajo:
+# - enviar() responde enseguida con el id; un pool de REPORTES_HILOS hilos por proceso
+#   arma el archivo y va guardando el avance en la tabla trabajos_reporte, que
+#   cualquier proceso web puede consultar;
+# - el archivo queda en caché en disco con una clave derivada de (rango, docente,
+#   formato, versión de los datos). La versión sale de la tabla `versiones`: la de
+#   `usuarios` y una por día ('logs:YYYY-MM-DD') que un trigger incrementa con cada
+#   log insertado. Una marca nueva en el rango (también una recuperada días después)
+#   cambia la clave; un pedido igual sin marcas nuevas se sirve del disco;
+# - si el mismo reporte ya se está armando, el nuevo pedido recibe ese mismo trabajo.
+# Un hilo de cada proceso actualiza cada REPORTES_LATIDO segundos el latido (y el avance)
+# de sus trabajos pendientes y en curso, durante toda su vida: también mientras se calcula
+# el resumen o se guarda un xlsx grande, que no avanzan fila a fila. Si el proceso muere,
+# a los REPORTES_EXPIRA segundos se da por interrumpido y un nuevo pedido lo vuelve a generar.
+
+FORMATOS = ('xlsx', 'csv', 'parquet')
+ACTIVOS = ('pendiente', 'en_curso')
+
+TRABAJOS = metricas.contador(
+    'reporte_trabajos_total', "Pedidos de reporte en segundo plano, por resultado "
+    "(cache, compartido, generado, error, ocupado).", ('resultado',))
+TRABAJO_SEGUNDOS = metricas.histograma(
+    'reporte_trabajo_segundos', "Tiempo de generación de cada trabajo de reporte, por formato.", ('formato',),
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+
+class Ocupado(Exception):
+    """Hay demasiados trabajos pendientes en este proceso."""
+
+_pool = None
+_pool_lock = threading.Lock()
+_cupos = None
+_activos = {}  # id -> docentes hechos (None si está en cola) de los trabajos de este proceso
+_activos_lock = threading.Lock()
+
+def crear_tabla(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos_reporte (
+            id TEXT PRIMARY KEY,
+            clave TEXT NOT NULL,               -- nombre del archivo en caché (sin extensión)
+            formato TEXT NOT NULL,
+            fecha_inicio TEXT NOT NULL,
+            fecha_fin TEXT NOT NULL,
+            docente_id TEXT,                   -- biometric_id o NULL (todos)
+            estado TEXT NOT NULL,              -- pendiente, en_curso, listo, error
+            hechos INTEGER NOT NULL DEFAULT 0, -- docentes procesados
+            total INTEGER,
+            error TEXT,
+            desde_cache INTEGER NOT NULL DEFAULT 0,
+            usuario_id INTEGER,
+            creado REAL NOT NULL,
+            actualizado REAL NOT NULL,         -- latido mientras está activo
+            terminado REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trabajos_reporte_clave ON trabajos_reporte (clave, estado)")
+
+def directorio_cache(ruta_db=None):
+    return config.REPORTES_CACHE_DIR or os.path.join(
+        os.path.dirname(os.path.abspath(ruta_db or config.DB_NAME)), 'reportes_cache')
+
+def ruta_archivo(clave, formato):
+    return os.path.join(directorio_cache(), f"{clave}.{formato}")
+
+def usuarios_del_reporte(conn, docente_id):
+    """Un docente (por biometric_id) o todos los docentes."""
+    if docente_id:
+        return conn.execute("SELECT * FROM usuarios WHERE biometric_id = ?", (docente_id,)).fetchall()
+    return conn.execute("SELECT * FROM usuarios WHERE rol='docente'").fetchall()
+
+def clave_cache(conn, inicio, fin, docente_id, formato):
+    """
+    Clave del archivo en caché: cambia si cambia cualquier versión de los días del rango,
+    la de `usuarios` (nombres, altas y bajas), la de `horarios`, el corte de jornada o el
+    horario general; si el rango llega a hoy, también cada día (las ausencias cuentan solo
+    los días cerrados).
+    """
+    versiones = conn.execute(
+        "SELECT clave, valor FROM versiones WHERE (clave >= ? AND clave <= ?) OR clave IN ('usuarios', 'horarios')",
+        (f"logs:{inicio}", f"logs:{fin}")).fetchall()
+    horario = [config.HORARIO_ENTRADA_MANANA, config.HORARIO_SALIDA_MANANA, config.HORARIO_ENTRADA_TARDE,
+               config.HORARIO_SALIDA_TARDE, list(config.HORARIO_DIAS_LABORABLES), config.HORARIO_MARGEN_ENTRADA_MIN,
+               config.HORARIO_TOLERANCIA_MIN]
+    hoy = date.today()
+    material = json.dumps([inicio.isoformat(), fin.isoformat(), docente_id, formato,
+                           reportes.CORTE_JORNADA.isoformat(), horario, hoy.isoformat() if fin >= hoy else None,
+                           [tuple(v) for v in versiones]])
+    return hashlib.sha256(material.encode()).hexdigest()[:32]
+
+def _conexion(solo_lectura=False):
+    return pool_db.obtener_pool(config.DB_NAME, solo_lectura).adquirir()
+
+def _actualizar(trabajo_id, **campos):
+    campos['actualizado'] = time.time()
+    conn = _conexion()
+    try:
+        with conn:
+            conn.execute(f"UPDATE trabajos_reporte SET {', '.join(f'{c} = :{c}' for c in campos)} WHERE id = :id",
+                         dict(campos, id=trabajo_id))
+    finally:
+        conn.close()
+
+def _latir():
+    """Hilo de latido: renueva `actualizado` y guarda el avance de los trabajos activos de este proceso."""
+    while True:
+        time.sleep(config.REPORTES_LATIDO)
+        with _activos_lock:
+            activos = list(_activos.items())
+        if not activos:
+            continue
+        ahora = time.time()
+        try:
+            conn = _conexion()
+            try:
+                with conn:
+                    # Solo los activos: un trabajo que acaba de terminar no vuelve atrás
+                    conn.executemany("UPDATE trabajos_reporte SET actualizado = ?, hechos = COALESCE(?, hechos) "
+                                     "WHERE id = ? AND estado IN ('pendiente', 'en_curso')",
+                                     [(ahora, hechos, trabajo_id) for trabajo_id, hechos in activos])
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ Error actualizando el latido de los reportes: {e}")
+
+def _con_avance(filas, trabajo_id):
+    for hechos, fila in enumerate(filas, start=1):
+        yield fila
+        _activos[trabajo_id] = hechos
+
+def _generar(trabajo_id, clave, inicio, fin, docente_id, formato):
+    with _activos_lock:
+        _activos[trabajo_id] = 0
+    destino = ruta_archivo(clave, formato)
+    temporal = f"{destino}.{trabajo_id}.tmp"
+    t0 = time.perf_counter()
+    try:
+        conn = _conexion(solo_lectura=True)
+        try:
+            usuarios = usuarios_del_reporte(conn, docente_id)
+            _actualizar(trabajo_id, estado='en_curso', total=len(usuarios))
+            os.makedirs(directorio_cache(), exist_ok=True)
+            with open(temporal, 'wb') as salida:
+                if formato == 'parquet':
+                    filas = _con_avance(reportes.iterar_marcas(conn, usuarios, inicio, fin), trabajo_id)
+                    reportes.escribir_parquet(filas, inicio, fin, salida)
+                else:
+                    filas = _con_avance(reportes.iterar_matriz_asistencia(conn, usuarios, inicio, fin), trabajo_id)
+                    if formato == 'csv':
+                        for bloque in reportes.generar_csv_matricial(filas, inicio, fin):
+                            salida.write(bloque.encode('utf-8'))
+                    else:
+                        reportes.escribir_excel_matricial(filas, inicio, fin, salida,
+                                                          reportes.resumen_asistencia(conn, usuarios, inicio, fin))
+        finally:
+            conn.close()
+        os.replace(temporal, destino)  # Nadie ve un archivo a medio escribir
+        TRABAJO_SEGUNDOS.observar(time.perf_counter() - t0, formato=formato)
+        _actualizar(trabajo_id, estado='listo', hechos=len(usuarios), terminado=time.time())
+        TRABAJOS.inc(resultado='generado')
+    except Exception as e:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        mensaje = "La exportación a Parquet requiere instalar 'pyarrow'." if isinstance(e, ImportError) else str(e)
+        print(f"❌ Error generando el reporte {trabajo_id}: {e}")
+        _actualizar(trabajo_id, estado='error', error=mensaje, terminado=time.time())
+        TRABAJOS.inc(resultado='error')
+    finally:
+        with _activos_lock:
+            _activos.pop(trabajo_id, None)
+        _cupos.release()
+    try:
+        limpiar_cache()
+    except OSError as e:
+        print(f"⚠️ Error limpiando la caché de reportes: {e}")
+
+def _interrumpido(fila, ahora=None):
+    return fila['estado'] in ACTIVOS and fila['actualizado'] < (ahora or time.time()) - config.REPORTES_EXPIRA
+
+def enviar(inicio, fin, docente_id, formato, usuario_id=None):
+    """
+    Registra un pedido de reporte y devuelve su id sin esperar a que se genere:
+    - si el archivo ya está en caché, el trabajo nace 'listo';
+    - si el mismo reporte se está generando (en cualquier proceso), devuelve ese trabajo;
+    - si no, lo encola en el pool de este proceso (Ocupado si la cola está llena).
+    """
+    global _pool, _cupos
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    docente_id = docente_id or None
+    conn = _conexion(solo_lectura=True)
+    try:
+        clave = clave_cache(conn, inicio, fin, docente_id, formato)
+        activos = conn.execute("SELECT * FROM trabajos_reporte WHERE clave = ? AND estado IN ('pendiente', 'en_curso')",
+                               (clave,)).fetchall()
+    finally:
+        conn.close()
+    for fila in activos:
+        if not _interrumpido(fila):
+            TRABAJOS.inc(resultado='compartido')
+            return fila['id']
+    for fila in activos:
+        _actualizar(fila['id'], estado='error', error="Interrumpido (el proceso que lo generaba se detuvo)",
+                    terminado=time.time())
+
+    ahora = time.time()
+    trabajo = {'id': uuid.uuid4().hex, 'clave': clave, 'formato': formato, 'fecha_inicio': inicio.isoformat(),
+               'fecha_fin': fin.isoformat(), 'docente_id': docente_id, 'usuario_id': usuario_id,
+               'creado': ahora, 'actualizado': ahora}
+    en_cache = os.path.exists(ruta_archivo(clave, formato))
+    if en_cache:
+        os.utime(ruta_archivo(clave, formato))  # La limpieza descarta primero los menos usados
+        trabajo.update(estado='listo', desde_cache=1, terminado=ahora)
+    else:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=config.REPORTES_HILOS, thread_name_prefix="trabajo-reporte")
+                _cupos = threading.BoundedSemaphore(config.REPORTES_HILOS + config.REPORTES_COLA)
+                threading.Thread(target=_latir, name="latido-reportes", daemon=True).start()
+        if not _cupos.acquire(blocking=False):
+            TRABAJOS.inc(resultado='ocupado')
+            raise Ocupado()
+        trabajo.update(estado='pendiente', desde_cache=0, terminado=None)
+
+    conn = _conexion()
+    try:
+        with conn:
+            conn.execute(f"INSERT INTO trabajos_reporte ({', '.join(trabajo)}) VALUES ({', '.join(':' + c for c in trabajo)})",
+                         trabajo)
+    except Exception:
+        if not en_cache:
+            _cupos.release()
+        raise
+    finally:
+        conn.close()
+
+    if en_cache:
+        TRABAJOS.inc(resultado='cache')
+    else:
+        with _activos_lock:
+            _activos.setdefault(trabajo['id'], None)
+        _pool.submit(_generar, trabajo['id'], clave, inicio, fin, docente_id, formato)
+    return trabajo['id']
+
+def estado(trabajo_id):
+    """Estado del trabajo como dict (None si no existe). Los interrumpidos se informan como 'error'."""
+    conn = _conexion(solo_lectura=True)
+    try:
+        fila = conn.execute("SELECT * FROM trabajos_reporte WHERE id = ?", (trabajo_id,)).fetchone()
+    finally:
+        conn.close()
+    if fila is None:
+        return None
+    trabajo = dict(fila)
+    if _interrumpido(fila):
+        trabajo.update(estado='error', error="Interrumpido (el proceso que lo generaba se detuvo)")
+    trabajo['progreso'] = round(trabajo['hechos'] / trabajo['total'], 3) if trabajo['total'] else (
+        1.0 if trabajo['estado'] == 'listo' else 0.0)
+    return trabajo
+
+def _temporales_huerfanos(temporales, ahora):
+    """
+    Rutas de `temporales` ({ruta: trabajo_id}) cuyo trabajo ya no está activo o dejó de
+    latir. Se decide con el latido en la BD y no con la fecha del archivo: openpyxl en
+    modo write_only no escribe nada hasta save(), así que un .tmp en uso puede tener
+    horas sin modificarse.
+    """
+    if not temporales:
+        return []
+    conn = _conexion(solo_lectura=True)
+    try:
+        filas = conn.execute("SELECT id, estado, actualizado FROM trabajos_reporte "
+                             "WHERE id IN (SELECT value FROM json_each(?))",
+                             (json.dumps(list(set(temporales.values()))),)).fetchall()
+    finally:
+        conn.close()
+    vivos = {f['id'] for f in filas if f['estado'] in ACTIVOS and not _interrumpido(f, ahora)}
+    return [ruta for ruta, trabajo_id in temporales.items() if trabajo_id not in vivos]
+
+def limpiar_cache(ahora=None):
+    """
+    Borra los archivos en caché sin uso hace más de REPORTES_CACHE_HORAS, luego los menos
+    usados hasta quedar bajo REPORTES_CACHE_MAX_MB, los temporales de trabajos que ya no
+    están en curso y los trabajos terminados más viejos.
+    """
+    ahora = ahora or time.time()
+    directorio = directorio_cache()
+    if not os.path.isdir(directorio):
+        return
+    limite = ahora - config.REPORTES_CACHE_HORAS * 3600
+    archivos = []
+    temporales = {}
+    for entrada in os.scandir(directorio):
+        if entrada.name.endswith('.tmp'):
+            # <clave>.<formato>.<trabajo_id>.tmp (ver _generar)
+            temporales[entrada.path] = entrada.name.rsplit('.', 2)[-2]
+            continue
+        estado_archivo = entrada.stat()
+        if estado_archivo.st_mtime < limite:
+            os.remove(entrada.path)
+        else:
+            archivos.append((estado_archivo.st_mtime, estado_archivo.st_size, entrada.path))
+    for ruta in _temporales_huerfanos(temporales, ahora):
+        os.remove(ruta)
+    sobrante = sum(tamano for _, tamano, _ in archivos) - config.REPORTES_CACHE_MAX_MB * 1024 * 1024
+    for _, tamano, ruta in sorted(archivos):
+        if sobrante <= 0:
+            break
+        os.remove(ruta)
+        sobrante -= tamano
+
+    conn = _conexion()
+    try:
+        with conn:
+            conn.execute("DELETE FROM trabajos_reporte WHERE estado NOT IN ('pendiente', 'en_curso') AND creado < ?",
+                         (limite,))
+    finally:
+        conn.close()